@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark stock checks for a page of products: per-product GETs vs POST /products/availability.
+
+Seeds ProductsTable with full product items (descriptions, image assets) and,
+for batches of random product IDs, measures what a client pays to learn
+their stock, status and price: one GET /products/{id} (get_product.py,
+reading DynamoDB) per product, against a single get_availability.py call.
+Reports DynamoDB calls per batch, bytes read from DynamoDB per batch
+(approximated by the size of the returned items, which is what read
+capacity is billed on), response bytes and handler latency. DynamoDB runs
+in-process in moto, so the latencies leave out the per-call network round
+trip, which is where most of the difference lands in a deployed stack.
+
+Usage:
+    python backend/benchmarks/bench_availability.py
+    python backend/benchmarks/bench_availability.py --batch 300 --batches 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+
+def seed(table, args, rng):
+    with table.batch_writer() as batch:
+        for n in range(args.products):
+            product_id = f'prod-{n:06d}'
+            status = 'active' if rng.random() > 0.05 else 'archived'
+            batch.put_item(Item={
+                'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id,
+                'name': f'Product {n}', 'description': 'Lightweight and durable. ' * 12,
+                'price': Decimal(f'{rng.uniform(2, 500):.2f}'), 'currency': 'USD', 'category': 'category-001',
+                'inventory': rng.randint(0, 200), 'reserved': 0, 'status': status,
+                'thumbnail': f'https://cdn.example.com/{product_id}/thumb.webp',
+                'imageAssets': [{'width': w, 'url': f'https://cdn.example.com/{product_id}/{w}.webp'}
+                                for w in (320, 640, 1280)],
+                'createdAt': '2026-01-01T00:00:00Z', 'updatedAt': '2026-01-01T00:00:00Z'
+            })
+
+
+def item_bytes(item):
+    return len(json.dumps(item, default=str))
+
+
+def get_event(product_id):
+    return {
+        'version': '2.0', 'routeKey': '$default', 'rawPath': f'/products/{product_id}', 'headers': {},
+        'rawQueryString': '', 'pathParameters': {'id': product_id}, 'isBase64Encoded': False,
+        'requestContext': {'http': {'method': 'GET', 'path': f'/products/{product_id}', 'sourceIp': '127.0.0.1'},
+                           'stage': '$default'}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--batch', type=int, default=200, help='product IDs per request')
+    parser.add_argument('--batches', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    context = LambdaContext(function_name='bench')
+    with local_stack(tables=['PRODUCTS_TABLE']) as stack:
+        table = stack.table('PRODUCTS_TABLE')
+        seed(table, args, rng)
+        sizes = {item['productId']: item_bytes(item) for item in table.scan()['Items']}
+        get_product = stack.handler('products', 'get_product')
+        get_availability = stack.handler('products', 'get_availability')
+
+        batches = [[f'prod-{rng.randrange(args.products + args.products // 50):06d}' for _ in range(args.batch)]
+                   for _ in range(args.batches)]
+        results = {'per_product': [], 'availability': []}
+        calls = {'per_product': 0, 'availability': 0}
+        read_bytes = {'per_product': 0, 'availability': 0}
+        response_bytes = {'per_product': 0, 'availability': 0}
+        answers = {'per_product': {}, 'availability': {}}
+        for ids in batches:
+            stack.reset_counters()
+            started = time.perf_counter()
+            for pid in ids:
+                response = get_product(get_event(pid), context)
+                response_bytes['per_product'] += len(response['body'])
+                read_bytes['per_product'] += sizes.get(pid, 0)
+                if response['statusCode'] == 200:
+                    body = json.loads(response['body'])
+                    answers['per_product'][pid] = body.get('inventory')
+            results['per_product'].append((time.perf_counter() - started) * 1000)
+            calls['per_product'] += stack.dynamodb_calls()
+
+            stack.reset_counters()
+            started = time.perf_counter()
+            response = get_availability({'body': json.dumps({'productIds': ids})}, context)
+            results['availability'].append((time.perf_counter() - started) * 1000)
+            calls['availability'] += stack.dynamodb_calls()
+            response_bytes['availability'] += len(response['body'])
+            body = json.loads(response['body'])
+            for pid, entry in body['availability'].items():
+                read_bytes['availability'] += len(json.dumps({'productId': pid, 'inventory': entry['inventory'],
+                                                              'price': entry['price'], 'status': entry['status']}))
+                if entry['status'] == 'active':
+                    answers['availability'][pid] = entry['inventory']
+
+    agree = sum(answers['availability'].get(pid) == inventory for pid, inventory in answers['per_product'].items())
+    print(f'{args.products} products, {args.batches} batches of {args.batch} IDs (about 2% unknown)')
+    print(f'Active products answered identically by both paths: {agree}/{len(answers["per_product"])}')
+    print(f'\n  {"per batch":<28} {"GET /products/{id}":>20} {"POST availability":>20}')
+    for label, values, fmt in (
+            ('DynamoDB calls', calls, '{:>20.1f}'),
+            ('KiB read from DynamoDB', read_bytes, '{:>20.1f}'),
+            ('KiB in responses', response_bytes, '{:>20.1f}')):
+        scale = args.batches * (1024 if 'KiB' in label else 1)
+        print(f'  {label:<28}' + fmt.format(values['per_product'] / scale)
+              + fmt.format(values['availability'] / scale))
+    print(f'  {"handler ms (median)":<28} {statistics.median(results["per_product"]):>20.1f} '
+          f'{statistics.median(results["availability"]):>20.1f}')
+
+
+if __name__ == '__main__':
+    main()
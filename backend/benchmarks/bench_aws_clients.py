@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark the aws_clients profiles against botocore's default client config.
+
+Runs a moto server behind backend/local/fault_proxy.py, which throttles
+above a per-second capacity (a hot partition), stalls a small fraction of
+requests (a slow storage node) and charges a handshake per new connection.
+A pool of worker threads then issues a GetItem/PutItem mix through each
+client config in turn. Reported per config: throughput, latency
+percentiles, failed operations (retries exhausted), the retries and
+throttles the client counted, and the connections the proxy accepted.
+
+Usage:
+    python backend/benchmarks/bench_aws_clients.py
+    python backend/benchmarks/bench_aws_clients.py --workers 64 --capacity 400 --stall-rate 0.005 --stall-seconds 15
+"""
+import argparse
+import logging
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+
+import boto3  # noqa: E402
+from botocore.config import Config  # noqa: E402
+
+import aws_clients  # noqa: E402
+from fault_proxy import FaultProxy  # noqa: E402
+
+TABLE = 'local-ecommerce-products'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_table(endpoint, items):
+    client = boto3.client('dynamodb', endpoint_url=endpoint)
+    client.create_table(
+        TableName=TABLE,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': 'PK', 'AttributeType': 'S'},
+                              {'AttributeName': 'SK', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}]
+    )
+    table = boto3.resource('dynamodb', endpoint_url=endpoint).Table(TABLE)
+    with table.batch_writer() as batch:
+        for n in range(items):
+            batch.put_item(Item={'PK': f'PRODUCT#prod-{n:05d}', 'SK': 'METADATA', 'inventory': 100})
+
+
+def run(label, table, proxy, args):
+    proxy.state.reset()
+    aws_clients.stats.clear()
+    rng = random.Random(args.seed)
+    ops = [(rng.random() < args.write_ratio, f'PRODUCT#prod-{rng.randrange(args.items):05d}')
+           for _ in range(args.operations)]
+    latencies, failures = [], []
+
+    def call(op):
+        write, pk = op
+        started = time.perf_counter()
+        try:
+            if write:
+                table.update_item(Key={'PK': pk, 'SK': 'METADATA'}, UpdateExpression='ADD inventory :one',
+                                  ExpressionAttributeValues={':one': 1})
+            else:
+                table.get_item(Key={'PK': pk, 'SK': 'METADATA'})
+        except Exception as e:
+            failures.append(type(e).__name__)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(call, ops))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]  # noqa: E731
+    print(f'\n{label}')
+    print(f'  {"throughput":<24} {len(ops) / elapsed:>10.0f} ops/s  ({elapsed:.1f} s)')
+    print(f'  {"latency p50 / p99 / max":<24} {statistics.median(latencies):>10.1f} / {pct(0.99):.1f} / {latencies[-1]:.0f} ms')
+    print(f'  {"failed operations":<24} {len(failures):>10}  {sorted(set(failures))}')
+    print(f'  {"client retries":<24} {aws_clients.stats["retries"]:>10}')
+    print(f'  {"throttles seen":<24} {aws_clients.stats["throttles"]:>10}')
+    print(f'  {"read timeouts":<24} {aws_clients.stats["timeouts"]:>10}')
+    print(f'  {"connections opened":<24} {proxy.state.counts["connections"]:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--operations', type=int, default=3000)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--capacity', type=float, default=600, help='requests/s the proxy admits before throttling')
+    parser.add_argument('--stall-rate', type=float, default=0.003)
+    parser.add_argument('--stall-seconds', type=float, default=12)
+    parser.add_argument('--handshake-ms', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    # Pool-full warnings are the point of the default-config run; keep them out of the report
+    logging.getLogger('urllib3.connectionpool').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=free_port(), verbose=False)
+    server.start()
+    upstream = f'http://127.0.0.1:{server._port}'
+    seed_table(upstream, args.items)
+
+    print(f'{args.operations} operations, {args.workers} threads, capacity {args.capacity:.0f} req/s, '
+          f'{args.stall_rate:.1%} stalled {args.stall_seconds:.0f} s, {args.handshake_ms:.0f} ms per new connection')
+    with FaultProxy(upstream, capacity=args.capacity, stall_rate=args.stall_rate,
+                    stall_seconds=args.stall_seconds, handshake_ms=args.handshake_ms) as proxy:
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = proxy.url
+
+        default = boto3.resource('dynamodb', config=Config())
+        aws_clients._instrument(default.meta.client)
+        run('botocore defaults (legacy retries, 10 connections, 60 s read timeout)', default.Table(TABLE), proxy, args)
+
+        for profile in ('interactive', 'batch'):
+            resource = aws_clients.resource('dynamodb', profile, pool_size=args.workers)
+            settings = aws_clients.PROFILES[profile]
+            run(f'{profile} profile (adaptive, {args.workers} connections, {settings["read_timeout"]} s read timeout)',
+                resource.Table(TABLE), proxy, args)
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark an ERP stock/price sync: one PUT /products/{id} per SKU vs the bulk endpoint.
+
+The per-SKU path calls update_product.py once per change (each call paying
+the API Gateway + Lambda invoke overhead and returning the whole item). The
+bulk path sends the same changes to bulk_update_products.py in requests of
+up to 1000 rows. Both run against the moto tables from backend/local/stack.py.
+
+Usage:
+    python backend/benchmarks/bench_bulk_products.py
+    python backend/benchmarks/bench_bulk_products.py --skus 5000 --invoke-overhead-ms 25
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+
+def seed(table, skus):
+    with table.batch_writer() as batch:
+        for n in range(skus):
+            batch.put_item(Item={
+                'PK': f'PRODUCT#prod-{n:05d}', 'SK': 'METADATA', 'productId': f'prod-{n:05d}',
+                'name': f'Product {n}', 'description': 'x' * 400, 'price': 10, 'inventory': 50,
+                'status': 'active', 'category': 'general', 'updatedAt': '2026-01-01T00:00:00Z',
+                'GSI1PK': 'CATEGORY#general', 'GSI1SK': f'10.0#prod-{n:05d}', 'GSI2PK': 'STATUS#active'
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--skus', type=int, default=2000)
+    parser.add_argument('--invoke-overhead-ms', type=float, default=20, help='API Gateway + Lambda per request')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent PUT requests from the sync job')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    changes = [{'productId': f'prod-{n:05d}', 'inventory': rng.randint(0, 500), 'price': round(rng.uniform(5, 50), 2)}
+               for n in range(args.skus)]
+
+    with local_stack(tables=['PRODUCTS_TABLE']) as stack:
+        table = stack.table('PRODUCTS_TABLE')
+        seed(table, args.skus)
+        update = stack.handler('products', 'update_product')
+        bulk = stack.handler('products', 'bulk_update_products')
+        context = LambdaContext(function_name='bench')
+
+        def put(change):
+            time.sleep(args.invoke_overhead_ms / 1000)
+            body = {'inventory': change['inventory'], 'price': change['price']}
+            response = update({'pathParameters': {'id': change['productId']}, 'body': json.dumps(body)}, context)
+            return len(response['body'])
+
+        stack.reset_counters()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            response_bytes = sum(pool.map(put, changes))
+        per_sku = {'elapsed': time.perf_counter() - started, 'requests': len(changes),
+                   'bytes': response_bytes, 'dynamodb': stack.dynamodb_calls()}
+
+        stack.reset_counters()
+        started = time.perf_counter()
+        response_bytes, requests = 0, 0
+        for i in range(0, len(changes), 1000):
+            time.sleep(args.invoke_overhead_ms / 1000)
+            response = bulk({'body': json.dumps({'changes': changes[i:i + 1000]})}, context)
+            response_bytes += len(response['body'])
+            requests += 1
+        bulk_result = {'elapsed': time.perf_counter() - started, 'requests': requests,
+                       'bytes': response_bytes, 'dynamodb': stack.dynamodb_calls()}
+
+    print(f'{args.skus} SKU changes, {args.invoke_overhead_ms:.0f} ms invoke overhead')
+    for label, result in (('PUT /products/{id} per SKU', per_sku), ('POST /admin/products/bulk', bulk_result)):
+        print(f'\n{label}')
+        print(f'  {"wall time":<22} {result["elapsed"]:>10.2f} s')
+        print(f'  {"api requests":<22} {result["requests"]:>10}')
+        print(f'  {"response bytes":<22} {result["bytes"]:>10}')
+        print(f'  {"dynamodb calls":<22} {result["dynamodb"]:>10}')
+    print(f'\n  speedup {per_sku["elapsed"] / bulk_result["elapsed"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
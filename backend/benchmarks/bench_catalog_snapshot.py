@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark product reads: the memory-mapped catalog snapshot vs live DynamoDB reads.
+
+Seeds ProductsTable (with the template's indexes) with a catalog, runs
+build_catalog_snapshot.py into a moto S3 bucket and records a set of product
+changes through catalog_deltas.py. Then measures, with and without the
+snapshot:
+
+* cold start: downloading and mapping the snapshot, then reading the deltas;
+* GET /products/{id} (get_product.py) for random products;
+* GET /products?category=... (get_products.py), first page and a later one;
+* the cart handlers' product lookup (Catalog.product vs GetItem).
+
+It also checks that both paths return the same documents, including changed
+products. DynamoDB runs in-process in moto, so its latencies leave out the
+network round trip a deployed function pays per call; the DynamoDB call
+counts are the number to carry over.
+
+Usage:
+    python backend/benchmarks/bench_catalog_snapshot.py
+    python backend/benchmarks/bench_catalog_snapshot.py --products 200000 --categories 80
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+CATALOG_BUCKET = 'local-ecommerce-catalog'
+
+
+def seed(table, args, rng):
+    with table.batch_writer() as batch:
+        for n in range(args.products):
+            product_id = f'prod-{n:06d}'
+            category = f'category-{rng.randrange(args.categories):03d}'
+            price = Decimal(f'{rng.uniform(2, 500):.2f}')
+            status = 'active' if rng.random() > 0.05 else 'archived'
+            batch.put_item(Item={
+                'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id,
+                'name': f'Product {n}', 'description': 'Lightweight and durable. ' * 12,
+                'price': price, 'currency': 'USD', 'category': category, 'brand': 'Acme',
+                'inventory': rng.randint(0, 200), 'status': status,
+                'thumbnail': f'https://cdn.example.com/{product_id}/thumb.webp',
+                'imageAssets': [{'width': w, 'url': f'https://cdn.example.com/{product_id}/{w}.webp'}
+                                for w in (320, 640, 1280)],
+                'imageIds': {'img-1'}, 'createdAt': '2026-01-01T00:00:00Z', 'updatedAt': '2026-01-01T00:00:00Z',
+                'GSI1PK': f'CATEGORY#{category}', 'GSI1SK': f'{float(price)}#{product_id}',
+                'GSI2PK': f'STATUS#{status}', 'GSI2SK': '2026-01-01T00:00:00Z'
+            })
+
+
+def stream_records(table, product_ids, rng):
+    """Change the products and return the stream records DynamoDB would deliver for them."""
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    records = []
+    for product_id in product_ids:
+        key = {'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'}
+        new = table.update_item(Key=key, UpdateExpression='SET price = :p, inventory = :i',
+                                ExpressionAttributeValues={':p': Decimal(f'{rng.uniform(2, 500):.2f}'),
+                                                           ':i': rng.randint(0, 200)},
+                                ReturnValues='ALL_NEW')['Attributes']
+        records.append({'eventName': 'MODIFY', 'dynamodb': {
+            'Keys': {k: serializer.serialize(v) for k, v in key.items()},
+            'NewImage': {k: serializer.serialize(v) for k, v in new.items()}}})
+    return records
+
+
+def http(path, path_parameters=None, query=None):
+    return {
+        'version': '2.0', 'routeKey': '$default', 'rawPath': path, 'headers': {},
+        'rawQueryString': '&'.join(f'{k}={v}' for k, v in (query or {}).items()),
+        'queryStringParameters': query, 'pathParameters': path_parameters, 'isBase64Encoded': False,
+        'requestContext': {'http': {'method': 'GET', 'path': path, 'sourceIp': '127.0.0.1'}, 'stage': '$default'}
+    }
+
+
+def timed(stack, fn, calls):
+    samples = []
+    stack.reset_counters()
+    for args in calls:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {'p50': statistics.median(samples), 'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            'calls': stack.dynamodb_calls() / len(calls)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=30000)
+    parser.add_argument('--categories', type=int, default=40)
+    parser.add_argument('--changes', type=int, default=300, help='products changed after the snapshot was built')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix='catalog-bench-')
+    os.environ['CATALOG_WORK_DIR'] = work_dir
+    context = LambdaContext(function_name='bench')
+    with local_stack(tables=['PRODUCTS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        import boto3
+        boto3.client('s3').create_bucket(Bucket=CATALOG_BUCKET)
+        table = stack.table('PRODUCTS_TABLE')
+        seed(table, args, rng)
+
+        # Handlers imported without CATALOG_BUCKET read DynamoDB only; the catalog is attached below
+        get_product = stack.handler('products', 'get_product')
+        get_products = stack.handler('products', 'get_products')
+        os.environ['CATALOG_BUCKET'] = CATALOG_BUCKET
+        started = time.perf_counter()
+        pointer = stack.handler('products', 'build_catalog_snapshot')({}, context)
+        build_seconds = time.perf_counter() - started
+
+        changed = rng.sample([f'prod-{n:06d}' for n in range(args.products)], args.changes)
+        stack.handler('products', 'catalog_deltas')({'Records': stream_records(table, changed, rng)}, context)
+
+        import catalog_snapshot
+        started = time.perf_counter()
+        local_copy = os.path.join(work_dir, 'cold.snap')
+        boto3.client('s3').download_file(CATALOG_BUCKET, pointer['key'], local_copy)
+        catalog_snapshot.Snapshot(local_copy).find(changed[0])
+        map_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        catalog = catalog_snapshot.from_environment(stack.dynamodb)
+        cold_ms = (time.perf_counter() - started) * 1000
+        assert catalog.refresh(), 'catalog did not load'
+        modules = [sys.modules['get_product'], sys.modules['get_products']]
+
+        ids = [f'prod-{rng.randrange(args.products):06d}' for _ in range(args.requests)] + changed[:50]
+        categories = [f'category-{rng.randrange(args.categories):03d}' for _ in range(args.requests // 5)]
+        results, bodies = {}, {}
+        for label, attached in (('dynamodb', None), ('snapshot', catalog)):
+            for module in modules:
+                module.catalog = attached
+            bodies[label] = [get_product(http(f'/products/{pid}', {'id': pid}), context)['body'] for pid in ids]
+            results[label] = {
+                'get_product': timed(stack, lambda pid: get_product(http(f'/products/{pid}', {'id': pid}), context),
+                                     [(pid,) for pid in ids]),
+                'list_category': timed(stack, lambda c: get_products(http('/products', query={'category': c}), context),
+                                       [(c,) for c in categories]),
+                'cart_lookup': timed(stack, (lambda pid: catalog.product(pid)) if attached else
+                                     (lambda pid: table.get_item(Key={'PK': f'PRODUCT#{pid}', 'SK': 'METADATA'})),
+                                     [(pid,) for pid in ids])
+            }
+        # A later page of a category listing (snapshot only: DynamoDB pages by its own key)
+        first = json.loads(get_products(http('/products', query={'category': categories[0]}), context)['body'])
+        results['snapshot']['list_next_page'] = timed(
+            stack, lambda: get_products(http('/products', query={'category': categories[0],
+                                                                  'nextToken': first['nextToken']}), context),
+            [()] * 50)
+
+    mismatched = sum(a != b for a, b in zip(bodies['dynamodb'], bodies['snapshot']))
+    size = pointer['bytes']
+    print(f'{args.products} products in {args.categories} categories, {args.changes} changed after the build')
+    print(f'\nSnapshot: {pointer["products"]} active products, {size / 1024 / 1024:.1f} MiB, '
+          f'built in {build_seconds:.1f} s')
+    print(f'Cold start: download + mmap + first lookup {map_ms:.0f} ms; '
+          f'with the {args.changes} delta rows read from moto {cold_ms:.0f} ms')
+    print(f'GET /products/{{id}} bodies identical on both paths: {len(ids) - mismatched}/{len(ids)}')
+    print(f'\n  {"":<32} {"DynamoDB p50 / p99 ms":>22} {"calls":>6} {"snapshot p50 / p99 ms":>22} {"calls":>6}')
+    for label, key in (('GET /products/{id}', 'get_product'), ('GET /products?category=', 'list_category'),
+                       ('cart product lookup', 'cart_lookup')):
+        old, new = results['dynamodb'][key], results['snapshot'][key]
+        print(f'  {label:<32} {old["p50"]:>12.3f} / {old["p99"]:<7.2f} {old["calls"]:>6.1f} '
+              f'{new["p50"]:>12.3f} / {new["p99"]:<7.2f} {new["calls"]:>6.1f}')
+    page = results['snapshot']['list_next_page']
+    print(f'  {"category listing, next page":<32} {"":>22} {"":>6} {page["p50"]:>12.3f} / {page["p99"]:<7.2f} '
+          f'{page["calls"]:>6.1f}')
+
+
+if __name__ == '__main__':
+    main()
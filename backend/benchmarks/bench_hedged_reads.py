@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark hedged GetItem reads (hedged_reads.py) against plain ones under latency spikes.
+
+Runs a moto server behind backend/local/fault_proxy.py, which stalls a
+``--stall-rate`` fraction of requests for ``--stall-seconds`` (a slow
+storage node). One thread issues GetItems back to back, the way a Lambda
+container serves one request at a time, through the interactive profile:
+first plain, then through a HedgedReader. A final, shorter brownout run
+stalls ``--brownout-rate`` of requests to show the budget holding the
+duplicate reads to 5% while the threshold climbs.
+
+Reported per run: latency percentiles, requests the proxy saw per read,
+hedges sent, hedge win rate, hedges refused by the budget and the
+threshold the reader settled on.
+
+Usage:
+    python backend/benchmarks/bench_hedged_reads.py
+    python backend/benchmarks/bench_hedged_reads.py --reads 5000 --stall-rate 0.01 --stall-seconds 0.5
+"""
+import argparse
+import logging
+import os
+import random
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common'))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+
+import boto3  # noqa: E402
+
+import aws_clients  # noqa: E402
+import hedged_reads  # noqa: E402
+from fault_proxy import FaultProxy  # noqa: E402
+
+TABLE = 'local-ecommerce-products'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_table(endpoint, items):
+    client = boto3.client('dynamodb', endpoint_url=endpoint)
+    client.create_table(
+        TableName=TABLE,
+        BillingMode='PAY_PER_REQUEST',
+        AttributeDefinitions=[{'AttributeName': 'PK', 'AttributeType': 'S'},
+                              {'AttributeName': 'SK', 'AttributeType': 'S'}],
+        KeySchema=[{'AttributeName': 'PK', 'KeyType': 'HASH'}, {'AttributeName': 'SK', 'KeyType': 'RANGE'}]
+    )
+    table = boto3.resource('dynamodb', endpoint_url=endpoint).Table(TABLE)
+    with table.batch_writer() as batch:
+        for n in range(items):
+            batch.put_item(Item={'PK': f'PRODUCT#prod-{n:05d}', 'SK': 'METADATA', 'name': f'Product {n}',
+                                 'price': 1999, 'inventory': 100, 'status': 'active'})
+
+
+def run(label, table, proxy, reader, args, reads):
+    proxy.state.reset()
+    aws_clients.stats.clear()
+    rng = random.Random(args.seed)
+    keys = [{'PK': f'PRODUCT#prod-{rng.randrange(args.items):05d}', 'SK': 'METADATA'} for _ in range(reads)]
+    latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        if reader is None:
+            table.get_item(Key=key)
+        else:
+            reader.get_item(table, Key=key)
+        latencies.append((time.perf_counter() - started) * 1000)
+    # Let losing reads finish so the proxy has counted them
+    time.sleep(args.stall_seconds + 0.2)
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]  # noqa: E731
+    stats = aws_clients.stats
+    print(f'\n{label}')
+    print(f'  {"latency p50 / p99 / p99.9":<28} {pct(0.5):>7.1f} / {pct(0.99):.1f} / {pct(0.999):.1f} ms  '
+          f'(max {latencies[-1]:.0f} ms)')
+    print(f'  {"stalled by the proxy":<28} {proxy.state.counts["stalled"]:>7}')
+    print(f'  {"requests per read":<28} {proxy.state.counts["requests"] / reads:>7.3f}')
+    if reader is not None:
+        hedges = stats['hedge_requests']
+        print(f'  {"hedges sent":<28} {hedges:>7}  ({hedges / reads:.1%} of reads)')
+        print(f'  {"hedge win rate":<28} {stats["hedge_wins"] / hedges if hedges else 0:>7.1%}')
+        print(f'  {"hedges over budget":<28} {stats["hedges_over_budget"]:>7}')
+        print(f'  {"hedge threshold":<28} {reader.delay * 1000:>7.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--stall-rate', type=float, default=0.02)
+    parser.add_argument('--stall-seconds', type=float, default=0.25)
+    parser.add_argument('--brownout-rate', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=free_port(), verbose=False)
+    server.start()
+    upstream = f'http://127.0.0.1:{server._port}'
+    seed_table(upstream, args.items)
+
+    print(f'{args.reads} sequential GetItems, {args.stall_rate:.1%} stalled {args.stall_seconds * 1000:.0f} ms')
+    with FaultProxy(upstream, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds) as proxy:
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = proxy.url
+        table = aws_clients.resource('dynamodb', 'interactive').Table(TABLE)
+
+        run('plain GetItem', table, proxy, None, args, args.reads)
+        run('hedged GetItem (p95 threshold, 5% budget)', table, proxy, hedged_reads.HedgedReader(), args, args.reads)
+
+        proxy.state.stall_rate = args.brownout_rate
+        # A quarter of the reads, since every stalled one costs the full stall
+        run(f'hedged GetItem, brownout: {args.brownout_rate:.0%} stalled', table, proxy,
+            hedged_reads.HedgedReader(), args, args.reads // 4)
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the product image pipeline: decode cost and list-page weight.
+
+Encodes a synthetic camera-sized JPEG, then times process_image.py's
+render_variants (draft-mode JPEG decode, cascaded resizes, WebP/AVIF
+encodes) against the same work done from a full-resolution decode, and
+compares the bytes a product grid downloads when it renders originals
+versus the thumbnail variant.
+
+Usage:
+    python backend/benchmarks/bench_images.py
+    python backend/benchmarks/bench_images.py --width 6000 --height 4000 --grid 48
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('PRODUCTS_TABLE', 'local-ecommerce-products')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers', 'images'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common'))
+
+from PIL import Image  # noqa: E402
+
+import process_image  # noqa: E402
+
+
+def camera_jpeg(width, height):
+    image = Image.effect_mandelbrot((width, height), (-2.2, -1.2, 0.8, 1.2), 120).convert('RGB')
+    noise = Image.effect_noise((width, height), 24).convert('RGB')
+    buffer = io.BytesIO()
+    Image.blend(image, noise, 0.15).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def full_decode(data):
+    """render_variants without draft mode: the whole image is decoded at full size first."""
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    width = max(process_image.VARIANT_WIDTHS)
+    image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+    out = []
+    for target in sorted(process_image.VARIANT_WIDTHS, reverse=True):
+        current = image.resize((target, round(image.height * target / image.width)), Image.Resampling.LANCZOS)
+        out += [process_image.encode(current, fmt) for fmt in process_image.FORMATS]
+    return out
+
+
+def timed(fn, data, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(data)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--grid', type=int, default=24, help='products per list page')
+    args = parser.parse_args()
+
+    data = camera_jpeg(args.width, args.height)
+    print(f'{args.width}x{args.height} JPEG, {len(data) / 1024:.0f} KiB; formats: {", ".join(process_image.FORMATS)}; '
+          f'widths: {", ".join(map(str, process_image.VARIANT_WIDTHS))}')
+
+    full_ms = timed(full_decode, data, args.runs)
+    draft_ms = timed(process_image.render_variants, data, args.runs)
+    print(f'\n  {"full decode + resize":<28} {full_ms:>9.0f} ms')
+    print(f'  {"draft decode (pipeline)":<28} {draft_ms:>9.0f} ms  ({full_ms / draft_ms:.1f}x)')
+
+    summary, variants = process_image.render_variants(data)
+    print('\nVariants')
+    for variant in variants:
+        print(f'  {variant["width"]:>5}w {variant["format"]:<5} {len(variant["body"]) / 1024:>8.1f} KiB')
+    print(f'  placeholder data URI  {len(summary["placeholder"]):>6} bytes')
+
+    thumb = min((v for v in variants if v['format'] == 'webp'),
+                key=lambda v: abs(v['width'] - process_image.THUMBNAIL_WIDTH))
+    print(f'\nList page of {args.grid} products')
+    print(f'  {"originals":<28} {args.grid * len(data) / 1024 / 1024:>9.2f} MiB')
+    print(f'  {"thumbnail variant":<28} {args.grid * len(thumb["body"]) / 1024 / 1024:>9.2f} MiB  '
+          f'({len(data) / len(thumb["body"]):.0f}x smaller)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark confirmation emails: one SendEmail per order vs the batched notification pipeline.
+
+The per-order path does what send_confirmation.py used to do for every
+order: one Lambda invoke, the body built with string formatting and one
+SendEmail call, with as many concurrent senders as there are concurrent
+workflow executions. The batched path feeds SQS-shaped batches of the same
+messages (including redeliveries) to send_notifications.py with the event
+source's maximum concurrency. Both talk to the in-process FakeSES, which
+enforces the account send rate and models per-call latency.
+
+Usage:
+    python backend/benchmarks/bench_notifications.py
+    python backend/benchmarks/bench_notifications.py --orders 5000 --max-send-rate 200 --duplicate-rate 0.1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from fake_ses import FakeSES  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+
+def make_orders(count, rng):
+    return [{
+        'orderId': f'ord-{n:06d}',
+        'email': f'customer{n}@example.com',
+        'items': [
+            {'productId': f'prod-{i:04d}', 'name': f'Product {i}', 'quantity': rng.randint(1, 3), 'price': 19.99}
+            for i in rng.sample(range(200), rng.randint(1, 5))
+        ],
+        'totals': {'total': 0, 'currency': 'USD'}
+    } for n in range(count)]
+
+
+def per_order(orders, deliveries, args):
+    ses = FakeSES(max_send_rate=args.max_send_rate, call_latency_ms=args.ses_latency_ms)
+    throttled = []
+
+    def send(order):
+        time.sleep(args.invoke_overhead_ms / 1000)
+        lines = '\n'.join(f"{item['quantity']} x {item['name']}" for item in order['items'])
+        try:
+            ses.send_email(
+                Source='noreply@example.com',
+                Destination={'ToAddresses': [order['email']]},
+                Message={
+                    'Subject': {'Data': f"Order Confirmation - {order['orderId']}"},
+                    'Body': {'Text': {'Data': f"Your order {order['orderId']} has been confirmed.\n{lines}"}}
+                }
+            )
+        except Exception:
+            throttled.append(order['orderId'])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.senders) as pool:
+        list(pool.map(send, deliveries))
+    elapsed = time.perf_counter() - started
+    return {'elapsed': elapsed, 'invokes': len(deliveries), 'ses_calls': sum(ses.calls.values()),
+            'sent': len(ses.outbox), 'unique': len({m['to'] for m in ses.outbox}), 'throttled': len(throttled)}
+
+
+def batched(orders, deliveries, args):
+    with local_stack(tables=['READ_MODELS_TABLE']) as stack:
+        handler = stack.handler('workflows', 'send_notifications')
+        import notifications
+        import send_notifications
+
+        ses = FakeSES(max_send_rate=args.max_send_rate, call_latency_ms=args.ses_latency_ms)
+        send_notifications.ses = ses
+        # The consumer threads share one module, hence one token bucket for the whole account rate
+        send_notifications.CONSUMER_CONCURRENCY = 1
+
+        queue = [{'messageId': str(uuid.uuid4()), 'body': json.dumps(notifications.confirmation_message(order))}
+                 for order in deliveries]
+        invokes = 0
+
+        def consume(batch):
+            time.sleep(args.invoke_overhead_ms / 1000)
+            result = handler({'Records': batch}, LambdaContext(function_name='send-notifications'))
+            failed = {f['itemIdentifier'] for f in result['batchItemFailures']}
+            return [record for record in batch if record['messageId'] in failed]
+
+        stack.reset_counters()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            while queue:
+                batches = [queue[i:i + args.batch_size] for i in range(0, len(queue), args.batch_size)]
+                invokes += len(batches)
+                queue = [record for retry in pool.map(consume, batches) for record in retry]
+        elapsed = time.perf_counter() - started
+
+        return {'elapsed': elapsed, 'invokes': invokes, 'ses_calls': sum(ses.calls.values()),
+                'sent': len(ses.outbox), 'unique': len({m['to'] for m in ses.outbox}),
+                'throttled': ses.throttled, 'dynamodb_calls': stack.dynamodb_calls()}
+
+
+def report(label, result, orders):
+    print(f'\n{label}')
+    print(f'  {"wall time":<26} {result["elapsed"]:>10.2f} s')
+    print(f'  {"lambda invokes":<26} {result["invokes"]:>10}')
+    print(f'  {"ses api calls":<26} {result["ses_calls"]:>10}')
+    print(f'  {"emails delivered":<26} {result["sent"]:>10}  ({result["sent"] - result["unique"]} duplicates, '
+          f'{orders - result["unique"]} missing)')
+    print(f'  {"throttled ses calls":<26} {result["throttled"]:>10}')
+    if 'dynamodb_calls' in result:
+        print(f'  {"dynamodb calls":<26} {result["dynamodb_calls"]:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.05, help='fraction of messages delivered twice')
+    parser.add_argument('--max-send-rate', type=float, default=200, help='SES MaxSendRate (emails/s)')
+    parser.add_argument('--ses-latency-ms', type=float, default=30)
+    parser.add_argument('--invoke-overhead-ms', type=float, default=20)
+    parser.add_argument('--senders', type=int, default=32, help='concurrent per-order senders')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=2, help='notification consumer concurrency')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    orders = make_orders(args.orders, rng)
+    deliveries = orders + rng.sample(orders, int(len(orders) * args.duplicate_rate))
+    rng.shuffle(deliveries)
+
+    print(f'{args.orders} orders, {len(deliveries) - len(orders)} redelivered, '
+          f'SES {args.max_send_rate:.0f} emails/s, {args.ses_latency_ms:.0f} ms per SES call')
+    report(f'Per-order SendEmail ({args.senders} concurrent)', per_order(orders, deliveries, args), len(orders))
+    report(f'Batched pipeline (batch {args.batch_size}, concurrency {args.concurrency})',
+           batched(orders, deliveries, args), len(orders))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark order archival: hot-table size and query latency before and after archive_orders.py.
+
+Seeds OrdersTable (with the template's indexes) with several years of order
+history for a set of users, then measures the hot table (items and bytes in
+the table and in OrderDateIndex) and the latency of the reads that grow with
+it: GET /orders (get_orders.py), the OrderDateIndex window query that
+reconcile_payments.py runs, and GET /orders/{id} for a recent order. After
+one archive run the same measurements are repeated, plus GET /orders/{id}
+for an archived order (stub read plus byte-range GET from S3). Everything
+runs against moto via backend/local/stack.py, so absolute latencies are
+moto's; compare the before/after ratios.
+
+Usage:
+    python backend/benchmarks/bench_order_archive.py
+    python backend/benchmarks/bench_order_archive.py --users 200 --months 36 --orders-per-month 3
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+ARCHIVE_BUCKET = 'local-ecommerce-orders-archive'
+STATUSES = ['delivered'] * 8 + ['cancelled', 'failed']
+
+
+@dataclass
+class ScheduledContext(LambdaContext):
+    """A scheduled run with the full 15 minutes ahead of it."""
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 900000
+
+
+def seed(table, args, rng):
+    now = datetime.utcnow()
+    recent = []
+    with table.batch_writer() as batch:
+        for u in range(args.users):
+            user_id = f'user-{u:04d}'
+            for month in range(args.months):
+                for _ in range(args.orders_per_month):
+                    created = now - timedelta(days=30 * month + rng.uniform(0, 29), seconds=rng.uniform(0, 86400))
+                    created_at = created.isoformat() + 'Z'
+                    order_id = str(uuid.UUID(int=rng.getrandbits(128)))
+                    status = STATUSES[rng.randrange(len(STATUSES))] if month else 'processing'
+                    items = [{'productId': f'prod-{rng.randrange(500):05d}', 'name': f'Product {n}', 'quantity': 1 + n,
+                              'price': '19.99', 'imageUrl': 'https://cdn.example.com/p.jpg'} for n in range(3)]
+                    batch.put_item(Item={
+                        'PK': f'USER#{user_id}', 'SK': f'ORDER#{order_id}', 'orderId': order_id, 'userId': user_id,
+                        'status': status, 'items': items, 'createdAt': created_at, 'updatedAt': created_at,
+                        'totals': {'subtotal': '59.97', 'tax': '4.80', 'total': '64.77', 'currency': 'USD'},
+                        'shippingAddress': {'line1': '1 Main St', 'city': 'Springfield', 'postalCode': '12345'},
+                        'GSI1PK': f'STATUS#{status}', 'GSI1SK': created_at, 'GSI2PK': 'ORDER', 'GSI2SK': created_at
+                    })
+                    if month == 0:
+                        recent.append((user_id, order_id))
+    return recent
+
+
+def table_size(table):
+    items, size, indexed = 0, 0, 0
+    scan_params = {}
+    while True:
+        response = table.scan(**scan_params)
+        for item in response['Items']:
+            items += 1
+            size += len(json.dumps(item, default=str))
+            indexed += 'GSI2PK' in item
+        if 'LastEvaluatedKey' not in response:
+            return {'items': items, 'bytes': size, 'indexed': indexed}
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def timed(fn, calls):
+    samples = []
+    for args in calls:
+        started = time.perf_counter()
+        response = fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response['statusCode'] == 200, response
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def measure(stack, handlers, users, recent, archived, context):
+    get_orders, get_order = handlers
+    table = stack.table('ORDERS_TABLE')
+    since = (datetime.utcnow() - timedelta(hours=24)).isoformat() + 'Z'
+
+    def http(user_id, path=None):
+        return {'requestContext': {'authorizer': {'jwt': {'claims': {'sub': user_id}}}},
+                'pathParameters': path, 'queryStringParameters': None}
+
+    def window_query():
+        table.query(IndexName='OrderDateIndex', KeyConditionExpression='GSI2PK = :o AND GSI2SK >= :since',
+                    ExpressionAttributeValues={':o': 'ORDER', ':since': since})
+        return {'statusCode': 200}
+
+    result = {'size': table_size(table)}
+    result['get_orders'] = timed(lambda u: get_orders(http(u), context), [(u,) for u in users])
+    result['date_index'] = timed(window_query, [()] * 20)
+    result['get_order_hot'] = timed(lambda u, o: get_order(http(u, {'id': o}), context), recent)
+    if archived:
+        result['get_order_archived'] = timed(lambda u, o: get_order(http(u, {'id': o}), context), archived)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=60)
+    parser.add_argument('--months', type=int, default=36, help='months of order history per user')
+    parser.add_argument('--orders-per-month', type=int, default=2)
+    parser.add_argument('--archive-after-months', type=int, default=12)
+    parser.add_argument('--samples', type=int, default=60, help='GET /orders/{id} calls per measurement')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    os.environ['ORDERS_ARCHIVE_BUCKET'] = ARCHIVE_BUCKET
+    with local_stack(tables=['ORDERS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        import boto3
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=ARCHIVE_BUCKET)
+        table = stack.table('ORDERS_TABLE')
+        recent = seed(table, args, rng)
+        users = [f'user-{u:04d}' for u in range(args.users)]
+        sample = rng.sample(recent, min(args.samples, len(recent)))
+        old = [(item['userId'], item['orderId']) for item in table.scan(
+            FilterExpression='createdAt < :cutoff', ExpressionAttributeValues={
+                ':cutoff': (datetime.utcnow() - timedelta(days=31 * (args.archive_after_months + 1))).isoformat()}
+        )['Items']]
+        old = rng.sample(old, min(args.samples, len(old)))
+
+        context = ScheduledContext(function_name='bench')
+        handlers = (stack.handler('orders', 'get_orders'), stack.handler('orders', 'get_order'))
+        before = measure(stack, handlers, users, sample, [], context)
+
+        started = time.perf_counter()
+        archive = stack.handler('orders', 'archive_orders')
+        run = archive({'months': args.archive_after_months}, context)
+        archive_seconds = time.perf_counter() - started
+        objects = s3.list_objects_v2(Bucket=ARCHIVE_BUCKET).get('Contents', [])
+
+        after = measure(stack, handlers, users, sample, old, context)
+
+    total = args.users * args.months * args.orders_per_month
+    print(f'{args.users} users x {args.months} months x {args.orders_per_month} orders = {total} orders; '
+          f'archiving before {run["before"][:10]}')
+    print(f'\nArchive run: {run["archived"]} orders -> {len(objects)} objects, '
+          f'{sum(o["Size"] for o in objects) / 1024:.0f} KiB gzip in {archive_seconds:.1f} s')
+    print(f'\n  {"":<34} {"before":>12} {"after":>12}')
+    for label, key in (('hot table items', 'items'), ('hot table bytes', 'bytes'), ('OrderDateIndex items', 'indexed')):
+        print(f'  {label:<34} {before["size"][key]:>12} {after["size"][key]:>12}')
+    for label, key in (('GET /orders p50 / p99 ms', 'get_orders'), ('OrderDateIndex 24h query ms', 'date_index'),
+                       ('GET /orders/{id} recent ms', 'get_order_hot')):
+        print(f'  {label:<34} {before[key][0]:>6.1f} /{before[key][1]:>4.0f} {after[key][0]:>6.1f} /{after[key][1]:>4.0f}')
+    archived = after['get_order_archived']
+    print(f'  {"GET /orders/{id} archived ms":<34} {"":>12} {archived[0]:>6.1f} /{archived[1]:>4.0f}')
+
+
+if __name__ == '__main__':
+    main()
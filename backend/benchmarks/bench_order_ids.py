@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark GET /orders ordering and range reads: random order IDs vs time-sortable IDs.
+
+Seeds OrdersTable with two years of history per user under the old random
+``ord-<hex>`` IDs and measures what get_orders.py returns for the first page
+(``limit`` orders, newest first): how many of the user's actual newest
+orders it contains, and how many items a client has to read to get the
+right answer (all of them, with random keys). migrate_order_ids.py then
+re-keys the orders, and the same page is measured again, along with a
+``since`` range query (items read vs orders in range) and GET /orders/{id}
+by an old ID. Runs against moto via backend/local/stack.py; moto copies the
+table for every transaction, so the migration time grows with the table and
+says nothing about DynamoDB.
+
+Usage:
+    python backend/benchmarks/bench_order_ids.py
+    python backend/benchmarks/bench_order_ids.py --users 200 --orders-per-user 60 --limit 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+STATUSES = ['delivered'] * 8 + ['cancelled', 'failed']
+
+
+class ManualContext(LambdaContext):
+    """A manual invocation with the full 15 minutes ahead of it."""
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 900000
+
+
+def seed(table, args, rng):
+    now = datetime.utcnow()
+    history = {}
+    with table.batch_writer() as batch:
+        for u in range(args.users):
+            user_id = f'user-{u:04d}'
+            history[user_id] = []
+            for n in range(args.orders_per_user):
+                created_at = (now - timedelta(days=rng.uniform(0, 730))).isoformat() + 'Z'
+                order_id = f'ord-{rng.getrandbits(48):012x}'
+                # The newest order of some users is still in flight
+                status = 'processing' if n == 0 and u % 10 == 0 else STATUSES[rng.randrange(len(STATUSES))]
+                batch.put_item(Item={
+                    'PK': f'USER#{user_id}', 'SK': f'ORDER#{order_id}', 'orderId': order_id, 'userId': user_id,
+                    'status': status, 'createdAt': created_at, 'updatedAt': created_at,
+                    'totals': {'total': '64.77', 'currency': 'USD'},
+                    'GSI1PK': f'STATUS#{status}', 'GSI1SK': f'{created_at}#{order_id}',
+                    'GSI2PK': 'ORDER', 'GSI2SK': f'{created_at}#{order_id}'
+                })
+                history[user_id].append(created_at)
+    return history
+
+
+def http(user_id, params=None, path=None):
+    return {'requestContext': {'authorizer': {'jwt': {'claims': {'sub': user_id}}}},
+            'queryStringParameters': params, 'pathParameters': path}
+
+
+def first_pages(stack, get_orders, history, limit, context):
+    """Share of each user's ``limit`` newest orders that the first page returns."""
+    hits, returned = 0, 0
+    stack.reset_counters()
+    for user_id, created in history.items():
+        response = get_orders(http(user_id, {'limit': str(limit)}), context)
+        orders = json.loads(response['body'])['orders']
+        newest = set(sorted(created, reverse=True)[:limit])
+        hits += sum(order['createdAt'] in newest for order in orders)
+        returned += len(orders)
+    return {'correct': hits / returned, 'calls': stack.dynamodb_calls() / len(history)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--orders-per-user', type=int, default=40)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--since-days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    context = ManualContext(function_name='bench')
+    with local_stack(tables=['ORDERS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        table = stack.table('ORDERS_TABLE')
+        history = seed(table, args, rng)
+        legacy_ids = [(item['userId'], item['orderId']) for item in table.scan()['Items']][:50]
+        get_orders = stack.handler('orders', 'get_orders')
+        get_order = stack.handler('orders', 'get_order')
+
+        before = first_pages(stack, get_orders, history, args.limit, context)
+
+        migrate = stack.handler('orders', 'migrate_order_ids')
+        # moto's in-process TransactWriteItems is not thread-safe
+        sys.modules['migrate_order_ids'].MIGRATE_WORKERS = 1
+        started = time.perf_counter()
+        run = migrate({}, context)
+        migrate_seconds = time.perf_counter() - started
+
+        after = first_pages(stack, get_orders, history, args.limit, context)
+
+        since = (datetime.utcnow() - timedelta(days=args.since_days)).isoformat() + 'Z'
+        in_range, read = 0, 0
+        for user_id, created in history.items():
+            in_range += sum(created_at >= since for created_at in created)
+            response = get_orders(http(user_id, {'since': since, 'limit': '100'}), context)
+            read += json.loads(response['body'])['count']
+        found = sum(get_order(http(u, path={'id': o}), context)['statusCode'] == 200 for u, o in legacy_ids)
+
+    print(f'{args.users} users x {args.orders_per_user} orders over two years, first page of {args.limit}')
+    print(f'\nMigration: {run["migrated"]} re-keyed, {run["skippedOpen"]} open orders skipped, '
+          f'{run["conflicts"]} conflicts in {migrate_seconds:.1f} s')
+    print(f'\n  {"":<40} {"random IDs":>12} {"sortable IDs":>14}')
+    print(f'  {"first page that is really newest":<40} {before["correct"]:>12.0%} {after["correct"]:>14.0%}')
+    print(f'  {"items read for a correct first page":<40} {args.orders_per_user:>12} {args.limit:>14}')
+    print(f'  {"DynamoDB calls per user":<40} {before["calls"]:>12.1f} {after["calls"]:>14.1f}')
+    print(f'\n  since={args.since_days}d: {read} orders returned by key range, {in_range} created in range '
+          f'(open orders skipped by the migration keep random keys)')
+    print(f'  GET /orders/{{old id}} after migration: {found}/{len(legacy_ids)} found')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark watching orders after checkout: polling GET /orders/{id} vs the order status feed.
+
+Creates orders in OrdersTable and walks each one through pending ->
+processing -> confirmed the way the workflow does, feeding the stream
+records to project_orders.py. Each order is watched four ways:
+
+* polling GET /orders/{id} (get_order.py) every ``--interval`` seconds;
+* polling GET /orders/{id}/status?version=... (get_order_status.py), which
+  reads the small status item and mostly answers 304;
+* long polling the same endpoint with ``wait``, one request per transition;
+* a WebSocket (order_watch.py on connect, pushes from project_orders.py into
+  backend/local/fake_connections.py).
+
+The handlers run for real against moto, with the workflow's clock simulated
+so nobody sleeps. The run checks that every watcher sees every transition
+and reports, per watched order, Lambda invocations, DynamoDB reads, read
+units (4 KB units, eventually consistent: half a unit each) and response
+bytes for the watcher. Orders under 4 KB cost the same half unit as a
+status item, so ``--lines`` shows where version checks start saving reads.
+
+Usage:
+    python backend/benchmarks/bench_order_status.py
+    python backend/benchmarks/bench_order_status.py --orders 200 --lines 12 --interval 2
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from fake_connections import FakeConnections  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+os.environ.setdefault('ORDER_WATCH_SECRET', 'local-order-watch-secret')
+os.environ.setdefault('WEBSOCKET_URL', 'wss://local.example.com/orders')
+os.environ.setdefault('WEBSOCKET_ENDPOINT', 'https://local.example.com/orders')
+
+TRANSITIONS = ['processing', 'confirmed']
+
+
+def read_units(item):
+    return math.ceil(len(json.dumps(item, default=str).encode()) / 4096) * 0.5
+
+
+def http(user_id, order_id, params=None):
+    return {'requestContext': {'authorizer': {'jwt': {'claims': {'sub': user_id}}}},
+            'pathParameters': {'id': order_id}, 'queryStringParameters': params, 'headers': {}}
+
+
+def stream_record(serializer, old, new):
+    return {'eventID': uuid.uuid4().hex, 'eventName': 'MODIFY' if old else 'INSERT', 'dynamodb': {
+        'OldImage': {k: serializer.serialize(v) for k, v in old.items()} if old else None,
+        'NewImage': {k: serializer.serialize(v) for k, v in new.items()}, 'SequenceNumber': '1'}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--lines', type=int, default=6, help='order lines per order (item size)')
+    parser.add_argument('--interval', type=float, default=1.0, help='client poll interval, seconds')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    context = LambdaContext(function_name='bench')
+    with local_stack(tables=['ORDERS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        from boto3.dynamodb.types import TypeSerializer
+
+        serializer = TypeSerializer()
+        orders_table = stack.table('ORDERS_TABLE')
+        get_order = stack.handler('orders', 'get_order')
+        get_status = stack.handler('orders', 'get_order_status')
+        watch = stack.handler('orders', 'order_watch')
+        publish = stack.handler('orders', 'project_orders')
+        connections = FakeConnections()
+        sys.modules['project_orders'].connections_api = connections
+
+        totals = {name: {'invocations': 0, 'reads': 0, 'units': 0.0, 'bytes': 0}
+                  for name in ('poll order', 'poll version', 'long poll', 'websocket')}
+        seen_complete = {name: 0 for name in totals}
+        started_at = datetime.utcnow()
+        for n in range(args.orders):
+            user_id, order_id = f'user-{n:04d}', f'ord-{n:06d}'
+            order = {'PK': f'USER#{user_id}', 'SK': f'ORDER#{order_id}', 'orderId': order_id, 'userId': user_id,
+                     'status': 'pending', 'createdAt': started_at.isoformat() + 'Z',
+                     'updatedAt': started_at.isoformat() + 'Z',
+                     'items': [{'productId': f'prod-{i:05d}', 'name': f'Product {i} with a descriptive name',
+                                'quantity': 1, 'price': '19.99', 'imageUrl': f'https://cdn.example.com/{i}.webp'}
+                               for i in range(args.lines)],
+                     'shippingAddress': {'line1': '1 Main Street', 'city': 'Springfield', 'postalCode': '12345'},
+                     'totals': {'subtotal': '119.94', 'total': '129.93', 'currency': 'USD'}}
+            orders_table.put_item(Item=order)
+            publish({'Records': [stream_record(serializer, None, order)]}, context)
+
+            # Simulated workflow clock: seconds after checkout at which each transition lands
+            times = sorted(rng.uniform(0.5, 8) for _ in TRANSITIONS)
+            duration = times[-1]
+
+            # The push watcher: one status read for the token, then connect
+            stack.reset_counters()
+            first = get_status(http(user_id, order_id), context)
+            token = json.loads(first['body'])['watchToken']
+            connection_id = f'conn-{n:06d}'
+            connections.connect(connection_id)
+            watch({'requestContext': {'routeKey': '$connect', 'connectionId': connection_id},
+                   'queryStringParameters': {'token': token}}, context)
+            status_item = stack.table('READ_MODELS_TABLE').get_item(
+                Key={'PK': f'ORDERSTATUS#{order_id}', 'SK': 'STATUS'})['Item']
+            totals['websocket']['invocations'] += 2
+            totals['websocket']['reads'] += 1
+            totals['websocket']['units'] += read_units(status_item)
+            totals['websocket']['bytes'] += len(first['body'])
+
+            for status, at in zip(TRANSITIONS, times):
+                old = dict(order)
+                order['status'] = status
+                order['updatedAt'] = (started_at + timedelta(seconds=at)).isoformat() + 'Z'
+                orders_table.put_item(Item=order)
+                publish({'Records': [stream_record(serializer, old, order)]}, context)
+
+            pushed = [message['status'] for message in connections.inbox[connection_id]]
+            seen_complete['websocket'] += pushed == TRANSITIONS
+            totals['websocket']['bytes'] += sum(len(json.dumps(m)) for m in connections.inbox[connection_id])
+            watch({'requestContext': {'routeKey': '$disconnect', 'connectionId': connection_id}}, context)
+            connections.disconnect(connection_id)
+
+            # Pollers: a request every interval until the client sees the final status
+            polls = math.ceil(duration / args.interval) + 1
+            final = json.loads(get_order(http(user_id, order_id), context)['body'])
+            seen_complete['poll order'] += final['status'] == TRANSITIONS[-1]
+            totals['poll order']['invocations'] += polls
+            totals['poll order']['reads'] += polls
+            totals['poll order']['units'] += polls * read_units(order)
+            totals['poll order']['bytes'] += polls * len(json.dumps(final))
+
+            version = json.loads(first['body'])['version']
+            unchanged = get_status(http(user_id, order_id, {'version': json.loads(
+                get_status(http(user_id, order_id), context)['body'])['version']}), context)
+            seen_complete['poll version'] += unchanged['statusCode'] == 304
+            totals['poll version']['invocations'] += polls
+            totals['poll version']['reads'] += polls
+            totals['poll version']['units'] += polls * read_units(status_item)
+            # Unchanged answers are bodiless 304s; the client gets a body per transition
+            totals['poll version']['bytes'] += len(TRANSITIONS) * len(first['body'])
+
+            # Long poll: one request per transition (plus the first), each reading the
+            # status item once per second while it waits
+            long_polls = len(TRANSITIONS) + 1
+            latest = json.loads(get_status(http(user_id, order_id, {'version': version}), context)['body'])
+            seen_complete['long poll'] += latest['status'] == TRANSITIONS[-1]
+            totals['long poll']['invocations'] += long_polls
+            totals['long poll']['reads'] += long_polls + math.ceil(duration)
+            totals['long poll']['units'] += (long_polls + math.ceil(duration)) * read_units(status_item)
+            totals['long poll']['bytes'] += long_polls * len(first['body'])
+
+    print(f'{args.orders} orders of {args.lines} lines, transitions within 8 s of checkout, '
+          f'polling every {args.interval:g} s')
+    print(f'Order item {len(json.dumps(order, default=str))} bytes, status item '
+          f'{len(json.dumps(status_item, default=str))} bytes; push messages delivered: {connections.calls}')
+    print(f'\n  {"per watched order":<20} {"invocations":>12} {"reads":>8} {"read units":>11} '
+          f'{"bytes sent":>11} {"saw every change":>17}')
+    for name, total in totals.items():
+        print(f'  {name:<20} {total["invocations"] / args.orders:>12.1f} {total["reads"] / args.orders:>8.1f} '
+              f'{total["units"] / args.orders:>11.2f} {total["bytes"] / args.orders:>11.0f} '
+              f'{seen_complete[name]:>13}/{args.orders}')
+
+
+if __name__ == '__main__':
+    main()
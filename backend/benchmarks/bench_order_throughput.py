@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Load test: queue-mode batch processing vs one Step Functions execution per order.
+
+Both modes run the real handlers against a moto DynamoDB. The per-order mode
+executes the standard ASL workflow on the local executor; queue mode feeds
+SQS-shaped batches to process_order_batch. --invoke-overhead-ms and
+--transition-overhead-ms model service latency that does not exist locally
+(queue mode pays one invoke per batch and no transitions).
+
+Queue mode runs two transactions per order (reserve, then settle with the
+status change). moto copies its tables on every TransactWriteItems and the
+local stack serializes requests, so locally its elapsed time grows with the
+table size; DynamoDB calls per order is the figure that carries over.
+
+Usage:
+    python backend/benchmarks/bench_order_throughput.py
+    python backend/benchmarks/bench_order_throughput.py --orders 2000 --batch-size 100 --invoke-overhead-ms 20 --transition-overhead-ms 10
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext, LocalStateMachine  # noqa: E402
+from bench_order_workflow import STATE_MACHINES, seed  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+
+def per_order(args):
+    with local_stack(tables=['PRODUCTS_TABLE', 'ORDERS_TABLE']) as stack:
+        functions = {
+            'ValidateInventoryFunctionArn': 'validate_inventory',
+            'ProcessPaymentFunctionArn': 'process_payment',
+            'UpdateInventoryFunctionArn': 'update_inventory',
+            'SendOrderConfirmationFunctionArn': 'send_confirmation'
+        }
+        handlers = {name: stack.handler('workflows', module) for name, module in functions.items()}
+        machine = LocalStateMachine.from_file(
+            os.path.join(STATE_MACHINES, 'order-processing.asl.json'), handlers,
+            dynamodb_client=stack.client,
+            substitutions={**{name: name for name in functions}, 'OrdersTableName': stack.table('ORDERS_TABLE').name},
+            invoke_overhead=args.invoke_overhead_ms / 1000,
+            transition_overhead=args.transition_overhead_ms / 1000
+        )
+        inputs = seed(stack, args.products, args.orders, args.items, random.Random(args.seed))
+        stack.reset_counters()
+
+        started = time.perf_counter()
+        succeeded = sum(machine.execute(execution_input).status == 'SUCCEEDED' for execution_input in inputs)
+        elapsed = time.perf_counter() - started
+        return elapsed, succeeded, stack.dynamodb_calls()
+
+
+def batched(args):
+    with local_stack(tables=['PRODUCTS_TABLE', 'ORDERS_TABLE']) as stack:
+        handler = stack.handler('workflows', 'process_order_batch')
+        inputs = seed(stack, args.products, args.orders, args.items, random.Random(args.seed))
+        orders_table = stack.table('ORDERS_TABLE')
+        stack.reset_counters()
+
+        started = time.perf_counter()
+        for start in range(0, len(inputs), args.batch_size):
+            records = [
+                {'messageId': str(uuid.uuid4()), 'body': json.dumps({'orderId': o['orderId'], 'userId': o['userId']})}
+                for o in inputs[start:start + args.batch_size]
+            ]
+            if args.invoke_overhead_ms:
+                time.sleep(args.invoke_overhead_ms / 1000)
+            handler({'Records': records}, LambdaContext(function_name='process_order_batch'))
+        elapsed = time.perf_counter() - started
+        calls = stack.dynamodb_calls()
+
+        succeeded = sum(
+            orders_table.get_item(Key={'PK': f"USER#{o['userId']}", 'SK': f"ORDER#{o['orderId']}"})['Item']['status'] == 'processing'
+            for o in inputs
+        )
+        return elapsed, succeeded, calls
+
+
+def report(label, orders, elapsed, succeeded, calls):
+    print(f'\n{label}')
+    print(f'  {"processed":<26} {succeeded:>10} / {orders}')
+    print(f'  {"elapsed":<26} {elapsed:>10.2f} s')
+    print(f'  {"throughput (1 worker)":<26} {orders / elapsed:>10.1f} orders/s')
+    print(f'  {"dynamodb calls / order":<26} {calls / orders:>10.2f}')
+    return orders / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--items', type=int, default=3, help='distinct products per order')
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--invoke-overhead-ms', type=float, default=0.0)
+    parser.add_argument('--transition-overhead-ms', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    single = report('One execution per order (standard workflow)', args.orders, *per_order(args))
+    batch = report(f'Queue mode (batches of {args.batch_size})', args.orders, *batched(args))
+    print(f'\n  {"speedup":<26} {batch / single:>10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
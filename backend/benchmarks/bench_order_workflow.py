@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the standard and fused order workflows end to end on the local ASL executor.
+
+Both state machines run against the real workflow handlers and a moto
+DynamoDB. Local invokes are free, so --invoke-overhead-ms and
+--transition-overhead-ms model the per-invoke and per-transition latency of
+the deployed services (warm Lambda invoke and Standard workflow transition
+are typically tens of milliseconds each).
+
+Usage:
+    python backend/benchmarks/bench_order_workflow.py
+    python backend/benchmarks/bench_order_workflow.py --orders 500 --items 5 --invoke-overhead-ms 25 --transition-overhead-ms 15
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LocalStateMachine  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+STATE_MACHINES = os.path.join(os.path.dirname(__file__), '..', '..', 'state-machines')
+# Standard workflows are billed per state transition
+PRICE_PER_TRANSITION = 0.025 / 1000
+
+
+def seed(stack, products, orders, items_per_order, rng):
+    products_table = stack.table('PRODUCTS_TABLE')
+    orders_table = stack.table('ORDERS_TABLE')
+    with products_table.batch_writer() as batch:
+        for i in range(products):
+            batch.put_item(Item={
+                'PK': f'PRODUCT#prod-{i:04d}', 'SK': 'METADATA', 'productId': f'prod-{i:04d}',
+                'price': Decimal('19.99'), 'inventory': 1000000, 'status': 'active'
+            })
+
+    inputs = []
+    with orders_table.batch_writer() as batch:
+        for n in range(orders):
+            order_id = f'order-{n:06d}'
+            items = [
+                {'productId': f'prod-{i:04d}', 'quantity': rng.randint(1, 3), 'price': 19.99}
+                for i in rng.sample(range(products), items_per_order)
+            ]
+            total = round(sum(item['price'] * item['quantity'] for item in items) * 1.08, 2)
+            batch.put_item(Item={
+                'PK': 'USER#bench-user', 'SK': f'ORDER#{order_id}', 'orderId': order_id,
+                'userId': 'bench-user', 'status': 'pending',
+                'items': [{**item, 'price': Decimal(str(item['price']))} for item in items],
+                'totals': {'total': Decimal(str(total)), 'currency': 'USD'},
+                'paymentMethodId': 'pm-bench'
+            })
+            inputs.append({
+                'orderId': order_id, 'userId': 'bench-user', 'email': 'bench@example.com',
+                'items': items, 'totals': {'total': total, 'currency': 'USD'},
+                'paymentMethodId': 'pm-bench', 'shippingAddress': {'city': 'New York'}
+            })
+    return inputs
+
+
+def run(label, definition, functions, args):
+    rng = random.Random(args.seed)
+    with local_stack(tables=['PRODUCTS_TABLE', 'ORDERS_TABLE']) as stack:
+        handlers = {name: stack.handler('workflows', module) for name, module in functions.items()}
+        machine = LocalStateMachine.from_file(
+            os.path.join(STATE_MACHINES, definition), handlers,
+            dynamodb_client=stack.client,
+            substitutions={**{name: name for name in functions}, 'OrdersTableName': stack.table('ORDERS_TABLE').name},
+            invoke_overhead=args.invoke_overhead_ms / 1000,
+            transition_overhead=args.transition_overhead_ms / 1000
+        )
+        inputs = seed(stack, args.products, args.orders, args.items, rng)
+        stack.reset_counters()
+
+        results = [machine.execute(execution_input) for execution_input in inputs]
+        dynamodb_calls = stack.dynamodb_calls()
+
+    failed = [r for r in results if r.status != 'SUCCEEDED']
+    latencies = sorted(r.seconds * 1000 for r in results)
+    elapsed = sum(r.seconds for r in results)
+    transitions = statistics.mean(r.transitions for r in results)
+    per_state = {}
+    for r in results:
+        for timing in r.states:
+            per_state.setdefault(timing.name, []).append(timing.seconds * 1000)
+
+    print(f'\n{label} ({definition})')
+    print(f'  {"succeeded":<26} {len(results) - len(failed):>10} / {len(results)}')
+    print(f'  {"p50 latency":<26} {latencies[len(latencies) // 2]:>10.2f} ms')
+    print(f'  {"p95 latency":<26} {latencies[int(len(latencies) * 0.95) - 1]:>10.2f} ms')
+    print(f'  {"throughput (1 worker)":<26} {len(results) / elapsed:>10.1f} orders/s')
+    print(f'  {"transitions / order":<26} {transitions:>10.1f}')
+    print(f'  {"lambda invokes / order":<26} {statistics.mean(r.lambda_invokes for r in results):>10.1f}')
+    print(f'  {"dynamodb calls / order":<26} {dynamodb_calls / len(results):>10.1f}')
+    print(f'  {"transition cost / 1M":<26} {transitions * PRICE_PER_TRANSITION * 1e6:>10.2f} USD')
+    for name, values in per_state.items():
+        print(f'    {name:<28} {statistics.mean(values):>8.2f} ms')
+    if failed:
+        print(f'  first failure: {failed[0].error}: {failed[0].cause}')
+    return {'p50': latencies[len(latencies) // 2], 'transitions': transitions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--items', type=int, default=3, help='distinct products per order')
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--invoke-overhead-ms', type=float, default=0.0)
+    parser.add_argument('--transition-overhead-ms', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    standard = run('Standard', 'order-processing.asl.json', {
+        'ValidateInventoryFunctionArn': 'validate_inventory',
+        'ProcessPaymentFunctionArn': 'process_payment',
+        'UpdateInventoryFunctionArn': 'update_inventory',
+        'SendOrderConfirmationFunctionArn': 'send_confirmation'
+    }, args)
+    fused = run('Fused', 'order-processing-fused.asl.json', {
+        'FulfilOrderFunctionArn': 'fulfil_order',
+        'ProcessPaymentFunctionArn': 'process_payment',
+        'SendOrderConfirmationFunctionArn': 'send_confirmation'
+    }, args)
+
+    print('\nFused vs standard')
+    print(f'  {"transitions saved / order":<26} {standard["transitions"] - fused["transitions"]:>10.1f}')
+    print(f'  {"p50 latency change":<26} {fused["p50"] - standard["p50"]:>+10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark payment_client.py against the local fake gateway.
+
+1. Connection reuse: concurrent charges through the pooled session vs a new
+   connection per charge (plain ``requests.post``).
+2. Brownout: the gateway stalls for a few seconds; compare how long callers
+   wait with the circuit breaker enabled and effectively disabled.
+
+Usage:
+    python backend/benchmarks/bench_payment_client.py
+    python backend/benchmarks/bench_payment_client.py --charges 1000 --latency-ms 30 --workers 32
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers', 'workflows'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common'))
+os.environ.setdefault('STRIPE_SECRET_KEY', 'sk_test_local')
+
+import requests  # noqa: E402
+
+import payment_client  # noqa: E402
+from fake_gateway import FakeGateway  # noqa: E402
+
+
+def unpooled_charge(url, order_id):
+    response = requests.post(
+        f'{url}/v1/payment_intents',
+        data={'amount': 1999, 'currency': 'usd', 'payment_method': 'pm_card_visa', 'confirm': 'true',
+              'metadata[orderId]': order_id},
+        headers={'Idempotency-Key': f'order-{order_id}', 'Connection': 'close'},
+        auth=('sk_test_local', ''),
+        timeout=(3.05, 10)
+    )
+    return response.json()['status'] == 'succeeded'
+
+
+def pooled_charge(order_id):
+    return payment_client.charge(order_id, '19.99', 'USD', 'pm_card_visa')['status'] == 'completed'
+
+
+def run(label, fn, ids, workers, gateway):
+    gateway.state.connections.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ok = sum(pool.map(fn, ids))
+    elapsed = time.perf_counter() - started
+    print(f'  {label:<30} {len(ids) / elapsed:>8.1f} charges/s  {ok}/{len(ids)} ok  '
+          f'{len(gateway.state.connections):>5} connections')
+    return len(ids) / elapsed
+
+
+def brownout(gateway, args, breaker_failures):
+    payment_client.breaker = payment_client.CircuitBreaker(failure_threshold=breaker_failures, reset_seconds=args.brownout_seconds)
+    gateway.state.brownout(args.brownout_seconds, latency_ms=args.brownout_seconds * 1000)
+    outcomes = {'completed': 0, 'timeout': 0, 'fast-fail': 0}
+    waited = []
+
+    def call(order_id):
+        started = time.perf_counter()
+        try:
+            payment_client.charge(order_id, '19.99', 'USD', 'pm_card_visa', deadline=time.monotonic() + args.call_budget)
+            outcome = 'completed'
+        except payment_client.PaymentGatewayUnavailable:
+            outcome = 'fast-fail'
+        except payment_client.PaymentGatewayTimeout:
+            outcome = 'timeout'
+        return outcome, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        for outcome, seconds in pool.map(call, [str(uuid.uuid4()) for _ in range(args.brownout_charges)]):
+            outcomes[outcome] += 1
+            waited.append(seconds)
+    gateway.state.brownout_until = 0
+    label = 'breaker on' if breaker_failures < 10 ** 6 else 'breaker off'
+    print(f'  {label:<30} caller time {sum(waited):>7.1f} s  '
+          + '  '.join(f'{k} {v}' for k, v in outcomes.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--charges', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--handshake-ms', type=float, default=30, help='modeled TCP+TLS setup per new connection')
+    parser.add_argument('--brownout-seconds', type=float, default=3)
+    parser.add_argument('--brownout-charges', type=int, default=64)
+    parser.add_argument('--call-budget', type=float, default=1.0, help='seconds each charge may take')
+    args = parser.parse_args()
+
+    with FakeGateway(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 4, handshake_ms=args.handshake_ms) as gateway:
+        payment_client.GATEWAY_URL = gateway.url
+
+        print(f'Connection reuse ({args.charges} charges, {args.workers} workers, '
+              f'{args.latency_ms:.0f} ms gateway, {args.handshake_ms:.0f} ms handshake)')
+        unpooled = run('new connection per charge', lambda i: unpooled_charge(gateway.url, i),
+                       [str(uuid.uuid4()) for _ in range(args.charges)], args.workers, gateway)
+        pooled = run('pooled keep-alive session', pooled_charge,
+                     [str(uuid.uuid4()) for _ in range(args.charges)], args.workers, gateway)
+        print(f'  {"speedup":<30} {pooled / unpooled:>8.2f}x')
+
+        print(f'\nBrownout ({args.brownout_seconds:.0f} s stall, {args.brownout_charges} charges, {args.call_budget:.1f} s budget each)')
+        brownout(gateway, args, breaker_failures=10 ** 6)
+        time.sleep(0.1)
+        brownout(gateway, args, breaker_failures=payment_client.BREAKER_FAILURES)
+
+
+if __name__ == '__main__':
+    main()
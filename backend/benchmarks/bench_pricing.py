@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cart pricing engine against the previous per-handler Decimal math.
+
+The engine does more than the old sum: it rounds every amount to cents,
+sets each line's lineTotal and checks promotions. It keeps up by converting
+each price point and line total once per container (pricing.py caches
+them), which is what a warm Lambda sees; the "cold caches" row clears them
+before every cart.
+
+Usage:
+    python backend/benchmarks/bench_pricing.py
+    python backend/benchmarks/bench_pricing.py --lines 10 100 1000 --carts 10000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers', 'cart'))
+
+import pricing  # noqa: E402
+from pricing import price_cart, price_carts  # noqa: E402
+
+
+def legacy_totals(items):
+    """Totals as add_to_cart.py computed them before the pricing engine."""
+    subtotal = sum(Decimal(str(item['price'])) * item['quantity'] for item in items)
+    tax = subtotal * Decimal('0.08')
+    shipping = Decimal('9.99') if subtotal < 50 else Decimal('0')
+    return {'subtotal': subtotal, 'tax': tax, 'shipping': shipping, 'total': subtotal + tax + shipping}
+
+
+def make_cart(lines, rng):
+    return {
+        'items': [
+            {
+                'productId': f'prod-{i:06d}',
+                'price': Decimal(f'{rng.randint(100, 50000) / 100:.2f}'),
+                'quantity': rng.randint(1, 5)
+            }
+            for i in range(lines)
+        ]
+    }
+
+
+def price_cart_cold(cart):
+    pricing._cents_cache.clear()
+    pricing._amount_cache.clear()
+    return price_cart(cart)
+
+
+def bench(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f'  {label:<34} {seconds * 1e6:>10.1f} us/op')
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, nargs='+', default=[3, 15, 100, 1000])
+    parser.add_argument('--carts', type=int, default=5000, help='carts in the batch re-pricing run')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    print('Single cart')
+    for lines in args.lines:
+        cart = make_cart(lines, rng)
+        number = max(10, 20000 // lines)
+        print(f' {lines} lines')
+        legacy = bench('legacy Decimal', lambda: legacy_totals(cart['items']), number)
+        engine = bench('pricing.price_cart', lambda: price_cart(cart), number)
+        bench('pricing.price_cart, cold caches', lambda: price_cart_cold(cart), number)
+        print(f'  {"speedup":<34} {legacy / engine:>10.2f}x')
+
+    print(f'\nBatch re-price of {args.carts} carts after a price change')
+    carts = [make_cart(rng.randint(1, 15), rng) for _ in range(args.carts)]
+    changed = {f'prod-{i:06d}': Decimal('9.99') for i in range(5)}
+    batch = bench('pricing.price_carts', lambda: price_carts(carts, changed), 1)
+    print(f'  {"per cart":<34} {batch / args.carts * 1e6:>10.1f} us/op')
+
+
+if __name__ == '__main__':
+    main()
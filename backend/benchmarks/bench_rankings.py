@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Benchmark popularity sorts: scanning OrdersTable per request vs incrementally maintained rankings.
+
+Seeds ProductsTable and OrdersTable with paid orders over the last 60 days
+(Zipf-distributed product popularity, plus a handful of products whose
+sales jump in the last two days), folds them into the ranking counters
+in OrdersTable stream batches the way project_orders.py does and runs
+materialize_rankings.py. Then compares GET /products?sort=popular|trending
+(get_products.py) with what answering the same question on request would
+take: scanning every order and computing the decayed scores. It also checks the materialized top of each
+ranking against the exact scores from the scan. DynamoDB runs in-process in
+moto, so latencies leave out network round trips; the call counts carry
+over.
+
+Usage:
+    python backend/benchmarks/bench_rankings.py
+    python backend/benchmarks/bench_rankings.py --orders 50000 --products 5000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+BATCH_SIZE = 500
+TOP = 20
+
+
+def seed_products(table, args, rng):
+    with table.batch_writer() as batch:
+        for n in range(args.products):
+            product_id = f'prod-{n:05d}'
+            batch.put_item(Item={
+                'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id,
+                'name': f'Product {n}', 'price': Decimal(f'{rng.uniform(2, 300):.2f}'),
+                'category': f'category-{n % args.categories:02d}', 'inventory': 100, 'status': 'active'
+            })
+
+
+def make_orders(args, rng, now):
+    weights = [1 / (n + 1) ** 1.1 for n in range(args.products)]
+    trending = rng.sample(range(args.products // 2, args.products), 5)
+    orders = []
+    for n in range(args.orders):
+        age = timedelta(days=rng.uniform(0, 60))
+        lines = rng.choices(range(args.products), weights=weights, k=rng.randint(1, 4))
+        if age < timedelta(days=2) and rng.random() < 0.3:
+            lines.append(rng.choice(trending))
+        created_at = (now - age).isoformat().replace('+00:00', 'Z')
+        orders.append({
+            'PK': f'USER#user-{n % 997}', 'SK': f'ORDER#ord-{n:08d}', 'orderId': f'ord-{n:08d}',
+            'userId': f'user-{n % 997}', 'status': 'processing', 'createdAt': created_at,
+            'items': [{'productId': f'prod-{p:05d}', 'category': f'category-{p % args.categories:02d}',
+                       'quantity': rng.randint(1, 3), 'price': Decimal('9.99')} for p in set(lines)]
+        })
+    return orders
+
+
+def exact_scores(orders, kind, now, product_rankings):
+    scores = defaultdict(float)
+    for order in orders:
+        created_at = datetime.fromisoformat(order['createdAt'].replace('Z', '+00:00'))
+        age = (now - created_at).total_seconds()
+        for item in order['items']:
+            scores[item['productId']] += int(item['quantity']) * 2 ** (-age / product_rankings.HALF_LIVES[kind])
+    return scores
+
+
+def http(query):
+    return {
+        'version': '2.0', 'routeKey': '$default', 'rawPath': '/products', 'headers': {},
+        'rawQueryString': '&'.join(f'{k}={v}' for k, v in query.items()),
+        'queryStringParameters': query, 'isBase64Encoded': False,
+        'requestContext': {'http': {'method': 'GET', 'path': '/products', 'sourceIp': '127.0.0.1'}, 'stage': '$default'}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    context = LambdaContext(function_name='bench')
+    with local_stack(tables=['PRODUCTS_TABLE', 'ORDERS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        from boto3.dynamodb.types import TypeSerializer
+
+        serializer = TypeSerializer()
+        seed_products(stack.table('PRODUCTS_TABLE'), args, rng)
+        orders = make_orders(args, rng, now)
+        orders_table = stack.table('ORDERS_TABLE')
+        with orders_table.batch_writer() as batch:
+            for order in orders:
+                batch.put_item(Item=order)
+
+        stack.handler('orders', 'project_orders')
+        import product_rankings
+        import project_orders
+        client = stack.table('READ_MODELS_TABLE').meta.client
+        batch_ms, counters = [], 0
+        for start in range(0, len(orders), BATCH_SIZE):
+            records = [{'eventName': 'INSERT', 'dynamodb': {
+                'NewImage': {k: serializer.serialize(v) for k, v in order.items()}}}
+                for order in orders[start:start + BATCH_SIZE]]
+            started = time.perf_counter()
+            # The projector's own batch deltas, written without its transaction: moto copies
+            # every table per TransactWriteItems call, which would dominate the run
+            deltas = project_orders.Deltas()
+            for record in records:
+                project_orders.collect(record, deltas)
+            for key in deltas.keys():
+                client.update_item(**project_orders.build_update(key, deltas)['Update'])
+                counters += key[0].startswith('RANK#')
+            batch_ms.append((time.perf_counter() - started) * 1000)
+        lines = sum(len(order['items']) for order in orders)
+
+        started = time.perf_counter()
+        summary = stack.handler('products', 'materialize_rankings')({}, context)
+        materialize_seconds = time.perf_counter() - started
+
+        get_products = stack.handler('products', 'get_products')
+        results = {}
+        for kind in product_rankings.HALF_LIVES:
+            stack.reset_counters()
+            samples = []
+            for n in range(args.requests):
+                query = {'sort': kind, 'limit': str(TOP)}
+                if n % 2:
+                    query['category'] = f'category-{n % args.categories:02d}'
+                started = time.perf_counter()
+                response = get_products(http(query), context)
+                samples.append((time.perf_counter() - started) * 1000)
+            ranked = [p['productId'] for p in json.loads(
+                get_products(http({'sort': kind, 'limit': str(TOP)}), context)['body'])['products']]
+            calls = stack.dynamodb_calls() / (args.requests + 1)
+
+            stack.reset_counters()
+            started = time.perf_counter()
+            scanned, scan_params = [], {}
+            while True:
+                response = orders_table.scan(**scan_params)
+                scanned.extend(response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            scores = exact_scores(scanned, kind, now, product_rankings)
+            exact = sorted(scores, key=scores.get, reverse=True)[:TOP]
+            scan_ms = (time.perf_counter() - started) * 1000
+            results[kind] = {'p50': statistics.median(samples), 'calls': calls, 'scan_ms': scan_ms,
+                             'scan_calls': stack.dynamodb_calls(), 'overlap': len(set(ranked) & set(exact))}
+
+    print(f'{args.orders} paid orders ({lines} lines) over 60 days, {args.products} products '
+          f'in {args.categories} categories')
+    print(f'\nproject_orders: {len(batch_ms)} stream batches of {BATCH_SIZE}, median {statistics.median(batch_ms):.0f} ms, '
+          f'{counters} ranking counter updates for {lines * len(product_rankings.HALF_LIVES)} line scores')
+    print(f'materialize_rankings: {materialize_seconds:.1f} s '
+          + ', '.join(f'{kind} {s["products"]} products / {s["categories"]} categories'
+                      for kind, s in summary.items()))
+    print(f'\n  {"":<12} {"scan per request ms":>20} {"calls":>7} {"ranking p50 ms":>16} {"calls":>7} '
+          f'{"top " + str(TOP) + " matches exact":>20}')
+    for kind, r in results.items():
+        print(f'  {kind:<12} {r["scan_ms"]:>20.0f} {r["scan_calls"]:>7} {r["p50"]:>16.2f} {r["calls"]:>7.1f} '
+              f'{r["overlap"]:>17}/{TOP}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark rate limits (rate_limits.py) on POST /cart with a bot and ordinary shoppers.
+
+Runs add_to_cart.py against moto for ``--seconds`` of simulated time. One
+anonymous bot sends ``--bot-rps`` requests per second from a single IP,
+spread round robin over ``--containers`` warm containers, each with its
+own limiter. Meanwhile ``--customers`` signed-in shoppers add an item
+every few seconds. The same traffic runs once without limits and once
+with the default limits.
+
+Reported per caller type: requests, requests served, 429s, and the
+DynamoDB calls made on their behalf (product reads, cart writes and the
+limiter's counter leases).
+
+Usage:
+    python backend/benchmarks/bench_rate_limits.py
+    python backend/benchmarks/bench_rate_limits.py --bot-rps 200 --containers 8 --seconds 120
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+os.environ.setdefault('GUEST_SESSION_SECRET', 'local-guest-session-secret')
+
+
+def traffic(args, rng):
+    """(time, caller type, event) in time order."""
+    body = json.dumps({'productId': 'prod-00001', 'quantity': 1})
+    requests = [(n / args.bot_rps, 'bot', {'requestContext': {'http': {'sourceIp': '203.0.113.9'}},
+                                           'body': body, 'headers': {}})
+                for n in range(int(args.seconds * args.bot_rps))]
+    for c in range(args.customers):
+        at = rng.uniform(0, 5)
+        while at < args.seconds:
+            requests.append((at, 'customer', {
+                'requestContext': {'authorizer': {'jwt': {'claims': {'sub': f'user-{c:03d}'}}},
+                                   'http': {'sourceIp': f'198.51.100.{c}'}},
+                'body': body, 'headers': {}}))
+            at += rng.uniform(2, 8)
+    return sorted(requests, key=lambda request: request[0])
+
+
+def run(label, module, stack, requests, containers, rate_limits):
+    now = [0.0]
+    limiters = [rate_limits.RateLimiter(stack.table('READ_MODELS_TABLE'), clock=lambda: now[0])
+                for _ in range(containers)] if containers else [None]
+    context = LambdaContext(function_name='bench')
+    totals = {kind: Counter() for kind in ('bot', 'customer')}
+    for n, (at, kind, event) in enumerate(requests):
+        now[0] = 1_800_000_000 + at
+        module.limiter = limiters[n % len(limiters)]
+        stack.reset_counters()
+        status = module.handler(event, context)['statusCode']
+        totals[kind]['requests'] += 1
+        totals[kind]['served' if status == 200 else 'limited' if status == 429 else f'http {status}'] += 1
+        for operation, calls in stack.api_calls.items():
+            totals[kind][operation] += calls
+
+    print(f'\n{label}')
+    print(f'  {"caller":<10} {"requests":>9} {"served":>8} {"429":>7} {"GetItem":>8} {"PutItem":>8} '
+          f'{"UpdateItem":>11} {"other":>6}')
+    for kind, total in totals.items():
+        other = sum(v for k, v in total.items() if k[0].isupper() and k not in ('GetItem', 'PutItem', 'UpdateItem'))
+        print(f'  {kind:<10} {total["requests"]:>9} {total["served"]:>8} {total["limited"]:>7} '
+              f'{total["GetItem"]:>8} {total["PutItem"]:>8} {total["UpdateItem"]:>11} {other:>6}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=int, default=120)
+    parser.add_argument('--bot-rps', type=float, default=50)
+    parser.add_argument('--containers', type=int, default=4)
+    parser.add_argument('--customers', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    requests = traffic(args, random.Random(args.seed))
+    with local_stack(tables=['PRODUCTS_TABLE', 'CARTS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        stack.table('PRODUCTS_TABLE').put_item(Item={
+            'PK': 'PRODUCT#prod-00001', 'SK': 'METADATA', 'productId': 'prod-00001', 'name': 'Product 1',
+            'price': Decimal('19.99'), 'inventory': 10 ** 6, 'status': 'active', 'category': 'books'})
+        stack.handler('cart', 'add_to_cart')
+        module = sys.modules['add_to_cart']
+        import rate_limits
+
+        print(f'{args.seconds} s simulated: bot at {args.bot_rps:g} req/s from one IP over {args.containers} '
+              f'containers, {args.customers} customers adding an item every 2-8 s')
+        run('no rate limits', module, stack, requests, 0, rate_limits)
+        limit = rate_limits.DEFAULT_LIMITS['cart:add']['anonymous']
+        run(f'default limits (anonymous: {limit.rate:g}/s, burst {limit.burst}, '
+            f'{limit.per_window} per {rate_limits.WINDOW_SECONDS} s)', module, stack, requests, args.containers,
+            rate_limits)
+
+
+if __name__ == '__main__':
+    main()
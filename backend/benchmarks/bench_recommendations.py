@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark the "frequently bought together" engine on a synthetic order history.
+
+Generates millions of order lines over a catalog with Zipf-distributed
+popularity and planted bundles (small groups of products that tend to be
+bought together), then times co_purchases.py: encoding the baskets and
+counting, pruning and ranking the pairs. The run fails if it takes longer
+than ``--budget`` seconds, and reports how many of each bundle's partners
+came back in the products' top lists.
+
+With ``--end-to-end`` it also runs build_recommendations.py against a moto
+stack on a smaller history and compares GET /products/{id} with and without
+``related=true`` (DynamoDB calls per request).
+
+Usage:
+    python backend/benchmarks/bench_recommendations.py
+    python backend/benchmarks/bench_recommendations.py --lines 10000000 --products 200000 --budget 120
+    python backend/benchmarks/bench_recommendations.py --end-to-end
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers', 'recommendations'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from co_purchases import Baskets, related_products  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+BUNDLE_SIZE = 4
+
+
+def synthetic_orders(lines, products, bundles, rng):
+    """Yield baskets of product IDs until ``lines`` order lines have been produced."""
+    popular = [f'prod-{n:06d}' for n in range(products)]
+    weights = [1 / (n + 1) ** 0.9 for n in range(products)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    planted = [rng.sample(popular, BUNDLE_SIZE) for _ in range(bundles)]
+    produced = 0
+    while produced < lines:
+        basket = rng.choices(popular, cum_weights=cumulative, k=rng.choice((1, 1, 2, 2, 3, 4, 6)))
+        if rng.random() < 0.25:
+            bundle = planted[rng.randrange(bundles)]
+            basket += rng.sample(bundle, rng.randint(2, BUNDLE_SIZE))
+        if rng.random() < 0.001:
+            # A bulk order, which the engine skips
+            basket += rng.sample(popular, 80)
+        produced += len(basket)
+        yield basket
+    return planted
+
+
+def run_engine(args):
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    baskets = Baskets()
+    generator = synthetic_orders(args.lines, args.products, args.bundles, rng)
+    generate_seconds = 0.0
+    while True:
+        tick = time.perf_counter()
+        try:
+            basket = next(generator)
+        except StopIteration as stop:
+            planted = stop.value
+            break
+        generate_seconds += time.perf_counter() - tick
+        baskets.add(basket)
+    encode_seconds = time.perf_counter() - started - generate_seconds
+
+    started = time.perf_counter()
+    related = dict(related_products(baskets, top_n=10, min_support=3, max_basket=50))
+    count_seconds = time.perf_counter() - started
+
+    found = expected = 0
+    for bundle in planted:
+        for product_id in bundle:
+            partners = {partner for partner, _, _ in related.get(product_id, [])}
+            expected += BUNDLE_SIZE - 1
+            found += len(partners & (set(bundle) - {product_id}))
+
+    total = encode_seconds + count_seconds
+    print(f'{args.lines:,} order lines in {len(baskets):,} orders over {args.products:,} products, '
+          f'{args.bundles} planted bundles of {BUNDLE_SIZE}')
+    print(f'\n  encode baskets          {encode_seconds:>7.1f} s   (generating them took {generate_seconds:.1f} s)')
+    print(f'  count, prune and rank   {count_seconds:>7.1f} s')
+    print(f'  total                   {total:>7.1f} s   budget {args.budget:.0f} s: '
+          f'{"within" if total <= args.budget else "OVER"}')
+    print(f'\n  products with recommendations: {len(related):,}')
+    print(f'  bundle partners recovered in top 10: {found}/{expected} ({found / expected:.0%})')
+    return total <= args.budget
+
+
+def run_end_to_end(args):
+    rng = random.Random(args.seed)
+    context = LambdaContext(function_name='bench')
+    with local_stack(tables=['PRODUCTS_TABLE', 'ORDERS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        with stack.table('PRODUCTS_TABLE').batch_writer() as batch:
+            for n in range(args.e2e_products):
+                product_id = f'prod-{n:06d}'
+                batch.put_item(Item={
+                    'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id,
+                    'name': f'Product {n}', 'price': Decimal('19.99'), 'status': 'active',
+                    'thumbnail': f'https://cdn.example.com/{product_id}/thumb.webp', 'inventory': 10
+                })
+        generator = synthetic_orders(args.e2e_lines, args.e2e_products, 20, rng)
+        created_at = (datetime.utcnow() - timedelta(days=10)).isoformat() + 'Z'
+        with stack.table('ORDERS_TABLE').batch_writer() as batch:
+            for n, basket in enumerate(generator):
+                batch.put_item(Item={
+                    'PK': f'USER#user-{n % 500}', 'SK': f'ORDER#ord-{n:08d}', 'orderId': f'ord-{n:08d}',
+                    'status': 'delivered', 'createdAt': created_at,
+                    'items': [{'productId': pid, 'quantity': 1} for pid in basket]
+                })
+
+        build = stack.handler('recommendations', 'build_recommendations')
+        started = time.perf_counter()
+        summary = build({}, context)
+        build_seconds = time.perf_counter() - started
+
+        get_product = stack.handler('products', 'get_product')
+        calls = {}
+        for label, query in (('plain', None), ('related=true', {'related': 'true'})):
+            stack.reset_counters()
+            sizes = []
+            for n in range(100):
+                pid = f'prod-{n:06d}'
+                event = {'version': '2.0', 'routeKey': '$default', 'rawPath': f'/products/{pid}', 'headers': {},
+                         'rawQueryString': 'related=true' if query else '', 'queryStringParameters': query,
+                         'pathParameters': {'id': pid}, 'isBase64Encoded': False,
+                         'requestContext': {'http': {'method': 'GET', 'path': f'/products/{pid}',
+                                                     'sourceIp': '127.0.0.1'}, 'stage': '$default'}}
+                body = json.loads(get_product(event, context)['body'])
+                sizes.append(len(body.get('related', [])))
+            calls[label] = (stack.dynamodb_calls() / 100, sum(sizes) / len(sizes))
+
+    print(f'\nEnd to end (moto): {summary["orders"]} orders -> {summary["products"]} products with recommendations '
+          f'in {build_seconds:.1f} s')
+    for label, (per_request, related) in calls.items():
+        print(f'  GET /products/{{id}} {label:<14} {per_request:.1f} DynamoDB calls, {related:.1f} related products')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=3000000)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--bundles', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=20, help='seconds allowed for encoding and counting')
+    parser.add_argument('--end-to-end', action='store_true')
+    parser.add_argument('--e2e-lines', type=int, default=20000)
+    parser.add_argument('--e2e-products', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    within = run_engine(args)
+    if args.end_to_end:
+        run_end_to_end(args)
+    sys.exit(0 if within else 1)
+
+
+if __name__ == '__main__':
+    main()
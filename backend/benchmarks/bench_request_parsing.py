@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Benchmark request body parsing: hand-rolled json.loads + field checks vs request_models.
+
+The hand-rolled parsers below are the ones create_product.py,
+update_product.py, add_to_cart.py and batch_cart.py used before they moved
+to backend/src/layers/common/request_models.py. Each is timed against
+``parse_body`` with the matching schema (plus the handler's own defaulting,
+for the cart batch) on a valid body and on a body that fails validation.
+Also reported: the one-off cost of importing request_models (pydantic plus
+compiling every TypeAdapter), which a cold start pays once and warm
+invocations never pay again.
+
+Usage:
+    python backend/benchmarks/bench_request_parsing.py
+    python backend/benchmarks/bench_request_parsing.py --iterations 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+from decimal import Decimal
+
+LAYER_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common')
+sys.path.insert(0, LAYER_DIR)
+
+import request_models  # noqa: E402
+from request_models import parse_body  # noqa: E402
+
+
+def legacy_create_product(event):
+    body = json.loads(event.get('body', '{}'))
+    for field in ['name', 'price', 'currency', 'category', 'inventory']:
+        if field not in body:
+            raise ValueError(f'Missing required field: {field}')
+    product = {'name': body['name'], 'price': float(body['price']), 'currency': body['currency'],
+               'category': body['category'], 'inventory': int(body['inventory']),
+               'status': body.get('status', 'active')}
+    for field in ('description', 'subCategory', 'brand', 'images', 'sku', 'attributes'):
+        if field in body:
+            product[field] = body[field]
+    return product
+
+
+def legacy_update_product(event):
+    body = json.loads(event.get('body', '{}'))
+    types = {'name': 'string', 'description': 'string', 'price': 'float', 'inventory': 'int',
+             'status': 'string', 'brand': 'string', 'images': 'list', 'attributes': 'dict'}
+    values = {}
+    for field, field_type in types.items():
+        if field in body:
+            if field_type == 'float':
+                values[field] = Decimal(str(body[field]))
+            elif field_type == 'int':
+                values[field] = int(body[field])
+            else:
+                values[field] = body[field]
+    if not values:
+        raise ValueError('No valid fields to update')
+    return values
+
+
+def legacy_add_to_cart(event):
+    body = json.loads(event.get('body', '{}'))
+    product_id = body.get('productId')
+    quantity = int(body.get('quantity', 1))
+    if not product_id or quantity < 1:
+        raise ValueError('Valid productId and quantity required')
+    return product_id, quantity
+
+
+def legacy_batch_cart(event):
+    operations = json.loads(event.get('body') or '{}').get('operations')
+    if not isinstance(operations, list) or not operations or len(operations) > 50:
+        raise ValueError('operations must be a non-empty list')
+    parsed = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f'Operation {index} must be an object')
+        op = operation.get('op')
+        product_id = operation.get('productId')
+        if op not in ('add', 'set', 'remove') or not product_id or not isinstance(product_id, str):
+            raise ValueError(f'Operation {index} is invalid')
+        quantity = 0
+        if op != 'remove':
+            quantity = int(operation.get('quantity', 1 if op == 'add' else 0))
+            if quantity < 0 or (op == 'add' and quantity < 1):
+                raise ValueError(f'Operation {index}: invalid quantity')
+        parsed.append({'op': op, 'productId': product_id, 'quantity': quantity})
+    return parsed
+
+
+def cart_batch(event):
+    """batch_cart.py's parsing: the schema, then the per-op quantity default."""
+    return [{'quantity': 1 if operation['op'] == 'add' else 0, **operation}
+            for operation in parse_body(request_models.BatchCartRequest, event)['operations']]
+
+
+def schema(request_schema):
+    return lambda event: parse_body(request_schema, event)
+
+
+PRODUCT = {'name': 'Trail running shoe', 'price': 129.99, 'currency': 'USD', 'category': 'footwear',
+           'inventory': 40, 'description': 'Lightweight shoe with a rock plate. ' * 8, 'brand': 'Acme',
+           'images': [f'https://cdn.example.com/p/{n}.jpg' for n in range(4)],
+           'attributes': {'color': 'blue', 'sizes': ['40', '41', '42', '43']}}
+OPERATIONS = [{'op': ('add', 'set', 'remove')[n % 3], 'productId': f'prod-{n:05d}', 'quantity': 1 + n % 4}
+              for n in range(50)]
+
+CASES = [
+    ('POST /products', legacy_create_product, schema(request_models.CreateProductRequest),
+     PRODUCT, {**PRODUCT, 'inventory': 'many'}),
+    ('PUT /products/{id}', legacy_update_product, schema(request_models.UpdateProductRequest),
+     {'price': 119.99, 'inventory': 35}, {'price': 'cheap'}),
+    ('POST /cart', legacy_add_to_cart, schema(request_models.AddCartItemRequest),
+     {'productId': 'prod-00042', 'quantity': 2}, {'productId': 'prod-00042', 'quantity': 0}),
+    ('POST /cart/batch (50 ops)', legacy_batch_cart, cart_batch,
+     {'operations': OPERATIONS}, {'operations': OPERATIONS[:-1] + [{'op': 'add', 'productId': 'x', 'quantity': 'x'}]}),
+]
+
+
+def per_call_us(fn, event, iterations):
+    def call():
+        try:
+            fn(event)
+        except Exception:
+            # Hand-rolled parsers also fail with InvalidOperation/TypeError (a 500 in the handler)
+            pass
+    return min(timeit.repeat(call, number=iterations, repeat=5)) / iterations * 1e6
+
+
+def import_ms():
+    code = 'import time; t = time.perf_counter(); import request_models; print((time.perf_counter() - t) * 1000)'
+    runs = [float(subprocess.check_output([sys.executable, '-c', code], cwd=LAYER_DIR)) for _ in range(3)]
+    return min(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f'{"":<28} {"body":>7} {"hand-rolled":>12} {"schema":>10}   (us per request)')
+    for label, legacy, current, valid, invalid in CASES:
+        for kind, body in (('valid', valid), ('invalid', invalid)):
+            event = {'body': json.dumps(body)}
+            old = per_call_us(legacy, event, args.iterations)
+            new = per_call_us(current, event, args.iterations)
+            print(f'{label if kind == "valid" else "":<28} {kind:>7} {old:>12.1f} {new:>10.1f}   {old / new:.1f}x')
+
+    print(f'\nimport request_models (pydantic + all schemas, once per cold start): {import_ms():.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark stateless guest carts (signed_cart.py) against stored ones.
+
+Runs the cart handlers against moto for ``--guests`` anonymous shoppers.
+Each adds one to six items (most stop at three or fewer), views the cart
+after each add and once more before leaving, changes one quantity and, for
+``--sign-in`` of them, signs in and merges the guest cart. The same
+sessions run once with GUEST_CART_MODE=stored and once with stateless, the
+client keeping whatever X-Guest-Cart token the last successful response
+carried.
+
+Reported per mode: CartsTable and ProductsTable calls per shopper, items
+left in CartsTable (carts and CARTREF index rows), the largest token and
+the handler time per request. Without CATALOG_BUCKET every token cart is
+re-priced with a ProductsTable BatchGetItem; with the catalog snapshot
+those reads go away too.
+
+Usage:
+    python backend/benchmarks/bench_signed_cart.py
+    python backend/benchmarks/bench_signed_cart.py --guests 2000 --sign-in 0.1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'local'))
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+os.environ.setdefault('GUEST_SESSION_SECRET', 'local-guest-session-secret')
+os.environ.setdefault('RATE_LIMITING', 'off')
+
+PRODUCTS = 200
+
+
+def count_tables(clients, totals):
+    """Count each DynamoDB call once per table it touches."""
+    def count(params, **kwargs):
+        tables = set(params.get('RequestItems') or ())
+        if 'TableName' in params:
+            tables.add(params['TableName'])
+        for item in params.get('TransactItems') or ():
+            tables.update(action['TableName'] for action in item.values())
+        for table in tables:
+            totals[table] += 1
+
+    for client in {id(client): client for client in clients}.values():
+        client.meta.events.register('before-parameter-build.dynamodb', count)
+
+
+def shopper(rng):
+    """The product IDs one guest adds."""
+    count = rng.choice((1, 1, 2, 2, 2, 3, 3, 4, 5, 6))
+    return rng.sample([f'prod-{n:05d}' for n in range(PRODUCTS)], count)
+
+
+class Client:
+    """One browser: sends the guest session and cart token it was last given."""
+
+    def __init__(self, handlers, totals):
+        self.handlers = handlers
+        self.totals = totals
+        self.session = None
+        self.cart_token = None
+
+    def call(self, name, body=None, path=None, user=None):
+        headers = {}
+        if self.session:
+            headers['X-Guest-Session'] = self.session
+        if self.cart_token:
+            headers['X-Guest-Cart'] = self.cart_token
+        event = {'headers': headers, 'body': json.dumps(body) if body is not None else None,
+                 'pathParameters': path or {}, 'requestContext': {'http': {'sourceIp': '198.51.100.1'}}}
+        if user:
+            event['requestContext']['authorizer'] = {'jwt': {'claims': {'sub': user}}}
+        started = time.perf_counter()
+        response = self.handlers[name](event, LambdaContext(function_name='bench'))
+        self.totals['seconds'] += time.perf_counter() - started
+        self.totals['requests'] += 1
+        assert response['statusCode'] == 200, response
+        response_headers = response.get('headers') or {}
+        if user is None:
+            self.session = response_headers.get('X-Guest-Session', self.session)
+            self.cart_token = response_headers.get('X-Guest-Cart')
+            if self.cart_token:
+                self.totals['max token'] = max(self.totals['max token'], len(self.cart_token))
+        return json.loads(response['body'])
+
+
+def run(label, mode, handlers, stack, tables, shoppers, signed_cart):
+    signed_cart.STATELESS = mode == 'stateless'
+    totals = Counter()
+    tables.clear()
+    before = stack.table('CARTS_TABLE').scan(Select='COUNT')['Count']
+    for n, (product_ids, signs_in) in enumerate(shoppers):
+        client = Client(handlers, totals)
+        for product_id in product_ids:
+            client.call('add_to_cart', {'productId': product_id, 'quantity': 1})
+            client.call('get_cart')
+        client.call('update_cart_item', {'quantity': 2}, {'productId': product_ids[0]})
+        client.call('get_cart')
+        if signs_in:
+            body = {'guestSession': client.session}
+            if client.cart_token:
+                body['guestCart'] = client.cart_token
+            client.call('merge_guest_cart', body, user=f'user-{mode}-{n:05d}')
+    items = stack.table('CARTS_TABLE').scan(Select='COUNT')['Count'] - before
+
+    guests = len(shoppers)
+    print(f'\n{label}')
+    for env_name in ('CARTS_TABLE', 'PRODUCTS_TABLE'):
+        name = stack.table(env_name).name
+        print(f'  {name + " calls":<38} {tables[name] / guests:>7.2f} per shopper')
+    print(f'  {"CartsTable items written":<38} {items:>7}  ({items / guests:.2f} per shopper)')
+    print(f'  {"largest cart token":<38} {totals["max token"]:>7} bytes')
+    print(f'  {"handler time":<38} {totals["seconds"] * 1000 / totals["requests"]:>7.2f} ms per request')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--guests', type=int, default=500)
+    parser.add_argument('--sign-in', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shoppers = [(shopper(rng), rng.random() < args.sign_in) for _ in range(args.guests)]
+    with local_stack(tables=['PRODUCTS_TABLE', 'CARTS_TABLE', 'READ_MODELS_TABLE']) as stack:
+        with stack.table('PRODUCTS_TABLE').batch_writer() as batch:
+            for n in range(PRODUCTS):
+                batch.put_item(Item={
+                    'PK': f'PRODUCT#prod-{n:05d}', 'SK': 'METADATA', 'productId': f'prod-{n:05d}',
+                    'name': f'Product {n}', 'price': Decimal('19.99'), 'inventory': 10 ** 6,
+                    'status': 'active', 'category': 'books'})
+        handlers = {module: stack.handler('cart', module)
+                    for module in ('add_to_cart', 'get_cart', 'update_cart_item', 'merge_guest_cart')}
+        import signed_cart
+        tables = Counter()
+        count_tables([sys.modules[name].dynamodb.meta.client for name in handlers], tables)
+
+        print(f'{args.guests} guest shoppers, {args.sign_in:.0%} sign in; '
+              f'stateless carts hold up to {signed_cart.MAX_ITEMS} lines')
+        run('GUEST_CART_MODE=stored', 'stored', handlers, stack, tables, shoppers, signed_cart)
+        run('GUEST_CART_MODE=stateless', 'stateless', handlers, stack, tables, shoppers, signed_cart)
+
+
+if __name__ == '__main__':
+    main()
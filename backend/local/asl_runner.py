@@ -0,0 +1,396 @@
+"""
+Local Step Functions executor
+
+Runs an Amazon States Language definition in-process against the real
+handler functions, for end-to-end latency and throughput measurements of the
+order workflows without deploying them. Supported:
+
+    Task    arn:aws:states:::lambda:invoke and arn:aws:states:::dynamodb:*Item
+    Choice  And/Or/Not, IsPresent, Boolean/String/Numeric comparisons
+    Pass, Wait, Succeed, Fail
+    InputPath, Parameters, ResultSelector, ResultPath, OutputPath,
+    Retry, Catch and the States.Format/States.JsonToString intrinsics
+
+Every state entered counts as one billed transition, as in Standard
+workflows. Lambda invokes and state transitions cost nothing locally; the
+``invoke_overhead`` and ``transition_overhead`` arguments add a modeled
+delay per invoke/transition so the effect of removing them can be estimated.
+"""
+import copy
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+DYNAMODB_ACTIONS = {
+    'arn:aws:states:::dynamodb:getItem': 'get_item',
+    'arn:aws:states:::dynamodb:putItem': 'put_item',
+    'arn:aws:states:::dynamodb:updateItem': 'update_item',
+    'arn:aws:states:::dynamodb:deleteItem': 'delete_item'
+}
+LAMBDA_INVOKE = 'arn:aws:states:::lambda:invoke'
+
+
+class StatesError(Exception):
+    """A named ASL error (States.TaskFailed, Lambda.Unknown, DynamoDB.ConditionalCheckFailedException...)."""
+
+    def __init__(self, error: str, cause: str = ''):
+        super().__init__(f'{error}: {cause}')
+        self.error = error
+        self.cause = cause
+
+
+@dataclass
+class LambdaContext:
+    """Just enough of the Lambda context object for Powertools decorators."""
+    function_name: str
+    memory_limit_in_mb: int = 512
+    aws_request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+    @property
+    def invoked_function_arn(self) -> str:
+        return f'arn:aws:lambda:us-east-1:000000000000:function:{self.function_name}'
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 30000
+
+
+@dataclass
+class StateTiming:
+    name: str
+    seconds: float
+    retries: int = 0
+
+
+@dataclass
+class ExecutionResult:
+    status: str
+    output: Any = None
+    error: Optional[str] = None
+    cause: Optional[str] = None
+    transitions: int = 0
+    lambda_invokes: int = 0
+    seconds: float = 0.0
+    states: List[StateTiming] = field(default_factory=list)
+
+
+# -------------------- paths and intrinsics --------------------
+
+_PATH_TOKEN = re.compile(r"\.([A-Za-z0-9_\-]+)|\[(\d+)\]|\['([^']+)'\]")
+
+
+def read_path(path: str, data: Any, context: Dict[str, Any]) -> Any:
+    """Evaluate a reference path such as ``$.a.b[0]`` or ``$$.State.EnteredTime``."""
+    if path.startswith('$$'):
+        value, rest = context, path[2:]
+    elif path.startswith('$'):
+        value, rest = data, path[1:]
+    else:
+        raise StatesError('States.Runtime', f'Invalid path {path}')
+
+    position = 0
+    while position < len(rest):
+        match = _PATH_TOKEN.match(rest, position)
+        if not match:
+            raise StatesError('States.Runtime', f'Unsupported path {path}')
+        key = match.group(1) or match.group(3)
+        try:
+            value = value[key] if key is not None else value[int(match.group(2))]
+        except (KeyError, IndexError, TypeError):
+            raise StatesError('States.Runtime', f'Path {path} not found in input')
+        position = match.end()
+    return value
+
+
+def path_exists(path: str, data: Any, context: Dict[str, Any]) -> bool:
+    try:
+        read_path(path, data, context)
+        return True
+    except StatesError:
+        return False
+
+
+def write_path(path: Optional[str], data: Any, result: Any) -> Any:
+    """Apply a ResultPath: None discards the result, ``$`` replaces the input."""
+    if path is None:
+        return data
+    if path == '$':
+        return result
+    output = copy.deepcopy(data) if isinstance(data, dict) else {}
+    keys = [m.group(1) or m.group(3) for m in _PATH_TOKEN.finditer(path[1:])]
+    target = output
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+    target[keys[-1]] = result
+    return output
+
+
+def _split_args(text: str) -> List[str]:
+    args, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == "'" and not current.endswith('\\'):
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        if char == ',' and not quoted and depth == 0:
+            args.append(current.strip())
+            current = ''
+        else:
+            current += char
+    if current.strip():
+        args.append(current.strip())
+    return args
+
+
+def evaluate(expression: str, data: Any, context: Dict[str, Any]) -> Any:
+    """Evaluate the value of a ``key.$`` field: a path or an intrinsic function call."""
+    expression = expression.strip()
+    if not expression.startswith('States.'):
+        return read_path(expression, data, context)
+
+    name, _, rest = expression.partition('(')
+    args = []
+    for arg in _split_args(rest[:-1]):
+        if arg.startswith("'"):
+            args.append(arg[1:-1].replace("\\'", "'"))
+        elif arg.startswith('$') or arg.startswith('States.'):
+            args.append(evaluate(arg, data, context))
+        else:
+            args.append(json.loads(arg))
+
+    if name == 'States.Format':
+        template, values = args[0], iter(args[1:])
+        return re.sub(r'\{\}', lambda _: str(next(values)), template)
+    if name == 'States.JsonToString':
+        return json.dumps(args[0], default=str)
+    if name == 'States.StringToJson':
+        return json.loads(args[0])
+    raise StatesError('States.Runtime', f'Unsupported intrinsic {name}')
+
+
+def resolve(template: Any, data: Any, context: Dict[str, Any]) -> Any:
+    """Resolve a Parameters/ResultSelector payload template."""
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith('.$'):
+                resolved[key[:-2]] = evaluate(value, data, context)
+            else:
+                resolved[key] = resolve(value, data, context)
+        return resolved
+    if isinstance(template, list):
+        return [resolve(value, data, context) for value in template]
+    return template
+
+
+# -------------------- Choice rules --------------------
+
+_COMPARATORS = {
+    'Equals': lambda a, b: a == b,
+    'LessThan': lambda a, b: a < b,
+    'LessThanEquals': lambda a, b: a <= b,
+    'GreaterThan': lambda a, b: a > b,
+    'GreaterThanEquals': lambda a, b: a >= b
+}
+
+
+def matches(rule: Dict[str, Any], data: Any, context: Dict[str, Any]) -> bool:
+    if 'And' in rule:
+        return all(matches(r, data, context) for r in rule['And'])
+    if 'Or' in rule:
+        return any(matches(r, data, context) for r in rule['Or'])
+    if 'Not' in rule:
+        return not matches(rule['Not'], data, context)
+
+    variable = rule['Variable']
+    if 'IsPresent' in rule:
+        return path_exists(variable, data, context) == rule['IsPresent']
+    if not path_exists(variable, data, context):
+        return False
+    value = read_path(variable, data, context)
+
+    for key, expected in rule.items():
+        if key in ('Variable', 'Next'):
+            continue
+        for prefix, kind in (('Boolean', bool), ('String', str), ('Numeric', (int, float))):
+            if key.startswith(prefix):
+                operator = key[len(prefix):]
+                if operator.endswith('Path'):
+                    operator, expected = operator[:-4], read_path(expected, data, context)
+                if kind is bool and not isinstance(value, bool):
+                    return False
+                if kind is not bool and (not isinstance(value, kind) or isinstance(value, bool)):
+                    return False
+                return _COMPARATORS[operator](value, expected)
+    raise StatesError('States.Runtime', f'Unsupported Choice rule {rule}')
+
+
+def error_matches(patterns: List[str], error: str) -> bool:
+    if 'States.ALL' in patterns or error in patterns:
+        return True
+    return 'States.TaskFailed' in patterns and error not in ('States.Timeout', 'States.Runtime')
+
+
+# -------------------- executor --------------------
+
+class LocalStateMachine:
+    """Execute one ASL definition against in-process Lambda handlers and a DynamoDB client.
+
+    ``functions`` maps the resolved FunctionName to a ``handler(event, context)``
+    callable. ``retry_scale`` multiplies Retry intervals (0 skips the sleeps).
+    """
+
+    def __init__(self, definition: Dict[str, Any], functions: Dict[str, Callable],
+                 dynamodb_client=None, substitutions: Optional[Dict[str, str]] = None,
+                 invoke_overhead: float = 0.0, transition_overhead: float = 0.0, retry_scale: float = 0.0):
+        if substitutions:
+            text = json.dumps(definition)
+            for name, value in substitutions.items():
+                text = text.replace('${' + name + '}', value)
+            definition = json.loads(text)
+        self.definition = definition
+        self.functions = functions
+        self.dynamodb_client = dynamodb_client
+        self.invoke_overhead = invoke_overhead
+        self.transition_overhead = transition_overhead
+        self.retry_scale = retry_scale
+
+    @classmethod
+    def from_file(cls, path: str, functions: Dict[str, Callable], **kwargs) -> 'LocalStateMachine':
+        with open(path) as f:
+            return cls(json.load(f), functions, **kwargs)
+
+    def invoke_lambda(self, params: Dict[str, Any], result: ExecutionResult) -> Dict[str, Any]:
+        name = params['FunctionName']
+        if name not in self.functions:
+            raise StatesError('Lambda.ResourceNotFoundException', f'No local handler for {name}')
+        result.lambda_invokes += 1
+        if self.invoke_overhead:
+            time.sleep(self.invoke_overhead)
+        payload = json.loads(json.dumps(params.get('Payload', {}), default=str))
+        try:
+            response = self.functions[name](payload, LambdaContext(function_name=name))
+        except Exception as e:
+            raise StatesError(type(e).__name__, str(e))
+        return {'StatusCode': 200, 'Payload': json.loads(json.dumps(response, default=str))}
+
+    def call_dynamodb(self, resource: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = getattr(self.dynamodb_client, DYNAMODB_ACTIONS[resource])(**params)
+        except ClientError as e:
+            raise StatesError(f"DynamoDB.{e.response['Error']['Code']}", e.response['Error'].get('Message', ''))
+        response.pop('ResponseMetadata', None)
+        return response
+
+    def run_task(self, state: Dict[str, Any], data: Any, context: Dict[str, Any],
+                 result: ExecutionResult) -> Any:
+        params = resolve(state.get('Parameters', {}), data, context) if 'Parameters' in state else data
+        resource = state['Resource']
+        if resource == LAMBDA_INVOKE:
+            return self.invoke_lambda(params, result)
+        if resource in DYNAMODB_ACTIONS:
+            return self.call_dynamodb(resource, params)
+        raise StatesError('States.Runtime', f'Unsupported resource {resource}')
+
+    def execute(self, execution_input: Dict[str, Any], name: Optional[str] = None) -> ExecutionResult:
+        result = ExecutionResult(status='RUNNING')
+        started = time.perf_counter()
+        context = {'Execution': {'Id': name or str(uuid.uuid4()), 'Input': execution_input}, 'State': {}}
+        data = execution_input
+        state_name = self.definition['StartAt']
+
+        while True:
+            state = self.definition['States'][state_name]
+            state_started = time.perf_counter()
+            context['State'] = {'Name': state_name, 'EnteredTime': datetime.utcnow().isoformat() + 'Z'}
+            result.transitions += 1
+            if self.transition_overhead:
+                time.sleep(self.transition_overhead)
+            timing = StateTiming(state_name, 0.0)
+            result.states.append(timing)
+
+            state_type = state['Type']
+            effective = read_path(state.get('InputPath', '$'), data, context)
+            next_state = state.get('Next')
+
+            try:
+                if state_type == 'Task':
+                    output = self.run_with_retry(state, effective, context, result, timing)
+                    if 'ResultSelector' in state:
+                        output = resolve(state['ResultSelector'], output, context)
+                    data = write_path(state.get('ResultPath', '$'), data, output)
+                elif state_type == 'Pass':
+                    output = resolve(state['Parameters'], effective, context) if 'Parameters' in state else state.get('Result', effective)
+                    data = write_path(state.get('ResultPath', '$'), data, output)
+                elif state_type == 'Wait':
+                    time.sleep(state.get('Seconds', 0) * self.retry_scale)
+                    data = effective
+                elif state_type == 'Choice':
+                    next_state = next(
+                        (rule['Next'] for rule in state['Choices'] if matches(rule, effective, context)),
+                        state.get('Default')
+                    )
+                    if next_state is None:
+                        raise StatesError('States.NoChoiceMatched', state_name)
+                    data = effective
+                elif state_type == 'Succeed':
+                    data = effective
+                elif state_type == 'Fail':
+                    timing.seconds = time.perf_counter() - state_started
+                    result.status, result.error, result.cause = 'FAILED', state.get('Error'), state.get('Cause')
+                    break
+                else:
+                    raise StatesError('States.Runtime', f'Unsupported state type {state_type}')
+
+                if 'OutputPath' in state and state_type != 'Fail':
+                    data = read_path(state['OutputPath'], data, context)
+            except StatesError as e:
+                catcher = next(
+                    (c for c in state.get('Catch', []) if error_matches(c['ErrorEquals'], e.error)),
+                    None
+                )
+                timing.seconds = time.perf_counter() - state_started
+                if catcher is None:
+                    result.status, result.error, result.cause = 'FAILED', e.error, e.cause
+                    break
+                data = write_path(catcher.get('ResultPath', '$'), data, {'Error': e.error, 'Cause': e.cause})
+                state_name = catcher['Next']
+                continue
+
+            timing.seconds = time.perf_counter() - state_started
+            if state_type == 'Succeed' or state.get('End'):
+                result.status = 'SUCCEEDED'
+                break
+            state_name = next_state
+
+        result.output = data
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def run_with_retry(self, state: Dict[str, Any], data: Any, context: Dict[str, Any],
+                       result: ExecutionResult, timing: StateTiming) -> Any:
+        attempts: Dict[int, int] = {}
+        while True:
+            try:
+                return self.run_task(state, data, context, result)
+            except StatesError as e:
+                for index, retrier in enumerate(state.get('Retry', [])):
+                    if error_matches(retrier['ErrorEquals'], e.error):
+                        count = attempts.get(index, 0)
+                        if count >= retrier.get('MaxAttempts', 3):
+                            raise
+                        attempts[index] = count + 1
+                        timing.retries += 1
+                        result.transitions += 1
+                        delay = retrier.get('IntervalSeconds', 1) * retrier.get('BackoffRate', 2.0) ** count
+                        time.sleep(delay * self.retry_scale)
+                        break
+                else:
+                    raise
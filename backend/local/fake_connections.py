@@ -0,0 +1,55 @@
+"""
+In-process stand-in for the API Gateway WebSocket management API
+
+Drop-in for the ``apigatewaymanagementapi`` client project_orders.py posts
+status pushes to. Connections are opened with ``connect()``; every message
+posted to an open connection lands in its ``inbox``, and posting to a closed
+or unknown connection raises ``GoneException`` the way API Gateway does, so
+the handler's cleanup path runs against the connection store in moto.
+
+Usage:
+    from fake_connections import FakeConnections
+    project_orders.connections_api = FakeConnections(call_latency_ms=5)
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from botocore.exceptions import ClientError
+
+
+class _Exceptions:
+    class GoneException(ClientError):
+        pass
+
+
+class FakeConnections:
+    exceptions = _Exceptions
+
+    def __init__(self, call_latency_ms: float = 0):
+        self.call_latency_ms = call_latency_ms
+        self.inbox: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.open = set()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def connect(self, connection_id: str) -> None:
+        with self._lock:
+            self.open.add(connection_id)
+
+    def disconnect(self, connection_id: str) -> None:
+        with self._lock:
+            self.open.discard(connection_id)
+
+    def post_to_connection(self, ConnectionId: str, Data: bytes) -> Dict[str, Any]:
+        if self.call_latency_ms:
+            time.sleep(self.call_latency_ms / 1000)
+        with self._lock:
+            self.calls += 1
+            if ConnectionId not in self.open:
+                raise _Exceptions.GoneException(
+                    {'Error': {'Code': 'GoneException', 'Message': f'{ConnectionId} is gone'}}, 'PostToConnection')
+            self.inbox[ConnectionId].append(json.loads(Data))
+        return {}
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Fake Stripe-compatible payment gateway for local testing of payment_client.py
+
+Implements the PaymentIntents calls the client makes (create+confirm with
+idempotency keys, list with ``created[gte]``/``starting_after``, retrieve)
+with injectable latency, error rate, per-connection handshake cost and
+brownout windows.
+
+Payment methods ``pm_card_chargeDeclined`` and
+``pm_card_visa_chargeDeclinedInsufficientFunds`` are declined,
+``pm_card_threeDSecure2Required`` returns ``requires_action``.
+
+Usage:
+    python backend/local/fake_gateway.py --port 12111 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+    PAYMENT_MODE=gateway PAYMENT_GATEWAY_URL=http://127.0.0.1:12111 STRIPE_SECRET_KEY=sk_test_local ...
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlparse
+
+DECLINES = {
+    'pm_card_chargeDeclined': ('card_declined', 'generic_decline', 'Your card was declined.'),
+    'pm_card_visa_chargeDeclinedInsufficientFunds': ('card_declined', 'insufficient_funds', 'Your card has insufficient funds.')
+}
+
+
+class GatewayState:
+    """Intents, idempotency cache and fault settings shared by request threads."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 handshake_ms: float = 0, seed: int = 7):
+        self.latency_ms = latency_ms
+        self.handshake_ms = handshake_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.brownout_until = 0.0
+        self.brownout_latency_ms = 0.0
+        self.intents: Dict[str, Dict[str, Any]] = {}
+        self.idempotency: Dict[str, Dict[str, Any]] = {}
+        self.connections = set()
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+
+    def brownout(self, seconds: float, latency_ms: float) -> None:
+        """Slow every request down to ``latency_ms`` for the next ``seconds``."""
+        self.brownout_until = time.monotonic() + seconds
+        self.brownout_latency_ms = latency_ms
+
+    def delay(self) -> float:
+        if time.monotonic() < self.brownout_until:
+            return self.brownout_latency_ms / 1000
+        return max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: GatewayState = None
+
+    def setup(self):
+        super().setup()
+        # Stands in for the TCP+TLS setup a real gateway connection costs
+        time.sleep(self.state.handshake_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any]) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def before(self) -> bool:
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            state.connections.add(self.client_address)
+            fail = state.rng.random() < state.error_rate
+        time.sleep(state.delay())
+        if fail:
+            self.send_json(503, {'error': {'type': 'api_error', 'message': 'Injected failure'}})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode()))
+        if not self.before():
+            return
+        if urlparse(self.path).path != '/v1/payment_intents':
+            return self.send_json(404, {'error': {'message': 'Not found'}})
+
+        key = self.headers.get('Idempotency-Key')
+        with self.state.lock:
+            if key and key in self.state.idempotency:
+                cached = self.state.idempotency[key]
+                return self.send_json(cached['status'], cached['body'])
+
+        status, body = self.create_intent(form)
+        with self.state.lock:
+            if key:
+                self.state.idempotency[key] = {'status': status, 'body': body}
+        self.send_json(status, body)
+
+    def create_intent(self, form: Dict[str, str]):
+        intent_id = f'pi_{uuid.uuid4().hex[:24]}'
+        method = form.get('payment_method', '')
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': int(form.get('amount', 0)),
+            'currency': form.get('currency', 'usd'),
+            'created': int(time.time()),
+            'metadata': {k[9:-1]: v for k, v in form.items() if k.startswith('metadata[')},
+            'client_secret': f'{intent_id}_secret_local'
+        }
+        if method in DECLINES:
+            code, decline_code, message = DECLINES[method]
+            intent['status'] = 'requires_payment_method'
+            self.store(intent)
+            return 402, {'error': {'type': 'card_error', 'code': code, 'decline_code': decline_code,
+                                   'message': message, 'payment_intent': intent}}
+        intent['status'] = 'requires_action' if method == 'pm_card_threeDSecure2Required' else 'succeeded'
+        self.store(intent)
+        return 200, intent
+
+    def store(self, intent: Dict[str, Any]) -> None:
+        with self.state.lock:
+            self.state.intents[intent['id']] = intent
+
+    def do_GET(self):
+        if not self.before():
+            return
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == '/v1/payment_intents':
+            return self.send_json(200, self.list_intents(params))
+        if url.path.startswith('/v1/payment_intents/'):
+            intent = self.state.intents.get(url.path.rsplit('/', 1)[-1])
+            if intent:
+                return self.send_json(200, intent)
+        self.send_json(404, {'error': {'message': 'Not found'}})
+
+    def list_intents(self, params: Dict[str, str]) -> Dict[str, Any]:
+        with self.state.lock:
+            intents = sorted(self.state.intents.values(), key=lambda i: (i['created'], i['id']), reverse=True)
+        created_gte = int(params.get('created[gte]', 0))
+        intents = [i for i in intents if i['created'] >= created_gte]
+        if params.get('starting_after'):
+            ids = [i['id'] for i in intents]
+            start = ids.index(params['starting_after']) + 1 if params['starting_after'] in ids else len(ids)
+            intents = intents[start:]
+        limit = min(int(params.get('limit', 10)), 100)
+        return {'object': 'list', 'data': intents[:limit], 'has_more': len(intents) > limit}
+
+
+class GatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up (timeouts) close the socket before the reply
+        pass
+
+
+class FakeGateway:
+    """Run the fake gateway on a background thread; use as a context manager."""
+
+    def __init__(self, port: int = 0, **faults):
+        self.state = GatewayState(**faults)
+        handler = type('Handler', (GatewayHandler,), {'state': self.state})
+        self.server = GatewayServer(('127.0.0.1', port), handler)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self) -> 'FakeGateway':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--handshake-ms', type=float, default=0, help='delay per new connection (TLS setup)')
+    args = parser.parse_args()
+
+    gateway = FakeGateway(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, handshake_ms=args.handshake_ms)
+    print(f'Fake payment gateway listening on {gateway.url}')
+    try:
+        gateway.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
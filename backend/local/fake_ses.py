@@ -0,0 +1,124 @@
+"""
+In-process SES stand-in for testing the notification pipeline locally
+
+Drop-in for the ``boto3.client('ses')`` calls send_notifications.py makes
+(templates, send quota, SendEmail, SendBulkTemplatedEmail). It renders the
+templates (``{{var}}`` and ``{{#each list}}...{{/each}}``), keeps every
+delivered message in ``outbox``, enforces ``max_send_rate`` over a sliding
+one-second window the way SES does (the whole call fails with
+``Throttling``) and can add per-call latency.
+
+Usage:
+    from fake_ses import FakeSES
+    send_notifications.ses = FakeSES(max_send_rate=14, call_latency_ms=30)
+"""
+import json
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from botocore.exceptions import ClientError
+
+EACH = re.compile(r'{{#each (\w+)}}(.*?){{/each}}', re.S)
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def render(template: str, data: Dict[str, Any]) -> str:
+    """Render the Handlebars subset used by the SES templates in this repo."""
+    def each(match):
+        return ''.join(render(match.group(2), {**data, **item}) for item in data.get(match.group(1), []))
+
+    def variable(match):
+        if match.group(1) not in data:
+            raise KeyError(match.group(1))
+        return str(data[match.group(1)])
+
+    return VARIABLE.sub(variable, EACH.sub(each, template))
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class FakeSES:
+    def __init__(self, max_send_rate: float = 14, max_24_hour_send: int = 50000,
+                 call_latency_ms: float = 0, rejected: tuple = ()):
+        self.max_send_rate = max_send_rate
+        self.max_24_hour_send = max_24_hour_send
+        self.call_latency_ms = call_latency_ms
+        self.rejected = set(rejected)
+        self.templates: Dict[str, Dict[str, str]] = {}
+        self.outbox: List[Dict[str, str]] = []
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    def _call(self, operation: str) -> None:
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        time.sleep(self.call_latency_ms / 1000)
+
+    def _charge_rate(self, count: int, operation: str) -> None:
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 1:
+                self.window.popleft()
+            if len(self.window) + count > self.max_send_rate:
+                self.throttled += 1
+                raise _error('Throttling', 'Maximum sending rate exceeded.', operation)
+            self.window.extend([now] * count)
+
+    def get_send_quota(self) -> Dict[str, float]:
+        self._call('GetSendQuota')
+        return {'Max24HourSend': float(self.max_24_hour_send), 'MaxSendRate': float(self.max_send_rate),
+                'SentLast24Hours': float(len(self.outbox))}
+
+    def get_template(self, TemplateName: str) -> Dict[str, Any]:
+        self._call('GetTemplate')
+        if TemplateName not in self.templates:
+            raise _error('TemplateDoesNotExist', f'Template {TemplateName} does not exist', 'GetTemplate')
+        return {'Template': dict(self.templates[TemplateName])}
+
+    def create_template(self, Template: Dict[str, str]) -> Dict[str, Any]:
+        self._call('CreateTemplate')
+        self.templates[Template['TemplateName']] = dict(Template)
+        return {}
+
+    def update_template(self, Template: Dict[str, str]) -> Dict[str, Any]:
+        self._call('UpdateTemplate')
+        self.templates[Template['TemplateName']] = dict(Template)
+        return {}
+
+    def send_email(self, Source: str, Destination: Dict[str, List[str]], Message: Dict[str, Any], **kwargs) -> Dict[str, str]:
+        self._call('SendEmail')
+        self._charge_rate(len(Destination['ToAddresses']), 'SendEmail')
+        for address in Destination['ToAddresses']:
+            self.outbox.append({'to': address, 'subject': Message['Subject']['Data'],
+                                'text': Message['Body'].get('Text', {}).get('Data', '')})
+        return {'MessageId': f'local-{len(self.outbox)}'}
+
+    def send_bulk_templated_email(self, Source: str, Template: str, DefaultTemplateData: str,
+                                  Destinations: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        self._call('SendBulkTemplatedEmail')
+        if Template not in self.templates:
+            raise _error('TemplateDoesNotExist', f'Template {Template} does not exist', 'SendBulkTemplatedEmail')
+        if len(Destinations) > 50:
+            raise _error('InvalidParameterValue', 'At most 50 destinations per call', 'SendBulkTemplatedEmail')
+        self._charge_rate(len(Destinations), 'SendBulkTemplatedEmail')
+
+        template = self.templates[Template]
+        defaults = json.loads(DefaultTemplateData)
+        statuses = []
+        for destination in Destinations:
+            address = destination['Destination']['ToAddresses'][0]
+            if address in self.rejected:
+                statuses.append({'Status': 'MessageRejected', 'Error': 'Email address is on the suppression list'})
+                continue
+            data = {**defaults, **json.loads(destination.get('ReplacementTemplateData', '{}'))}
+            self.outbox.append({'to': address, 'subject': render(template['SubjectPart'], data),
+                                'text': render(template['TextPart'], data)})
+            statuses.append({'Status': 'Success', 'MessageId': f'local-{len(self.outbox)}'})
+        return {'Status': statuses}
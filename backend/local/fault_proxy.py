@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Fault-injecting HTTP proxy for AWS JSON-protocol endpoints (DynamoDB)
+
+Sits in front of a local endpoint (moto server) and forwards requests
+unchanged, except that it can:
+
+- throttle like a hot partition: requests beyond ``capacity`` per second
+  (sliding window) get ``ProvisionedThroughputExceededException``, and a
+  further ``throttle_rate`` fraction is throttled at random
+- stall a ``stall_rate`` fraction of requests for ``stall_seconds`` before
+  answering (a slow storage node)
+- charge ``handshake_ms`` per new connection (TLS setup)
+
+and counts requests, throttles, stalls and connections.
+
+Usage:
+    python backend/local/fault_proxy.py --upstream http://127.0.0.1:5000 --capacity 300 --stall-rate 0.01
+    AWS_ENDPOINT_URL_DYNAMODB=http://127.0.0.1:12112 ...
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse
+
+THROTTLE_BODY = json.dumps({
+    '__type': 'com.amazonaws.dynamodb.v20120810#ProvisionedThroughputExceededException',
+    'message': 'The level of configured provisioned throughput for the table was exceeded.'
+}).encode()
+
+
+class ProxyState:
+    """Fault settings and counters shared by request threads."""
+
+    def __init__(self, upstream: str, capacity: float = 0, throttle_rate: float = 0, stall_rate: float = 0,
+                 stall_seconds: float = 0, handshake_ms: float = 0, seed: int = 7):
+        url = urlparse(upstream)
+        self.upstream = (url.hostname, url.port or 80)
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.handshake_ms = handshake_ms
+        self.window = deque()
+        self.counts = {'requests': 0, 'throttled': 0, 'stalled': 0, 'connections': 0}
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.local = threading.local()
+
+    def admit(self) -> str:
+        """'throttle', 'stall' or 'forward' for the next request."""
+        with self.lock:
+            self.counts['requests'] += 1
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 1:
+                self.window.popleft()
+            if (self.capacity and len(self.window) >= self.capacity) or self.rng.random() < self.throttle_rate:
+                self.counts['throttled'] += 1
+                return 'throttle'
+            self.window.append(now)
+            if self.rng.random() < self.stall_rate:
+                self.counts['stalled'] += 1
+                return 'stall'
+            return 'forward'
+
+    def upstream_connection(self) -> http.client.HTTPConnection:
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(*self.upstream, timeout=30)
+        return self.local.connection
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counts = dict.fromkeys(self.counts, 0)
+            self.window.clear()
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: ProxyState = None
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.counts['connections'] += 1
+        time.sleep(self.state.handshake_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, headers, body: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers:
+            if name.lower() not in ('content-length', 'connection', 'transfer-encoding', 'server', 'date'):
+                self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        decision = self.state.admit()
+        if decision == 'throttle':
+            return self.reply(400, [('Content-Type', 'application/x-amz-json-1.0'),
+                                    ('x-amzn-ErrorType', 'ProvisionedThroughputExceededException')], THROTTLE_BODY)
+        if decision == 'stall':
+            time.sleep(self.state.stall_seconds)
+
+        connection = self.state.upstream_connection()
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ('host', 'connection')}
+        try:
+            connection.request('POST', self.path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self.state.local.connection = None
+            raise
+        self.reply(response.status, response.getheaders(), payload)
+
+
+class ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out close the socket before the reply
+        pass
+
+
+class FaultProxy:
+    """Run the proxy on a background thread; use as a context manager."""
+
+    def __init__(self, upstream: str, port: int = 0, **faults):
+        self.state = ProxyState(upstream, **faults)
+        handler = type('Handler', (ProxyHandler,), {'state': self.state})
+        self.server = ProxyServer(('127.0.0.1', port), handler)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self) -> 'FaultProxy':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--upstream', required=True, help='endpoint to forward to, e.g. a moto server')
+    parser.add_argument('--port', type=int, default=12112)
+    parser.add_argument('--capacity', type=float, default=0, help='requests/s before throttling (0: unlimited)')
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--stall-rate', type=float, default=0)
+    parser.add_argument('--stall-seconds', type=float, default=10)
+    parser.add_argument('--handshake-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    proxy = FaultProxy(args.upstream, args.port, capacity=args.capacity, throttle_rate=args.throttle_rate,
+                       stall_rate=args.stall_rate, stall_seconds=args.stall_seconds, handshake_ms=args.handshake_ms)
+    print(f'Fault proxy listening on {proxy.url}, forwarding to {args.upstream}')
+    try:
+        proxy.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Aggregate handler profiles (profiling.py) into a flame graph
+
+``flamegraph`` reads the gzipped JSON profiles from local files or
+directories, or from the profile bucket, merges their cProfile stats and
+writes:
+
+- ``<out>.folded``: collapsed stacks (``a;b;c <microseconds>``) for
+  flamegraph.pl, speedscope or inferno;
+- ``<out>.svg``: a self-contained flame graph (hover for times).
+
+cProfile records caller/callee edges rather than whole stacks, so each
+function's time is split over its callers in proportion to the time each
+call edge accounted for (as gprof2dot and flameprof do).
+
+It also prints the mean parse / AWS / serialize / compute breakdown, the
+mean peak memory and the functions with the most self time.
+
+``token`` mints an ``X-Debug-Profile`` header value for a deployed stack.
+
+Usage:
+    python backend/local/profiles.py flamegraph /tmp/profiles --out get-products
+    python backend/local/profiles.py flamegraph --bucket prod-ecommerce-profiles-123 --prefix profiles/prod-ecommerce-get-products/
+    python backend/local/profiles.py token --secret "$PROFILING_SECRET" --minutes 30
+"""
+import argparse
+import gzip
+import html
+import json
+import os
+import sys
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common'))
+
+MAX_DEPTH = 80
+# Call paths carrying less than this share of the total are dropped
+MIN_SHARE = 1e-4
+
+Key = Tuple[str, int, str]
+
+
+def load_local(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        names = ([os.path.join(root, name) for root, _, files in os.walk(path) for name in files]
+                 if os.path.isdir(path) else [path])
+        for name in sorted(names):
+            if name.endswith('.json.gz'):
+                with gzip.open(name, 'rt') as f:
+                    yield json.load(f)
+
+
+def load_bucket(bucket: str, prefix: str) -> Iterator[Dict[str, Any]]:
+    import boto3
+
+    s3 = boto3.client('s3')
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        for entry in page.get('Contents', []):
+            body = s3.get_object(Bucket=bucket, Key=entry['Key'])['Body'].read()
+            yield json.loads(gzip.decompress(body))
+
+
+class MergedStats:
+    """cProfile rows from many profiles, summed per function and per call edge."""
+
+    def __init__(self):
+        self.functions: Dict[Key, List[float]] = defaultdict(lambda: [0, 0, 0.0, 0.0])
+        self.callers: Dict[Key, Dict[Key, float]] = defaultdict(lambda: defaultdict(float))
+
+    def add(self, rows: List[list]) -> None:
+        for file, line, func, nc, cc, tt, ct, callers in rows:
+            totals = self.functions[(file, line, func)]
+            totals[0] += nc
+            totals[1] += cc
+            totals[2] += tt
+            totals[3] += ct
+            for caller_file, caller_line, caller_func, _, _, _, edge_ct in callers:
+                self.callers[(file, line, func)][(caller_file, caller_line, caller_func)] += edge_ct
+
+    def callees(self) -> Dict[Key, Dict[Key, float]]:
+        graph: Dict[Key, Dict[Key, float]] = defaultdict(dict)
+        for callee, callers in self.callers.items():
+            for caller, edge_ct in callers.items():
+                graph[caller][callee] = edge_ct
+        return graph
+
+    def folded(self) -> Dict[str, float]:
+        """Collapsed stacks, in seconds, by spreading each function's time over its call edges."""
+        graph = self.callees()
+        roots = [key for key in self.functions if not self.callers.get(key)]
+        total = sum(self.functions[key][3] for key in roots) or 1.0
+        stacks: Dict[str, float] = defaultdict(float)
+
+        def walk(key: Key, share: float, path: Tuple[Key, ...]) -> None:
+            cumulative = self.functions[key][3]
+            if cumulative <= 0 or share / total < MIN_SHARE:
+                return
+            scale = min(1.0, share / cumulative)
+            stack = path + (key,)
+            stacks[';'.join(label(k) for k in stack)] += self.functions[key][2] * scale
+            if len(stack) >= MAX_DEPTH:
+                return
+            for callee, edge_ct in graph.get(key, {}).items():
+                if callee not in stack:
+                    walk(callee, edge_ct * scale, stack)
+
+        for root in roots:
+            walk(root, self.functions[root][3], ())
+        return stacks
+
+
+def label(key: Key) -> str:
+    file, line, func = key
+    if file == '~':
+        return func
+    return f'{os.path.basename(file)}:{func}'
+
+
+def render_svg(stacks: Dict[str, float], title: str, width: int = 1200, row: int = 17) -> str:
+    tree: Dict[str, Any] = {'name': 'all', 'value': 0.0, 'children': {}}
+    for stack, seconds in stacks.items():
+        node = tree
+        node['value'] += seconds
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'name': frame, 'value': 0.0, 'children': {}})
+            node['value'] += seconds
+
+    rects = []
+    total = tree['value'] or 1.0
+
+    def depth_of(node: Dict[str, Any]) -> int:
+        return 1 + max((depth_of(child) for child in node['children'].values()), default=0)
+
+    height = (depth_of(tree) + 2) * row
+
+    def place(node: Dict[str, Any], x: float, depth: int) -> None:
+        w = node['value'] / total * width
+        if w < 0.3:
+            return
+        y = height - (depth + 1) * row
+        hue = zlib.crc32(node['name'].encode()) % 60
+        name = html.escape(node['name'])
+        tip = f'{name} ({node["value"] * 1000:.1f} ms, {node["value"] / total:.1%})'
+        text = name if w > 7 * len(node['name']) else name[:int(w // 7) - 2] + '..' if w > 35 else ''
+        rects.append(f'<g><title>{tip}</title><rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" '
+                     f'fill="hsl({hue},85%,60%)" rx="2"/><text x="{x + 3:.1f}" y="{y + row - 5}">{text}</text></g>')
+        offset = x
+        for child in sorted(node['children'].values(), key=lambda c: c['name']):
+            place(child, offset, depth + 1)
+            offset += child['value'] / total * width
+
+    place(tree, 0.0, 0)
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'font-family="monospace" font-size="11">'
+            f'<text x="4" y="13" font-size="13">{html.escape(title)}</text>{"".join(rects)}</svg>\n')
+
+
+def flamegraph(args: argparse.Namespace) -> None:
+    profiles = load_bucket(args.bucket, args.prefix) if args.bucket else load_local(args.paths)
+    merged = MergedStats()
+    count = 0
+    wall = 0.0
+    peak = 0
+    phases: Dict[str, float] = defaultdict(float)
+    for profile in profiles:
+        if args.function and profile['function'] != args.function:
+            continue
+        count += 1
+        merged.add(profile['stats'])
+        wall += profile['wallMs']
+        peak += profile['memory']['peakBytes']
+        for name, entry in profile['phases'].items():
+            phases[name] += entry['ms']
+        for service, entry in profile['aws'].items():
+            phases[f'{service} (handler thread)'] += entry['handlerThreadMs']
+    if not count:
+        sys.exit('No profiles found')
+
+    stacks = merged.folded()
+    with open(f'{args.out}.folded', 'w') as f:
+        for stack, seconds in sorted(stacks.items()):
+            if seconds * 1e6 >= 1:
+                f.write(f'{stack} {round(seconds * 1e6)}\n')
+    with open(f'{args.out}.svg', 'w') as f:
+        f.write(render_svg(stacks, f'{count} profiles, mean {wall / count:.1f} ms'))
+
+    print(f'{count} profiles, mean wall {wall / count:.1f} ms, mean peak memory {peak / count / 1024:.0f} KiB')
+    for name, ms in sorted(phases.items(), key=lambda item: -item[1]):
+        print(f'  {name:<32} {ms / count:>9.2f} ms  {ms / wall:>6.1%}')
+    print('\n  most self time (all profiles)')
+    top = sorted(merged.functions.items(), key=lambda item: -item[1][2])[:args.top]
+    for key, (nc, _, tt, ct) in top:
+        print(f'  {label(key)[:60]:<60} {tt * 1000 / count:>9.2f} ms self  {ct * 1000 / count:>9.2f} ms total '
+              f'{nc / count:>8.1f} calls')
+    print(f'\nWrote {args.out}.svg and {args.out}.folded')
+
+
+def token(args: argparse.Namespace) -> None:
+    from profiling import issue_debug_token
+
+    print(f'X-Debug-Profile: {issue_debug_token(args.secret, args.minutes * 60)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    graph = commands.add_parser('flamegraph', help='merge profiles into a flame graph')
+    graph.add_argument('paths', nargs='*', default=['/tmp/profiles'], help='profile files or directories')
+    graph.add_argument('--bucket', help='read profiles from this bucket instead')
+    graph.add_argument('--prefix', default='profiles/')
+    graph.add_argument('--function', help='only profiles of this function name')
+    graph.add_argument('--out', default='profile', help='output path without extension')
+    graph.add_argument('--top', type=int, default=15)
+    graph.set_defaults(run=flamegraph)
+
+    mint = commands.add_parser('token', help='mint an X-Debug-Profile header value')
+    mint.add_argument('--secret', required=True, help='the stack\'s PROFILING_SECRET')
+    mint.add_argument('--minutes', type=int, default=60)
+    mint.set_defaults(run=token)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+In-process stand-in for the deployed stack
+
+Starts moto's AWS mock, creates the DynamoDB tables with the key schema from
+template.yaml and imports handler modules against them, so local tools
+(asl_runner, benchmarks) exercise the real handler code. Requires the
+packages in backend/requirements-dev.txt.
+"""
+import importlib
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List
+
+HANDLERS_DIR = os.path.join(os.path.dirname(__file__), '..', 'src', 'handlers')
+# Lambda layers mount their modules on the import path of every function that uses them
+LAYER_DIRS = [os.path.join(os.path.dirname(__file__), '..', 'src', 'layers', 'common')]
+
+TABLES = {
+    'PRODUCTS_TABLE': 'local-ecommerce-products',
+    'USERS_TABLE': 'local-ecommerce-users',
+    'CARTS_TABLE': 'local-ecommerce-carts',
+    'ORDERS_TABLE': 'local-ecommerce-orders',
+    'READ_MODELS_TABLE': 'local-ecommerce-read-models'
+}
+# Global secondary indexes from template.yaml as (name, hash key, range key)
+INDEXES = {
+    'PRODUCTS_TABLE': [('CategoryIndex', 'GSI1PK', 'GSI1SK'), ('StatusIndex', 'GSI2PK', 'GSI2SK')],
+    'ORDERS_TABLE': [('OrderStatusIndex', 'GSI1PK', 'GSI1SK'), ('OrderDateIndex', 'GSI2PK', 'GSI2SK')]
+}
+
+
+@dataclass
+class LocalStack:
+    dynamodb: object
+    client: object
+    api_calls: Dict[str, int] = field(default_factory=dict)
+
+    def table(self, env_name: str):
+        return self.dynamodb.Table(TABLES[env_name])
+
+    def handler(self, domain: str, module: str) -> Callable:
+        """Import ``backend/src/handlers/<domain>/<module>.py`` and return its handler."""
+        paths = [os.path.abspath(layer) for layer in LAYER_DIRS]
+        paths.append(os.path.abspath(os.path.join(HANDLERS_DIR, domain)))
+        for path in paths:
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        return importlib.import_module(module).handler
+
+    def reset_counters(self) -> None:
+        self.api_calls.clear()
+
+    def dynamodb_calls(self) -> int:
+        return sum(self.api_calls.values())
+
+
+def _create_table(client, name: str, indexes=()) -> None:
+    attributes = ['PK', 'SK'] + [key for _, hash_key, range_key in indexes for key in (hash_key, range_key)]
+    params = {
+        'TableName': name,
+        'BillingMode': 'PAY_PER_REQUEST',
+        'AttributeDefinitions': [{'AttributeName': attr, 'AttributeType': 'S'} for attr in attributes],
+        'KeySchema': [
+            {'AttributeName': 'PK', 'KeyType': 'HASH'},
+            {'AttributeName': 'SK', 'KeyType': 'RANGE'}
+        ]
+    }
+    if indexes:
+        params['GlobalSecondaryIndexes'] = [{
+            'IndexName': index_name,
+            'KeySchema': [{'AttributeName': hash_key, 'KeyType': 'HASH'},
+                          {'AttributeName': range_key, 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        } for index_name, hash_key, range_key in indexes]
+    client.create_table(**params)
+
+
+def _serialize_dynamodb() -> None:
+    """Run moto's DynamoDB requests one at a time.
+
+    Handlers write from thread pools. moto's in-process backend is not
+    thread-safe: a transaction deep-copies tables while other threads write
+    to them. DynamoDB itself needs no such lock.
+    """
+    from moto.dynamodb.responses import DynamoHandler
+
+    if getattr(DynamoHandler, '_serialized', False):
+        return
+    lock = threading.RLock()
+    call_action = DynamoHandler.call_action
+
+    def locked(self, *args, **kwargs):
+        with lock:
+            return call_action(self, *args, **kwargs)
+
+    DynamoHandler.call_action = locked
+    DynamoHandler._serialized = True
+
+
+@contextmanager
+def local_stack(tables: List[str] = None) -> Iterator[LocalStack]:
+    """Mocked AWS with the application's tables; handlers must be imported inside."""
+    import boto3
+    from moto import mock_aws
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    os.environ.setdefault('POWERTOOLS_TRACE_DISABLED', 'true')
+    os.environ.setdefault('POWERTOOLS_METRICS_NAMESPACE', 'Ecommerce')
+    os.environ.setdefault('POWERTOOLS_SERVICE_NAME', 'ecommerce-local')
+    os.environ.setdefault('POWERTOOLS_LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('POWERTOOLS_METRICS_DISABLED', 'true')
+    os.environ.update(TABLES)
+
+    _serialize_dynamodb()
+    with mock_aws():
+        boto3.setup_default_session()
+        api_calls: Dict[str, int] = {}
+
+        def count(event_name: str, **kwargs) -> None:
+            operation = event_name.rsplit('.', 1)[-1]
+            api_calls[operation] = api_calls.get(operation, 0) + 1
+
+        # Registered before any client exists so every client inherits it
+        boto3.DEFAULT_SESSION.events.register('before-call.dynamodb', count)
+        stack = LocalStack(dynamodb=boto3.resource('dynamodb'), client=boto3.client('dynamodb'), api_calls=api_calls)
+        for env_name in tables or TABLES:
+            _create_table(stack.client, TABLES[env_name], INDEXES.get(env_name, ()))
+        stack.reset_counters()
+        yield stack
@@ -1,22 +1,49 @@
 """
 Add to Cart Lambda Handler
 POST /cart - Add item to shopping cart
+
+The product is read from the catalog snapshot when CATALOG_BUCKET is set
+(catalog_snapshot.py), falling back to ProductsTable with a read that is
+hedged when HEDGED_READS is on (hedged_reads.py). Callers over their
+``cart:add`` rate limit (rate_limits.py) get a 429 before anything else.
+
+Guests sending an X-Guest-Cart token (signed_cart.py) have their cart
+rebuilt from it, with the new product fetched in the same BatchGetItem as
+the cart's lines, and get the updated token back instead of a CartsTable
+write until the cart outgrows it.
 """
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Optional
 from decimal import Decimal
-from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import catalog_snapshot
+import cognito_auth
+import hedged_reads
+import profiling
+import rate_limits
+import signed_cart
+from guest_session import cart_expires_at, resolve_cart_owner, session_headers
+from cart_store import CartConflict, conflict_response, product_ids, save_cart, version_condition
+from pricing import price_cart
+from request_models import AddCartItemRequest, RequestError, parse_body
 
 logger = Logger()
 tracer = Tracer()
+metrics = Metrics()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
 products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
+# None unless RATE_LIMITING is on
+limiter = rate_limits.from_environment(dynamodb)
 
 
 def decimal_to_float(obj):
@@ -30,44 +57,61 @@ def decimal_to_float(obj):
     return obj
 
 
+def load_product(product_id: str) -> Optional[Dict[str, Any]]:
+    """The active product, from the catalog snapshot if it has it."""
+    if catalog and catalog.refresh():
+        product = catalog.product(product_id)
+        if product:
+            return product
+    response = hedged_reads.get_item(products_table, Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'})
+    product = response.get('Item')
+    return product if product and product.get('status', 'active') == 'active' else None
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
-        # Get user_id from JWT claims or use guest session
-        user_id = None
+        limited = limiter.check('cart:add', event) if limiter else None
+        if limited:
+            return limited
+
         try:
-            user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
-        except (KeyError, TypeError):
-            # No authentication - use guest cart with session ID from headers or generate one
-            import uuid
-            user_id = f"guest-{uuid.uuid4().hex[:12]}"
-        
-        body = json.loads(event.get('body', '{}'))
-        
-        product_id = body.get('productId')
-        quantity = int(body.get('quantity', 1))
-        
-        if not product_id or quantity < 1:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({
-                    'error': 'INVALID_REQUEST',
-                    'message': 'Valid productId and quantity required'
-                })
-            }
-        
-        # Get product details - use correct PK/SK format
-        product_response = products_table.get_item(
-            Key={
-                'PK': f'PRODUCT#{product_id}',
-                'SK': f'PRODUCT#{product_id}'
-            }
-        )
+            request = parse_body(AddCartItemRequest, event)
+        except RequestError as e:
+            return e.response()
+        product_id = request['productId']
+        quantity = request.get('quantity', 1)
         
-        if 'Item' not in product_response:
+        # Get user_id from JWT claims or the signed guest session (issued on first add)
+        try:
+            owner = resolve_cart_owner(event, create=True)
+        except cognito_auth.InvalidToken:
+            return cognito_auth.unauthorized()
+        user_id = owner.user_id
+        if owner.is_guest:
+            metrics.add_metric(
+                name='GuestSessionCreated' if owner.new_session else 'GuestSessionReused',
+                unit=MetricUnit.Count,
+                value=1
+            )
+        
+        # A guest's cart token replaces the CartsTable read; its lines are re-priced with the new product
+        lines = signed_cart.verify_token(signed_cart.get_token(event), owner)
+        if lines is not None:
+            products = signed_cart.load_products(dynamodb, products_table, catalog,
+                                                 list(dict.fromkeys([line[0] for line in lines] + [product_id])))
+            product = products.get(product_id)
+            if product and product.get('status', 'active') != 'active':
+                product = None
+        else:
+            product = load_product(product_id)
+        if not product:
             return {
                 'statusCode': 404,
                 'body': json.dumps({
@@ -76,10 +120,8 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
                 })
             }
         
-        product = product_response['Item']
-        
         # Check inventory
-        stock = int(product.get('stock', 0))
+        stock = int(product.get('inventory', product.get('stock', 0)))
         if stock < quantity:
             return {
                 'statusCode': 400,
@@ -89,20 +131,32 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
                 })
             }
         
-        # Get current cart
-        cart_response = carts_table.get_item(
-            Key={
-                'PK': f'USER#{user_id}',
-                'SK': 'CART'
-            }
-        )
-        
-        cart = cart_response.get('Item', {
+        # Get current cart: from the guest's token, else CartsTable (a session issued just now has none)
+        cart = None
+        if lines is not None:
+            cart = signed_cart.cart_from_lines(owner, lines, products)
+        elif not owner.new_session:
+            cart_response = carts_table.get_item(
+                Key={
+                    'PK': f'USER#{user_id}',
+                    'SK': 'CART'
+                },
+                ConsistentRead=True
+            )
+            cart = cart_response.get('Item')
+        # The write only succeeds if the cart is still as read here
+        condition = version_condition(cart)
+        # Guest carts not yet in CartsTable go back to the client as a token while they fit
+        stored = not owner.is_guest or (lines is None and cart is not None)
+        cart = cart or {
             'PK': f'USER#{user_id}',
             'SK': 'CART',
             'userId': user_id,
             'items': []
-        })
+        }
+        if owner.is_guest:
+            cart['isGuest'] = True
+        previous_ids = product_ids(cart)
         
         # Update or add item
         items = cart.get('items', [])
@@ -116,40 +170,44 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
             items.append({
                 'productId': product_id,
                 'name': product.get('name', ''),
+                'category': product.get('category', ''),
                 'quantity': quantity,
                 'price': price_decimal,
                 'imageUrl': product.get('imageUrl', ''),
                 'addedAt': datetime.utcnow().isoformat() + 'Z'
             })
         
-        # Calculate totals using Decimal
-        subtotal = sum(Decimal(str(item['price'])) * item['quantity'] for item in items)
-        tax = subtotal * Decimal('0.08')  # 8% tax
-        shipping = Decimal('9.99') if subtotal < 50 else Decimal('0')
-        total = subtotal + tax + shipping
-        
         cart['items'] = items
-        cart['totals'] = {
-            'subtotal': subtotal,
-            'tax': tax,
-            'shipping': shipping,
-            'total': total
-        }
+        price_cart(cart)
         cart['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
-        cart['expiresAt'] = int((datetime.utcnow() + timedelta(days=30)).timestamp())
+        cart['expiresAt'] = cart_expires_at(owner)
         
         # Save cart
-        carts_table.put_item(Item=cart)
+        cart_token = None
+        if stored:
+            try:
+                save_cart(carts_table, cart, previous_ids, condition)
+            except CartConflict:
+                return conflict_response(session_headers(owner))
+        else:
+            cart_token = signed_cart.save(carts_table, owner, cart)
+            if cart_token is None and signed_cart.STATELESS:
+                metrics.add_metric(name='StatelessCartsStored', unit=MetricUnit.Count, value=1)
         
         # Convert Decimals for JSON response
         response_cart = decimal_to_float(cart)
+        if owner.is_guest:
+            response_cart['guestSession'] = owner.session_token
+            response_cart['guestCart'] = cart_token
         
         return {
             'statusCode': 200,
             'body': json.dumps(response_cart),
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                **session_headers(owner),
+                **signed_cart.cart_headers(cart_token)
             }
         }
         
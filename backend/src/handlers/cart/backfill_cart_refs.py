@@ -0,0 +1,132 @@
+"""
+Backfill Cart Refs Lambda Handler
+One-off job that adds carts saved before the CARTREF index to it
+
+reprice_carts.py only reaches carts through their ``CARTREF#<productId>``
+refs (cart_store.py), which are written when a cart is saved. Carts that have
+not changed since the index was introduced have none, so their prices and
+availability would stay as they were when the lines were added. This job
+scans CartsTable for carts without ``refsExpireAt``, brings their lines up to
+date from ProductsTable the way reprice_carts does, and saves each one with
+its refs on condition that the user has not changed it meanwhile (a cart the
+user changed got its refs from that save).
+
+Invoke with ``{}``; a run that stops early returns ``nextKey``, which the
+next invocation takes as ``startKey``. ``{"dryRun": true}`` only counts.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr
+
+import aws_clients
+import profiling
+from cart_store import CartConflict, product_ids, save_cart, version_condition
+from pricing import price_cart
+from reprice_carts import apply_changes
+from signed_cart import load_products
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+PAGE_SIZE = 500
+BATCH_GET_SIZE = 100
+WRITE_WORKERS = 8
+# Stop with enough time left to finish the page in flight
+RESERVE_MS = 60000
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=WRITE_WORKERS)
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+
+
+def product_states(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Current price, status and stock of each product, shaped like reprice_carts changes."""
+    products = {}
+    for start in range(0, len(ids), BATCH_GET_SIZE):
+        products.update(load_products(dynamodb, products_table, None, ids[start:start + BATCH_GET_SIZE]))
+    states = {}
+    for product_id in ids:
+        product = products.get(product_id)
+        if product is None:
+            states[product_id] = {'productId': product_id, 'price': None, 'status': 'deleted', 'inventory': 0}
+        else:
+            states[product_id] = {
+                'productId': product_id,
+                'price': product.get('price'),
+                'status': product.get('status', 'active'),
+                'inventory': int(product.get('inventory', product.get('stock', 0)))
+            }
+    return states
+
+
+def backfill(cart: Dict[str, Any], states: Dict[str, Dict[str, Any]], timestamp: str) -> bool:
+    """Re-price one cart and save it with its refs; False if the user changed it meanwhile."""
+    condition = version_condition(cart)
+    updated = dict(cart)
+    updated['items'] = [dict(item) for item in cart.get('items', [])]
+    apply_changes(updated, states)
+    price_cart(updated)
+    updated['pricedAt'] = timestamp
+    updated['updatedAt'] = timestamp
+    try:
+        save_cart(carts_table, updated, (), condition)
+        return True
+    except CartConflict:
+        return False
+
+
+@tracer.capture_method
+def backfill_page(carts: List[Dict[str, Any]], dry_run: bool) -> Dict[str, int]:
+    if dry_run or not carts:
+        return {'backfilled': len(carts), 'conflicts': 0}
+    states = product_states(sorted({pid for cart in carts for pid in product_ids(cart)}))
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+        saved = list(pool.map(lambda cart: backfill(cart, states, timestamp), carts))
+    return {'backfilled': sum(saved), 'conflicts': len(saved) - sum(saved)}
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    dry_run = bool(event.get('dryRun'))
+    scan_params = {
+        'FilterExpression': Attr('SK').eq('CART') & Attr('refsExpireAt').not_exists(),
+        'Limit': PAGE_SIZE
+    }
+    if event.get('startKey'):
+        scan_params['ExclusiveStartKey'] = json.loads(event['startKey'])
+    stats = {'backfilled': 0, 'conflicts': 0}
+    next_key = None
+
+    while True:
+        response = carts_table.scan(**scan_params)
+        for name, value in backfill_page(response.get('Items', []), dry_run).items():
+            stats[name] += value
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        if context.get_remaining_time_in_millis() <= RESERVE_MS:
+            next_key = json.dumps(response['LastEvaluatedKey'], default=str)
+            logger.info("Cart ref backfill stopping early; invoke again with startKey")
+            break
+
+    metrics.add_metric(name='CartRefsBackfilled', unit=MetricUnit.Count, value=stats['backfilled'] if not dry_run else 0)
+    logger.info("Cart ref backfill run complete", extra={**stats, 'dryRun': dry_run})
+
+    result = {**stats, 'dryRun': dry_run}
+    if next_key:
+        result['nextKey'] = next_key
+    return result
@@ -0,0 +1,237 @@
+"""
+Batch Cart Lambda Handler
+POST /cart/batch - Apply several add/set/remove operations to the cart in one request
+
+Products the catalog snapshot has (catalog_snapshot.py, when CATALOG_BUCKET
+is set) are not read from ProductsTable; the BatchGetItem then only carries
+the cart and the remaining products. With a guest cart token
+(signed_cart.py) the cart key is left out and the token's products are read
+instead; the result goes back as a new token while the cart fits in one.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import catalog_snapshot
+import cognito_auth
+import profiling
+import signed_cart
+from guest_session import cart_expires_at, resolve_cart_owner, session_headers
+from cart_store import CartConflict, conflict_response, product_ids, save_cart, version_condition
+from pricing import price_cart
+from request_models import BatchCartRequest, RequestError, parse_body
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
+
+MAX_BATCH_GET_ATTEMPTS = 5
+
+
+def decimal_to_float(obj):
+    """Convert Decimal objects to float for JSON serialization."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, dict):
+        return {k: decimal_to_float(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [decimal_to_float(i) for i in obj]
+    return obj
+
+
+def error_response(status_code: int, error: str, message: str) -> Dict[str, Any]:
+    """Build an error response in the API's standard format."""
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({'error': error, 'message': message}),
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        }
+    }
+
+
+@tracer.capture_method
+def batch_load(cart_key: Optional[Dict[str, str]], product_ids: List[str]):
+    """Fetch the cart (unless ``cart_key`` is None) and every referenced product with a single BatchGetItem.
+
+    Unprocessed keys (throttling) are retried a bounded number of times.
+    """
+    request_items = {}
+    if cart_key:
+        # Consistent so the conditional cart write holds
+        request_items[carts_table.name] = {'Keys': [cart_key], 'ConsistentRead': True}
+    if product_ids:
+        request_items[products_table.name] = {
+            'Keys': [{'PK': f'PRODUCT#{pid}', 'SK': 'METADATA'} for pid in product_ids]
+        }
+
+    responses = {carts_table.name: [], products_table.name: []}
+    for _ in range(MAX_BATCH_GET_ATTEMPTS):
+        if not request_items:
+            break
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for table_name, items in response.get('Responses', {}).items():
+            responses[table_name].extend(items)
+        request_items = response.get('UnprocessedKeys') or {}
+        if not request_items:
+            break
+    else:
+        raise RuntimeError('BatchGetItem left unprocessed keys after retries')
+
+    cart_items = responses[carts_table.name]
+    cart = cart_items[0] if cart_items else None
+    products = {item['productId']: item for item in responses[products_table.name] if 'productId' in item}
+    return cart, products
+
+
+def apply_operation(items: List[Dict[str, Any]], operation: Dict[str, Any],
+                    product: Dict[str, Any], timestamp: str) -> Dict[str, Any]:
+    """Apply one operation to the cart items in place and return its result line."""
+    op = operation['op']
+    product_id = operation['productId']
+    result = {'op': op, 'productId': product_id}
+    existing_item = next((item for item in items if item['productId'] == product_id), None)
+
+    if op == 'remove' or (op == 'set' and operation['quantity'] == 0):
+        if not existing_item:
+            return {**result, 'status': 'rejected', 'error': 'NOT_IN_CART'}
+        items.remove(existing_item)
+        return {**result, 'status': 'applied', 'quantity': 0}
+
+    if product is None:
+        return {**result, 'status': 'rejected', 'error': 'NOT_FOUND'}
+    if product.get('status', 'active') != 'active':
+        return {**result, 'status': 'rejected', 'error': 'PRODUCT_UNAVAILABLE'}
+
+    current_quantity = int(existing_item['quantity']) if existing_item else 0
+    new_quantity = current_quantity + operation['quantity'] if op == 'add' else operation['quantity']
+
+    stock = int(product.get('inventory', product.get('stock', 0)))
+    if stock < new_quantity:
+        return {**result, 'status': 'rejected', 'error': 'INSUFFICIENT_INVENTORY', 'available': stock}
+
+    if existing_item:
+        existing_item['quantity'] = new_quantity
+    else:
+        items.append({
+            'productId': product_id,
+            'name': product.get('name', ''),
+            'category': product.get('category', ''),
+            'quantity': new_quantity,
+            'price': Decimal(str(product.get('price', 0))),
+            'imageUrl': product.get('imageUrl', ''),
+            'addedAt': timestamp
+        })
+    return {**result, 'status': 'applied', 'quantity': new_quantity}
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        try:
+            request = parse_body(BatchCartRequest, event)
+        except RequestError as e:
+            return e.response()
+        operations = [{'quantity': 1 if operation['op'] == 'add' else 0, **operation}
+                      for operation in request['operations']]
+
+        # Get user_id from JWT claims or the signed guest session
+        try:
+            owner = resolve_cart_owner(event, create=True)
+        except cognito_auth.InvalidToken:
+            return cognito_auth.unauthorized()
+        user_id = owner.user_id
+
+        cart_key = owner.cart_key
+        # A guest's cart token replaces the cart read; a session issued just now has no cart to read
+        token = signed_cart.get_token(event)
+        lines = signed_cart.verify_token(token, owner)
+        requested_ids = list(dict.fromkeys(
+            [line[0] for line in lines or ()]
+            + [operation['productId'] for operation in operations if operation['op'] != 'remove']
+        ))
+
+        products = {}
+        if catalog and catalog.refresh():
+            products = {pid: product for pid in requested_ids if (product := catalog.product(pid))}
+        read_cart = lines is None and not owner.new_session
+        cart, loaded = batch_load(cart_key if read_cart else None,
+                                  [pid for pid in requested_ids if pid not in products])
+        products.update(loaded)
+        stored = not owner.is_guest or cart is not None
+        condition = version_condition(cart)
+        if lines is not None:
+            cart = signed_cart.cart_from_lines(owner, lines, products)
+            cart['guestCart'] = token
+        cart = cart or {**cart_key, 'userId': user_id, 'items': []}
+        if owner.is_guest:
+            cart['isGuest'] = True
+        previous_ids = product_ids(cart)
+
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        items = cart.get('items', [])
+        results = []
+        for index, operation in enumerate(operations):
+            line = apply_operation(items, operation, products.get(operation['productId']), timestamp)
+            results.append({'index': index, **line})
+
+        applied = sum(1 for line in results if line['status'] == 'applied')
+        if applied:
+            cart['items'] = items
+            price_cart(cart)
+            cart['updatedAt'] = timestamp
+            cart['expiresAt'] = cart_expires_at(owner)
+
+            # Single cart write for the whole batch (or a new token for a guest cart not in CartsTable)
+            if stored:
+                try:
+                    save_cart(carts_table, cart, previous_ids, condition)
+                except CartConflict:
+                    return conflict_response(session_headers(owner))
+            else:
+                cart['guestCart'] = signed_cart.save(carts_table, owner, cart)
+
+        logger.info("Cart batch applied", extra={
+            'operations': len(operations),
+            'applied': applied,
+            'rejected': len(operations) - applied
+        })
+
+        response_body = {
+            'cart': decimal_to_float(cart),
+            'results': results,
+            'applied': applied,
+            'rejected': len(operations) - applied
+        }
+        if owner.is_guest and applied:
+            response_body['guestSession'] = owner.session_token
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps(response_body),
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                **(session_headers(owner) if applied else {}),
+                **signed_cart.cart_headers(cart.get('guestCart'))
+            }
+        }
+
+    except Exception as e:
+        logger.exception("Error applying cart batch")
+        return error_response(500, 'INTERNAL_ERROR', str(e))
@@ -0,0 +1,118 @@
+"""
+Cart persistence helpers
+
+Besides the cart item itself, CartsTable holds a reverse index from each
+product to the carts that contain it::
+
+    PK: CARTREF#<productId>   SK: USER#<userId>   expiresAt: <ttl>
+
+The ProductsTable stream consumer (reprice_carts.py) queries it to find
+exactly the carts affected by a price, status or inventory change. Refs are
+only written when a product enters a cart, and re-written in bulk once the
+cart's TTL has moved past theirs, so quantity changes cost no extra writes.
+Stale refs (cart cleared or checked out) are pruned lazily by the consumer.
+Carts saved before the index existed have no refs (and no ``refsExpireAt``)
+until backfill_cart_refs.py has run or the cart is next changed.
+
+Every cart write is conditional on the ``updatedAt`` it read (see
+``version_condition``) and sets a new one, so a handler and reprice_carts
+never overwrite each other's changes.
+"""
+import json
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+from botocore.exceptions import ClientError
+
+REF_PREFIX = 'CARTREF#'
+# Refs outlive their cart's current TTL so they are not re-written on every change
+REF_TTL_GRACE_SECONDS = 30 * 24 * 3600
+
+
+class CartConflict(Exception):
+    """The cart was changed by another request after it was read."""
+
+
+def ref_key(product_id: str, cart_pk: str) -> Dict[str, str]:
+    return {'PK': f'{REF_PREFIX}{product_id}', 'SK': cart_pk}
+
+
+def product_ids(cart: Dict[str, Any]) -> Set[str]:
+    """Product IDs currently in the cart."""
+    return {item['productId'] for item in cart.get('items', [])}
+
+
+def add_refs(table, cart: Dict[str, Any], previous_ids: Iterable[str] = ()) -> Set[str]:
+    """Write the refs a cart needs before it is saved.
+
+    ``previous_ids`` are the product IDs the cart held when it was read.
+    Returns the product IDs whose refs should be removed once the cart is saved.
+    """
+    previous_ids = set(previous_ids)
+    current_ids = product_ids(cart)
+    expires_at = int(cart.get('expiresAt') or time.time())
+
+    if expires_at > int(cart.get('refsExpireAt', 0)):
+        cart['refsExpireAt'] = expires_at + REF_TTL_GRACE_SECONDS
+        to_add = current_ids
+    else:
+        to_add = current_ids - previous_ids
+
+    if to_add:
+        with table.batch_writer() as batch:
+            for product_id in to_add:
+                batch.put_item(Item={**ref_key(product_id, cart['PK']), 'expiresAt': cart['refsExpireAt']})
+
+    return previous_ids - current_ids
+
+
+def remove_refs(table, cart_pk: str, ids: Iterable[str]) -> None:
+    """Delete the refs from the given products to a cart."""
+    ids = list(ids)
+    if ids:
+        with table.batch_writer() as batch:
+            for product_id in ids:
+                batch.delete_item(Key=ref_key(product_id, cart_pk))
+
+
+def version_condition(existing: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Condition that only holds while the cart is unchanged since ``existing`` was read.
+
+    ``existing`` is None for a cart that did not exist.
+    """
+    if existing is None:
+        return {'ConditionExpression': 'attribute_not_exists(PK)'}
+    if 'updatedAt' not in existing:
+        return {'ConditionExpression': 'attribute_exists(PK) AND attribute_not_exists(updatedAt)'}
+    return {
+        'ConditionExpression': 'updatedAt = :seen',
+        'ExpressionAttributeValues': {':seen': existing['updatedAt']}
+    }
+
+
+def save_cart(table, cart: Dict[str, Any], previous_ids: Iterable[str] = (),
+              condition: Optional[Dict[str, Any]] = None) -> None:
+    """Put the cart and keep its product reverse-index entries in sync.
+
+    ``condition`` is the ``version_condition`` of the cart as it was read;
+    CartConflict is raised if it no longer holds. New refs are written before
+    the cart so a crash never leaves a cart line without its ref; removed refs
+    are deleted afterwards.
+    """
+    to_remove = add_refs(table, cart, previous_ids)
+    try:
+        table.put_item(Item=cart, **(condition or {}))
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            raise CartConflict(cart['PK']) from e
+        raise
+    remove_refs(table, cart['PK'], to_remove)
+
+
+def conflict_response(headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """409 for a cart write that lost to a concurrent change; the client retries."""
+    return {
+        'statusCode': 409,
+        'body': json.dumps({'error': 'CONFLICT', 'message': 'Cart changed, please retry'}),
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **(headers or {})}
+    }
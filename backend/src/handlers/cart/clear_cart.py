@@ -7,17 +7,20 @@ import os
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import profiling
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
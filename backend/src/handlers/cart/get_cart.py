@@ -1,56 +1,84 @@
 """
 Get Cart Lambda Handler
 GET /cart - Get user's shopping cart
+
+The cart read is hedged when HEDGED_READS is on (hedged_reads.py). A guest
+cart token (signed_cart.py) is rebuilt and re-priced from the catalog
+snapshot or ProductsTable instead, with no CartsTable read.
 """
 import json
 import os
 from typing import Any, Dict
-from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools import Logger, Metrics, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import catalog_snapshot
+import cognito_auth
+import hedged_reads
+import profiling
+import signed_cart
+from guest_session import resolve_cart_owner, session_headers
+from pricing import empty_totals
 
 logger = Logger()
 tracer = Tracer()
+metrics = Metrics()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
 
 
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
-        # Get user ID from authorizer context
-        user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
-        
-        # Get cart from DynamoDB
-        response = carts_table.get_item(
-            Key={
-                'PK': f'USER#{user_id}',
-                'SK': 'CART'
-            }
-        )
+        # Get user ID from the caller's JWT or guest session (the route has no authorizer)
+        try:
+            owner = resolve_cart_owner(event)
+        except cognito_auth.InvalidToken:
+            return cognito_auth.unauthorized()
+        user_id = owner.user_id if owner else None
         
-        cart = response.get('Item', {
-            'userId': user_id,
-            'items': [],
-            'totals': {
-                'subtotal': 0,
-                'tax': 0,
-                'shipping': 0,
-                'total': 0,
-                'currency': 'USD'
-            }
-        })
+        token = signed_cart.get_token(event)
+        lines = signed_cart.verify_token(token, owner)
+        if lines is not None:
+            products = signed_cart.load_products(dynamodb, products_table, catalog, [line[0] for line in lines])
+            cart = signed_cart.cart_from_lines(owner, lines, products)
+            # Re-issued so lines for products that went away drop out of the token too
+            cart['guestCart'] = signed_cart.issue_token(owner, cart['items']) or token
+        else:
+            # Get cart from DynamoDB (anonymous callers without a session have an empty cart)
+            response = hedged_reads.get_item(
+                carts_table,
+                Key={
+                    'PK': f'USER#{user_id}',
+                    'SK': 'CART'
+                }
+            ) if owner else {}
+            
+            cart = response.get('Item', {
+                'userId': user_id,
+                'items': [],
+                'totals': empty_totals()
+            })
         
         return {
             'statusCode': 200,
             'body': json.dumps(cart, default=str),
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
+                'Access-Control-Allow-Origin': '*',
+                **session_headers(owner),
+                **signed_cart.cart_headers(cart.get('guestCart'))
             }
         }
         
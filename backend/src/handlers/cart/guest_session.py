@@ -0,0 +1,136 @@
+"""
+Guest cart sessions
+
+Anonymous shoppers get a signed session token (returned in the
+X-Guest-Session response header and the ``guestSession`` body field) that
+the cart handlers accept on later calls. Tokens are validated with an HMAC
+check only, so resolving a guest identity never costs a DynamoDB read.
+
+Token format: ``<guestId>.<expiresAt>.<signature>``
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import cognito_auth
+
+SESSION_HEADER = 'x-guest-session'
+GUEST_PREFIX = 'guest-'
+SESSION_TTL_SECONDS = int(os.environ.get('GUEST_SESSION_TTL_DAYS', '7')) * 24 * 3600
+USER_CART_TTL_SECONDS = 30 * 24 * 3600
+
+_secret: Optional[bytes] = None
+
+
+@dataclass
+class CartOwner:
+    """Identity that owns a cart: a Cognito user or a guest session."""
+    user_id: str
+    is_guest: bool = False
+    session_token: Optional[str] = None
+    session_expires_at: Optional[int] = None
+    new_session: bool = False
+
+    @property
+    def cart_key(self) -> Dict[str, str]:
+        return {'PK': f'USER#{self.user_id}', 'SK': 'CART'}
+
+
+def _get_secret() -> bytes:
+    """Load the signing secret once per container."""
+    global _secret
+    if _secret is None:
+        secret = os.environ.get('GUEST_SESSION_SECRET')
+        if not secret:
+            raise RuntimeError('GUEST_SESSION_SECRET environment variable is not set')
+        _secret = secret.encode('utf-8')
+    return _secret
+
+
+def sign(payload: str) -> str:
+    """HMAC of ``payload`` with the session secret (also signs signed_cart.py tokens)."""
+    digest = hmac.new(_get_secret(), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+
+def issue_session(guest_id: Optional[str] = None, now: Optional[int] = None) -> CartOwner:
+    """Mint a new signed guest session."""
+    now = int(now if now is not None else time.time())
+    guest_id = guest_id or f'{GUEST_PREFIX}{uuid.uuid4().hex}'
+    expires_at = now + SESSION_TTL_SECONDS
+    payload = f'{guest_id}.{expires_at}'
+    return CartOwner(
+        user_id=guest_id,
+        is_guest=True,
+        session_token=f'{payload}.{sign(payload)}',
+        session_expires_at=expires_at,
+        new_session=True
+    )
+
+
+def verify_session(token: Optional[str], now: Optional[int] = None) -> Optional[CartOwner]:
+    """Validate a session token, returning None if it is malformed, forged or expired."""
+    if not token or token.count('.') != 2:
+        return None
+
+    guest_id, expires_at, signature = token.split('.')
+    if not guest_id.startswith(GUEST_PREFIX) or not expires_at.isdigit():
+        return None
+    if not hmac.compare_digest(signature, sign(f'{guest_id}.{expires_at}')):
+        return None
+    if int(expires_at) <= int(now if now is not None else time.time()):
+        return None
+
+    return CartOwner(
+        user_id=guest_id,
+        is_guest=True,
+        session_token=token,
+        session_expires_at=int(expires_at)
+    )
+
+
+def get_session_token(event: Dict[str, Any]) -> Optional[str]:
+    """Read the guest session token from the request headers."""
+    headers = event.get('headers') or {}
+    for name, value in headers.items():
+        if name.lower() == SESSION_HEADER:
+            return value
+    return None
+
+
+def resolve_cart_owner(event: Dict[str, Any], create: bool = False) -> Optional[CartOwner]:
+    """Work out who owns the cart for this request.
+
+    Authenticated users are identified by their JWT ``sub`` claim, from the
+    authorizer or the Authorization header (cognito_auth.py; raises
+    InvalidToken for a bad one). Anonymous callers are identified by a valid
+    guest session token; if there is none and ``create`` is set, a new session
+    is issued, otherwise None is returned.
+    """
+    user_claims = cognito_auth.claims(event)
+    if user_claims:
+        return CartOwner(user_id=user_claims['sub'])
+
+    owner = verify_session(get_session_token(event))
+    if owner is None and create:
+        owner = issue_session()
+    return owner
+
+
+def cart_expires_at(owner: CartOwner) -> int:
+    """TTL for a cart: guest carts live exactly as long as the session that can reach them."""
+    if owner.is_guest:
+        return owner.session_expires_at
+    return int(time.time()) + USER_CART_TTL_SECONDS
+
+
+def session_headers(owner: Optional[CartOwner]) -> Dict[str, str]:
+    """Response headers that hand the session token back to guest clients."""
+    if owner is None or not owner.is_guest:
+        return {}
+    return {'X-Guest-Session': owner.session_token}
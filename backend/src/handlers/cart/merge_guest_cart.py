@@ -0,0 +1,188 @@
+"""
+Merge Guest Cart Lambda Handler
+POST /cart/merge - Merge a guest session cart into the signed-in user's cart
+
+A stateless guest cart (signed_cart.py) comes in as the ``guestCart`` body
+field or X-Guest-Cart header; its lines are re-priced and merged with a
+conditional put of the user's cart, as there is no guest cart item to delete.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from decimal import Decimal
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+import signed_cart
+from guest_session import CartOwner, cart_expires_at, get_session_token, verify_session
+from cart_store import add_refs, product_ids, remove_refs, version_condition
+from pricing import empty_totals, price_cart
+from request_models import MergeGuestCartRequest, RequestError, parse_body
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+client = dynamodb.meta.client
+
+MAX_MERGE_ATTEMPTS = 3
+
+
+def decimal_to_float(obj):
+    """Convert Decimal objects to float for JSON serialization."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    elif isinstance(obj, dict):
+        return {k: decimal_to_float(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [decimal_to_float(i) for i in obj]
+    return obj
+
+
+def merge_items(user_items: List[Dict[str, Any]], guest_items: List[Dict[str, Any]]) -> int:
+    """Fold guest lines into the user's lines in place; returns the number of guest lines merged."""
+    by_product = {item['productId']: item for item in user_items}
+    for guest_item in guest_items:
+        existing_item = by_product.get(guest_item['productId'])
+        if existing_item:
+            existing_item['quantity'] = int(existing_item['quantity']) + int(guest_item['quantity'])
+        else:
+            user_items.append(guest_item)
+            by_product[guest_item['productId']] = guest_item
+    return len(guest_items)
+
+
+@tracer.capture_method
+def load_carts(user: CartOwner, guest: CartOwner):
+    """Read both carts with one BatchGetItem (consistent reads so the write conditions hold)."""
+    response = dynamodb.batch_get_item(RequestItems={
+        carts_table.name: {'Keys': [user.cart_key, guest.cart_key], 'ConsistentRead': True}
+    })
+    if response.get('UnprocessedKeys'):
+        raise RuntimeError('Cart read was throttled')
+
+    carts = {item['PK']: item for item in response['Responses'].get(carts_table.name, [])}
+    return carts.get(user.cart_key['PK']), carts.get(guest.cart_key['PK'])
+
+
+@tracer.capture_method
+def commit_merge(cart: Dict[str, Any], user_cart: Optional[Dict[str, Any]],
+                 guest: CartOwner, guest_cart: Optional[Dict[str, Any]]):
+    """Write the merged cart and delete the guest cart in a single conditional transaction.
+
+    ``guest_cart`` is None for a cart that came from a token, which leaves nothing to delete.
+    """
+    transact_items = [
+        {
+            'Put': {
+                'TableName': carts_table.name,
+                'Item': cart,
+                **version_condition(user_cart)
+            }
+        }
+    ]
+    if guest_cart is not None:
+        transact_items.append({
+            'Delete': {
+                'TableName': carts_table.name,
+                'Key': guest.cart_key,
+                **version_condition(guest_cart)
+            }
+        })
+    client.transact_write_items(TransactItems=transact_items)
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+    try:
+        try:
+            user = CartOwner(user_id=event['requestContext']['authorizer']['jwt']['claims']['sub'])
+        except (KeyError, TypeError):
+            return {'statusCode': 401, 'body': json.dumps({'error': 'UNAUTHORIZED', 'message': 'Sign in required'})}
+
+        try:
+            request = parse_body(MergeGuestCartRequest, event)
+        except RequestError as e:
+            return e.response()
+        guest = verify_session(request.get('guestSession') or get_session_token(event))
+        if guest is None:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'INVALID_SESSION', 'message': 'Guest session is missing or expired'})
+            }
+
+        lines = signed_cart.verify_token(request.get('guestCart') or signed_cart.get_token(event), guest)
+        token_cart = None
+        if lines is not None:
+            products = signed_cart.load_products(dynamodb, products_table, None, [line[0] for line in lines])
+            token_cart = signed_cart.cart_from_lines(guest, lines, products)
+
+        for attempt in range(MAX_MERGE_ATTEMPTS):
+            user_cart, guest_cart = load_carts(user, guest)
+            if token_cart is not None:
+                guest_cart = token_cart
+
+            if not guest_cart or not guest_cart.get('items'):
+                cart = user_cart or {'userId': user.user_id, 'items': [], 'totals': empty_totals()}
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'cart': decimal_to_float(cart), 'mergedItems': 0}),
+                    'headers': headers
+                }
+
+            # Merge into a copy so the version condition still sees what was read
+            cart = dict(user_cart) if user_cart else {**user.cart_key, 'userId': user.user_id, 'items': []}
+            previous_ids = product_ids(cart)
+            items = list(cart.get('items', []))
+            merged = merge_items(items, guest_cart['items'])
+
+            timestamp = datetime.utcnow().isoformat() + 'Z'
+            cart['items'] = items
+            price_cart(cart)
+            cart['updatedAt'] = timestamp
+            cart['expiresAt'] = cart_expires_at(user)
+
+            try:
+                add_refs(carts_table, cart, previous_ids)
+                commit_merge(cart, user_cart, guest, None if token_cart is not None else guest_cart)
+                break
+            except client.exceptions.TransactionCanceledException:
+                logger.info("Cart changed during merge, retrying", extra={'attempt': attempt + 1})
+        else:
+            return {
+                'statusCode': 409,
+                'body': json.dumps({'error': 'CONFLICT', 'message': 'Cart changed during merge, please retry'}),
+                'headers': headers
+            }
+
+        if token_cart is None:
+            remove_refs(carts_table, guest.cart_key['PK'], product_ids(guest_cart))
+
+        metrics.add_metric(name='GuestCartsMerged', unit=MetricUnit.Count, value=1)
+        metrics.add_metric(name='GuestCartItemsMerged', unit=MetricUnit.Count, value=merged)
+        logger.info(f"Merged guest cart into user cart: {user.user_id}", extra={'merged_items': merged})
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'cart': decimal_to_float(cart), 'mergedItems': merged}),
+            'headers': headers
+        }
+
+    except Exception as e:
+        logger.exception("Error merging guest cart")
+        return {'statusCode': 500, 'body': json.dumps({'error': 'INTERNAL_ERROR', 'message': str(e)})}
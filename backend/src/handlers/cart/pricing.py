@@ -0,0 +1,195 @@
+"""
+Cart pricing engine
+
+Single source of truth for cart totals. All arithmetic is done in integer
+cents so results are exact and identical no matter whether line prices come
+from DynamoDB (Decimal), JSON (float) or strings. Tax, shipping and
+promotion rules are compiled into lookup tables once per container.
+
+Promotions are configured with the CART_PROMOTIONS environment variable, a
+JSON object keyed by promo code, e.g.::
+
+    {"SAVE10": {"type": "percent", "value": 10, "minSubtotal": 25},
+     "AUDIO5": {"type": "amount", "value": 5, "category": "Audio"},
+     "FREESHIP": {"type": "free_shipping"}}
+"""
+import json
+import os
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+DEFAULT_CURRENCY = 'USD'
+TAX_RATE_BASIS_POINTS = int(os.environ.get('CART_TAX_RATE_BPS', '800'))  # 8%
+SHIPPING_FLAT_CENTS = 999
+FREE_SHIPPING_THRESHOLD_CENTS = 5000
+
+_ONE = Decimal('1')
+_HUNDRED = Decimal('100')
+_CENT = Decimal('0.01')
+
+# A catalog has a limited set of price points, so a warm container converts
+# the same prices and line totals over and over. Both caches are cleared when
+# they fill up rather than tracking recency.
+_CACHE_LIMIT = 20000
+_cents_cache: Dict[Decimal, int] = {}
+_amount_cache: Dict[int, Decimal] = {}
+
+# kind: 'percent' (value in basis points), 'amount' (value in cents) or 'free_shipping'
+Promotion = namedtuple('Promotion', ['code', 'kind', 'value', 'min_subtotal', 'category'])
+
+
+def to_cents(value: Any) -> int:
+    """Convert a money amount to integer cents, rounding half up."""
+    if isinstance(value, int):
+        return value * 100
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    cents = _cents_cache.get(value)
+    if cents is not None:
+        return cents
+    scaled = value * _HUNDRED
+    cents = int(scaled)
+    # Prices with at most two decimal places (the normal case) skip quantize
+    if cents != scaled:
+        cents = int(scaled.quantize(_ONE, rounding=ROUND_HALF_UP))
+    if len(_cents_cache) >= _CACHE_LIMIT:
+        _cents_cache.clear()
+    _cents_cache[value] = cents
+    return cents
+
+
+def from_cents(cents: int) -> Decimal:
+    """Convert integer cents to a two-place Decimal suitable for DynamoDB."""
+    amount = _amount_cache.get(cents)
+    if amount is None:
+        if len(_amount_cache) >= _CACHE_LIMIT:
+            _amount_cache.clear()
+        amount = _amount_cache[cents] = Decimal(cents) * _CENT
+    return amount
+
+
+def compile_promotions(config: Dict[str, Any]) -> Dict[str, Promotion]:
+    """Compile promotion config into a code -> Promotion table."""
+    table = {}
+    for code, rule in config.items():
+        kind = rule['type']
+        if kind == 'percent':
+            value = int(Decimal(str(rule['value'])) * 100)
+        elif kind == 'amount':
+            value = to_cents(rule['value'])
+        elif kind == 'free_shipping':
+            value = 0
+        else:
+            raise ValueError(f'Unknown promotion type for {code}: {kind}')
+        table[code.upper()] = Promotion(
+            code=code.upper(),
+            kind=kind,
+            value=value,
+            min_subtotal=to_cents(rule.get('minSubtotal', 0)),
+            category=rule.get('category')
+        )
+    return table
+
+
+PROMOTIONS = compile_promotions(json.loads(os.environ.get('CART_PROMOTIONS', '{}')))
+
+
+def _percent_of(cents: int, basis_points: int) -> int:
+    """basis_points/10000 of an amount in cents, rounded half up."""
+    return (cents * basis_points + 5000) // 10000
+
+
+def price_lines(items: List[Dict[str, Any]],
+                promo_codes: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Price cart lines in one pass and return the totals in cents.
+
+    Each line gets a ``lineTotal`` (Decimal) as a side effect.
+    """
+    promotions = [PROMOTIONS[code.upper()] for code in promo_codes if code.upper() in PROMOTIONS] if promo_codes else ()
+    category_subtotals = {promo.category: 0 for promo in promotions if promo.category}
+
+    subtotal = 0
+    item_count = 0
+    for item in items:
+        quantity = int(item['quantity'])
+        line_cents = to_cents(item['price']) * quantity
+        item['lineTotal'] = from_cents(line_cents)
+        subtotal += line_cents
+        item_count += quantity
+        if category_subtotals:
+            category = item.get('category')
+            if category in category_subtotals:
+                category_subtotals[category] += line_cents
+
+    discount = 0
+    free_shipping = False
+    for promo in promotions:
+        if subtotal < promo.min_subtotal:
+            continue
+        base = category_subtotals[promo.category] if promo.category else subtotal
+        if promo.kind == 'percent':
+            discount += _percent_of(base, promo.value)
+        elif promo.kind == 'amount':
+            discount += min(promo.value, base)
+        else:
+            free_shipping = True
+    discount = min(discount, subtotal)
+
+    taxable = subtotal - discount
+    tax = _percent_of(taxable, TAX_RATE_BASIS_POINTS)
+    if free_shipping or subtotal == 0 or subtotal >= FREE_SHIPPING_THRESHOLD_CENTS:
+        shipping = 0
+    else:
+        shipping = SHIPPING_FLAT_CENTS
+
+    return {
+        'subtotal': subtotal,
+        'discount': discount,
+        'tax': tax,
+        'shipping': shipping,
+        'total': taxable + tax + shipping,
+        'itemCount': item_count
+    }
+
+
+def price_cart(cart: Dict[str, Any]) -> Dict[str, Any]:
+    """Recalculate ``cart['totals']`` in place and return them."""
+    currency = cart.get('currency', DEFAULT_CURRENCY)
+    cents = price_lines(cart.get('items', []), cart.get('promoCodes'))
+    totals = {
+        'subtotal': from_cents(cents['subtotal']),
+        'discount': from_cents(cents['discount']),
+        'tax': from_cents(cents['tax']),
+        'shipping': from_cents(cents['shipping']),
+        'total': from_cents(cents['total']),
+        'itemCount': cents['itemCount'],
+        'currency': currency
+    }
+    cart['totals'] = totals
+    return totals
+
+
+def price_carts(carts: Iterable[Dict[str, Any]],
+                prices: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Re-price many carts at once, e.g. after a catalog price change.
+
+    ``prices`` maps productId to its new unit price; matching lines are
+    updated before the carts are priced. Each new price is rounded to cents
+    once for the whole batch. Returns the list of totals.
+    """
+    new_prices = {product_id: from_cents(to_cents(price)) for product_id, price in (prices or {}).items()}
+    results = []
+    for cart in carts:
+        if new_prices:
+            for item in cart.get('items', []):
+                price = new_prices.get(item['productId'])
+                if price is not None:
+                    item['price'] = price
+        results.append(price_cart(cart))
+    return results
+
+
+def empty_totals(currency: str = DEFAULT_CURRENCY) -> Dict[str, Any]:
+    """Totals for a cart with no items."""
+    return price_cart({'items': [], 'currency': currency})
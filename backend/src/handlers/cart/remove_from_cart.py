@@ -1,6 +1,9 @@
 """
 Remove from Cart Lambda Handler
 DELETE /cart/items/{productId} - Remove item from cart
+
+A guest cart token (signed_cart.py) is rebuilt from the catalog snapshot or
+ProductsTable and handed back as a new token instead of a CartsTable write.
 """
 import json
 import os
@@ -8,54 +11,80 @@ from datetime import datetime, timedelta
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import catalog_snapshot
+import cognito_auth
+import profiling
+import signed_cart
+from guest_session import resolve_cart_owner, session_headers
+from cart_store import CartConflict, conflict_response, product_ids, save_cart, version_condition
+from pricing import price_cart
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
-        user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
+        try:
+            owner = resolve_cart_owner(event)
+        except cognito_auth.InvalidToken:
+            return cognito_auth.unauthorized()
+        if owner is None:
+            return {'statusCode': 404, 'body': json.dumps({'error': 'CART_NOT_FOUND', 'message': 'Cart not found'})}
+        user_id = owner.user_id
         product_id = event['pathParameters']['productId']
         
-        # Get cart
-        cart_response = carts_table.get_item(Key={'PK': f'USER#{user_id}', 'SK': 'CART'})
-        
-        if 'Item' not in cart_response:
-            return {'statusCode': 404, 'body': json.dumps({'error': 'CART_NOT_FOUND'})}
-        
-        cart = cart_response['Item']
+        # Get cart (from the guest's cart token when there is one)
+        lines = signed_cart.verify_token(signed_cart.get_token(event), owner)
+        if lines is not None:
+            products = signed_cart.load_products(dynamodb, products_table, catalog, [line[0] for line in lines])
+            cart = signed_cart.cart_from_lines(owner, lines, products)
+        else:
+            cart_response = carts_table.get_item(Key={'PK': f'USER#{user_id}', 'SK': 'CART'}, ConsistentRead=True)
+            
+            if 'Item' not in cart_response:
+                return {'statusCode': 404, 'body': json.dumps({'error': 'CART_NOT_FOUND'})}
+            
+            cart = cart_response['Item']
+            condition = version_condition(cart)
+        previous_ids = product_ids(cart)
         items = [item for item in cart.get('items', []) if item['productId'] != product_id]
         
         # Recalculate totals
-        subtotal = sum(item['price'] * item['quantity'] for item in items)
-        tax = subtotal * 0.08
-        shipping = 9.99 if subtotal < 50 else 0
-        
         cart['items'] = items
-        cart['totals'] = {
-            'subtotal': round(subtotal, 2),
-            'tax': round(tax, 2),
-            'shipping': round(shipping, 2),
-            'total': round(subtotal + tax + shipping, 2),
-            'currency': 'USD'
-        }
+        price_cart(cart)
         cart['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
         
-        carts_table.put_item(Item=cart)
+        if lines is not None:
+            cart['guestCart'] = signed_cart.save(carts_table, owner, cart)
+        else:
+            try:
+                save_cart(carts_table, cart, previous_ids, condition)
+            except CartConflict:
+                return conflict_response(session_headers(owner))
         
         return {
             'statusCode': 200,
             'body': json.dumps(cart, default=str),
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                **session_headers(owner),
+                **signed_cart.cart_headers(cart.get('guestCart'))
+            }
         }
         
     except Exception as e:
@@ -0,0 +1,225 @@
+"""
+Reprice Carts Lambda Handler
+ProductsTable stream consumer that pushes price, status and inventory changes into open carts
+
+Cart lines snapshot the product price when they are added. This handler keeps
+them current: for each changed product it looks up the carts that contain it
+through the CARTREF reverse index (see cart_store.py), reads those carts with
+BatchGetItem, updates line prices and availability, re-prices them with the
+pricing engine and writes them back. Checkout can then trust cart totals and
+only has to check the per-line ``available`` flag.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import profiling
+from cart_store import REF_PREFIX, remove_refs, version_condition
+from pricing import price_cart
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+# Inventory changes only matter to carts once stock is this low
+LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', '10'))
+BATCH_GET_SIZE = 100
+WRITE_WORKERS = 8
+MAX_WRITE_ATTEMPTS = 3
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=WRITE_WORKERS)
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+client = dynamodb.meta.client
+deserializer = TypeDeserializer()
+
+
+def deserialize(image: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a stream image from DynamoDB JSON to Python values."""
+    return {k: deserializer.deserialize(v) for k, v in (image or {}).items()}
+
+
+def detect_change(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the cart-relevant state of a product if this record changed it."""
+    old = deserialize(record['dynamodb'].get('OldImage'))
+    new = deserialize(record['dynamodb'].get('NewImage'))
+    product_id = (new or old).get('productId')
+    if not product_id:
+        return None
+
+    if record['eventName'] == 'REMOVE':
+        return {'productId': product_id, 'price': None, 'status': 'deleted', 'inventory': 0}
+
+    old_inventory = int(old.get('inventory', old.get('stock', 0)))
+    new_inventory = int(new.get('inventory', new.get('stock', 0)))
+    price_changed = old.get('price') != new.get('price')
+    status_changed = old.get('status') != new.get('status')
+    inventory_changed = old_inventory != new_inventory and min(old_inventory, new_inventory) < LOW_STOCK_THRESHOLD
+
+    if not (price_changed or status_changed or inventory_changed):
+        return None
+    return {
+        'productId': product_id,
+        'price': new.get('price'),
+        'status': new.get('status', 'active'),
+        'inventory': new_inventory
+    }
+
+
+@tracer.capture_method
+def find_carts(product_ids: List[str]) -> Dict[str, List[str]]:
+    """Map cart PK -> changed product IDs it references, via the reverse index."""
+    carts: Dict[str, List[str]] = {}
+    for product_id in product_ids:
+        query_params = {
+            'KeyConditionExpression': Key('PK').eq(f'{REF_PREFIX}{product_id}'),
+            'ProjectionExpression': 'SK'
+        }
+        while True:
+            response = carts_table.query(**query_params)
+            for ref in response.get('Items', []):
+                carts.setdefault(ref['SK'], []).append(product_id)
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return carts
+
+
+@tracer.capture_method
+def load_carts(cart_pks: List[str]) -> Dict[str, Dict[str, Any]]:
+    """BatchGetItem the carts in chunks of 100, retrying unprocessed keys."""
+    carts = {}
+    for start in range(0, len(cart_pks), BATCH_GET_SIZE):
+        request_items = {
+            carts_table.name: {'Keys': [{'PK': pk, 'SK': 'CART'} for pk in cart_pks[start:start + BATCH_GET_SIZE]]}
+        }
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for cart in response['Responses'].get(carts_table.name, []):
+                carts[cart['PK']] = cart
+            request_items = response.get('UnprocessedKeys') or {}
+    return carts
+
+
+def apply_changes(cart: Dict[str, Any], changes: Dict[str, Dict[str, Any]]) -> bool:
+    """Update matching cart lines in place; returns True if anything changed."""
+    changed = False
+    for item in cart.get('items', []):
+        change = changes.get(item['productId'])
+        if change is None:
+            continue
+
+        if change['price'] is not None and item.get('price') != change['price']:
+            item['price'] = change['price']
+            changed = True
+
+        if change['status'] != 'active':
+            reason = 'PRODUCT_UNAVAILABLE'
+        elif change['inventory'] < int(item['quantity']):
+            reason = 'INSUFFICIENT_INVENTORY'
+        else:
+            reason = None
+
+        available = reason is None
+        if item.get('available', True) != available or item.get('unavailableReason') != reason:
+            item['available'] = available
+            if reason:
+                item['unavailableReason'] = reason
+            else:
+                item.pop('unavailableReason', None)
+            changed = True
+    return changed
+
+
+def write_cart(cart: Dict[str, Any]) -> bool:
+    """Conditionally write a re-priced cart; False if the user changed it meanwhile.
+
+    The write moves ``updatedAt`` too, so a handler that read the cart before
+    it was re-priced fails its own conditional save instead of overwriting it.
+    """
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    condition = version_condition(cart)
+    try:
+        carts_table.update_item(
+            Key={'PK': cart['PK'], 'SK': 'CART'},
+            UpdateExpression='SET #items = :items, totals = :totals, pricedAt = :now, updatedAt = :now',
+            ConditionExpression=condition['ConditionExpression'],
+            ExpressionAttributeNames={'#items': 'items'},
+            ExpressionAttributeValues={
+                ':items': cart['items'],
+                ':totals': cart['totals'],
+                ':now': timestamp,
+                **condition.get('ExpressionAttributeValues', {})
+            }
+        )
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+@tracer.capture_method
+def reprice(cart_refs: Dict[str, List[str]], changes: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """Re-price every referenced cart, retrying carts that were edited concurrently."""
+    stats = {'repriced': 0, 'unchanged': 0, 'staleRefs': 0}
+    pending = list(cart_refs)
+
+    for _ in range(MAX_WRITE_ATTEMPTS):
+        if not pending:
+            break
+        carts = load_carts(pending)
+        to_write = []
+        for cart_pk in pending:
+            cart = carts.get(cart_pk)
+            held = {item['productId'] for item in cart.get('items', [])} if cart else set()
+            stale = [product_id for product_id in cart_refs[cart_pk] if product_id not in held]
+            if stale:
+                stats['staleRefs'] += len(stale)
+                remove_refs(carts_table, cart_pk, stale)
+            if cart and apply_changes(cart, changes):
+                price_cart(cart)
+                to_write.append(cart)
+            elif cart:
+                stats['unchanged'] += 1
+
+        with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+            written = list(pool.map(write_cart, to_write))
+        stats['repriced'] += sum(written)
+        pending = [cart['PK'] for cart, ok in zip(to_write, written) if not ok]
+
+    if pending:
+        logger.warning("Carts still conflicting after retries", extra={'carts': pending})
+    return stats
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    changes = {}
+    for record in event.get('Records', []):
+        change = detect_change(record)
+        if change:
+            # Later records for the same product win
+            changes[change['productId']] = change
+
+    if not changes:
+        return {'products': 0, 'repriced': 0}
+
+    cart_refs = find_carts(list(changes))
+    stats = reprice(cart_refs, changes)
+
+    metrics.add_metric(name='CartsRepriced', unit=MetricUnit.Count, value=stats['repriced'])
+    metrics.add_metric(name='CartRefsPruned', unit=MetricUnit.Count, value=stats['staleRefs'])
+    logger.info("Carts re-priced from product changes", extra={'products': len(changes), **stats})
+
+    return {'products': len(changes), **stats}
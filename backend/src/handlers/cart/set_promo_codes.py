@@ -0,0 +1,102 @@
+"""
+Set Promo Codes Lambda Handler
+PUT /cart/promo-codes - Replace the promo codes applied to the signed-in user's cart
+
+Codes must be configured in CART_PROMOTIONS (pricing.py); an empty list
+removes them all. The cart is re-priced with the new codes before it is
+saved, and reprice_carts keeps applying them as prices change.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import cognito_auth
+import profiling
+from guest_session import CartOwner, cart_expires_at
+from cart_store import CartConflict, conflict_response, product_ids, save_cart, version_condition
+from pricing import PROMOTIONS, price_cart
+from request_models import RequestError, SetPromoCodesRequest, parse_body
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+    try:
+        try:
+            owner = CartOwner(user_id=event['requestContext']['authorizer']['jwt']['claims']['sub'])
+        except (KeyError, TypeError):
+            return cognito_auth.unauthorized('Sign in required')
+
+        try:
+            requested = parse_body(SetPromoCodesRequest, event)['promoCodes']
+        except RequestError as e:
+            return e.response()
+
+        codes = list(dict.fromkeys(code.upper() for code in requested))
+        unknown = [code for code in codes if code not in PROMOTIONS]
+        if unknown:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'INVALID_PROMO_CODE',
+                    'message': 'Promo code is not valid',
+                    'promoCodes': unknown
+                }),
+                'headers': headers
+            }
+
+        cart_response = carts_table.get_item(Key=owner.cart_key, ConsistentRead=True)
+        if 'Item' not in cart_response:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'CART_NOT_FOUND', 'message': 'Cart not found'}),
+                'headers': headers
+            }
+
+        cart = cart_response['Item']
+        condition = version_condition(cart)
+        if codes:
+            cart['promoCodes'] = codes
+        else:
+            cart.pop('promoCodes', None)
+        price_cart(cart)
+        cart['updatedAt'] = datetime.utcnow().isoformat() + 'Z'
+        cart['expiresAt'] = cart_expires_at(owner)
+
+        # Lines are unchanged, so the product refs are too
+        ids = product_ids(cart)
+        try:
+            save_cart(carts_table, cart, ids, condition)
+        except CartConflict:
+            return conflict_response()
+
+        logger.info(f"Promo codes set for cart: {owner.user_id}", extra={'promo_codes': codes})
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps(cart, default=str),
+            'headers': headers
+        }
+
+    except Exception as e:
+        logger.exception("Error setting promo codes")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': 'INTERNAL_ERROR', 'message': str(e)}),
+            'headers': headers
+        }
@@ -0,0 +1,149 @@
+"""
+Stateless guest carts
+
+With GUEST_CART_MODE=stateless a guest's cart is not written to CartsTable
+while it is small. Instead the client carries it in a signed token, returned
+in the X-Guest-Cart response header and the ``guestCart`` body field and sent
+back in the X-Guest-Cart request header. The token holds only each line's
+productId, quantity and when it was added; handlers rebuild and re-price the
+lines from the catalog snapshot (or one BatchGetItem on ProductsTable) on
+every call, so a cart never shows a stale price and costs no CartsTable I/O.
+
+Token format: ``<payload>.<signature>``, where the payload is urlsafe base64
+(unpadded) of zlib-compressed JSON ``[[productId, quantity, addedAt], ...]``
+and the signature is the guest session HMAC over
+``cart.<guestId>.<payload>``. A token is only accepted alongside the session
+it was issued to, so it expires with that session. Valid tokens are honoured
+even with the mode off; the next change then stores the cart.
+
+A cart moves to CartsTable once it has more than STATELESS_CART_MAX_ITEMS
+lines or its token would pass MAX_TOKEN_BYTES, and when the guest signs in
+(merge_guest_cart.py). A successful cart response without an X-Guest-Cart
+header is for a stored cart, and the client drops the token it holds.
+"""
+import base64
+import hmac
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from guest_session import CartOwner, cart_expires_at, sign
+from cart_store import save_cart
+from pricing import price_cart
+
+CART_HEADER = 'x-guest-cart'
+STATELESS = os.environ.get('GUEST_CART_MODE', 'stored') == 'stateless'
+MAX_ITEMS = int(os.environ.get('STATELESS_CART_MAX_ITEMS', '3'))
+# Well under common proxy and browser header limits
+MAX_TOKEN_BYTES = 1024
+
+Line = List[Any]
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _epoch(timestamp: str) -> int:
+    return int(datetime.fromisoformat(timestamp.rstrip('Z')).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _isoformat(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat() + 'Z'
+
+
+def issue_token(owner: CartOwner, items: List[Dict[str, Any]]) -> Optional[str]:
+    """Sign the cart's lines, or None when the cart is too big to carry (or the mode is off)."""
+    if not STATELESS or len(items) > MAX_ITEMS:
+        return None
+    lines = [[item['productId'], int(item['quantity']), _epoch(item['addedAt'])] for item in items]
+    payload = _b64encode(zlib.compress(json.dumps(lines, separators=(',', ':')).encode('utf-8'), 9))
+    token = f'{payload}.{sign(f"cart.{owner.user_id}.{payload}")}'
+    return token if len(token) <= MAX_TOKEN_BYTES else None
+
+
+def verify_token(token: Optional[str], owner: Optional[CartOwner]) -> Optional[List[Line]]:
+    """The token's lines, or None if it is missing, malformed, forged or for another session."""
+    if not token or owner is None or not owner.is_guest or len(token) > MAX_TOKEN_BYTES or token.count('.') != 1:
+        return None
+    payload, signature = token.split('.')
+    if not hmac.compare_digest(signature, sign(f'cart.{owner.user_id}.{payload}')):
+        return None
+    try:
+        lines = json.loads(zlib.decompress(_b64decode(payload)))
+    except (ValueError, zlib.error):
+        return None
+    return [[str(product_id), int(quantity), int(added_at)] for product_id, quantity, added_at in lines]
+
+
+def get_token(event: Dict[str, Any]) -> Optional[str]:
+    """Read the cart token from the request headers."""
+    headers = event.get('headers') or {}
+    for name, value in headers.items():
+        if name.lower() == CART_HEADER:
+            return value
+    return None
+
+
+def load_products(dynamodb: Any, products_table: Any, catalog: Any, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Products by ID: from the catalog snapshot when it has them, the rest with one BatchGetItem."""
+    products = {}
+    if catalog and catalog.refresh():
+        products = {product_id: product for product_id in ids if (product := catalog.product(product_id))}
+    missing = [product_id for product_id in ids if product_id not in products]
+    if missing:
+        request_items = {products_table.name: {
+            'Keys': [{'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'} for product_id in missing]
+        }}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            for item in response['Responses'].get(products_table.name, []):
+                products[item['productId']] = item
+            request_items = response.get('UnprocessedKeys') or {}
+    return products
+
+
+def cart_from_lines(owner: CartOwner, lines: List[Line], products: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """The cart a token describes, priced from current product data; unavailable products are dropped."""
+    items = []
+    for product_id, quantity, added_at in lines:
+        product = products.get(product_id)
+        if not product or product.get('status', 'active') != 'active' or quantity <= 0:
+            continue
+        items.append({
+            'productId': product_id,
+            'name': product.get('name', ''),
+            'category': product.get('category', ''),
+            'quantity': quantity,
+            'price': Decimal(str(product.get('price', 0))),
+            'imageUrl': product.get('imageUrl', ''),
+            'addedAt': _isoformat(added_at)
+        })
+    cart = {**owner.cart_key, 'userId': owner.user_id, 'isGuest': True, 'items': items,
+            'expiresAt': cart_expires_at(owner)}
+    price_cart(cart)
+    return cart
+
+
+def save(carts_table: Any, owner: CartOwner, cart: Dict[str, Any]) -> Optional[str]:
+    """Hand a new or token cart back as a token if it fits, else write it to CartsTable.
+
+    Returns the token, or None once the cart has been stored.
+    """
+    cart.pop('guestCart', None)
+    token = issue_token(owner, cart.get('items', []))
+    if token is None:
+        save_cart(carts_table, cart, ())
+    return token
+
+
+def cart_headers(token: Optional[str]) -> Dict[str, str]:
+    """Response headers that hand the cart token back to the client."""
+    return {'X-Guest-Cart': token} if token else {}
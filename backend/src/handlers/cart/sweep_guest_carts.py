@@ -0,0 +1,135 @@
+"""
+Sweep Guest Carts Lambda Handler
+Scheduled job that deletes expired and unreachable guest carts, a bounded slice per run
+
+Guest carts carry the session's ``expiresAt`` as their TTL, but DynamoDB only
+deletes expired items on a best-effort basis (typically within days), and
+until then they still take storage and still have CARTREF rows that
+reprice_carts.py follows. Carts written before guest sessions existed belong
+to a random guest ID that was never returned to the client, so nobody can
+read them again either. Both are deleted here, with their refs.
+
+Each run scans at most ``MAX_PAGES_PER_RUN`` pages of CartsTable and keeps
+its position in ReadModelsTable, so the next run resumes where this one
+stopped and a full pass is spread over several runs rather than rescanning
+the table from the start every time.
+
+Keys in ReadModelsTable:
+    PK: SWEEP#guest-carts    SK: CURSOR    startKey (JSON), updatedAt
+"""
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+
+import aws_clients
+import profiling
+from cart_store import product_ids, remove_refs
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+PAGE_SIZE = 500
+MAX_PAGES_PER_RUN = 20
+# Stop with enough time left to finish the page in flight
+RESERVE_MS = 30000
+CURSOR_KEY = {'PK': 'SWEEP#guest-carts', 'SK': 'CURSOR'}
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+
+def load_cursor() -> Optional[Dict[str, Any]]:
+    item = read_models_table.get_item(Key=CURSOR_KEY).get('Item')
+    return json.loads(item['startKey']) if item else None
+
+
+def save_cursor(start_key: Optional[Dict[str, Any]]) -> None:
+    """Remember where the next run starts; a finished pass starts over from the beginning."""
+    if start_key is None:
+        read_models_table.delete_item(Key=CURSOR_KEY)
+    else:
+        read_models_table.put_item(Item={**CURSOR_KEY, 'startKey': json.dumps(start_key, default=str),
+                                         'updatedAt': int(time.time())})
+
+
+def delete_cart(cart: Dict[str, Any], now: int) -> bool:
+    """Delete a swept cart and its refs; False if it was renewed since the scan read it."""
+    condition = {}
+    if cart.get('isGuest'):
+        condition = {
+            'ConditionExpression': 'expiresAt < :now',
+            'ExpressionAttributeValues': {':now': now}
+        }
+    try:
+        carts_table.delete_item(Key={'PK': cart['PK'], 'SK': cart['SK']}, **condition)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+    remove_refs(carts_table, cart['PK'], product_ids(cart))
+    return True
+
+
+@tracer.capture_method
+def sweep_page(carts: List[Dict[str, Any]], now: int, stats: Dict[str, int]) -> None:
+    for cart in carts:
+        if cart.get('isGuest'):
+            stats['sessionCarts'] += 1
+            if int(cart.get('expiresAt', now)) >= now:
+                continue
+            if delete_cart(cart, now):
+                stats['expiredDeleted'] += 1
+        elif delete_cart(cart, now):
+            stats['orphansDeleted'] += 1
+            stats['orphanBytesReclaimed'] += len(json.dumps(cart, default=str))
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    now = int(time.time())
+    stats = {
+        'scanned': 0,
+        'sessionCarts': 0,
+        'expiredDeleted': 0,
+        'orphansDeleted': 0,
+        'orphanBytesReclaimed': 0
+    }
+    scan_params = {
+        'FilterExpression': Attr('PK').begins_with('USER#guest-') & Attr('SK').eq('CART'),
+        'Limit': PAGE_SIZE
+    }
+    start_key = load_cursor()
+
+    for _ in range(MAX_PAGES_PER_RUN):
+        if start_key:
+            scan_params['ExclusiveStartKey'] = start_key
+        response = carts_table.scan(**scan_params)
+        stats['scanned'] += response.get('ScannedCount', 0)
+        sweep_page(response.get('Items', []), now, stats)
+        start_key = response.get('LastEvaluatedKey')
+        if start_key is None or context.get_remaining_time_in_millis() <= RESERVE_MS:
+            break
+
+    save_cursor(start_key)
+
+    metrics.add_metric(name='GuestSessionCarts', unit=MetricUnit.Count, value=stats['sessionCarts'])
+    metrics.add_metric(name='ExpiredGuestCartsDeleted', unit=MetricUnit.Count, value=stats['expiredDeleted'])
+    metrics.add_metric(name='OrphanGuestCartsDeleted', unit=MetricUnit.Count, value=stats['orphansDeleted'])
+    metrics.add_metric(name='OrphanGuestCartBytesReclaimed', unit=MetricUnit.Bytes, value=stats['orphanBytesReclaimed'])
+    logger.info("Guest cart sweep run complete", extra={**stats, 'passComplete': start_key is None})
+
+    return {**stats, 'passComplete': start_key is None}
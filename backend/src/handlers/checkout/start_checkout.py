@@ -4,31 +4,47 @@ POST /checkout/start - Initiate checkout process
 """
 import json
 import os
-import uuid
 from datetime import datetime, timedelta
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import inventory_ledger
+import order_ids
+import profiling
+from request_models import CheckoutRequest, RequestError, parse_body
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 carts_table = dynamodb.Table(os.environ['CARTS_TABLE'])
 orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
-stepfunctions = boto3.client('stepfunctions')
+client = dynamodb.meta.client
+stepfunctions = aws_clients.client('stepfunctions', 'interactive')
+sqs = aws_clients.client('sqs', 'interactive')
+
+# 'workflow' starts one Step Functions execution per order; 'queue' hands the
+# order to the batch consumer (workflows/process_order_batch.py)
+ORDER_PROCESSING_MODE = os.environ.get('ORDER_PROCESSING_MODE', 'workflow')
+# The reservation ledger item and the order take the other two transaction slots
+MAX_PRODUCTS_PER_ORDER = inventory_ledger.MAX_TRANSACT_ITEMS - 2
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
         user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
         email = event['requestContext']['authorizer']['jwt']['claims'].get('email', '')
-        body = json.loads(event.get('body', '{}'))
+        try:
+            request = parse_body(CheckoutRequest, event)
+        except RequestError as e:
+            return e.response()
         
         # Get cart
         cart_response = carts_table.get_item(Key={'PK': f'USER#{user_id}', 'SK': 'CART'})
@@ -41,8 +57,21 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         
         cart = cart_response['Item']
         
-        # Create order
-        order_id = f"ord-{uuid.uuid4().hex[:12]}"
+        # Lines are kept current by the ProductsTable stream (reprice_carts), so the
+        # cart totals can be trusted as-is; only lines flagged unavailable block checkout
+        unavailable = [item['productId'] for item in cart['items'] if not item.get('available', True)]
+        if unavailable:
+            return {
+                'statusCode': 409,
+                'body': json.dumps({
+                    'error': 'ITEMS_UNAVAILABLE',
+                    'message': 'Some cart items are no longer available',
+                    'details': {'productIds': unavailable}
+                })
+            }
+        
+        # Create order; the ID sorts by creation time (see order_ids.py)
+        order_id = order_ids.new_order_id()
         timestamp = datetime.utcnow().isoformat() + 'Z'
         
         order = {
@@ -52,9 +81,9 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
             'userId': user_id,
             'status': 'pending',
             'items': cart['items'],
-            'totals': cart['totals'],
-            'shippingAddress': body.get('shippingAddress', {}),
-            'paymentMethodId': body.get('paymentMethodId', ''),
+            'totals': {'currency': 'USD', **cart['totals']},
+            'shippingAddress': request.get('shippingAddress', {}),
+            'paymentMethodId': request.get('paymentMethodId', ''),
             'email': email,
             'createdAt': timestamp,
             'updatedAt': timestamp,
@@ -64,11 +93,43 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
             'GSI2SK': f"{timestamp}#{order_id}"
         }
         
-        orders_table.put_item(Item=order)
+        # Reserve stock and create the order in one transaction: either both happen or neither
+        totals = inventory_ledger.quantities(cart['items'])
+        if len(totals) > MAX_PRODUCTS_PER_ORDER:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({
+                    'error': 'TOO_MANY_ITEMS',
+                    'message': f'Orders are limited to {MAX_PRODUCTS_PER_ORDER} distinct products'
+                })
+            }
+        transact_items = inventory_ledger.reserve_items(order_id, user_id, totals)
+        transact_items.append({
+            'Put': {'TableName': orders_table.name, 'Item': order, 'ConditionExpression': 'attribute_not_exists(PK)'}
+        })
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+        except client.exceptions.TransactionCanceledException as e:
+            unavailable = inventory_ledger.unavailable_products(e, list(totals))
+            if not unavailable:
+                raise
+            return {
+                'statusCode': 409,
+                'body': json.dumps({
+                    'error': 'INSUFFICIENT_INVENTORY',
+                    'message': 'Some cart items are no longer in stock',
+                    'details': {'productIds': unavailable}
+                })
+            }
         
-        # Start Step Functions workflow
+        # Start order processing
         state_machine_arn = os.environ.get('STATE_MACHINE_ARN')
-        if state_machine_arn:
+        if ORDER_PROCESSING_MODE == 'queue':
+            sqs.send_message(
+                QueueUrl=os.environ['ORDER_QUEUE_URL'],
+                MessageBody=json.dumps({'orderId': order_id, 'userId': user_id})
+            )
+        elif state_machine_arn:
             stepfunctions.start_execution(
                 stateMachineArn=state_machine_arn,
                 name=f"order-{order_id}-{int(datetime.utcnow().timestamp())}",
@@ -84,9 +145,9 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
                 'orderId': order_id,
                 'status': 'pending',
                 'total': cart['totals']['total'],
-                'currency': cart['totals']['currency'],
+                'currency': order['totals']['currency'],
                 'createdAt': timestamp
-            }),
+            }, default=str),
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
         }
         
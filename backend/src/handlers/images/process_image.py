@@ -0,0 +1,244 @@
+"""
+Process Image Lambda Handler
+S3 event consumer that turns uploaded product images into resized variants
+
+Uploads land in ProductImagesBucket under ``uploads/<productId>/<imageId>.<ext>``
+(products/create_image_upload.py hands out the presigned POST). Each upload
+is decoded once and written back as WebP and, where Pillow supports it,
+AVIF variants at the widths in VARIANT_WIDTHS (never upscaled), plus a tiny
+blurred WebP placeholder inlined as a data URI. JPEGs are decoded with
+``Image.draft`` so libjpeg scales by 1/2, 1/4 or 1/8 during the decode when
+the largest variant is much smaller than the original, which is most of the
+CPU and memory of the job. Variants go to ``variants/<productId>/<imageId>/``
+with an immutable Cache-Control and are served through CloudFront.
+
+The product item gets an ``imageAssets`` entry (dimensions, placeholder and
+variant URLs) and, for its first processed image, a ``thumbnail`` that the
+list endpoint returns instead of the full asset list. ``imageIds`` makes
+the write-back idempotent when S3 delivers an event twice.
+"""
+import base64
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from urllib.parse import unquote_plus
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError, features
+
+import aws_clients
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+IMAGES_BASE_URL = os.environ.get('IMAGES_BASE_URL', '').rstrip('/')
+VARIANT_WIDTHS = tuple(int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '160,480,1200').split(','))
+# The variant list endpoints show; the others are for srcset on the detail page
+THUMBNAIL_WIDTH = int(os.environ.get('IMAGE_THUMBNAIL_WIDTH', '480'))
+FORMATS = {
+    'webp': {'format': 'WEBP', 'contentType': 'image/webp', 'options': {'quality': 80, 'method': 4}},
+    'avif': {'format': 'AVIF', 'contentType': 'image/avif', 'options': {'quality': 55, 'speed': 8}},
+}
+if not features.check('avif'):
+    FORMATS.pop('avif')
+PLACEHOLDER_WIDTH = 16
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# 40 megapixels is well past any camera upload; larger images are treated as decompression bombs
+Image.MAX_IMAGE_PIXELS = 40_000_000
+VARIANT_UPLOAD_WORKERS = 8
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+UPLOAD_KEY = re.compile(r'^uploads/(?P<product_id>[\w-]+)/(?P<image_id>[\w-]+)\.\w+$')
+
+s3 = aws_clients.client('s3', 'batch', pool_size=VARIANT_UPLOAD_WORKERS)
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+
+
+def decode(data: bytes) -> Image.Image:
+    """Decode an upload at the smallest size that still covers the largest variant."""
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    target = min(max(VARIANT_WIDTHS), width)
+    # JPEG only: libjpeg does the downscale while decoding (no-op for other formats)
+    image.draft('RGB', (target, max(1, height * target // width)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, FORMATS[fmt]['format'], **FORMATS[fmt]['options'])
+    return buffer.getvalue()
+
+
+def placeholder(image: Image.Image) -> str:
+    """A blurred ~16px WebP small enough to inline in list responses."""
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.Resampling.BOX).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+@tracer.capture_method
+def render_variants(data: bytes) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Decode an upload and encode every variant.
+
+    Returns the image summary (original size, placeholder) and the variants
+    as ``{width, height, format, contentType, body}``, largest first.
+    """
+    with Image.open(io.BytesIO(data)) as probe:
+        original_size = probe.size
+    image = decode(data)
+
+    widths = sorted({min(w, image.width) for w in VARIANT_WIDTHS}, reverse=True)
+    variants = []
+    current = image
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        # Each size is resampled from the previous one, which is cheaper than going back to the full decode
+        if current.width != width:
+            current = current.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        for fmt in FORMATS:
+            variants.append({
+                'width': width,
+                'height': height,
+                'format': fmt,
+                'contentType': FORMATS[fmt]['contentType'],
+                'body': encode(current, fmt)
+            })
+
+    summary = {'width': original_size[0], 'height': original_size[1], 'placeholder': placeholder(current)}
+    return summary, variants
+
+
+def variant_key(product_id: str, image_id: str, variant: Dict[str, Any]) -> str:
+    return f"variants/{product_id}/{image_id}/{variant['width']}w.{variant['format']}"
+
+
+def upload_variants(bucket: str, product_id: str, image_id: str, variants: List[Dict[str, Any]]) -> None:
+    def put(variant):
+        s3.put_object(
+            Bucket=bucket,
+            Key=variant_key(product_id, image_id, variant),
+            Body=variant['body'],
+            ContentType=variant['contentType'],
+            CacheControl=CACHE_CONTROL
+        )
+
+    with ThreadPoolExecutor(max_workers=min(VARIANT_UPLOAD_WORKERS, len(variants))) as pool:
+        list(pool.map(put, variants))
+
+
+def image_asset(bucket: str, product_id: str, image_id: str, summary: Dict[str, Any],
+                variants: List[Dict[str, Any]]) -> Dict[str, Any]:
+    base_url = IMAGES_BASE_URL or f'https://{bucket}.s3.amazonaws.com'
+    return {
+        'imageId': image_id,
+        'width': summary['width'],
+        'height': summary['height'],
+        'placeholder': summary['placeholder'],
+        'variants': [{
+            'width': v['width'],
+            'height': v['height'],
+            'format': v['format'],
+            'bytes': len(v['body']),
+            'url': f"{base_url}/{variant_key(product_id, image_id, v)}"
+        } for v in variants]
+    }
+
+
+def thumbnail(asset: Dict[str, Any]) -> Dict[str, Any]:
+    """The WebP variant closest to THUMBNAIL_WIDTH (WebP decodes everywhere)."""
+    webp = [v for v in asset['variants'] if v['format'] == 'webp']
+    best = min(webp, key=lambda v: abs(v['width'] - THUMBNAIL_WIDTH))
+    return {'url': best['url'], 'width': best['width'], 'height': best['height'], 'placeholder': asset['placeholder']}
+
+
+@tracer.capture_method
+def attach_to_product(product_id: str, asset: Dict[str, Any]) -> bool:
+    """Append the asset to the product; False if the product is gone or already has this image."""
+    try:
+        products_table.update_item(
+            Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'},
+            UpdateExpression=(
+                'SET imageAssets = list_append(if_not_exists(imageAssets, :empty), :asset), '
+                'thumbnail = if_not_exists(thumbnail, :thumbnail), updatedAt = :updatedAt '
+                'ADD imageIds :imageIds'
+            ),
+            ConditionExpression='attribute_exists(PK) AND NOT contains(imageIds, :imageId)',
+            ExpressionAttributeValues={
+                ':empty': [],
+                ':asset': [asset],
+                ':thumbnail': thumbnail(asset),
+                ':updatedAt': datetime.utcnow().isoformat() + 'Z',
+                ':imageIds': {asset['imageId']},
+                ':imageId': asset['imageId']
+            }
+        )
+        return True
+    except products_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+@tracer.capture_method
+def process(bucket: str, key: str, size: int) -> str:
+    match = UPLOAD_KEY.match(key)
+    if not match:
+        logger.warning("Ignoring object outside the upload layout", extra={'key': key})
+        return 'ignored'
+    if size > MAX_UPLOAD_BYTES:
+        logger.warning("Upload exceeds size limit", extra={'key': key, 'size': size})
+        return 'rejected'
+
+    product_id, image_id = match.group('product_id'), match.group('image_id')
+    product = products_table.get_item(Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'},
+                                      ProjectionExpression='imageIds').get('Item')
+    if product is None or image_id in product.get('imageIds', set()):
+        logger.info("Image already attached or product deleted", extra={'product_id': product_id, 'image_id': image_id})
+        return 'duplicate'
+
+    data = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    try:
+        summary, variants = render_variants(data)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning("Upload is not a usable image", extra={'key': key, 'error': str(e)})
+        return 'rejected'
+
+    upload_variants(bucket, product_id, image_id, variants)
+    asset = image_asset(bucket, product_id, image_id, summary, variants)
+    if not attach_to_product(product_id, asset):
+        logger.info("Image already attached or product deleted", extra={'product_id': product_id, 'image_id': image_id})
+        return 'duplicate'
+
+    metrics.add_metric(name='ImageBytesIn', unit=MetricUnit.Bytes, value=len(data))
+    metrics.add_metric(name='ImageVariantBytesOut', unit=MetricUnit.Bytes, value=sum(len(v['body']) for v in variants))
+    return 'processed'
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    results = {'processed': 0, 'duplicate': 0, 'rejected': 0, 'ignored': 0}
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        results[process(bucket, key, int(record['s3']['object'].get('size', 0)))] += 1
+
+    metrics.add_metric(name='ImagesProcessed', unit=MetricUnit.Count, value=results['processed'])
+    metrics.add_metric(name='ImagesRejected', unit=MetricUnit.Count, value=results['rejected'])
+    logger.info("Image batch processed", extra=results)
+    return results
@@ -0,0 +1,137 @@
+"""
+Expire Reservations Lambda Handler
+OrdersTable stream consumer that restores stock from expired inventory reservations
+
+Reservation ledger items (layers/common/inventory_ledger.py) carry an
+``expiresAt`` TTL. When DynamoDB deletes one, the stream delivers a REMOVE
+record made by the DynamoDB service principal; the event source filter
+passes only those. Quantities are summed per product across the batch and
+moved from ``reserved`` back to ``inventory`` with one update per product,
+committed with TransactWriteItems together with an EVENT#<eventID> marker
+per record so a replayed batch restores stock once. Committed or released
+reservations are deleted by the workflows, not by TTL, and never reach
+this handler.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import inventory_ledger
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+client = dynamodb.meta.client
+deserializer = TypeDeserializer()
+
+MAX_TRANSACT_ITEMS = inventory_ledger.MAX_TRANSACT_ITEMS
+MAX_COMMIT_ATTEMPTS = 4
+# Stream records are retained for 24 hours; markers only need to outlive that
+MARKER_TTL_SECONDS = 2 * 24 * 3600
+
+
+def deserialize(image: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a stream image from DynamoDB JSON to Python values."""
+    return {k: deserializer.deserialize(v) for k, v in (image or {}).items()}
+
+
+def is_expiry(record: Dict[str, Any]) -> bool:
+    identity = record.get('userIdentity') or {}
+    return (
+        record.get('eventName') == 'REMOVE'
+        and identity.get('type') == 'Service'
+        and identity.get('principalId') == 'dynamodb.amazonaws.com'
+        and record['dynamodb'].get('Keys', {}).get('SK', {}).get('S') == 'RESERVATION'
+    )
+
+
+def reserved_quantities(record: Dict[str, Any]) -> Dict[str, int]:
+    reservation = deserialize(record['dynamodb'].get('OldImage'))
+    return {product_id: int(qty) for product_id, qty in reservation.get('items', {}).items()}
+
+
+def chunk_records(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split records so each chunk's markers plus product updates fit in one transaction."""
+    chunks, current, products = [], [], set()
+    for record in records:
+        record_products = set(reserved_quantities(record))
+        if current and len(current) + 1 + len(products | record_products) > MAX_TRANSACT_ITEMS:
+            chunks.append(current)
+            current, products = [], set()
+        current.append(record)
+        products |= record_products
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def marker(record: Dict[str, Any], expires_at: int) -> Dict[str, Any]:
+    return {
+        'Put': {
+            'TableName': orders_table.name,
+            'Item': {'PK': f"EVENT#{record['eventID']}", 'SK': 'RESERVATION_EXPIRY', 'expiresAt': expires_at},
+            'ConditionExpression': 'attribute_not_exists(PK)'
+        }
+    }
+
+
+@tracer.capture_method
+def restore(records: List[Dict[str, Any]]) -> int:
+    """Return the stock of a chunk of expired reservations exactly once; returns how many were new."""
+    for attempt in range(MAX_COMMIT_ATTEMPTS):
+        if not records:
+            return 0
+        totals: Dict[str, int] = {}
+        for record in records:
+            for product_id, qty in reserved_quantities(record).items():
+                totals[product_id] = totals.get(product_id, 0) + qty
+
+        expires_at = int(time.time()) + MARKER_TTL_SECONDS
+        transact_items = [marker(record, expires_at) for record in records]
+        transact_items += [inventory_ledger.counter_update(product_id, qty, -qty) for product_id, qty in totals.items()]
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+            return len(records)
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            duplicates = {
+                i for i, reason in enumerate(reasons[:len(records)])
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            }
+            if duplicates:
+                logger.info("Dropping replayed stream records", extra={'count': len(duplicates)})
+                records = [record for i, record in enumerate(records) if i not in duplicates]
+            else:
+                time.sleep(0.05 * 2 ** attempt)
+    raise RuntimeError('Reservation expiry transaction kept conflicting')
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    records = [record for record in event.get('Records', []) if is_expiry(record)]
+    restored = 0
+    for chunk in chunk_records(records):
+        try:
+            restored += restore(chunk)
+        except Exception:
+            logger.exception("Failed to restore expired reservations")
+            # Checkpoint just before the first record of the failed chunk
+            return {'batchItemFailures': [{'itemIdentifier': chunk[0]['dynamodb']['SequenceNumber']}]}
+
+    metrics.add_metric(name='ReservationsExpired', unit=MetricUnit.Count, value=restored)
+    return {'batchItemFailures': []}
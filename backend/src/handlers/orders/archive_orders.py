@@ -0,0 +1,118 @@
+"""
+Archive Orders Lambda Handler
+Scheduled job that moves old, settled orders from OrdersTable to S3
+
+Orders created before the start of the month ``ARCHIVE_AFTER_MONTHS`` ago
+are read from OrderDateIndex in creation order, written to the orders
+archive bucket in the format described in order_archive.py, and replaced in
+OrdersTable by a stub without index keys. Open orders (pending, processing,
+pending_review) stay in the hot table until they settle. The monthly
+projections in ReadModelsTable are kept (see project_orders.py), so
+``GET /orders?view=summary`` still lists archived orders, and get_order.py
+reads them back through their stub.
+
+A page is uploaded before its stubs are written and its orders deleted. An
+interrupted run re-reads the orders it did not delete on the next run; the
+object key derives from the page's first order, so a rerun of the same page
+overwrites its object rather than adding a second copy.
+"""
+import os
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr, Key
+
+import aws_clients
+import order_archive
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+s3 = aws_clients.client('s3', 'batch')
+ARCHIVE_BUCKET = os.environ['ORDERS_ARCHIVE_BUCKET']
+
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '12'))
+OPEN_STATUSES = ['pending', 'processing', 'pending_review']
+# Orders per index page, and so at most per archive object
+PAGE_SIZE = 1000
+# Stop with enough time left to upload a page and write its stubs
+RESERVE_MS = 60000
+
+
+def cutoff(now: datetime, months: int) -> str:
+    """Start of the month ``months`` before ``now``, as an OrderDateIndex sort key."""
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1).isoformat() + 'Z'
+
+
+@tracer.capture_method
+def archive_page(orders: List[Dict[str, Any]], archived_at: str) -> Dict[str, int]:
+    """Upload one page of orders (one object per month partition), then swap them for stubs."""
+    stats = {'archived': 0, 'objects': 0, 'bytes': 0}
+    stubs = []
+    for prefix, group in groupby(orders, key=lambda order: order_archive.partition(order['createdAt'])):
+        group = list(group)
+        key = f"{prefix}/part-{group[0]['orderId']}.jsonl.gz"
+        body, ranges = order_archive.pack(group)
+        s3.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=body,
+                      ContentType='application/x-ndjson', ContentEncoding='gzip')
+        stubs += [order_archive.stub(order, key, offset, length, archived_at)
+                  for order, (offset, length) in zip(group, ranges)]
+        stats['objects'] += 1
+        stats['bytes'] += len(body)
+
+    with orders_table.batch_writer() as batch:
+        for order, archive_stub in zip(orders, stubs):
+            batch.put_item(Item=archive_stub)
+            batch.delete_item(Key={'PK': order['PK'], 'SK': order['SK']})
+    stats['archived'] = len(orders)
+    return stats
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    now = datetime.utcnow()
+    archived_at = now.isoformat() + 'Z'
+    before = cutoff(now, int(event.get('months', ARCHIVE_AFTER_MONTHS)))
+    query_params = {
+        'IndexName': 'OrderDateIndex',
+        'KeyConditionExpression': Key('GSI2PK').eq('ORDER') & Key('GSI2SK').lt(before),
+        'FilterExpression': Attr('SK').begins_with('ORDER#') & ~Attr('status').is_in(OPEN_STATUSES),
+        'Limit': PAGE_SIZE
+    }
+    stats = {'archived': 0, 'objects': 0, 'bytes': 0}
+    complete = False
+
+    while context.get_remaining_time_in_millis() > RESERVE_MS:
+        response = orders_table.query(**query_params)
+        orders = response.get('Items', [])
+        if orders:
+            for name, value in archive_page(orders, archived_at).items():
+                stats[name] += value
+        if 'LastEvaluatedKey' not in response:
+            complete = True
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    if not complete:
+        logger.info("Archive run stopping early; remaining orders are picked up on the next run")
+
+    metrics.add_metric(name='OrdersArchived', unit=MetricUnit.Count, value=stats['archived'])
+    metrics.add_metric(name='OrderArchiveObjects', unit=MetricUnit.Count, value=stats['objects'])
+    metrics.add_metric(name='OrderArchiveBytes', unit=MetricUnit.Bytes, value=stats['bytes'])
+    logger.info("Order archive run complete", extra={**stats, 'before': before, 'complete': complete})
+
+    return {**stats, 'before': before, 'complete': complete}
@@ -1,23 +1,64 @@
 """
 Get Order Lambda Handler
 GET /orders/{id} - Get a specific order by ID
+
+Orders moved to S3 by archive_orders.py are read through their archive stub
+with a byte-range GET and returned with ``archivedAt`` set. Orders re-keyed
+by migrate_order_ids.py are still found by their old ID through the alias
+item the migration left behind.
 """
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import order_archive
+import order_ids
+import profiling
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+s3 = aws_clients.client('s3', 'interactive')
+ARCHIVE_BUCKET = os.environ.get('ORDERS_ARCHIVE_BUCKET')
+
+
+def archived_order(user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+    """The order from the S3 archive, or None if it was never archived."""
+    if not ARCHIVE_BUCKET:
+        return None
+    response = orders_table.get_item(
+        Key={'PK': f'USER#{user_id}', 'SK': f'{order_archive.ARCHIVE_SK_PREFIX}{order_id}'}
+    )
+    if 'Item' not in response:
+        return None
+    order = order_archive.read(s3, ARCHIVE_BUCKET, response['Item'])
+    order['archivedAt'] = response['Item']['archivedAt']
+    return order
+
+
+def find_order(user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+    response = orders_table.get_item(Key={'PK': f'USER#{user_id}', 'SK': f'ORDER#{order_id}'})
+    return response.get('Item') or archived_order(user_id, order_id)
+
+
+def migrated_order(user_id: str, legacy_order_id: str) -> Optional[Dict[str, Any]]:
+    """The order that had ``legacy_order_id`` before it was re-keyed, or None."""
+    response = orders_table.get_item(
+        Key={'PK': f'USER#{user_id}', 'SK': f'{order_ids.ALIAS_SK_PREFIX}{legacy_order_id}'}
+    )
+    if 'Item' not in response:
+        return None
+    return find_order(user_id, response['Item']['orderId'])
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
@@ -25,15 +66,10 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
         order_id = event['pathParameters']['id']
         
-        # Get order
-        response = orders_table.get_item(
-            Key={
-                'PK': f'USER#{user_id}',
-                'SK': f'ORDER#{order_id}'
-            }
-        )
-        
-        if 'Item' not in response:
+        order = find_order(user_id, order_id)
+        if not order and not order_ids.is_sortable(order_id):
+            order = migrated_order(user_id, order_id)
+        if not order:
             return {
                 'statusCode': 404,
                 'body': json.dumps({'error': 'NOT_FOUND', 'message': 'Order not found'})
@@ -41,7 +77,7 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         
         return {
             'statusCode': 200,
-            'body': json.dumps(response['Item'], default=str),
+            'body': json.dumps(order, default=str),
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
         }
         
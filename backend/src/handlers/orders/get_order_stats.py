@@ -0,0 +1,101 @@
+"""
+Get Order Stats Lambda Handler
+GET /admin/orders/stats - Daily sales aggregates and order status counters (Admin only)
+
+Reads the projections maintained by project_orders.py: one query for the
+day's product, category and total aggregates and one read for the status
+counters.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+
+def is_admin(event: Dict[str, Any]) -> bool:
+    claims = event['requestContext']['authorizer']['jwt']['claims']
+    return 'Admins' in str(claims.get('cognito:groups', ''))
+
+
+@tracer.capture_method
+def get_daily_sales(day: str) -> Dict[str, Any]:
+    """All SALES#<day> aggregates, grouped by kind."""
+    sales = {'products': [], 'categories': [], 'total': {'orders': 0, 'units': 0, 'revenueCents': 0}}
+    query_params = {'KeyConditionExpression': Key('PK').eq(f'SALES#{day}')}
+    while True:
+        response = read_models_table.query(**query_params)
+        for item in response.get('Items', []):
+            kind, _, name = item['SK'].partition('#')
+            counters = {k: int(item.get(k, 0)) for k in ('units', 'revenueCents')}
+            if kind == 'PRODUCT':
+                sales['products'].append({'productId': name, **counters})
+            elif kind == 'CATEGORY':
+                sales['categories'].append({'category': name, **counters})
+            elif kind == 'TOTAL':
+                sales['total'] = {'orders': int(item.get('orders', 0)), **counters}
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    sales['products'].sort(key=lambda row: row['revenueCents'], reverse=True)
+    sales['categories'].sort(key=lambda row: row['revenueCents'], reverse=True)
+    return sales
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        if not is_admin(event):
+            return {
+                'statusCode': 403,
+                'body': json.dumps({'error': 'FORBIDDEN', 'message': 'Admin access required'}),
+                'headers': HEADERS
+            }
+
+        params = event.get('queryStringParameters') or {}
+        day = params.get('date') or datetime.utcnow().strftime('%Y-%m-%d')
+        try:
+            datetime.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'VALIDATION_ERROR', 'message': 'date must be YYYY-MM-DD'}),
+                'headers': HEADERS
+            }
+
+        status_item = read_models_table.get_item(Key={'PK': 'STATS', 'SK': 'ORDER_STATUS'}).get('Item', {})
+        status_counts = {k: int(v) for k, v in status_item.items() if k not in ('PK', 'SK')}
+
+        result = {
+            'date': day,
+            'sales': get_daily_sales(day),
+            'statusCounts': status_counts
+        }
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps(result, default=str),
+            'headers': HEADERS
+        }
+
+    except Exception as e:
+        logger.exception("Error fetching order stats")
+        return {'statusCode': 500, 'body': json.dumps({'error': 'INTERNAL_ERROR', 'message': str(e)})}
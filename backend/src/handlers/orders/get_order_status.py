@@ -0,0 +1,99 @@
+"""
+Get Order Status Lambda Handler
+GET /orders/{id}/status - Version check and long poll on an order's status
+
+Reads the order's small status item (order_status_feed.py) instead of the
+order itself. ``version`` (or an ``If-None-Match`` header with the ETag of
+an earlier answer) makes it a version check: an unchanged status comes back
+as ``304`` with no body. Adding ``wait=<seconds>`` (at most MAX_WAIT_SECONDS)
+turns it into a long poll that answers as soon as the version changes.
+Clients that want pushes instead open a WebSocket with the ``watchToken``
+from the answer (see order_watch.py).
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from order_status_feed import issue_watch_token, status_key, status_view
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+WEBSOCKET_URL = os.environ.get('WEBSOCKET_URL')
+
+# HTTP API integrations time out after 30 s
+MAX_WAIT_SECONDS = 20
+POLL_INTERVAL_SECONDS = 1
+
+
+def response(status_code: int, body: Optional[Dict[str, Any]] = None, version: Optional[str] = None) -> Dict[str, Any]:
+    headers = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Cache-Control': 'no-cache'}
+    if version is not None:
+        headers['ETag'] = f'"{version}"'
+    return {'statusCode': status_code, 'body': json.dumps(body) if body is not None else '', 'headers': headers}
+
+
+def feed_status(user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+    """The order's status item, if the feed has one for this user's order."""
+    item = read_models_table.get_item(Key=status_key(order_id)).get('Item')
+    return status_view(item) if item and item.get('userId') == user_id else None
+
+
+@tracer.capture_method
+def current_status(user_id: str, order_id: str) -> Optional[Dict[str, Any]]:
+    view = feed_status(user_id, order_id)
+    if view is None:
+        # Orders whose status has not changed since the feed was deployed
+        order = orders_table.get_item(
+            Key={'PK': f'USER#{user_id}', 'SK': f'ORDER#{order_id}'},
+            ProjectionExpression='orderId, #status, updatedAt, createdAt',
+            ExpressionAttributeNames={'#status': 'status'}
+        ).get('Item')
+        view = status_view(order) if order else None
+    return view
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
+        order_id = event['pathParameters']['id']
+        params = event.get('queryStringParameters') or {}
+        headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+        known_version = params.get('version') or headers.get('if-none-match', '').strip('"') or None
+        try:
+            wait = max(0, min(int(params.get('wait', 0)), MAX_WAIT_SECONDS))
+        except ValueError:
+            return response(400, {'error': 'INVALID_REQUEST', 'message': 'wait must be a number of seconds'})
+
+        view = current_status(user_id, order_id)
+        if view is None:
+            return response(404, {'error': 'NOT_FOUND', 'message': 'Order not found'})
+
+        deadline = time.monotonic() + wait
+        while view['version'] == known_version and time.monotonic() + POLL_INTERVAL_SECONDS < deadline:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            view = feed_status(user_id, order_id) or view
+
+        if view['version'] == known_version:
+            return response(304, version=view['version'])
+        body = dict(view)
+        if WEBSOCKET_URL:
+            body.update(watchToken=issue_watch_token(order_id), websocketUrl=WEBSOCKET_URL)
+        return response(200, body, version=view['version'])
+
+    except Exception:
+        logger.exception("Error fetching order status")
+        return response(500, {'error': 'INTERNAL_ERROR', 'message': 'Failed to read order status'})
@@ -1,24 +1,122 @@
 """
 Get Orders Lambda Handler
 GET /orders - Get user's order history
+
+With ``view=summary`` the history is served from the monthly projections
+that project_orders.py maintains in ReadModelsTable: one query over a few
+month buckets instead of paging through every order item.
+
+Order IDs sort by creation time (order_ids.py), so the default view is a
+descending query on the order sort key: the first page holds the newest
+orders. ``since`` (inclusive) and ``until`` (exclusive) take ISO 8601 dates
+or date-times and narrow the query to a key range rather than filtering
+after the read.
+
+Orders created before the switch keep random ``ord-<hex>`` IDs until
+migrate_order_ids.py re-keys them, and those keys sort among and after the
+time-sortable ones. Every one of them is older than every sortable order,
+so while ``LEGACY_ORDER_IDS`` is on the sortable range is read first
+(legacy keys inside it are dropped) and the user's legacy orders follow,
+read together and sorted by ``createdAt``. Turn it off once the migration
+has re-keyed them all.
 """
 import json
 import os
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
 from boto3.dynamodb.conditions import Key
 
+import aws_clients
+import order_ids
+import profiling
+
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+ORDER_ATTR_PREFIX = 'ord_'
+LEGACY_ORDER_IDS = os.environ.get('LEGACY_ORDER_IDS', 'on') == 'on'
+
+
+def get_order_summaries(user_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Read the user's most recent monthly order projections."""
+    query_params = {
+        'KeyConditionExpression': Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('ORDERS#'),
+        'Limit': min(int(params.get('months', 3)), 12),
+        'ScanIndexForward': False
+    }
+    if params.get('nextToken'):
+        query_params['ExclusiveStartKey'] = json.loads(params['nextToken'])
+
+    response = read_models_table.query(**query_params)
+
+    orders = [
+        value
+        for bucket in response.get('Items', [])
+        for name, value in bucket.items()
+        if name.startswith(ORDER_ATTR_PREFIX)
+    ]
+    if params.get('status'):
+        orders = [order for order in orders if order.get('status') == params['status']]
+    orders.sort(key=lambda order: order.get('createdAt', ''), reverse=True)
+
+    result = {'orders': orders, 'count': len(orders), 'view': 'summary'}
+    if 'LastEvaluatedKey' in response:
+        result['nextToken'] = json.dumps(response['LastEvaluatedKey'])
+    return result
+
+
+def date_range(params: Dict[str, Any]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """The [since, until) bounds of the request. Raises ValueError."""
+    since = order_ids.parse_timestamp(params['since']) if params.get('since') else None
+    until = order_ids.parse_timestamp(params['until']) if params.get('until') else None
+    return since, until
+
+
+def order_key_condition(user_id: str, since: Optional[datetime], until: Optional[datetime]):
+    """Key condition for the user's time-sortable orders, limited to [since, until)."""
+    return Key('PK').eq(f'USER#{user_id}') & Key('SK').between(f'ORDER#{order_ids.lower_bound(since)}',
+                                                               f'ORDER#{order_ids.upper_bound(until)}')
+
+
+def legacy_page(user_id: str, since: Optional[datetime], until: Optional[datetime],
+                cursor: Optional[List[str]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[List[str]]]:
+    """Up to ``limit`` legacy-ID orders after ``cursor``, newest first, and the cursor for the next page.
+
+    An empty cursor starts from the newest legacy order; None is returned when nothing is left.
+    """
+    orders = []
+    query_params = {'KeyConditionExpression': Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('ORDER#')}
+    while True:
+        response = orders_table.query(**query_params)
+        for order in response.get('Items', []):
+            if order_ids.is_sortable(order.get('orderId', '')):
+                continue
+            created = order_ids.parse_timestamp(order['createdAt'])
+            if (since and created < since) or (until and created >= until):
+                continue
+            position = [order['createdAt'], order['orderId']]
+            if not cursor or position < cursor:
+                orders.append(order)
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    orders.sort(key=lambda order: (order['createdAt'], order['orderId']), reverse=True)
+    if len(orders) <= limit:
+        return orders, None
+    page = orders[:limit]
+    return page, [page[-1]['createdAt'], page[-1]['orderId']] if page else (cursor or [])
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
@@ -26,26 +124,59 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         user_id = event['requestContext']['authorizer']['jwt']['claims']['sub']
         params = event.get('queryStringParameters') or {}
         
-        limit = int(params.get('limit', 10))
-        
-        # Query orders for user
-        query_params = {
-            'KeyConditionExpression': Key('PK').eq(f'USER#{user_id}') & Key('SK').begins_with('ORDER#'),
-            'Limit': min(limit, 100),
-            'ScanIndexForward': False  # Most recent first
-        }
-        
-        response = orders_table.query(**query_params)
+        if params.get('view') == 'summary':
+            return {
+                'statusCode': 200,
+                'body': json.dumps(get_order_summaries(user_id, params), default=str),
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+            }
         
-        orders = response.get('Items', [])
+        limit = min(int(params.get('limit', 10)), 100)
+        try:
+            since, until = date_range(params)
+        except ValueError:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'INVALID_REQUEST', 'message': 'since and until must be ISO 8601 dates'}),
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+            }
+        token = json.loads(params['nextToken']) if params.get('nextToken') else None
+
+        orders: List[Dict[str, Any]] = []
+        next_token = None
+        in_legacy = bool(token) and 'legacy' in token
+        legacy_cursor = token['legacy'] if in_legacy else None
+        if not in_legacy:
+            # Query orders for user
+            query_params = {
+                'KeyConditionExpression': order_key_condition(user_id, since, until),
+                'Limit': limit,
+                'ScanIndexForward': False  # Most recent first
+            }
+            if token:
+                query_params['ExclusiveStartKey'] = token
+
+            response = orders_table.query(**query_params)
+
+            orders = [order for order in response.get('Items', []) if order_ids.is_sortable(order.get('orderId', ''))]
+            if 'LastEvaluatedKey' in response:
+                next_token = response['LastEvaluatedKey']
+
+        # Legacy orders are older than every sortable one: they come after the sortable range
+        if LEGACY_ORDER_IDS and next_token is None:
+            legacy, legacy_cursor = legacy_page(user_id, since, until, legacy_cursor, limit - len(orders))
+            orders += legacy
+            if legacy_cursor is not None:
+                next_token = {'legacy': legacy_cursor}
+
         result = {
             'orders': orders,
             'count': len(orders)
         }
-        
-        if 'LastEvaluatedKey' in response:
-            result['nextToken'] = json.dumps(response['LastEvaluatedKey'])
-        
+
+        if next_token:
+            result['nextToken'] = json.dumps(next_token, default=str)
+
         return {
             'statusCode': 200,
             'body': json.dumps(result, default=str),
@@ -0,0 +1,146 @@
+"""
+Migrate Order IDs Lambda Handler
+One-off job that re-keys orders created with random ``ord-<hex>`` IDs
+
+Each legacy order gets a time-sortable ID derived from its ``createdAt``
+(order_ids.order_id_at, seeded with the old ID so a rerun derives the same
+one). One transaction per order writes the order under ``ORDER#<newId>``
+with ``legacyOrderId`` set and both index sort keys rewritten, writes an
+``ALIAS#<oldId>`` item that get_order.py follows for old links, and deletes
+the old item on condition that it has not changed since it was scanned.
+project_orders.py sees the insert of an order carrying ``legacyOrderId`` as
+a rename and only moves its summary, so counters and sales are not counted
+twice.
+
+Open orders (pending, processing, pending_review) are skipped: their
+workflow still writes to ``ORDER#<oldId>``. Run the job again once they have
+settled. Invoke with ``{}``; a run that stops early returns ``nextKey``,
+which the next invocation takes as ``startKey``. ``{"dryRun": true}`` only
+counts.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr
+
+import aws_clients
+import order_ids
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+client = dynamodb.meta.client
+
+OPEN_STATUSES = {'pending', 'processing', 'pending_review'}
+PAGE_SIZE = 1000
+MIGRATE_WORKERS = 16
+# Stop with enough time left to finish the page in flight
+RESERVE_MS = 60000
+
+
+def migration_items(order: Dict[str, Any], migrated_at: str) -> List[Dict[str, Any]]:
+    """The three writes that move one legacy order to its time-sortable ID."""
+    legacy_id = order['orderId']
+    order_id = order_ids.order_id_at(order['createdAt'], legacy_id)
+    item = {**order, 'SK': f'ORDER#{order_id}', 'orderId': order_id,
+            'legacyOrderId': legacy_id, 'migratedAt': migrated_at}
+    for sort_key in ('GSI1SK', 'GSI2SK'):
+        if sort_key in item:
+            item[sort_key] = f"{order['createdAt']}#{order_id}"
+
+    names = {'#status': 'status'}
+    values = {':status': order.get('status')}
+    condition = 'attribute_exists(PK) AND #status = :status'
+    if 'updatedAt' in order:
+        names['#updatedAt'] = 'updatedAt'
+        values[':updatedAt'] = order['updatedAt']
+        condition += ' AND #updatedAt = :updatedAt'
+
+    return [
+        {'Put': {'TableName': orders_table.name, 'Item': item, 'ConditionExpression': 'attribute_not_exists(PK)'}},
+        {'Put': {'TableName': orders_table.name, 'Item': {
+            'PK': order['PK'], 'SK': f'{order_ids.ALIAS_SK_PREFIX}{legacy_id}',
+            'orderId': order_id, 'createdAt': order['createdAt']
+        }}},
+        {'Delete': {
+            'TableName': orders_table.name,
+            'Key': {'PK': order['PK'], 'SK': order['SK']},
+            'ConditionExpression': condition,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }}
+    ]
+
+
+def migrate(order: Dict[str, Any], migrated_at: str) -> str:
+    try:
+        client.transact_write_items(TransactItems=migration_items(order, migrated_at))
+        return 'migrated'
+    except client.exceptions.TransactionCanceledException:
+        # Changed since the scan (or already migrated); the next run sees its current state
+        return 'conflicts'
+
+
+@tracer.capture_method
+def migrate_page(orders: List[Dict[str, Any]], migrated_at: str, dry_run: bool) -> Dict[str, int]:
+    stats = {'migrated': 0, 'skippedOpen': 0, 'conflicts': 0}
+    legacy = [order for order in orders if not order_ids.is_sortable(order['orderId'])]
+    ready = [order for order in legacy if order.get('status') not in OPEN_STATUSES]
+    stats['skippedOpen'] = len(legacy) - len(ready)
+    if dry_run:
+        stats['migrated'] = len(ready)
+    elif ready:
+        with ThreadPoolExecutor(max_workers=min(MIGRATE_WORKERS, len(ready))) as pool:
+            for outcome in pool.map(lambda order: migrate(order, migrated_at), ready):
+                stats[outcome] += 1
+    return stats
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    migrated_at = datetime.utcnow().isoformat() + 'Z'
+    dry_run = bool(event.get('dryRun'))
+    scan_params = {
+        'FilterExpression': Attr('SK').begins_with('ORDER#'),
+        'Limit': PAGE_SIZE
+    }
+    if event.get('startKey'):
+        scan_params['ExclusiveStartKey'] = json.loads(event['startKey'])
+    stats = {'migrated': 0, 'skippedOpen': 0, 'conflicts': 0}
+    next_key = None
+
+    while True:
+        response = orders_table.scan(**scan_params)
+        for name, value in migrate_page(response.get('Items', []), migrated_at, dry_run).items():
+            stats[name] += value
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        if context.get_remaining_time_in_millis() <= RESERVE_MS:
+            next_key = json.dumps(response['LastEvaluatedKey'], default=str)
+            logger.info("Order ID migration stopping early; invoke again with startKey")
+            break
+
+    metrics.add_metric(name='OrdersRekeyed', unit=MetricUnit.Count, value=stats['migrated'] if not dry_run else 0)
+    metrics.add_metric(name='OrdersRekeySkipped', unit=MetricUnit.Count, value=stats['skippedOpen'])
+    logger.info("Order ID migration run complete", extra={**stats, 'dryRun': dry_run})
+
+    result = {**stats, 'dryRun': dry_run}
+    if next_key:
+        result['nextKey'] = next_key
+    return result
@@ -0,0 +1,69 @@
+"""
+Order archive format shared by archive_orders.py and get_order.py
+
+Archived orders live in the orders archive bucket as gzipped JSON Lines,
+partitioned by order month so Athena/Glue can prune on it:
+
+    orders/year=YYYY/month=MM/part-<first orderId>.jsonl.gz
+
+Every order is written as its own gzip member. Concatenated members are
+still one valid gzip stream for bulk readers, and a single order can be
+fetched with a byte-range GET and decompressed on its own. Where each order
+went is recorded in a small stub item left in OrdersTable
+(``USER#<userId>`` / ``ARCHIVE#<orderId>``) that carries no index keys.
+"""
+import gzip
+import json
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+
+ARCHIVE_SK_PREFIX = 'ARCHIVE#'
+
+
+def partition(created_at: str) -> str:
+    """Object key prefix for an order created at ``created_at`` (ISO 8601)."""
+    return f'orders/year={created_at[:4]}/month={created_at[5:7]}'
+
+
+def _number(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def pack(orders: List[Dict[str, Any]]) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """One object body for ``orders`` and the (offset, length) of each order in it."""
+    members, ranges, offset = [], [], 0
+    for order in orders:
+        line = json.dumps(order, default=_number, separators=(',', ':')) + '\n'
+        member = gzip.compress(line.encode(), mtime=0)
+        members.append(member)
+        ranges.append((offset, len(member)))
+        offset += len(member)
+    return b''.join(members), ranges
+
+
+def stub(order: Dict[str, Any], key: str, offset: int, length: int, archived_at: str) -> Dict[str, Any]:
+    """The hot-table item that replaces an archived order."""
+    return {
+        'PK': order['PK'],
+        'SK': f"{ARCHIVE_SK_PREFIX}{order['orderId']}",
+        'orderId': order['orderId'],
+        'createdAt': order.get('createdAt', ''),
+        'status': order.get('status', ''),
+        'archivedAt': archived_at,
+        'archive': {'key': key, 'offset': offset, 'length': length}
+    }
+
+
+def read(s3: Any, bucket: str, archive_stub: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch one archived order with a byte-range GET.
+
+    Numbers come back as Decimal, as they would from DynamoDB.
+    """
+    location = archive_stub['archive']
+    start = int(location['offset'])
+    response = s3.get_object(Bucket=bucket, Key=location['key'],
+                             Range=f"bytes={start}-{start + int(location['length']) - 1}")
+    line = gzip.decompress(response['Body'].read())
+    return json.loads(line, parse_float=Decimal, parse_int=Decimal)
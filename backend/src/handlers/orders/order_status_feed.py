@@ -0,0 +1,117 @@
+"""
+Order status feed shared by the push and long-poll handlers
+
+project_orders.py keeps one small item per order in ReadModelsTable
+with the order's status and ``version`` (the order's ``updatedAt`` at the
+last status change). get_order_status.py answers version checks and long
+polls from it, and order_watch.py registers WebSocket connections that
+project_orders.py pushes each transition to.
+
+Keys in ReadModelsTable:
+    PK: ORDERSTATUS#<orderId>    SK: STATUS                   status, version, userId, expiresAt
+    PK: WATCH#<orderId>          SK: CONNECTION#<connId>      expiresAt
+    PK: CONNECTION#<connId>      SK: WATCH                    orderId, expiresAt
+
+WebSocket clients connect with a watch token from GET /orders/{id}/status
+instead of a Cognito JWT (browsers cannot set headers on a WebSocket
+handshake). Tokens are HMAC-signed like guest cart sessions, so checking
+one costs no read.
+
+Token format: ``<orderId>.<expiresAt>.<signature>``
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from boto3.dynamodb.conditions import Key
+
+STATUS_PK_PREFIX = 'ORDERSTATUS#'
+WATCH_PK_PREFIX = 'WATCH#'
+CONNECTION_PK_PREFIX = 'CONNECTION#'
+# Status items outlive the window in which anyone watches an order
+STATUS_TTL_SECONDS = 7 * 24 * 3600
+# API Gateway closes WebSocket connections after two hours
+CONNECTION_TTL_SECONDS = 2 * 3600
+WATCH_TOKEN_TTL_SECONDS = 15 * 60
+
+_secret: Optional[bytes] = None
+
+
+def _get_secret() -> bytes:
+    """Load the signing secret once per container."""
+    global _secret
+    if _secret is None:
+        secret = os.environ.get('ORDER_WATCH_SECRET')
+        if not secret:
+            raise RuntimeError('ORDER_WATCH_SECRET environment variable is not set')
+        _secret = secret.encode('utf-8')
+    return _secret
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(_get_secret(), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+
+def issue_watch_token(order_id: str, now: Optional[int] = None) -> str:
+    expires_at = int(now if now is not None else time.time()) + WATCH_TOKEN_TTL_SECONDS
+    payload = f'{order_id}.{expires_at}'
+    return f'{payload}.{_sign(payload)}'
+
+
+def verify_watch_token(token: Optional[str], now: Optional[int] = None) -> Optional[str]:
+    """The order a watch token is for, or None if it is malformed, forged or expired."""
+    if not token or token.count('.') != 2:
+        return None
+    order_id, expires_at, signature = token.split('.')
+    if not expires_at.isdigit() or not hmac.compare_digest(signature, _sign(f'{order_id}.{expires_at}')):
+        return None
+    if int(expires_at) <= int(now if now is not None else time.time()):
+        return None
+    return order_id
+
+
+def status_key(order_id: str) -> Dict[str, str]:
+    return {'PK': f'{STATUS_PK_PREFIX}{order_id}', 'SK': 'STATUS'}
+
+
+def status_view(order: Dict[str, Any]) -> Dict[str, Any]:
+    """What the feed tells clients about an order (status item or full order)."""
+    return {'orderId': order['orderId'], 'status': order.get('status', 'pending'),
+            'version': order.get('version') or order.get('updatedAt') or order.get('createdAt', '')}
+
+
+class ConnectionStore:
+    """WebSocket connections watching orders, kept in ReadModelsTable."""
+
+    def __init__(self, table: Any):
+        self.table = table
+
+    def add(self, order_id: str, connection_id: str, now: Optional[int] = None) -> None:
+        expires_at = int(now if now is not None else time.time()) + CONNECTION_TTL_SECONDS
+        with self.table.batch_writer() as batch:
+            batch.put_item(Item={'PK': f'{WATCH_PK_PREFIX}{order_id}', 'SK': f'{CONNECTION_PK_PREFIX}{connection_id}',
+                                 'expiresAt': expires_at})
+            batch.put_item(Item={'PK': f'{CONNECTION_PK_PREFIX}{connection_id}', 'SK': 'WATCH',
+                                 'orderId': order_id, 'expiresAt': expires_at})
+
+    def remove(self, connection_id: str, order_id: Optional[str] = None) -> None:
+        """Forget a connection; without ``order_id`` it is looked up first."""
+        if order_id is None:
+            item = self.table.get_item(Key={'PK': f'{CONNECTION_PK_PREFIX}{connection_id}', 'SK': 'WATCH'}).get('Item')
+            if item is None:
+                return
+            order_id = item['orderId']
+        with self.table.batch_writer() as batch:
+            batch.delete_item(Key={'PK': f'{WATCH_PK_PREFIX}{order_id}',
+                                   'SK': f'{CONNECTION_PK_PREFIX}{connection_id}'})
+            batch.delete_item(Key={'PK': f'{CONNECTION_PK_PREFIX}{connection_id}', 'SK': 'WATCH'})
+
+    def connections(self, order_id: str) -> List[str]:
+        """IDs of the connections watching an order."""
+        response = self.table.query(KeyConditionExpression=Key('PK').eq(f'{WATCH_PK_PREFIX}{order_id}'),
+                                    ProjectionExpression='SK')
+        return [item['SK'][len(CONNECTION_PK_PREFIX):] for item in response.get('Items', [])]
@@ -0,0 +1,52 @@
+"""
+Order Watch Lambda Handler
+WebSocket $connect/$disconnect for the order status push channel
+
+Clients connect to ``<websocketUrl>?token=<watchToken>`` with the token from
+GET /orders/{id}/status. The token is checked with an HMAC only and the
+connection is recorded against its order in the connection store
+(order_status_feed.ConnectionStore); project_orders.py then pushes
+``{"type": "orderStatus", "orderId", "status", "version"}`` messages to it.
+A transition that lands between the status read and the connect is not
+pushed, so clients should make one version check after connecting.
+"""
+import os
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from order_status_feed import ConnectionStore, verify_watch_token
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+store = ConnectionStore(dynamodb.Table(os.environ['READ_MODELS_TABLE']))
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    route = event['requestContext']['routeKey']
+    connection_id = event['requestContext']['connectionId']
+
+    if route == '$connect':
+        token = (event.get('queryStringParameters') or {}).get('token')
+        order_id = verify_watch_token(token)
+        if order_id is None:
+            # Rejects the handshake
+            return {'statusCode': 401}
+        store.add(order_id, connection_id)
+        logger.info("Watching order", extra={'orderId': order_id, 'connectionId': connection_id})
+        return {'statusCode': 200}
+
+    if route == '$disconnect':
+        store.remove(connection_id)
+        return {'statusCode': 200}
+
+    return {'statusCode': 400}
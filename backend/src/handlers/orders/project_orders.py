@@ -0,0 +1,355 @@
+"""
+Project Orders Lambda Handler
+OrdersTable stream consumer that maintains read-optimized projections in ReadModelsTable
+
+Projections:
+    PK: USER#<userId>     SK: ORDERS#<yyyy-mm>     one ord_<orderId> attribute per order (compact summary)
+    PK: SALES#<yyyy-mm-dd> SK: PRODUCT#<productId> units, revenueCents
+    PK: SALES#<yyyy-mm-dd> SK: CATEGORY#<category> units, revenueCents
+    PK: SALES#<yyyy-mm-dd> SK: TOTAL               orders, units, revenueCents
+    PK: STATS             SK: ORDER_STATUS        one counter per order status
+    PK: RANK#<kind>#<epoch>#<shard> SK: PRODUCT#<productId>  decayed sales score (product_rankings.py)
+    PK: ORDERSTATUS#<orderId>       SK: STATUS               status feed item (order_status_feed.py)
+
+Deltas for a batch are aggregated per projection item and committed with
+TransactWriteItems together with one EVENT#<eventID> marker per stream
+record. A replayed record fails its marker condition and is dropped, so the
+counters are applied exactly once. If a chunk cannot be committed the
+handler reports the first record of that chunk as failed, which checkpoints
+the stream just before it.
+
+The ranking counters behind GET /products?sort=popular|trending are
+maintained here too, so one stream reader serves every projection: a paid
+line adds its forward-decayed units to the product's ``popular`` and
+``trending`` counters, weighted by the order's ``createdAt``, and a paid
+order that is cancelled or refunded takes them back. materialize_rankings.py
+turns the counters into top-K lists.
+
+The order status feed rides on the same reader. Every writer of an order's
+status (checkout, the workflows' UpdateOrderStatus steps, the queue
+processor, reconciliation) shows up on the stream; a status change
+overwrites the order's status item in the transaction and, once the chunk
+is committed and when WEBSOCKET_ENDPOINT is set, is pushed to every
+WebSocket connection watching the order. Pushes are best effort (a retried
+batch skips committed records), and connections that have gone away are
+removed from the store.
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import order_ids
+import product_rankings
+import profiling
+from order_status_feed import STATUS_TTL_SECONDS, ConnectionStore, status_key, status_view
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+PUSH_WORKERS = 16
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=PUSH_WORKERS)
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+client = dynamodb.meta.client
+store = ConnectionStore(read_models_table)
+WEBSOCKET_ENDPOINT = os.environ.get('WEBSOCKET_ENDPOINT')
+connections_api = (aws_clients.client('apigatewaymanagementapi', 'batch', pool_size=PUSH_WORKERS,
+                                      endpoint_url=WEBSOCKET_ENDPOINT) if WEBSOCKET_ENDPOINT else None)
+deserializer = TypeDeserializer()
+
+# Orders count towards sales once payment has gone through
+PAID_STATUSES = {'processing', 'confirmed', 'shipped', 'delivered'}
+ORDER_ATTR_PREFIX = 'ord_'
+MAX_TRANSACT_ITEMS = 100
+MAX_COMMIT_ATTEMPTS = 4
+# Stream records are retained for 24 hours; markers only need to outlive that
+MARKER_TTL_SECONDS = 2 * 24 * 3600
+
+
+def deserialize(image: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a stream image from DynamoDB JSON to Python values."""
+    return {k: deserializer.deserialize(v) for k, v in (image or {}).items()}
+
+
+def to_cents(value: Any) -> int:
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def order_summary(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact per-order entry stored in the user's monthly projection."""
+    totals = order.get('totals', {})
+    return {
+        'orderId': order['orderId'],
+        'status': order.get('status', 'pending'),
+        'total': totals.get('total', 0),
+        'currency': totals.get('currency', 'USD'),
+        'itemCount': sum(int(item.get('quantity', 0)) for item in order.get('items', [])),
+        'createdAt': order.get('createdAt', ''),
+        'updatedAt': order.get('updatedAt', '')
+    }
+
+
+class Deltas:
+    """Aggregated updates for one transaction: SET attributes and ADD counters per projection key."""
+
+    def __init__(self):
+        self.sets: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.removes: Dict[Tuple[str, str], set] = {}
+        self.adds: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def keys(self) -> set:
+        return set(self.sets) | set(self.removes) | set(self.adds)
+
+    def set(self, key, attr, value):
+        self.sets.setdefault(key, {})[attr] = value
+        self.removes.get(key, set()).discard(attr)
+
+    def remove(self, key, attr):
+        self.sets.get(key, {}).pop(attr, None)
+        self.removes.setdefault(key, set()).add(attr)
+
+    def add(self, key, attr, amount):
+        if amount:
+            counters = self.adds.setdefault(key, {})
+            counters[attr] = counters.get(attr, 0) + amount
+
+    def add_sales(self, order: Dict[str, Any], sign: int):
+        day = order.get('createdAt', '')[:10]
+        units_total = 0
+        revenue_total = 0
+        for item in order.get('items', []):
+            units = int(item.get('quantity', 0))
+            revenue = to_cents(item.get('price', 0)) * units
+            units_total += units
+            revenue_total += revenue
+            for sk in (f"PRODUCT#{item['productId']}", f"CATEGORY#{item.get('category', 'uncategorized')}"):
+                self.add((f'SALES#{day}', sk), 'units', sign * units)
+                self.add((f'SALES#{day}', sk), 'revenueCents', sign * revenue)
+        self.add((f'SALES#{day}', 'TOTAL'), 'orders', sign)
+        self.add((f'SALES#{day}', 'TOTAL'), 'units', sign * units_total)
+        self.add((f'SALES#{day}', 'TOTAL'), 'revenueCents', sign * revenue_total)
+
+    def add_rankings(self, order: Dict[str, Any], sign: int):
+        try:
+            created_at = order_ids.parse_timestamp(order.get('createdAt', ''))
+        except ValueError:
+            logger.warning("Order without a usable createdAt", extra={'orderId': order.get('orderId')})
+            return
+        for item in order.get('items', []):
+            units = int(item.get('quantity', 0))
+            product_id = item['productId']
+            for kind in product_rankings.HALF_LIVES:
+                epoch = product_rankings.epoch_of(kind, created_at)
+                key = (product_rankings.counter_pk(kind, epoch, product_rankings.shard(product_id)),
+                       f'PRODUCT#{product_id}')
+                self.add(key, 'score',
+                         product_rankings.to_decimal(sign * units * product_rankings.weight(kind, epoch, created_at)))
+                self.set(key, 'productId', product_id)
+                self.set(key, 'category', item.get('category') or 'uncategorized')
+                # Counters stop being read once a newer epoch has started and ended
+                self.set(key, 'expiresAt', epoch + 3 * product_rankings.epoch_seconds(kind))
+
+
+def collect(record: Dict[str, Any], deltas: Deltas) -> None:
+    """Fold one stream record into the pending deltas."""
+    old = deserialize(record['dynamodb'].get('OldImage'))
+    new = deserialize(record['dynamodb'].get('NewImage'))
+    order = new or old
+    if not order.get('orderId') or not order.get('SK', '').startswith('ORDER#'):
+        return
+    if not new:
+        # Orders only leave OrdersTable when archive_orders.py moves them to S3;
+        # their projections keep describing them
+        return
+
+    user_key = (f"USER#{order['userId']}", f"ORDERS#{order.get('createdAt', '')[:7]}")
+    attr = f"{ORDER_ATTR_PREFIX}{order['orderId']}"
+    old_status = old.get('status') if old else None
+    new_status = new.get('status')
+
+    deltas.set(user_key, attr, order_summary(new))
+    if new_status != old_status:
+        feed_key = tuple(status_key(order['orderId']).values())
+        view = {**status_view(new), 'userId': new.get('userId'), 'expiresAt': int(time.time()) + STATUS_TTL_SECONDS}
+        for name, value in view.items():
+            deltas.set(feed_key, name, value)
+    if not old and new.get('legacyOrderId'):
+        # migrate_order_ids.py re-keyed an order that is already counted: only its summary moves
+        deltas.remove(user_key, f"{ORDER_ATTR_PREFIX}{new['legacyOrderId']}")
+        return
+    if not old:
+        deltas.add(user_key, 'orderCount', 1)
+
+    if old_status != new_status:
+        if old_status:
+            deltas.add(('STATS', 'ORDER_STATUS'), old_status, -1)
+        if new_status:
+            deltas.add(('STATS', 'ORDER_STATUS'), new_status, 1)
+
+    was_paid = old_status in PAID_STATUSES
+    is_paid = new_status in PAID_STATUSES
+    if is_paid and not was_paid:
+        deltas.add_sales(new, 1)
+        deltas.add_rankings(new, 1)
+    elif was_paid and not is_paid:
+        deltas.add_sales(old, -1)
+        deltas.add_rankings(old, -1)
+
+
+def build_update(key: Tuple[str, str], deltas: Deltas) -> Dict[str, Any]:
+    """One TransactWriteItems Update combining every SET/REMOVE/ADD for a projection item."""
+    names, values, clauses = {}, {}, {'SET': [], 'REMOVE': [], 'ADD': []}
+    for i, (attr, value) in enumerate(deltas.sets.get(key, {}).items()):
+        names[f'#s{i}'] = attr
+        values[f':s{i}'] = value
+        clauses['SET'].append(f'#s{i} = :s{i}')
+    for i, attr in enumerate(deltas.removes.get(key, ())):
+        names[f'#r{i}'] = attr
+        clauses['REMOVE'].append(f'#r{i}')
+    for i, (attr, amount) in enumerate(deltas.adds.get(key, {}).items()):
+        names[f'#a{i}'] = attr
+        values[f':a{i}'] = amount
+        clauses['ADD'].append(f'#a{i} :a{i}')
+
+    update = {
+        'TableName': read_models_table.name,
+        'Key': {'PK': key[0], 'SK': key[1]},
+        'UpdateExpression': ' '.join(f"{verb} {', '.join(parts)}" for verb, parts in clauses.items() if parts),
+        'ExpressionAttributeNames': names
+    }
+    if values:
+        update['ExpressionAttributeValues'] = values
+    return {'Update': update}
+
+
+def marker(record: Dict[str, Any], expires_at: int) -> Dict[str, Any]:
+    return {
+        'Put': {
+            'TableName': read_models_table.name,
+            'Item': {'PK': f"EVENT#{record['eventID']}", 'SK': 'EVENT', 'expiresAt': expires_at},
+            'ConditionExpression': 'attribute_not_exists(PK)'
+        }
+    }
+
+
+@tracer.capture_method
+def commit(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply a chunk of records exactly once; returns the records that were new.
+
+    Records whose marker already exists are duplicates from a retried batch
+    and are dropped before the transaction is retried.
+    """
+    for attempt in range(MAX_COMMIT_ATTEMPTS):
+        if not records:
+            return []
+        deltas = Deltas()
+        for record in records:
+            collect(record, deltas)
+
+        expires_at = int(time.time()) + MARKER_TTL_SECONDS
+        transact_items = [marker(record, expires_at) for record in records]
+        transact_items += [build_update(key, deltas) for key in deltas.keys()]
+        try:
+            client.transact_write_items(TransactItems=transact_items)
+            return records
+        except client.exceptions.TransactionCanceledException as e:
+            reasons = e.response.get('CancellationReasons', [])
+            duplicates = {
+                i for i, reason in enumerate(reasons[:len(records)])
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            }
+            if duplicates:
+                logger.info("Dropping replayed stream records", extra={'count': len(duplicates)})
+                records = [record for i, record in enumerate(records) if i not in duplicates]
+            else:
+                time.sleep(0.05 * 2 ** attempt)
+    raise RuntimeError('Projection transaction kept conflicting')
+
+
+def chunk_records(records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split records so each chunk's markers plus projection updates fit in one transaction."""
+    chunks, current, keys = [], [], set()
+    for record in records:
+        record_deltas = Deltas()
+        collect(record, record_deltas)
+        record_keys = record_deltas.keys()
+        if current and len(current) + 1 + len(keys | record_keys) > MAX_TRANSACT_ITEMS:
+            chunks.append(current)
+            current, keys = [], set()
+        current.append(record)
+        keys |= record_keys
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def push(order_id: str, connection_id: str, message: bytes) -> bool:
+    """Send one message; returns False if the connection is gone (and forgets it) or the post failed."""
+    try:
+        connections_api.post_to_connection(ConnectionId=connection_id, Data=message)
+        return True
+    except connections_api.exceptions.GoneException:
+        store.remove(connection_id, order_id)
+        return False
+    except Exception:
+        logger.warning("Order status push failed", extra={'orderId': order_id}, exc_info=True)
+        return False
+
+
+@tracer.capture_method
+def publish(records: List[Dict[str, Any]]) -> None:
+    """Push the status changes in committed records to the connections watching each order."""
+    changes = {}
+    for record in records:
+        old = deserialize(record['dynamodb'].get('OldImage'))
+        new = deserialize(record['dynamodb'].get('NewImage'))
+        if new.get('orderId') and new.get('SK', '').startswith('ORDER#') and new.get('status') != old.get('status'):
+            # Later records for the same order win
+            changes[new['orderId']] = new
+
+    deliveries = []
+    if connections_api:
+        for order in changes.values():
+            message = json.dumps({'type': 'orderStatus', **status_view(order)}).encode()
+            deliveries += [(order['orderId'], connection_id, message)
+                           for connection_id in store.connections(order['orderId'])]
+    with ThreadPoolExecutor(max_workers=PUSH_WORKERS) as executor:
+        delivered = sum(executor.map(lambda delivery: push(*delivery), deliveries))
+
+    metrics.add_metric(name='OrderStatusChangesPublished', unit=MetricUnit.Count, value=len(changes))
+    metrics.add_metric(name='OrderStatusPushes', unit=MetricUnit.Count, value=delivered)
+    metrics.add_metric(name='OrderStatusStaleConnections', unit=MetricUnit.Count, value=len(deliveries) - delivered)
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    records = event.get('Records', [])
+    applied: List[Dict[str, Any]] = []
+    for chunk in chunk_records(records):
+        try:
+            applied += commit(chunk)
+        except Exception:
+            logger.exception("Failed to apply projection chunk")
+            publish(applied)
+            # Checkpoint just before the first record of the failed chunk
+            return {'batchItemFailures': [{'itemIdentifier': chunk[0]['dynamodb']['SequenceNumber']}]}
+
+    publish(applied)
+    metrics.add_metric(name='OrderProjectionRecordsApplied', unit=MetricUnit.Count, value=len(applied))
+    metrics.add_metric(name='OrderProjectionRecordsSkipped', unit=MetricUnit.Count, value=len(records) - len(applied))
+    return {'batchItemFailures': []}
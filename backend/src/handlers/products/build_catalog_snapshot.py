@@ -0,0 +1,77 @@
+"""
+Build Catalog Snapshot Lambda Handler
+Scheduled job that exports the active products to a memory-mappable snapshot
+
+Reads every active product from StatusIndex, writes the snapshot format
+described in catalog_snapshot.py to /tmp, uploads it under
+``catalog/snapshots/<version>.snap`` and then moves the ``catalog/latest.json``
+pointer to it. ``builtAt`` in the pointer is when the export started:
+readers apply every delta row catalog_deltas.py wrote from then on, so
+changes made while the export ran are not lost. Old snapshots expire
+through the bucket's lifecycle rule; containers that still map one keep
+their local copy.
+"""
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+import catalog_snapshot
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+s3 = aws_clients.client('s3', 'batch')
+CATALOG_BUCKET = os.environ['CATALOG_BUCKET']
+WORK_DIR = os.environ.get('CATALOG_WORK_DIR', '/tmp')
+
+
+@tracer.capture_method
+def active_products():
+    """Every active product, read from StatusIndex."""
+    query_params = {'IndexName': 'StatusIndex', 'KeyConditionExpression': Key('GSI2PK').eq('STATUS#active')}
+    while True:
+        response = table.query(**query_params)
+        for product in response.get('Items', []):
+            yield product['productId'], catalog_snapshot.entry(product)
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    started = datetime.utcnow()
+    version = started.strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(WORK_DIR, f'catalog-build-{version}.snap')
+    key = f'{catalog_snapshot.SNAPSHOT_PREFIX}{version}.snap'
+    try:
+        stats = catalog_snapshot.write(path, active_products())
+        s3.upload_file(path, CATALOG_BUCKET, key)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    pointer = {'version': version, 'key': key, 'builtAt': started.isoformat() + 'Z', **stats}
+    s3.put_object(Bucket=CATALOG_BUCKET, Key=catalog_snapshot.POINTER_KEY, Body=json.dumps(pointer),
+                  ContentType='application/json', CacheControl='no-cache')
+
+    metrics.add_metric(name='CatalogSnapshotProducts', unit=MetricUnit.Count, value=stats['products'])
+    metrics.add_metric(name='CatalogSnapshotBytes', unit=MetricUnit.Bytes, value=stats['bytes'])
+    logger.info("Catalog snapshot published", extra=pointer)
+    return pointer
@@ -0,0 +1,70 @@
+"""
+Bulk Update Products Lambda Handler
+POST /admin/products/bulk - Apply inventory, price and status changes to many products (Admin only)
+
+Body: ``{"changes": [{productId, inventory?, price?, status?, expectedUpdatedAt?}],
+"ifUnmodifiedSince"?: ISO timestamp}``. Rows are applied independently (see
+product_changes.py), so one stale or unknown product does not fail the
+request; the response carries a count per outcome and one compact result
+per row instead of the updated items.
+"""
+import json
+import os
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from product_changes import UPDATE_WORKERS, apply_changes
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive', pool_size=UPDATE_WORKERS)
+table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+
+# Larger syncs go through the S3 import (import_product_updates.py)
+MAX_ROWS = 1000
+
+
+def error(status_code: int, code: str, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({'error': code, 'message': message})
+    }
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        return error(400, 'INVALID_JSON', 'Request body is not valid JSON')
+
+    changes = body.get('changes') if isinstance(body, dict) else None
+    if not isinstance(changes, list) or not changes:
+        return error(400, 'INVALID_REQUEST', 'changes must be a non-empty list')
+    if len(changes) > MAX_ROWS:
+        return error(400, 'TOO_MANY_CHANGES', f'At most {MAX_ROWS} changes per request; use the S3 import for more')
+
+    try:
+        outcome = apply_changes(dynamodb.meta.client, table.name, changes, body.get('ifUnmodifiedSince'))
+    except Exception:
+        logger.exception("Error applying bulk product changes")
+        return error(500, 'INTERNAL_ERROR', 'An error occurred while updating products')
+
+    logger.info("Bulk product update", extra={'summary': outcome['summary']})
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps(outcome),
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        }
+    }
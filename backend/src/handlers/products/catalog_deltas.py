@@ -0,0 +1,69 @@
+"""
+Catalog Deltas Lambda Handler
+ProductsTable stream consumer that records product changes for the catalog snapshot readers
+
+Each changed product gets a row in ReadModelsTable under ``CATALOG#DELTAS``
+with sort key ``<writtenAt>#<productId>``, holding the new item (no
+``product`` attribute when it was removed). catalog_snapshot.Catalog reads
+the rows written since its snapshot was built and lets them override the
+snapshot, so readers see changes within seconds rather than at the next
+snapshot build. Rows expire after two days; snapshots are rebuilt hourly.
+"""
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import catalog_snapshot
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+deserializer = TypeDeserializer()
+
+DELTA_TTL_SECONDS = 2 * 24 * 3600
+
+
+def deserialize(image: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert a stream image from DynamoDB JSON to Python values."""
+    return {k: deserializer.deserialize(v) for k, v in (image or {}).items()}
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    changes = {}
+    for record in event.get('Records', []):
+        new = deserialize(record['dynamodb'].get('NewImage'))
+        old = deserialize(record['dynamodb'].get('OldImage'))
+        product_id = (new or old).get('productId')
+        if product_id:
+            # Later records for the same product win
+            changes[product_id] = new if record['eventName'] != 'REMOVE' else None
+
+    written_at = datetime.utcnow().isoformat() + 'Z'
+    expires_at = int(time.time()) + DELTA_TTL_SECONDS
+    with read_models_table.batch_writer() as batch:
+        for product_id, product in changes.items():
+            row = {'PK': catalog_snapshot.DELTAS_PK, 'SK': f'{written_at}#{product_id}',
+                   'productId': product_id, 'expiresAt': expires_at}
+            if product is not None:
+                row['product'] = product
+            batch.put_item(Item=row)
+
+    metrics.add_metric(name='CatalogDeltasWritten', unit=MetricUnit.Count, value=len(changes))
+    return {'products': len(changes)}
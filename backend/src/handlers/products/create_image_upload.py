@@ -0,0 +1,92 @@
+"""
+Create Image Upload Lambda Handler
+POST /products/{id}/images - Presigned upload for a product image (Admin only)
+
+Returns a presigned S3 POST for ``uploads/<productId>/<imageId>.<ext>`` in
+ProductImagesBucket. The policy pins the content type and caps the size, so
+S3 itself rejects oversized uploads. Once the object lands,
+images/process_image.py generates the resized variants and attaches them
+to the product.
+"""
+import json
+import os
+import uuid
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from request_models import IMAGE_EXTENSIONS, MAX_IMAGE_FILE_SIZE, ImageUploadRequest, RequestError, parse_body
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
+table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+s3 = aws_clients.client('s3', 'interactive')
+
+PRODUCT_IMAGES_BUCKET = os.environ['PRODUCT_IMAGES_BUCKET']
+PRESIGNED_URL_EXPIRATION = int(os.environ.get('PRESIGNED_URL_EXPIRATION', '300'))
+
+
+def error(status_code: int, code: str, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({'error': code, 'message': message})
+    }
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        product_id = event['pathParameters']['id']
+        try:
+            content_type = parse_body(ImageUploadRequest, event)['contentType']
+        except RequestError as e:
+            return e.response()
+
+        product = table.get_item(
+            Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'},
+            ProjectionExpression='PK'
+        ).get('Item')
+        if not product:
+            return error(404, 'PRODUCT_NOT_FOUND', f'Product {product_id} not found')
+
+        image_id = uuid.uuid4().hex[:16]
+        key = f'uploads/{product_id}/{image_id}.{IMAGE_EXTENSIONS[content_type]}'
+        upload = s3.generate_presigned_post(
+            Bucket=PRODUCT_IMAGES_BUCKET,
+            Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, MAX_IMAGE_FILE_SIZE]
+            ],
+            ExpiresIn=PRESIGNED_URL_EXPIRATION
+        )
+
+        logger.info("Image upload prepared", extra={'product_id': product_id, 'key': key})
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'imageId': image_id,
+                'key': key,
+                'uploadUrl': upload['url'],
+                'fields': upload['fields'],
+                'expiresIn': PRESIGNED_URL_EXPIRATION
+            }),
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            }
+        }
+
+    except Exception:
+        logger.exception("Error creating image upload")
+        return error(500, 'INTERNAL_ERROR', 'An error occurred while preparing the upload')
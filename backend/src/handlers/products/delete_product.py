@@ -1,38 +1,66 @@
 """
 Delete Product Lambda Handler
 DELETE /products/{id} - Delete a product (Admin only)
+
+Products are soft-deleted: historical order lines and carts keep pointing at
+the item, so it stays in the table with status ``deleted``. The same update
+drops it from CategoryIndex (GSI1 keys removed) and moves it to the
+``STATUS#deleted`` partition of StatusIndex, so storefront queries never
+read it again. Deleting an already deleted product succeeds.
 """
 import json
 import os
+from datetime import datetime
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import profiling
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
 
+DELETED_STATUS = 'deleted'
+
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
         product_id = event['pathParameters']['id']
+        timestamp = datetime.utcnow().isoformat() + 'Z'
         
-        # Delete from DynamoDB
-        table.delete_item(
-            Key={
-                'PK': f'PRODUCT#{product_id}',
-                'SK': 'METADATA'
-            }
-        )
-        
-        logger.info(f"Product deleted: {product_id}")
+        try:
+            table.update_item(
+                Key={
+                    'PK': f'PRODUCT#{product_id}',
+                    'SK': 'METADATA'
+                },
+                UpdateExpression='SET #status = :deleted, GSI2PK = :statusKey, deletedAt = :now, updatedAt = :now '
+                                 'REMOVE GSI1PK, GSI1SK',
+                ConditionExpression='attribute_exists(PK) AND (attribute_not_exists(#status) OR #status <> :deleted)',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':deleted': DELETED_STATUS,
+                    ':statusKey': f'STATUS#{DELETED_STATUS}',
+                    ':now': timestamp
+                },
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            logger.info(f"Product deleted: {product_id}")
+        except table.meta.client.exceptions.ConditionalCheckFailedException as e:
+            if 'Item' not in e.response:
+                return {
+                    'statusCode': 404,
+                    'body': json.dumps({'error': 'NOT_FOUND', 'message': 'Product not found'})
+                }
         
         return {
             'statusCode': 204,
@@ -0,0 +1,122 @@
+"""
+Get Availability Lambda Handler
+POST /products/availability - Stock, status and price for many products in one request
+
+The IDs (up to MAX_AVAILABILITY_IDS) are split into BatchGetItem chunks of
+100 keys, which run in parallel. Each read projects only the attributes the
+answer needs, so a chunk costs a fraction of the read capacity of full
+product items and the response is built without deserializing descriptions
+or image lists. Reads go to ProductsTable rather than the catalog snapshot:
+stock changes with every checkout and the answer has to be current.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from request_models import AvailabilityRequest, RequestError, parse_body
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+BATCH_GET_SIZE = 100
+READ_WORKERS = 5
+MAX_BATCH_GET_ATTEMPTS = 5
+
+dynamodb = aws_clients.resource('dynamodb', 'interactive', pool_size=READ_WORKERS)
+table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+executor = ThreadPoolExecutor(max_workers=READ_WORKERS)
+
+
+def error_response(status_code: int, error: str, message: str) -> Dict[str, Any]:
+    """Build an error response in the API's standard format."""
+    return {
+        'statusCode': status_code,
+        'body': json.dumps({'error': error, 'message': message}),
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        }
+    }
+
+
+def load_chunk(product_ids: List[str]) -> List[Dict[str, Any]]:
+    """BatchGetItem one chunk of at most 100 products, retrying unprocessed keys."""
+    request_items = {
+        table.name: {
+            'Keys': [{'PK': f'PRODUCT#{pid}', 'SK': 'METADATA'} for pid in product_ids],
+            'ProjectionExpression': 'productId, inventory, stock, price, #status',
+            'ExpressionAttributeNames': {'#status': 'status'}
+        }
+    }
+    items = []
+    for _ in range(MAX_BATCH_GET_ATTEMPTS):
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        items.extend(response['Responses'].get(table.name, []))
+        request_items = response.get('UnprocessedKeys') or {}
+        if not request_items:
+            return items
+    raise RuntimeError('BatchGetItem left unprocessed keys after retries')
+
+
+@tracer.capture_method
+def load_availability(product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Read the products in parallel chunks; returns the compact entry per found product."""
+    chunks = [product_ids[start:start + BATCH_GET_SIZE] for start in range(0, len(product_ids), BATCH_GET_SIZE)]
+    availability = {}
+    for items in executor.map(load_chunk, chunks):
+        for item in items:
+            status = item.get('status', 'active')
+            if status == 'deleted' or 'productId' not in item:
+                continue
+            inventory = int(item.get('inventory', item.get('stock', 0)))
+            price = item.get('price')
+            availability[item['productId']] = {
+                'available': status == 'active' and inventory > 0,
+                'inventory': inventory,
+                'status': status,
+                'price': float(price) if isinstance(price, Decimal) else price
+            }
+    return availability
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    try:
+        body = parse_body(AvailabilityRequest, event)
+        # Keep the caller's order, drop repeats
+        product_ids = list(dict.fromkeys(body['productIds']))
+        availability = load_availability(product_ids)
+
+        metrics.add_metric(name='AvailabilityProductsRequested', unit=MetricUnit.Count, value=len(product_ids))
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'availability': availability,
+                'missing': [pid for pid in product_ids if pid not in availability]
+            }, separators=(',', ':')),
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'Cache-Control': 'no-store'
+            }
+        }
+
+    except RequestError as e:
+        return e.response()
+    except Exception as e:
+        logger.exception("Error reading product availability")
+        return error_response(500, 'INTERNAL_ERROR', 'Failed to read product availability')
@@ -1,29 +1,48 @@
 """
 Get Product Lambda Handler
 GET /products/{id} - Get a single product by ID
+
+When CATALOG_BUCKET is set, products are served from the memory-mapped
+catalog snapshot (catalog_snapshot.py) and DynamoDB is only read for
+products the snapshot does not have as active. Both paths return the same
+document.
+
+With ``?related=true`` the document also carries ``related``: the
+"frequently bought together" products build_recommendations.py wrote to
+ReadModelsTable, read with one extra GetItem (an empty list if none).
 """
 import json
 import os
 from typing import Any, Dict
-from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.event_handler import APIGatewayHttpResolver
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.event_handler import APIGatewayHttpResolver, Response
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import catalog_snapshot
+import hedged_reads
+import profiling
 
 logger = Logger()
 tracer = Tracer()
+metrics = Metrics()
 app = APIGatewayHttpResolver()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
 
 
 @tracer.capture_method
 def get_product_by_id(product_id: str) -> Dict[str, Any]:
-    """Get a single product from DynamoDB."""
+    """Get a single product from DynamoDB (hedged when HEDGED_READS is on)."""
     
     try:
-        response = table.get_item(
+        response = hedged_reads.get_item(
+            table,
             Key={
                 'PK': f'PRODUCT#{product_id}',
                 'SK': 'METADATA'
@@ -40,6 +59,29 @@ def get_product_by_id(product_id: str) -> Dict[str, Any]:
         raise
 
 
+@tracer.capture_method
+def related_products(product_id: str) -> str:
+    """The precomputed related products as a JSON array."""
+    item = read_models_table.get_item(Key={'PK': f'PRODUCT#{product_id}', 'SK': 'RELATED'},
+                                      ProjectionExpression='related').get('Item')
+    return json.dumps(item['related'] if item else [], default=float, separators=(',', ':'))
+
+
+def with_related(document: str, product_id: str) -> str:
+    """Append ``related`` to a product document without decoding it."""
+    if app.current_event.get_query_string_value('related') != 'true':
+        return document
+    return f'{document[:-1]},"related":{related_products(product_id)}}}'
+
+
+def respond(status_code: int, body: str, cache: bool = False) -> Response:
+    """A raw HTTP response; returning a dict would make the resolver JSON-encode it a second time."""
+    headers = {'Access-Control-Allow-Origin': '*'}
+    if cache:
+        headers['Cache-Control'] = 'max-age=300'  # Cache for 5 minutes
+    return Response(status_code=status_code, content_type='application/json', body=body, headers=headers)
+
+
 @app.get("/products/<product_id>")
 @tracer.capture_method
 def get_product(product_id: str):
@@ -48,62 +90,35 @@ def get_product(product_id: str):
     logger.info(f"Fetching product: {product_id}")
     
     try:
+        record = catalog.record(product_id) if catalog and catalog.refresh() else None
+        if record is not None:
+            return respond(200, with_related(str(record, 'utf-8'), product_id), cache=True)
+
         product = get_product_by_id(product_id)
         
         if not product:
-            return {
-                'statusCode': 404,
-                'body': json.dumps({
-                    'error': 'NOT_FOUND',
-                    'message': f'Product {product_id} not found'
-                }),
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                }
-            }
+            return respond(404, json.dumps({'error': 'NOT_FOUND', 'message': f'Product {product_id} not found'}))
         
         # Check if product is active
         if product.get('status') != 'active':
-            return {
-                'statusCode': 404,
-                'body': json.dumps({
-                    'error': 'NOT_FOUND',
-                    'message': 'Product not available'
-                }),
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                }
-            }
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps(product, default=str),
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Cache-Control': 'max-age=300'  # Cache for 5 minutes
-            }
-        }
+            return respond(404, json.dumps({'error': 'NOT_FOUND', 'message': 'Product not available'}))
+
+        # The snapshot's encoding: drops the image pipeline's imageIds, numbers as JSON numbers
+        return respond(200, with_related(catalog_snapshot.encode(product)[0].decode(), product_id), cache=True)
         
     except Exception as e:
         logger.exception("Error processing request")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': 'INTERNAL_ERROR',
-                'message': 'An error occurred while processing your request'
-            }),
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            }
-        }
+        return respond(500, json.dumps({
+            'error': 'INTERNAL_ERROR',
+            'message': 'An error occurred while processing your request'
+        }))
 
 
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     logger.info("Received event", extra={'event': event})
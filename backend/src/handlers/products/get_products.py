@@ -1,23 +1,55 @@
 """
 Get Products Lambda Handler
 GET /products - List all products with filtering and pagination
+
+When CATALOG_BUCKET is set, listings without ``search`` are served from the
+memory-mapped catalog snapshot (catalog_snapshot.py): category listings come
+cheapest first from the snapshot's category postings, other listings in
+productId order, and the list views are copied into the response body
+without decoding them. Only active products are listed either way.
+
+``sort=popular`` and ``sort=trending`` (optionally with ``category``) list
+products in the order materialize_rankings.py last wrote: one GetItem for
+the ranking and one BatchGetItem for the page. Until a ranking exists the
+listing falls back to the default order.
+
+Callers over their ``products:list`` or (with ``search``) tighter
+``products:search`` rate limit get a 429 before the request is routed
+(rate_limits.py).
 """
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from decimal import Decimal
-from aws_lambda_powertools import Logger, Tracer
-from aws_lambda_powertools.event_handler import APIGatewayHttpResolver
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.event_handler import APIGatewayHttpResolver, Response
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
 from boto3.dynamodb.conditions import Key, Attr
 
+import aws_clients
+import catalog_snapshot
+import product_rankings
+import profiling
+import rate_limits
+
 logger = Logger()
 tracer = Tracer()
+metrics = Metrics()
 app = APIGatewayHttpResolver()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+# Written by images/process_image.py; only the product detail endpoint returns them
+LIST_OMITTED_FIELDS = ('imageAssets', 'imageIds')
+
+MAX_BATCH_GET_ATTEMPTS = 5
+
+# Memory-mapped catalog snapshot; None when CATALOG_BUCKET is not set
+catalog = catalog_snapshot.from_environment(dynamodb)
+# None unless RATE_LIMITING is on
+limiter = rate_limits.from_environment(dynamodb)
 
 
 def decimal_to_float(obj):
@@ -31,6 +63,11 @@ def decimal_to_float(obj):
     return obj
 
 
+def list_view(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the per-image variant lists; list pages render ``thumbnail``."""
+    return {k: v for k, v in product.items() if k not in LIST_OMITTED_FIELDS}
+
+
 @tracer.capture_method
 def get_products(
     category: str = None,
@@ -94,7 +131,7 @@ def get_products(
             response = table.scan(**scan_params)
         
         # Format response
-        products = response.get('Items', [])
+        products = [list_view(product) for product in response.get('Items', [])]
         result = {
             'products': decimal_to_float(products),
             'count': len(products)
@@ -111,6 +148,55 @@ def get_products(
         raise
 
 
+@tracer.capture_method
+def catalog_page(category: str = None, min_price: float = None, max_price: float = None,
+                 limit: int = 20, after: list = None) -> Response:
+    """One page of list views from the catalog snapshot, as a raw JSON body."""
+    views, next_after = catalog.listing(category, min_price, max_price, after, min(limit, 100))
+    body = b'{"products":[' + b','.join(views) + b'],"count":' + str(len(views)).encode()
+    if next_after:
+        body += b',"nextToken":' + json.dumps(json.dumps({'after': next_after})).encode()
+    return Response(status_code=200, content_type='application/json', body=(body + b'}').decode())
+
+
+def batch_get(product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch up to 100 products with one BatchGetItem, retrying unprocessed keys."""
+    request_items = {table.name: {'Keys': [{'PK': f'PRODUCT#{pid}', 'SK': 'METADATA'} for pid in product_ids]}}
+    products = {}
+    for _ in range(MAX_BATCH_GET_ATTEMPTS):
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for product in response['Responses'].get(table.name, []):
+            products[product['productId']] = product
+        request_items = response.get('UnprocessedKeys') or {}
+        if not request_items:
+            return products
+    raise RuntimeError('BatchGetItem left unprocessed keys after retries')
+
+
+@tracer.capture_method
+def ranked_page(sort: str, category: str = None, min_price: float = None, max_price: float = None,
+                limit: int = 20, offset: int = 0) -> Optional[Dict[str, Any]]:
+    """One page of a materialized ranking, or None if it has not been built."""
+    pk, sk = product_rankings.ranking_key(sort, category)
+    ranking = read_models_table.get_item(Key={'PK': pk, 'SK': sk}, ProjectionExpression='productIds').get('Item')
+    if ranking is None:
+        return None
+
+    page_ids = ranking['productIds'][offset:offset + min(limit, 100)]
+    products = batch_get(page_ids) if page_ids else {}
+    # Rankings are rebuilt every few minutes; drop products that changed since
+    listed = [
+        list_view(products[pid]) for pid in page_ids
+        if pid in products and products[pid].get('status') == 'active'
+        and (min_price is None or products[pid].get('price', 0) >= Decimal(str(min_price)))
+        and (max_price is None or products[pid].get('price', 0) <= Decimal(str(max_price)))
+    ]
+    result = {'products': decimal_to_float(listed), 'count': len(listed)}
+    if offset + len(page_ids) < len(ranking['productIds']):
+        result['nextToken'] = json.dumps({'rank': offset + len(page_ids)})
+    return result
+
+
 @app.get("/products")
 @tracer.capture_method
 def list_products():
@@ -125,16 +211,40 @@ def list_products():
     search = params.get('search')
     limit = int(params.get('limit', 20))
     next_token = params.get('nextToken')
+    sort = params.get('sort')
     
     logger.info("Fetching products", extra={
         'category': category,
         'min_price': min_price,
         'max_price': max_price,
         'search': search,
+        'sort': sort,
         'limit': limit
     })
     
     try:
+        token = json.loads(next_token) if next_token else {}
+        if sort:
+            if sort not in product_rankings.HALF_LIVES:
+                raise ValueError(f"sort must be one of: {', '.join(product_rankings.HALF_LIVES)}")
+            if search:
+                raise ValueError('sort cannot be combined with search')
+            # Ranking page tokens carry the position in the ranking: {"rank": n}
+            if 'rank' in token or not next_token:
+                result = ranked_page(sort, category, min_price, max_price, limit, int(token.get('rank', 0)))
+                if result is not None:
+                    return result
+                logger.info("Ranking not materialized yet", extra={'sort': sort, 'category': category})
+                next_token = None
+
+        # Snapshot page tokens carry the last key served: {"after": [...]}
+        after = token.get('after') if next_token else None
+        if not search and catalog and catalog.refresh() and (after or not next_token):
+            return catalog_page(category, min_price, max_price, limit, after)
+        if after:
+            # The snapshot is unavailable and its token cannot resume a DynamoDB read; start over
+            next_token = None
+
         result = get_products(
             category=category,
             min_price=min_price,
@@ -162,9 +272,18 @@ def list_products():
         }
 
 
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
 @logger.inject_lambda_context
 @tracer.capture_lambda_handler
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     logger.info("Received event", extra={'event': event})
+    if limiter:
+        # Searches scan ProductsTable and have their own, tighter limit
+        route = 'products:search' if (event.get('queryStringParameters') or {}).get('search') else 'products:list'
+        limited = limiter.check(route, event)
+        if limited:
+            return limited
     return app.resolve(event, context)
@@ -0,0 +1,113 @@
+"""
+Import Product Updates Lambda Handler
+S3 event consumer that applies product change files from the imports bucket
+
+ERP and warehouse syncs drop a file under ``imports/`` in
+ProductImportsBucket: CSV with a header row (``productId,inventory,price,
+status,expectedUpdatedAt``, empty cells meaning "unchanged") or JSON Lines
+with one change object per line. An ``if-unmodified-since`` object metadata
+value applies to every row (see product_changes.py). The object is read as
+a stream and applied in chunks, so file size is bounded by time, not
+memory. A report with the counts and every row that was not updated is
+written to ``results/<file name>.json``.
+"""
+import codecs
+import csv
+import json
+import os
+from itertools import islice
+from typing import Any, Dict, Iterator
+from urllib.parse import unquote_plus
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import profiling
+from product_changes import UPDATE_WORKERS, apply_changes
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=UPDATE_WORKERS)
+table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+s3 = aws_clients.client('s3', 'batch')
+
+CHUNK_ROWS = 500
+# Time kept back to write the report
+RESERVE_MS = 15000
+
+
+def read_rows(body: Any, key: str) -> Iterator[Any]:
+    lines = codecs.getreader('utf-8-sig')(body)
+    if key.endswith('.csv'):
+        for row in csv.DictReader(lines):
+            yield {k: (v if v != '' else None) for k, v in row.items() if k}
+        return
+    for line in lines:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield {'error': 'invalid JSON'}
+
+
+@tracer.capture_method
+def import_file(bucket: str, key: str, context: LambdaContext) -> Dict[str, Any]:
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    since = obj.get('Metadata', {}).get('if-unmodified-since')
+    rows = read_rows(obj['Body'], key)
+
+    summary: Dict[str, int] = {}
+    not_updated = []
+    processed = 0
+    complete = True
+    while True:
+        chunk = list(islice(rows, CHUNK_ROWS))
+        if not chunk:
+            break
+        outcome = apply_changes(dynamodb.meta.client, table.name, chunk, since)
+        for status, count in outcome['summary'].items():
+            summary[status] = summary.get(status, 0) + count
+        for offset, result in enumerate(outcome['results']):
+            if result['status'] != 'updated':
+                not_updated.append({'row': processed + offset + 1, **result})
+        processed += len(chunk)
+        if context.get_remaining_time_in_millis() < RESERVE_MS:
+            complete = False
+            logger.warning("Import stopped before the end of the file", extra={'key': key, 'rows': processed})
+            break
+
+    report = {'source': key, 'rows': processed, 'complete': complete, 'summary': summary, 'notUpdated': not_updated}
+    s3.put_object(
+        Bucket=bucket,
+        Key=f"results/{key.rsplit('/', 1)[-1]}.json",
+        Body=json.dumps(report).encode(),
+        ContentType='application/json'
+    )
+    return report
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    totals: Dict[str, int] = {}
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = unquote_plus(record['s3']['object']['key'])
+        report = import_file(bucket, key, context)
+        logger.info("Product import finished", extra={'key': key, 'rows': report['rows'], 'summary': report['summary']})
+        for status, count in report['summary'].items():
+            totals[status] = totals.get(status, 0) + count
+
+    metrics.add_metric(name='ProductChangesApplied', unit=MetricUnit.Count, value=totals.get('updated', 0))
+    metrics.add_metric(name='ProductChangeConflicts', unit=MetricUnit.Count, value=totals.get('conflict', 0))
+    metrics.add_metric(name='ProductChangesRejected', unit=MetricUnit.Count,
+                       value=sum(v for k, v in totals.items() if k not in ('updated', 'conflict')))
+    return {'summary': totals}
@@ -0,0 +1,126 @@
+"""
+Materialize Rankings Lambda Handler
+Scheduled job that turns the decayed sales counters into top-K ranking items
+
+For each ranking in product_rankings.HALF_LIVES, reads every counter shard
+of the current and the previous epoch in parallel, scales the scores to the
+present and writes the TOP_K best products overall, plus the CATEGORY_TOP_K
+best of each category, as single ``RANKING`` items in ReadModelsTable.
+GET /products?sort=popular|trending then needs one GetItem for the order
+and one BatchGetItem for the page. Category rankings that no longer have
+any sales are deleted.
+"""
+import heapq
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+import product_rankings
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+READ_WORKERS = 16
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=READ_WORKERS)
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+
+def query_all(**query_params) -> List[Dict[str, Any]]:
+    """Every item of a ReadModelsTable query, following the pages."""
+    items = []
+    while True:
+        response = read_models_table.query(**query_params)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+@tracer.capture_method
+def current_scores(kind: str, now: datetime) -> Tuple[Dict[str, float], Dict[str, str]]:
+    """Decayed score and category of every product with sales in the last two epochs."""
+    current_epoch = product_rankings.epoch_of(kind, now)
+    epochs = [current_epoch - product_rankings.epoch_seconds(kind), current_epoch]
+    partitions = [(epoch, product_rankings.counter_pk(kind, epoch, n))
+                  for epoch in epochs for n in range(product_rankings.SHARDS)]
+
+    scores: Dict[str, float] = defaultdict(float)
+    categories: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+        results = executor.map(lambda partition: query_all(KeyConditionExpression=Key('PK').eq(partition[1]),
+                                                           ProjectionExpression='productId, category, score'),
+                               partitions)
+        # Previous epoch first, so categories end up as last recorded
+        for (epoch, _), counters in zip(partitions, results):
+            factor = product_rankings.decay(kind, epoch, now)
+            for counter in counters:
+                scores[counter['productId']] += float(counter['score']) * factor
+                categories[counter['productId']] = counter['category']
+    return scores, categories
+
+
+def ranking_item(kind: str, category: Optional[str], ranked: List[Tuple[str, float]], built_at: str) -> Dict[str, Any]:
+    pk, sk = product_rankings.ranking_key(kind, category)
+    return {
+        'PK': pk, 'SK': sk, 'kind': kind, 'builtAt': built_at,
+        'productIds': [product_id for product_id, _ in ranked],
+        'scores': [product_rankings.to_decimal(score) for _, score in ranked]
+    }
+
+
+@tracer.capture_method
+def materialize(kind: str, now: datetime) -> Dict[str, int]:
+    """Write the overall and per-category top-K items of one ranking."""
+    scores, categories = current_scores(kind, now)
+    # Refunds can leave a product at or just below zero
+    positive = [(product_id, score) for product_id, score in scores.items() if score > 1e-6]
+    by_category: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+    for product_id, score in positive:
+        by_category[categories[product_id]].append((product_id, score))
+
+    by_score = lambda entry: entry[1]  # noqa: E731
+    built_at = now.isoformat().replace('+00:00', 'Z')
+    existing = query_all(KeyConditionExpression=Key('PK').eq(product_rankings.RANKING_PK)
+                         & Key('SK').begins_with(f'{kind}#CATEGORY#'),
+                         ProjectionExpression='SK')
+    with read_models_table.batch_writer() as batch:
+        batch.put_item(Item=ranking_item(kind, None, heapq.nlargest(product_rankings.TOP_K, positive, key=by_score),
+                                         built_at))
+        for category, entries in by_category.items():
+            batch.put_item(Item=ranking_item(
+                kind, category, heapq.nlargest(product_rankings.CATEGORY_TOP_K, entries, key=by_score), built_at))
+        current = {product_rankings.ranking_key(kind, category)[1] for category in by_category}
+        for item in existing:
+            if item['SK'] not in current:
+                batch.delete_item(Key={'PK': product_rankings.RANKING_PK, 'SK': item['SK']})
+
+    return {'products': len(positive), 'categories': len(by_category)}
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    now = datetime.now(timezone.utc)
+    summary = {}
+    for kind in product_rankings.HALF_LIVES:
+        summary[kind] = materialize(kind, now)
+        metrics.add_metric(name=f'{kind.capitalize()}RankedProducts', unit=MetricUnit.Count,
+                           value=summary[kind]['products'])
+
+    logger.info("Rankings materialized", extra=summary)
+    return summary
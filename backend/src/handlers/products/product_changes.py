@@ -0,0 +1,158 @@
+"""
+Bulk product changes shared by the admin bulk endpoint and the S3 import
+
+A change row is ``{productId, inventory?, price?, status?, expectedUpdatedAt?}``.
+Rows are validated up front, then applied as independent conditional
+UpdateItem calls on a thread pool: BatchWriteItem cannot carry conditions
+and a transaction would fail a whole chunk for one stale row. Each update
+is guarded by optimistic concurrency on ``updatedAt``: the row's own
+``expectedUpdatedAt`` (exact match) or, for feeds that only know when their
+snapshot was taken, an ``ifUnmodifiedSince`` timestamp for the whole
+batch. Failed conditions return the current item
+(``ReturnValuesOnConditionCheckFailure``), so conflicts and missing products
+are told apart without a second read. GSI keys that derive from price and
+status are rewritten in the same update.
+
+Deletion stays with delete_product.py, which also drops the product from
+CategoryIndex: rows cannot set status ``deleted``, and rows for deleted
+products are refused rather than bringing them back half-indexed.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+UPDATE_WORKERS = 16
+STATUS_PATTERN = re.compile(r'^[a-z][a-z_]{0,31}$')
+CHANGE_FIELDS = ('inventory', 'price', 'status')
+DELETED_STATUS = 'deleted'
+
+
+def gsi_keys(product_id: str, price: Optional[float] = None, status: Optional[str] = None) -> Dict[str, str]:
+    """The index keys create_product.py derives from price and status."""
+    keys = {}
+    if price is not None:
+        keys['GSI1SK'] = f'{float(price)}#{product_id}'
+    if status is not None:
+        keys['GSI2PK'] = f'STATUS#{status}'
+    return keys
+
+
+def validate(row: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Normalise one change row; returns (change, None) or (None, error)."""
+    if not isinstance(row, dict) or not isinstance(row.get('productId'), str) or not row['productId']:
+        return None, 'productId is required'
+    change = {'productId': row['productId']}
+    try:
+        if row.get('inventory') is not None:
+            if isinstance(row['inventory'], bool) or int(row['inventory']) != float(row['inventory']):
+                return None, 'inventory must be an integer'
+            change['inventory'] = int(row['inventory'])
+            if change['inventory'] < 0:
+                return None, 'inventory must not be negative'
+        if row.get('price') is not None:
+            price = Decimal(str(row['price']))
+            if not price.is_finite() or price < 0:
+                return None, 'price must be a non-negative number'
+            change['price'] = price
+    except (TypeError, ValueError, InvalidOperation):
+        return None, 'inventory and price must be numbers'
+    if row.get('status') is not None:
+        if not isinstance(row['status'], str) or not STATUS_PATTERN.match(row['status']):
+            return None, 'status must be a lowercase word'
+        if row['status'] == DELETED_STATUS:
+            return None, 'status cannot be deleted; use DELETE /products/{id}'
+        change['status'] = row['status']
+    if len(change) == 1:
+        return None, f"no changes; expected one of {', '.join(CHANGE_FIELDS)}"
+    if row.get('expectedUpdatedAt'):
+        change['expectedUpdatedAt'] = str(row['expectedUpdatedAt'])
+    return change, None
+
+
+def update_request(table_name: str, change: Dict[str, Any], if_unmodified_since: Optional[str],
+                   timestamp: str) -> Dict[str, Any]:
+    product_id = change['productId']
+    names = {'#updatedAt': 'updatedAt', '#status': 'status'}
+    values: Dict[str, Any] = {':updatedAt': timestamp, ':deleted': DELETED_STATUS}
+    assignments = ['#updatedAt = :updatedAt']
+    fields = {k: change[k] for k in CHANGE_FIELDS if k in change}
+    fields.update(gsi_keys(product_id, change.get('price'), change.get('status')))
+    for name, value in fields.items():
+        names[f'#{name}'] = name
+        values[f':{name}'] = value
+        assignments.append(f'#{name} = :{name}')
+
+    condition = 'attribute_exists(PK) AND (attribute_not_exists(#status) OR #status <> :deleted)'
+    if change.get('expectedUpdatedAt'):
+        condition += ' AND #updatedAt = :expected'
+        values[':expected'] = change['expectedUpdatedAt']
+    elif if_unmodified_since:
+        condition += ' AND (attribute_not_exists(#updatedAt) OR #updatedAt <= :since)'
+        values[':since'] = if_unmodified_since
+
+    return {
+        'TableName': table_name,
+        'Key': {'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'},
+        'UpdateExpression': 'SET ' + ', '.join(assignments),
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    }
+
+
+def apply_changes(client: Any, table_name: str, rows: Iterable[Any],
+                  if_unmodified_since: Optional[str] = None) -> Dict[str, Any]:
+    """Validate and apply change rows; returns counts and one compact result per row.
+
+    Results are ``{productId, status}`` in input order, where status is
+    ``updated`` (with the new ``updatedAt``), ``conflict`` (with the current
+    ``updatedAt``), ``not_found``, ``deleted`` (soft-deleted products are
+    not changed), ``invalid`` or ``duplicate`` (the same product appeared
+    earlier in the batch), or ``error``.
+    """
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    results: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    seen = set()
+    for row in rows:
+        change, error = validate(row)
+        if error:
+            product_id = row.get('productId') if isinstance(row, dict) else None
+            results.append({'productId': product_id, 'status': 'invalid', 'error': error})
+        elif change['productId'] in seen:
+            # Two writes to one item in a batch would race; the caller should merge them
+            results.append({'productId': change['productId'], 'status': 'duplicate'})
+        else:
+            seen.add(change['productId'])
+            results.append(None)
+            pending.append((len(results) - 1, change))
+
+    def apply(change: Dict[str, Any]) -> Dict[str, Any]:
+        product_id = change['productId']
+        try:
+            client.update_item(**update_request(table_name, change, if_unmodified_since, timestamp))
+            return {'productId': product_id, 'status': 'updated', 'updatedAt': timestamp}
+        except client.exceptions.ConditionalCheckFailedException as e:
+            current = e.response.get('Item')
+            if not current:
+                return {'productId': product_id, 'status': 'not_found'}
+            if current.get('status') in (DELETED_STATUS, {'S': DELETED_STATUS}):
+                return {'productId': product_id, 'status': 'deleted'}
+            updated_at = current.get('updatedAt', {})
+            return {'productId': product_id, 'status': 'conflict',
+                    'updatedAt': updated_at.get('S') if isinstance(updated_at, dict) else updated_at}
+        except Exception as e:
+            return {'productId': product_id, 'status': 'error', 'error': type(e).__name__}
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(UPDATE_WORKERS, len(pending))) as pool:
+            for (index, _), result in zip(pending, pool.map(apply, [change for _, change in pending])):
+                results[index] = result
+
+    summary: Dict[str, int] = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return {'summary': summary, 'results': results}
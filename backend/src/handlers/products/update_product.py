@@ -8,51 +8,41 @@ from datetime import datetime
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import aws_clients
+import profiling
+from product_changes import gsi_keys
+from request_models import RequestError, UpdateProductRequest, parse_body
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = aws_clients.resource('dynamodb', 'interactive')
 table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
         product_id = event['pathParameters']['id']
-        body = json.loads(event.get('body', '{}'))
+        try:
+            changes = parse_body(UpdateProductRequest, event)
+        except RequestError as e:
+            return e.response()
         
         # Build update expression
         update_parts = []
         attr_names = {}
         attr_values = {}
         
-        updateable_fields = {
-            'name': 'string',
-            'description': 'string',
-            'price': 'float',
-            'inventory': 'int',
-            'status': 'string',
-            'brand': 'string',
-            'images': 'list',
-            'attributes': 'dict'
-        }
-        
-        for field, field_type in updateable_fields.items():
-            if field in body:
-                update_parts.append(f"#{field} = :{field}")
-                attr_names[f'#{field}'] = field
-                
-                if field_type == 'float':
-                    attr_values[f':{field}'] = float(body[field])
-                elif field_type == 'int':
-                    attr_values[f':{field}'] = int(body[field])
-                else:
-                    attr_values[f':{field}'] = body[field]
+        for field, value in changes.items():
+            update_parts.append(f"#{field} = :{field}")
+            attr_names[f'#{field}'] = field
+            attr_values[f':{field}'] = value
         
         if not update_parts:
             return {
@@ -63,6 +53,13 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
                 })
             }
         
+        # Keep the category-price and status index keys in step with the fields they derive from
+        index_keys = gsi_keys(product_id, attr_values.get(':price'), attr_values.get(':status'))
+        for name, value in index_keys.items():
+            update_parts.append(f"#{name} = :{name}")
+            attr_names[f'#{name}'] = name
+            attr_values[f':{name}'] = value
+
         # Always update timestamp
         update_parts.append('#updatedAt = :updatedAt')
         attr_names['#updatedAt'] = 'updatedAt'
@@ -0,0 +1,147 @@
+"""
+Build Recommendations Lambda Handler
+Scheduled job that precomputes "frequently bought together" products
+
+Reads the paid orders created in the last RECOMMENDATION_WINDOW_DAYS with a
+parallel Scan of OrdersTable (SCAN_SEGMENTS segments, only ``items``
+projected), counts co-purchases with co_purchases.py and writes one item
+per product to ReadModelsTable:
+
+    PK: PRODUCT#<productId>  SK: RELATED  related: [{productId, name, price, thumbnail}], builtAt, expiresAt
+
+Partners are looked up with BatchGetItem so each entry carries what a
+product page renders, and inactive partners are dropped; GET
+/products/{id}?related=true then costs one GetItem. Items of products that
+drop out of the counts expire after RECOMMENDATION_TTL_DAYS.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr
+
+import aws_clients
+import profiling
+from co_purchases import Baskets, related_products
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+SCAN_SEGMENTS = 16
+WRITE_WORKERS = 8
+BATCH_GET_SIZE = 100
+RELATED_LIMIT = 10
+MIN_SUPPORT = int(os.environ.get('RECOMMENDATION_MIN_SUPPORT', '3'))
+MAX_BASKET = 50
+WINDOW_DAYS = int(os.environ.get('RECOMMENDATION_WINDOW_DAYS', '180'))
+RECOMMENDATION_TTL_DAYS = 3
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=SCAN_SEGMENTS)
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+
+# Paid orders, as counted by project_orders.py
+PAID_STATUSES = ['processing', 'confirmed', 'shipped', 'delivered']
+
+
+def scan_segment(segment: int, since: str) -> List[List[str]]:
+    """The product IDs of every paid order since ``since`` in one Scan segment."""
+    scan_params = {
+        'Segment': segment,
+        'TotalSegments': SCAN_SEGMENTS,
+        'FilterExpression': Attr('SK').begins_with('ORDER#') & Attr('status').is_in(PAID_STATUSES)
+        & Attr('createdAt').gte(since),
+        'ProjectionExpression': '#items',
+        'ExpressionAttributeNames': {'#items': 'items'}
+    }
+    baskets = []
+    while True:
+        response = orders_table.scan(**scan_params)
+        for order in response.get('Items', []):
+            baskets.append([item['productId'] for item in order.get('items', [])])
+        if 'LastEvaluatedKey' not in response:
+            return baskets
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+@tracer.capture_method
+def load_baskets(since: str) -> Baskets:
+    baskets = Baskets()
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+        for segment in executor.map(lambda n: scan_segment(n, since), range(SCAN_SEGMENTS)):
+            for product_ids in segment:
+                baskets.add(product_ids)
+    return baskets
+
+
+def load_summaries(product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """What a product page shows for a partner, for the active products among ``product_ids``."""
+    request_items = {
+        products_table.name: {
+            'Keys': [{'PK': f'PRODUCT#{pid}', 'SK': 'METADATA'} for pid in product_ids],
+            'ProjectionExpression': 'productId, #name, price, thumbnail, #status',
+            'ExpressionAttributeNames': {'#name': 'name', '#status': 'status'}
+        }
+    }
+    summaries = {}
+    while request_items:
+        response = dynamodb.batch_get_item(RequestItems=request_items)
+        for product in response['Responses'].get(products_table.name, []):
+            if product.pop('status', None) == 'active':
+                summaries[product['productId']] = product
+        request_items = response.get('UnprocessedKeys') or {}
+    return summaries
+
+
+def write_items(items: List[Dict[str, Any]]) -> None:
+    with read_models_table.batch_writer() as batch:
+        for item in items:
+            batch.put_item(Item=item)
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    started = time.perf_counter()
+    since = (datetime.utcnow() - timedelta(days=WINDOW_DAYS)).isoformat() + 'Z'
+    baskets = load_baskets(since)
+    scanned = time.perf_counter()
+
+    related = dict(related_products(baskets, top_n=RELATED_LIMIT, min_support=MIN_SUPPORT, max_basket=MAX_BASKET))
+    counted = time.perf_counter()
+
+    partner_ids = sorted({partner for partners in related.values() for partner, _, _ in partners})
+    chunks = [partner_ids[i:i + BATCH_GET_SIZE] for i in range(0, len(partner_ids), BATCH_GET_SIZE)]
+    summaries = {}
+    with ThreadPoolExecutor(max_workers=SCAN_SEGMENTS) as executor:
+        for chunk in executor.map(load_summaries, chunks):
+            summaries.update(chunk)
+
+    built_at = datetime.utcnow().isoformat() + 'Z'
+    expires_at = int(time.time()) + RECOMMENDATION_TTL_DAYS * 24 * 3600
+    items = []
+    for product_id, partners in related.items():
+        listed = [summaries[partner] for partner, _, _ in partners if partner in summaries]
+        if listed:
+            items.append({'PK': f'PRODUCT#{product_id}', 'SK': 'RELATED', 'related': listed,
+                          'builtAt': built_at, 'expiresAt': expires_at})
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        list(executor.map(write_items, [items[i::WRITE_WORKERS] for i in range(WRITE_WORKERS)]))
+
+    summary = {'orders': len(baskets), 'products': len(items), 'scanSeconds': round(scanned - started, 1),
+               'countSeconds': round(counted - scanned, 1)}
+    metrics.add_metric(name='RecommendationOrdersCounted', unit=MetricUnit.Count, value=len(baskets))
+    metrics.add_metric(name='RecommendationItemsWritten', unit=MetricUnit.Count, value=len(items))
+    logger.info("Recommendations built", extra=summary)
+    return summary
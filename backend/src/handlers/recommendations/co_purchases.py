@@ -0,0 +1,122 @@
+"""
+Co-purchase counting for "frequently bought together" recommendations
+
+Pure NumPy, no AWS calls, so it runs the same in build_recommendations.py
+and on a laptop. Baskets are encoded as int32 product codes in one flat
+array plus a size per basket. Pair counting never loops over baskets in
+Python: baskets of the same size are gathered into a 2-D array and every
+pair (a, b) with a < b is emitted with one fancy-indexing step per size,
+keyed as ``a * n_products + b`` in int64 and counted with ``np.unique``.
+
+Pruning keeps the work bounded:
+
+* baskets with more than ``max_basket`` distinct products (bulk and B2B
+  orders) are skipped, since their pairs grow quadratically and say
+  little about what goes together;
+* pairs bought together fewer than ``min_support`` times are dropped;
+* each product keeps its ``top_n`` best partners.
+
+Partners are ranked by cosine similarity, ``together / sqrt(orders_a *
+orders_b)``, so best-sellers that end up in every basket do not crowd out
+the products that are actually bought with this one.
+"""
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+
+class Baskets:
+    """Product-ID baskets encoded as int32 codes."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.codes_by_id: Dict[str, int] = {}
+        self._codes: List[int] = []
+        self._sizes: List[int] = []
+
+    def add(self, product_ids: Iterable[str]) -> None:
+        codes = set()
+        for product_id in product_ids:
+            code = self.codes_by_id.get(product_id)
+            if code is None:
+                code = self.codes_by_id[product_id] = len(self.ids)
+                self.ids.append(product_id)
+            codes.add(code)
+        self._codes.extend(codes)
+        self._sizes.append(len(codes))
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Flat codes and the size of each basket."""
+        return np.asarray(self._codes, dtype=np.int32), np.asarray(self._sizes, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+
+def count_pairs(codes: np.ndarray, sizes: np.ndarray, n_products: int,
+                max_basket: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Count unordered co-purchases.
+
+    Returns ``(a, b, together, orders)``: the pairs with a < b, how many
+    baskets held both, and how many baskets (of the counted ones) held each
+    product.
+    """
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    counted = (sizes >= 2) & (sizes <= max_basket)
+    orders = np.zeros(n_products, dtype=np.int64)
+
+    keys = []
+    for size in np.unique(sizes[counted]):
+        basket_starts = starts[sizes == size]
+        rows = codes[basket_starts[:, None] + np.arange(size)]
+        orders += np.bincount(rows.ravel(), minlength=n_products)
+        left, right = np.triu_indices(size, 1)
+        a = rows[:, left].ravel().astype(np.int64)
+        b = rows[:, right].ravel().astype(np.int64)
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        keys.append(low * n_products + high)
+
+    if not keys:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, orders
+    unique, together = np.unique(np.concatenate(keys), return_counts=True)
+    return unique // n_products, unique % n_products, together, orders
+
+
+def top_partners(codes: np.ndarray, sizes: np.ndarray, n_products: int, top_n: int = 10,
+                 min_support: int = 3, max_basket: int = 50) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The ``top_n`` partners of every product with any.
+
+    Returns ``(source, partner, together, score)`` sorted by source, best
+    partner first.
+    """
+    a, b, together, orders = count_pairs(codes, sizes, n_products, max_basket)
+    kept = together >= min_support
+    a, b, together = a[kept], b[kept], together[kept]
+
+    # Each unordered pair recommends in both directions
+    source = np.concatenate((a, b))
+    partner = np.concatenate((b, a))
+    together = np.concatenate((together, together))
+    score = together / np.sqrt(orders[source].astype(np.float64) * orders[partner])
+
+    order = np.lexsort((partner, -score, source))
+    source, partner, together, score = source[order], partner[order], together[order], score[order]
+    group_start = np.searchsorted(source, source, side='left')
+    rank = np.arange(len(source)) - group_start
+    top = rank < top_n
+    return source[top], partner[top], together[top], score[top]
+
+
+def related_products(baskets: Baskets, **options) -> Iterator[Tuple[str, List[Tuple[str, int, float]]]]:
+    """``(productId, [(partnerId, together, score), ...])`` for every product with partners."""
+    codes, sizes = baskets.arrays()
+    source, partner, together, score = top_partners(codes, sizes, len(baskets.ids), **options)
+    boundaries = np.flatnonzero(np.diff(source)) + 1
+    for start, end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(source)]))):
+        if start == end:
+            continue
+        yield baskets.ids[source[start]], [
+            (baskets.ids[p], int(t), float(s))
+            for p, t, s in zip(partner[start:end], together[start:end], score[start:end])
+        ]
@@ -0,0 +1,141 @@
+"""
+Fulfil Order Lambda Handler
+Step Functions task that validates, reserves and marks an order in one transaction
+
+Replaces the ValidateInventory -> UpdateInventory pair of the standard
+workflow (state-machines/order-processing-fused.asl.json). Inventory is
+checked and decremented by the ledger's conditional updates in a single
+TransactWriteItems together with the order status change, so there is no
+window between validation and decrement and one Lambda invoke instead of
+two. Orders reserved at checkout (layers/common/inventory_ledger.py) only
+hand their ledger reservation over to the order; the others take their
+stock with the ledger's ``take_items``, so soft-deleted products are refused
+and the settled marker is written either way. ``action: release``
+undoes a reservation when payment fails.
+"""
+import os
+from datetime import datetime
+from typing import Any, Dict
+from aws_lambda_powertools import Logger, Tracer
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import inventory_ledger
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+client = dynamodb.meta.client
+
+# The ledger delete, settled marker and order update take three slots
+MAX_PRODUCTS_PER_ORDER = inventory_ledger.MAX_TRANSACT_ITEMS - 3
+
+
+def order_key(event: Dict[str, Any]) -> Dict[str, str]:
+    return {'PK': f"USER#{event['userId']}", 'SK': f"ORDER#{event['orderId']}"}
+
+
+def status_update(event: Dict[str, Any], status: str, expected: str, message: str = None) -> Dict[str, Any]:
+    update = {
+        'TableName': orders_table.name,
+        'Key': order_key(event),
+        'UpdateExpression': 'SET #status = :status, updatedAt = :updatedAt',
+        'ConditionExpression': '#status = :expected',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {
+            ':status': status,
+            ':expected': expected,
+            ':updatedAt': datetime.utcnow().isoformat() + 'Z'
+        }
+    }
+    if message:
+        update['UpdateExpression'] += ', errorMessage = :error'
+        update['ExpressionAttributeValues'][':error'] = message
+    return update
+
+
+def current_status(event: Dict[str, Any]) -> str:
+    item = orders_table.get_item(Key=order_key(event), ProjectionExpression='#status',
+                                 ExpressionAttributeNames={'#status': 'status'}).get('Item', {})
+    return item.get('status', '')
+
+
+@tracer.capture_method
+def reserve(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Decrement inventory for every line and move the order to ``reserved``."""
+    totals = inventory_ledger.quantities(event.get('items', []))
+    if len(totals) > MAX_PRODUCTS_PER_ORDER:
+        raise ValueError(f'Orders are limited to {MAX_PRODUCTS_PER_ORDER} distinct products')
+
+    # Orders reserved at checkout: the stock is already taken, hand it from the ledger to the order
+    transact_items = inventory_ledger.settle_items(event['orderId'], totals, restore=False)
+    transact_items.append({'Update': status_update(event, 'reserved', 'pending')})
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+        return {'status': 'success', 'reserved': True, 'message': 'Inventory reserved at checkout', 'unavailable': []}
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[-1].get('Code') == 'ConditionalCheckFailed' and current_status(event) == 'reserved':
+            return {'status': 'success', 'reserved': True, 'message': 'Inventory already reserved', 'unavailable': []}
+        if not reasons or reasons[0].get('Code') != 'ConditionalCheckFailed':
+            raise
+
+    # No reservation (it expired, or the order predates the ledger): take the stock through the ledger now
+    transact_items = inventory_ledger.take_items(event['orderId'], totals)
+    transact_items.append({'Update': status_update(event, 'reserved', 'pending')})
+
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+        return {'status': 'success', 'reserved': True, 'message': 'Inventory reserved', 'unavailable': []}
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        unavailable = inventory_ledger.unavailable_products(e, list(totals))
+        if not unavailable:
+            # The settled marker and status change only fail together on a retry after success
+            if reasons and reasons[-1].get('Code') == 'ConditionalCheckFailed' and current_status(event) == 'reserved':
+                return {'status': 'success', 'reserved': True, 'message': 'Inventory already reserved', 'unavailable': []}
+            raise
+
+    message = f"Insufficient inventory for: {', '.join(unavailable)}"
+    try:
+        client.update_item(**status_update(event, 'cancelled', 'pending', message))
+    except client.exceptions.ConditionalCheckFailedException:
+        logger.warning("Order no longer pending", extra={'order_id': event.get('orderId')})
+    return {'status': 'failed', 'reserved': False, 'message': message, 'unavailable': unavailable}
+
+
+@tracer.capture_method
+def release(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Return reserved inventory and mark the order failed."""
+    totals = inventory_ledger.quantities(event.get('items', []))
+    transact_items = [inventory_ledger.counter_update(product_id, quantity) for product_id, quantity in totals.items()]
+    transact_items.append({'Update': status_update(event, 'failed', 'reserved', event.get('reason', 'Payment processing failed'))})
+
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if not reasons or reasons[-1].get('Code') != 'ConditionalCheckFailed':
+            # Throttling or a conflicting write: nothing was returned, so let the workflow retry
+            raise
+        # The order's status check failed: it has already left ``reserved``; inventory was returned then
+        logger.warning("Reservation already released", extra={'order_id': event.get('orderId')})
+    return {'status': 'success', 'reserved': False, 'message': 'Inventory released'}
+
+
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    action = event.get('action', 'reserve')
+    logger.info(f"Fulfilment {action} for order: {event.get('orderId')}")
+
+    if action == 'release':
+        return release(event)
+    return reserve(event)
@@ -0,0 +1,74 @@
+"""
+Notification queue producer
+
+Order workflows hand confirmation emails to the notification queue instead
+of calling SES themselves; workflows/send_notifications.py sends them in
+bulk. Template data is rendered here once per order (currency formatting,
+line totals), so the consumer only forwards it to SES.
+"""
+import json
+import os
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, List
+
+import aws_clients
+
+sqs = aws_clients.client('sqs')
+
+NOTIFICATION_QUEUE_URL = os.environ.get('NOTIFICATION_QUEUE_URL')
+SEND_MESSAGE_BATCH_SIZE = 10
+# Longer orders are summarised as "and N more items" to keep template data small
+MAX_TEMPLATE_ITEMS = 20
+
+
+def format_money(amount: Any, currency: str) -> str:
+    value = Decimal(str(amount or 0)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    return f'${value:,}' if currency.upper() == 'USD' else f'{value:,} {currency.upper()}'
+
+
+def confirmation_message(order: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue message for an order confirmation, with the template data pre-rendered."""
+    totals = order.get('totals', {})
+    currency = totals.get('currency', 'USD')
+    items = order.get('items', [])
+    lines = [
+        {
+            'name': item.get('name') or item['productId'],
+            'quantity': int(item.get('quantity', 1)),
+            'lineTotal': format_money(Decimal(str(item.get('price', 0))) * int(item.get('quantity', 1)), currency)
+        }
+        for item in items[:MAX_TEMPLATE_ITEMS]
+    ]
+    if len(items) > MAX_TEMPLATE_ITEMS:
+        lines.append({'name': f'and {len(items) - MAX_TEMPLATE_ITEMS} more items', 'quantity': '', 'lineTotal': ''})
+    return {
+        'type': 'order_confirmation',
+        'orderId': order['orderId'],
+        'email': order.get('email', ''),
+        'data': {
+            'orderId': order['orderId'],
+            'items': lines,
+            'total': format_money(totals.get('total'), currency)
+        }
+    }
+
+
+def enqueue(messages: List[Dict[str, Any]]) -> int:
+    """Send messages to the notification queue (SendMessageBatch, 10 per call).
+
+    Returns the number of messages SQS refused; callers log them and move on,
+    since a missing confirmation email must not fail the order.
+    """
+    messages = [message for message in messages if message.get('email')]
+    failed = 0
+    for start in range(0, len(messages), SEND_MESSAGE_BATCH_SIZE):
+        chunk = messages[start:start + SEND_MESSAGE_BATCH_SIZE]
+        response = sqs.send_message_batch(
+            QueueUrl=NOTIFICATION_QUEUE_URL,
+            Entries=[
+                {'Id': str(i), 'MessageBody': json.dumps(message, default=str)}
+                for i, message in enumerate(chunk)
+            ]
+        )
+        failed += len(response.get('Failed', []))
+    return failed
@@ -0,0 +1,256 @@
+"""
+Payment gateway client
+
+Talks to a Stripe-compatible PaymentIntents API (see docs/STRIPE-INTEGRATION.md):
+
+- one pooled keep-alive ``requests.Session`` per container, reused across warm invocations
+- per-call timeouts derived from the Lambda's remaining time, so a slow
+  gateway fails the call instead of the whole invocation
+- a circuit breaker that fails fast while the gateway is browning out, and
+  a bulkhead that caps concurrent gateway calls per container
+- idempotency keys per order, so retries (ours or Step Functions') never double charge
+- ``reconcile`` resolves the outcome of many orders with one paginated listing
+
+Error class names match the Step Functions Retry/Catch names in the guide.
+"""
+import json
+import os
+import threading
+import time
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import aws_clients
+
+GATEWAY_URL = os.environ.get('PAYMENT_GATEWAY_URL', 'https://api.stripe.com').rstrip('/')
+SECRET_NAME = os.environ.get('PAYMENT_SECRET_NAME', 'ecommerce/stripe/secret-key')
+POOL_SIZE = int(os.environ.get('PAYMENT_POOL_SIZE', '16'))
+MAX_CONCURRENT_CALLS = int(os.environ.get('PAYMENT_MAX_CONCURRENT', '16'))
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = float(os.environ.get('PAYMENT_READ_TIMEOUT', '10'))
+# Time left for the handler to record the outcome after the last gateway call
+RESERVE_MS = 1500
+MIN_CALL_MS = 250
+BREAKER_FAILURES = int(os.environ.get('PAYMENT_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.environ.get('PAYMENT_BREAKER_RESET_SECONDS', '30'))
+BULKHEAD_WAIT_SECONDS = 0.5
+MAX_ATTEMPTS = 3
+
+
+class PaymentError(Exception):
+    retryable = False
+
+
+class PaymentDeclined(PaymentError):
+    pass
+
+
+class InsufficientFunds(PaymentDeclined):
+    pass
+
+
+class PaymentFailed(PaymentError):
+    pass
+
+
+class PaymentGatewayTimeout(PaymentError):
+    retryable = True
+
+
+class PaymentGatewayUnavailable(PaymentError):
+    """Circuit open or bulkhead full; the gateway was not called."""
+    retryable = True
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one trial call) -> closed."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self) -> None:
+        with self.lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_in_flight):
+                raise PaymentGatewayUnavailable('Payment gateway circuit is open')
+            if state == 'half-open':
+                self.trial_in_flight = True
+
+    def record(self, success: bool) -> None:
+        with self.lock:
+            self.trial_in_flight = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def _session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = _session()
+breaker = CircuitBreaker()
+bulkhead = threading.BoundedSemaphore(MAX_CONCURRENT_CALLS)
+_api_key: Optional[str] = None
+
+
+def api_key() -> str:
+    global _api_key
+    if _api_key is None:
+        _api_key = os.environ.get('STRIPE_SECRET_KEY')
+        if not _api_key:
+            secret = aws_clients.client('secretsmanager').get_secret_value(SecretId=SECRET_NAME)
+            _api_key = json.loads(secret['SecretString'])['STRIPE_SECRET_KEY']
+    return _api_key
+
+
+def timeout_budget(context: Any = None, deadline: Optional[float] = None) -> Optional[float]:
+    """Absolute monotonic deadline for gateway calls in this invocation."""
+    if deadline is not None:
+        return deadline
+    if context is None:
+        return None
+    remaining_ms = context.get_remaining_time_in_millis() - RESERVE_MS
+    return time.monotonic() + remaining_ms / 1000
+
+
+def _timeouts(deadline: Optional[float]):
+    if deadline is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    left = deadline - time.monotonic()
+    if left * 1000 < MIN_CALL_MS:
+        raise PaymentGatewayTimeout('Not enough time left in the invocation for a gateway call')
+    return min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left)
+
+
+def request(method: str, path: str, deadline: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    """One gateway call through the breaker and bulkhead."""
+    timeouts = _timeouts(deadline)
+    key = api_key()
+    if not bulkhead.acquire(timeout=BULKHEAD_WAIT_SECONDS):
+        raise PaymentGatewayUnavailable('Too many concurrent payment gateway calls')
+    try:
+        breaker.before_call()
+        # Anything but a usable answer counts as a failure, and recording it always ends a half-open trial
+        succeeded = False
+        try:
+            response = session.request(
+                method, f'{GATEWAY_URL}{path}',
+                auth=(key, ''),
+                timeout=timeouts,
+                **kwargs
+            )
+            succeeded = response.status_code < 500 and response.status_code != 429
+        except (requests.Timeout, requests.ConnectionError) as e:
+            raise PaymentGatewayTimeout(str(e))
+        finally:
+            breaker.record(succeeded)
+    finally:
+        bulkhead.release()
+
+    if not succeeded:
+        raise PaymentGatewayTimeout(f'Gateway returned {response.status_code}')
+
+    body = response.json()
+    if response.status_code == 402:
+        error = body.get('error', {})
+        if error.get('decline_code') == 'insufficient_funds':
+            raise InsufficientFunds(error.get('message', 'Insufficient funds'))
+        raise PaymentDeclined(error.get('message', 'Card declined'))
+    if response.status_code >= 400:
+        raise PaymentFailed(body.get('error', {}).get('message', f'Gateway returned {response.status_code}'))
+    return body
+
+
+def to_minor_units(amount: Any) -> int:
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def charge(order_id: str, amount: Any, currency: str, payment_method_id: str,
+           context: Any = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+    """Create and confirm a PaymentIntent for an order.
+
+    Timeouts are retried with the same idempotency key while the budget lasts;
+    declines return ``status: failed`` and gateway outages raise.
+    Pass the Lambda ``context`` or an absolute ``deadline`` (time.monotonic()).
+    """
+    deadline = timeout_budget(context, deadline)
+    data = {
+        'amount': to_minor_units(amount),
+        'currency': currency.lower(),
+        'payment_method': payment_method_id,
+        'confirm': 'true',
+        'metadata[orderId]': order_id
+    }
+    headers = {'Idempotency-Key': f'order-{order_id}'}
+
+    attempt = 0
+    while True:
+        try:
+            intent = request('POST', '/v1/payment_intents', deadline=deadline, data=data, headers=headers)
+            break
+        except PaymentDeclined as e:
+            return {'status': 'failed', 'transactionId': '', 'message': str(e), 'error': type(e).__name__}
+        except PaymentGatewayTimeout:
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+    if intent.get('status') == 'succeeded':
+        status = 'completed'
+    elif intent.get('status') == 'requires_action':
+        status = 'requires_action'
+    else:
+        status = 'failed'
+    return {
+        'status': status,
+        'transactionId': intent.get('id', ''),
+        'message': f"Payment {intent.get('status')}",
+        'clientSecret': intent.get('client_secret') if status == 'requires_action' else None
+    }
+
+
+def reconcile(order_ids: Iterable[str], created_after: int, deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """Map order IDs to their latest PaymentIntent by listing intents created since ``created_after``.
+
+    One paginated listing (100 per page) replaces a lookup per order.
+    """
+    wanted = set(order_ids)
+    found: Dict[str, Dict[str, Any]] = {}
+    params: Dict[str, Any] = {'limit': 100, 'created[gte]': created_after}
+    while wanted - set(found):
+        page = request('GET', '/v1/payment_intents', deadline=deadline, params=params)
+        intents: List[Dict[str, Any]] = page.get('data', [])
+        for intent in intents:
+            order_id = intent.get('metadata', {}).get('orderId')
+            if order_id in wanted and order_id not in found:
+                found[order_id] = {'status': intent.get('status'), 'transactionId': intent.get('id')}
+        if not page.get('has_more') or not intents:
+            break
+        params['starting_after'] = intents[-1]['id']
+    return found
@@ -0,0 +1,326 @@
+"""
+Process Order Batch Lambda Handler
+SQS consumer for the high-throughput order processing mode (ORDER_PROCESSING_MODE=queue)
+
+Checkout enqueues each order instead of starting a Step Functions execution.
+This handler processes up to a full SQS batch of orders at once:
+
+1. Re-read the orders and their checkout reservations (BatchGetItem) and
+   skip any that are no longer pending
+2. For orders without a reservation, read every product once and allocate
+   stock in arrival order
+3. Reserve stock for the allocated orders through the inventory ledger, one
+   transaction per order that also checks the order is still pending, so a
+   redelivered message finds the reservation instead of taking stock again
+4. Charge the reserved orders concurrently
+5. Commit or release the reservations and update the order statuses, each
+   on condition that the order is still pending
+6. Queue confirmation emails for the paid orders (SendMessageBatch)
+
+Orders caught by a concurrent stock change, or whose payment could not reach
+the gateway, are handed back to SQS through ``batchItemFailures``; a
+deferred order keeps its reservation for the retry.
+"""
+import json
+import os
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+import aws_clients
+import inventory_ledger
+import profiling
+from notifications import NOTIFICATION_QUEUE_URL, confirmation_message, enqueue
+from payment_client import PaymentError
+from process_payment import charge
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+BATCH_GET_SIZE = 100
+PAYMENT_WORKERS = int(os.environ.get('PAYMENT_WORKERS', '16'))
+WRITE_WORKERS = 16
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=WRITE_WORKERS)
+products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+client = dynamodb.meta.client
+
+
+def order_quantities(order: Dict[str, Any]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for item in order.get('items', []):
+        totals[item['productId']] = totals.get(item['productId'], 0) + int(item['quantity'])
+    return totals
+
+
+@tracer.capture_method
+def batch_get(table, keys: List[Dict[str, str]], consistent: bool = False) -> List[Dict[str, Any]]:
+    """BatchGetItem in chunks of 100, retrying unprocessed keys."""
+    items = []
+    for start in range(0, len(keys), BATCH_GET_SIZE):
+        request_items = {table.name: {'Keys': keys[start:start + BATCH_GET_SIZE], 'ConsistentRead': consistent}}
+        while request_items:
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response['Responses'].get(table.name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+    return items
+
+
+def allocate(orders: List[Dict[str, Any]], stock: Dict[str, int]) -> Dict[str, List[Dict[str, Any]]]:
+    """Split orders into accepted and rejected against the stock read for this batch."""
+    remaining = dict(stock)
+    accepted, rejected = [], []
+    for order in orders:
+        needed = order_quantities(order)
+        short = [product_id for product_id, qty in needed.items() if remaining.get(product_id, 0) < qty]
+        if short:
+            order['_unavailable'] = short
+            rejected.append(order)
+            continue
+        for product_id, qty in needed.items():
+            remaining[product_id] -= qty
+        accepted.append(order)
+    return {'accepted': accepted, 'rejected': rejected}
+
+
+def order_key(order: Dict[str, Any]) -> Dict[str, str]:
+    return {'PK': f"USER#{order['userId']}", 'SK': f"ORDER#{order['orderId']}"}
+
+
+def reserve_order(order: Dict[str, Any]) -> Optional[str]:
+    """Reserve an order's stock through the ledger while the order is still pending.
+
+    Returns None when the stock is reserved (now or by an earlier delivery of
+    the same message), 'refused' when a product could not cover it and
+    'processed' when the order is no longer pending.
+    """
+    totals = order_quantities(order)
+    transact_items = inventory_ledger.reserve_items(order['orderId'], order['userId'], totals)
+    transact_items.append({
+        'ConditionCheck': {
+            'TableName': orders_table.name,
+            'Key': order_key(order),
+            'ConditionExpression': '#status = :pending',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':pending': 'pending'}
+        }
+    })
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+        return None
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        if len(reasons) != len(transact_items):
+            raise
+        if reasons[-1] == 'ConditionalCheckFailed':
+            return 'processed'
+        if reasons[-2] == 'ConditionalCheckFailed':
+            # The ledger item exists: an earlier delivery already reserved this order
+            return None
+        if 'ConditionalCheckFailed' in reasons:
+            return 'refused'
+        raise
+
+
+@tracer.capture_method
+def reserve(orders: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Reserve stock for each order; split them into reserved, retry and already processed."""
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+        outcomes = list(pool.map(reserve_order, orders))
+    result = {'reserved': [], 'retry': [], 'processed': []}
+    for order, outcome in zip(orders, outcomes):
+        result['reserved' if outcome is None else 'retry' if outcome == 'refused' else 'processed'].append(order)
+    return result
+
+
+def pay(order: Dict[str, Any], context: LambdaContext = None) -> Dict[str, Any]:
+    try:
+        totals = order.get('totals', {})
+        return charge(order['orderId'], totals.get('total'), totals.get('currency', 'USD'),
+                      order.get('paymentMethodId'), context)
+    except PaymentError as e:
+        if e.retryable:
+            return {'status': 'retry', 'transactionId': '', 'message': str(e)}
+        return {'status': 'failed', 'transactionId': '', 'message': str(e)}
+    except Exception as e:
+        logger.exception("Payment error", extra={'order_id': order['orderId']})
+        return {'status': 'failed', 'transactionId': '', 'message': f'Payment failed: {str(e)}'}
+
+
+def set_status(order: Dict[str, Any], status: str, timestamp: str) -> None:
+    order['status'] = status
+    order['updatedAt'] = timestamp
+    order['GSI1PK'] = f'STATUS#{status}'
+
+
+def status_update(order: Dict[str, Any]) -> Dict[str, Any]:
+    """UpdateItem of the order's new status fields, conditional on the order still being pending."""
+    fields = {name: order[name] for name in ('status', 'updatedAt', 'GSI1PK', 'payment', 'errorMessage')
+              if name in order}
+    return {
+        'TableName': orders_table.name,
+        'Key': order_key(order),
+        'UpdateExpression': 'SET ' + ', '.join(f'#{name} = :{name}' for name in fields),
+        'ConditionExpression': '#status = :pending',
+        'ExpressionAttributeNames': {f'#{name}': name for name in fields},
+        'ExpressionAttributeValues': {**{f':{name}': value for name, value in fields.items()}, ':pending': 'pending'}
+    }
+
+
+def update_status(order: Dict[str, Any]) -> bool:
+    """Write the order's new status alone; False if another delivery got there first."""
+    update = status_update(order)
+    update.pop('TableName')
+    try:
+        orders_table.update_item(**update)
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+def finish_order(order: Dict[str, Any]) -> str:
+    """Settle the order's reservation and write its status in one transaction.
+
+    Paid orders commit the reservation, declined ones release it and
+    cancelled ones (never reserved) only change status. Returns 'done',
+    'oversold' (paid, but the reservation had expired and the stock could not
+    be taken again) or 'settled' (another delivery already finished it).
+    """
+    if order['status'] == 'cancelled':
+        return 'done' if update_status(order) else 'settled'
+
+    totals = order_quantities(order)
+    paid = order['status'] == 'processing'
+    transact_items = inventory_ledger.settle_items(order['orderId'], totals, restore=not paid)
+    transact_items.append({'Update': status_update(order)})
+    try:
+        client.transact_write_items(TransactItems=transact_items)
+        return 'done'
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        if reasons[-1:] == ['ConditionalCheckFailed']:
+            return 'settled'
+        if reasons[:1] != ['ConditionalCheckFailed']:
+            raise
+
+    # The reservation expired and its stock was restored: a paid order takes it again, all lines or none
+    refused = inventory_ledger.take(order['orderId'], totals) if paid else []
+    if refused:
+        logger.error("Paid order oversold", extra={'order_id': order['orderId'], 'productIds': refused})
+    if not update_status(order):
+        return 'settled'
+    return 'oversold' if refused else 'done'
+
+
+@tracer.capture_method
+def finish_orders(orders: List[Dict[str, Any]]) -> List[str]:
+    """Finish orders concurrently; returns each order's outcome."""
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as pool:
+        return list(pool.map(finish_order, orders))
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    message_ids: Dict[str, str] = {}
+    queued: Dict[str, Dict[str, Any]] = {}
+    for record in event.get('Records', []):
+        order = json.loads(record['body'])
+        if order['orderId'] not in queued:
+            message_ids[order['orderId']] = record['messageId']
+            queued[order['orderId']] = order
+
+    # The queue is at-least-once: only orders still pending are processed. Their
+    # checkout reservations are read in the same BatchGetItem
+    keys = [{'PK': f"USER#{o['userId']}", 'SK': f"ORDER#{o['orderId']}"} for o in queued.values()]
+    keys += [inventory_ledger.reservation_key(order_id) for order_id in queued]
+    items = batch_get(orders_table, keys, consistent=True)
+    stored = {o['orderId']: o for o in items if o['SK'].startswith('ORDER#')}
+    held_ids = {o['orderId'] for o in items if o['SK'] == 'RESERVATION'}
+    orders = [stored[order_id] for order_id in queued if stored.get(order_id, {}).get('status') == 'pending']
+    held = [order for order in orders if order['orderId'] in held_ids]
+    orders = [order for order in orders if order['orderId'] not in held_ids]
+
+    product_ids = list({product_id for order in orders for product_id in order_quantities(order)})
+    products = batch_get(products_table, [{'PK': f'PRODUCT#{p}', 'SK': 'METADATA'} for p in product_ids])
+    stock = {
+        product['PK'][len('PRODUCT#'):]: int(product.get('inventory', 0))
+        for product in products if product.get('status', 'active') == 'active'
+    }
+
+    allocation = allocate(orders, stock)
+    reservations = reserve(allocation['accepted'])
+    retry_ids = {order['orderId'] for order in reservations['retry']}
+    # Every order paid for below holds a ledger reservation, so settling is the same for all
+    reserved = held + reservations['reserved']
+
+    with ThreadPoolExecutor(max_workers=PAYMENT_WORKERS) as pool:
+        payments = list(pool.map(partial(pay, context=context), reserved))
+
+    timestamp = datetime.utcnow().isoformat() + 'Z'
+    declined, deferred = [], []
+    for order, payment in zip(reserved, payments):
+        if payment['status'] == 'retry':
+            # Gateway unavailable: hand the order back to the queue
+            deferred.append(order)
+        elif payment['status'] == 'completed':
+            set_status(order, 'processing', timestamp)
+            order['payment'] = {
+                'status': 'completed',
+                'transactionId': payment['transactionId'],
+                'method': 'card',
+                'amount': order.get('totals', {}).get('total'),
+                'currency': order.get('totals', {}).get('currency', 'USD')
+            }
+        else:
+            set_status(order, 'failed', timestamp)
+            order['payment'] = {'status': 'failed', 'message': 'Payment processing failed'}
+            declined.append(order)
+
+    deferred_ids = {order['orderId'] for order in deferred}
+    retry_ids |= deferred_ids
+
+    for order in allocation['rejected']:
+        set_status(order, 'cancelled', timestamp)
+        order['errorMessage'] = f"Insufficient inventory for: {', '.join(order['_unavailable'])}"
+
+    # Deferred orders keep their reservation for the retry
+    finished = [order for order in reserved if order['orderId'] not in deferred_ids] + allocation['rejected']
+    outcomes = dict(zip((order['orderId'] for order in finished), finish_orders(finished)))
+    oversold = sum(1 for outcome in outcomes.values() if outcome == 'oversold')
+    settled = sum(1 for outcome in outcomes.values() if outcome == 'settled')
+    if settled:
+        logger.warning("Orders settled by another delivery", extra={'count': settled})
+
+    # Confirmation emails only for the orders this delivery settled
+    paid = [order for order in reserved
+            if order['status'] == 'processing' and outcomes.get(order['orderId']) != 'settled']
+    if paid and NOTIFICATION_QUEUE_URL:
+        unqueued = enqueue([confirmation_message(order) for order in paid])
+        if unqueued:
+            logger.warning("Confirmation emails not queued", extra={'count': unqueued})
+
+    processed = len(paid)
+    metrics.add_metric(name='BatchOrdersProcessed', unit=MetricUnit.Count, value=processed)
+    metrics.add_metric(name='BatchOrdersCancelled', unit=MetricUnit.Count, value=len(allocation['rejected']))
+    metrics.add_metric(name='BatchOrdersPaymentFailed', unit=MetricUnit.Count, value=len(declined))
+    metrics.add_metric(name='BatchOrdersRetried', unit=MetricUnit.Count, value=len(retry_ids))
+    if oversold:
+        metrics.add_metric(name='BatchOrdersOversold', unit=MetricUnit.Count, value=oversold)
+    logger.info("Order batch processed", extra={
+        'orders': len(queued), 'processed': processed, 'cancelled': len(allocation['rejected']),
+        'paymentFailed': len(declined), 'retried': len(retry_ids)
+    })
+
+    return {'batchItemFailures': [{'itemIdentifier': message_ids[order_id]} for order_id in retry_ids]}
@@ -1,50 +1,75 @@
 """
 Process Payment Lambda Handler
-DUMMY IMPLEMENTATION - Always succeeds for demo purposes
-No external payment gateway required
+PAYMENT_MODE=demo (default): DUMMY IMPLEMENTATION - Always succeeds for demo purposes
+PAYMENT_MODE=gateway: charges through payment_client.py (Stripe-compatible gateway)
 """
 import json
+import os
 import uuid
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
+import payment_client
+import profiling
+
 logger = Logger()
 tracer = Tracer()
 
+PAYMENT_MODE = os.environ.get('PAYMENT_MODE', 'demo')
+
+
+def charge(order_id: str, amount: Any, currency: str, payment_method_id: str,
+           context: Any = None) -> Dict[str, Any]:
+    """Charge one order through the gateway, or the DUMMY PAYMENT (always succeeds) in demo mode."""
+    
+    if PAYMENT_MODE == 'gateway':
+        return payment_client.charge(order_id, amount, currency, payment_method_id, context=context)
+    
+    logger.info(f"[DEMO] Processing dummy payment for order: {order_id}, amount: {amount} {currency}", extra={
+        'order_id': order_id,
+        'amount': amount,
+        'currency': currency,
+        'demo_mode': True
+    })
+    
+    # DUMMY IMPLEMENTATION - Always succeeds
+    # In production, integrate with Stripe, PayPal, Square, etc.
+    transaction_id = f"DEMO-{uuid.uuid4().hex[:12].upper()}"
+    
+    result = {
+        'status': 'completed',
+        'transactionId': transaction_id,
+        'message': f'Payment of {amount} {currency} processed successfully (DEMO MODE)',
+        'demoMode': True
+    }
+    
+    logger.info(f"[DEMO] Payment processed successfully: {result}")
+    
+    return result
+
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
-    """Lambda handler entry point - DUMMY PAYMENT (always succeeds)."""
+    """Lambda handler entry point."""
     
     try:
-        order_id = event.get('orderId')
-        amount = event.get('amount')
-        currency = event.get('currency', 'USD')
-        payment_method_id = event.get('paymentMethodId')
-        
-        logger.info(f"[DEMO] Processing dummy payment for order: {order_id}, amount: {amount} {currency}", extra={
-            'order_id': order_id,
-            'amount': amount,
-            'currency': currency,
-            'demo_mode': True
-        })
-        
-        # DUMMY IMPLEMENTATION - Always succeeds
-        # In production, integrate with Stripe, PayPal, Square, etc.
-        transaction_id = f"DEMO-{uuid.uuid4().hex[:12].upper()}"
-        
-        result = {
-            'status': 'completed',
-            'transactionId': transaction_id,
-            'message': f'Payment of {amount} {currency} processed successfully (DEMO MODE)',
-            'demoMode': True
-        }
-        
-        logger.info(f"[DEMO] Payment processed successfully: {result}")
+        return charge(
+            event.get('orderId'),
+            event.get('amount'),
+            event.get('currency', 'USD'),
+            event.get('paymentMethodId'),
+            context
+        )
         
-        return result
+    except payment_client.PaymentError as e:
+        if e.retryable:
+            # Surfaces as PaymentGatewayTimeout/PaymentGatewayUnavailable for Step Functions Retry
+            raise
+        logger.warning("Payment failed", extra={'order_id': event.get('orderId'), 'error': type(e).__name__})
+        return {'status': 'failed', 'transactionId': '', 'message': str(e), 'error': type(e).__name__}
         
     except Exception as e:
         logger.exception("[DEMO] Error in dummy payment handler")
@@ -0,0 +1,108 @@
+"""
+Reconcile Payments Lambda Handler
+Scheduled job that resolves orders whose payment outcome is uncertain
+
+An order can end up ``failed`` (or stay ``pending``) although the gateway
+captured the payment, e.g. when the charge timed out on our side. This job
+reads recent orders from the OrderDateIndex, resolves all uncertain ones
+with one paginated PaymentIntent listing (payment_client.reconcile) and
+flags captured ones as ``pending_review``.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from boto3.dynamodb.conditions import Attr, Key
+
+import aws_clients
+import payment_client
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+dynamodb = aws_clients.resource('dynamodb', 'batch')
+orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+client = dynamodb.meta.client
+
+WINDOW_HOURS = int(os.environ.get('RECONCILE_WINDOW_HOURS', '24'))
+# Pending orders younger than this are still being processed
+PENDING_GRACE_MINUTES = 15
+
+
+@tracer.capture_method
+def uncertain_orders(since: datetime) -> List[Dict[str, Any]]:
+    """Recent orders that failed or are stuck in pending."""
+    cutoff = (datetime.utcnow() - timedelta(minutes=PENDING_GRACE_MINUTES)).isoformat() + 'Z'
+    query_params = {
+        'IndexName': 'OrderDateIndex',
+        'KeyConditionExpression': Key('GSI2PK').eq('ORDER') & Key('GSI2SK').gte(since.isoformat() + 'Z'),
+        'FilterExpression': Attr('status').eq('failed') | (Attr('status').eq('pending') & Attr('createdAt').lt(cutoff)),
+        'ProjectionExpression': 'PK, SK, orderId, #status, createdAt',
+        'ExpressionAttributeNames': {'#status': 'status'}
+    }
+    orders = []
+    while True:
+        response = orders_table.query(**query_params)
+        orders.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return orders
+        query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def flag_for_review(order: Dict[str, Any], intent: Dict[str, Any]) -> bool:
+    try:
+        orders_table.update_item(
+            Key={'PK': order['PK'], 'SK': order['SK']},
+            UpdateExpression='SET #status = :review, #payment = :payment, errorMessage = :error, updatedAt = :now',
+            ConditionExpression='#status = :seen',
+            ExpressionAttributeNames={'#status': 'status', '#payment': 'payment'},
+            ExpressionAttributeValues={
+                ':review': 'pending_review',
+                ':seen': order['status'],
+                ':payment': {'status': 'completed', 'transactionId': intent['transactionId'], 'method': 'card'},
+                ':error': 'Payment captured but order was not completed - requires manual review',
+                ':now': datetime.utcnow().isoformat() + 'Z'
+            }
+        )
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+
+    if os.environ.get('PAYMENT_MODE', 'demo') != 'gateway':
+        return {'checked': 0, 'flagged': 0}
+
+    since = datetime.utcnow() - timedelta(hours=WINDOW_HOURS)
+    orders = uncertain_orders(since)
+    if not orders:
+        return {'checked': 0, 'flagged': 0}
+
+    intents = payment_client.reconcile(
+        [order['orderId'] for order in orders],
+        created_after=int(time.time()) - WINDOW_HOURS * 3600,
+        deadline=payment_client.timeout_budget(context)
+    )
+    flagged = sum(
+        flag_for_review(order, intents[order['orderId']])
+        for order in orders
+        if intents.get(order['orderId'], {}).get('status') == 'succeeded'
+    )
+
+    metrics.add_metric(name='PaymentsReconciled', unit=MetricUnit.Count, value=len(orders))
+    metrics.add_metric(name='CapturedPaymentsFlagged', unit=MetricUnit.Count, value=flagged)
+    logger.info("Payment reconciliation complete", extra={'checked': len(orders), 'flagged': flagged})
+
+    return {'checked': len(orders), 'flagged': flagged}
@@ -1,54 +1,42 @@
 """
 Send Confirmation Lambda Handler
-Step Functions task to send order confirmation email
+Step Functions task to queue the order confirmation email
 """
-import os
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import profiling
+from notifications import NOTIFICATION_QUEUE_URL, confirmation_message, enqueue
 
 logger = Logger()
 tracer = Tracer()
 
-ses = boto3.client('ses')
-
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
         order_id = event.get('orderId')
         email = event.get('email')
-        totals = event.get('totals', {})
-        
-        logger.info(f"Sending confirmation email for order: {order_id} to {email}")
-        
-        # TODO: Implement actual email sending with SES
-        # For now, just log the action
-        
-        # from_email = os.environ.get('FROM_EMAIL', 'noreply@example.com')
-        # 
-        # ses.send_email(
-        #     Source=from_email,
-        #     Destination={'ToAddresses': [email]},
-        #     Message={
-        #         'Subject': {'Data': f'Order Confirmation - {order_id}'},
-        #         'Body': {
-        #             'Text': {
-        #                 'Data': f'Your order {order_id} has been confirmed. Total: ${totals.get("total", 0)}'
-        #             }
-        #         }
-        #     }
-        # )
-        
-        logger.info(f"Order confirmation email sent to {email}")
         
+        if not NOTIFICATION_QUEUE_URL:
+            # No notification pipeline configured (local/demo): just log the action
+            logger.info(f"Order confirmation for {order_id} not queued; NOTIFICATION_QUEUE_URL is not set")
+            return {'status': 'success', 'message': f'Confirmation email skipped for {email}'}
+
+        # Sent in bulk by send_notifications.py
+        if enqueue([confirmation_message(event)]):
+            raise RuntimeError('Notification queue refused the message')
+
+        logger.info(f"Order confirmation email queued for {order_id}")
+
         return {
             'status': 'success',
-            'message': f'Confirmation email sent to {email}'
+            'message': f'Confirmation email queued for {email}'
         }
         
     except Exception as e:
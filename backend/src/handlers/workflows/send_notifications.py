@@ -0,0 +1,281 @@
+"""
+Send Notifications Lambda Handler
+SQS consumer that sends queued notification emails in bulk through SES
+
+Workflows enqueue one message per email (workflows/notifications.py). Each
+batch is:
+
+1. Deduplicated per recipient: repeats within the batch are dropped and each
+   email is claimed with a conditional put of a ``NOTIFY#<email>`` marker in
+   ReadModelsTable, so redeliveries and concurrent copies are sent once
+2. Sent with SendBulkTemplatedEmail, up to 50 destinations per call, against SES
+   templates registered once per container from ``templates/*.json``
+3. Paced by a sliding-window limiter sized to this consumer's share of the account's
+   SES maximum send rate; messages over the rate, the daily quota or the
+   invocation's time budget go back to the queue via ``batchItemFailures``
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from aws_lambda_powertools import Logger, Metrics, Tracer
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from botocore.exceptions import ClientError
+
+import aws_clients
+import profiling
+
+logger = Logger()
+tracer = Tracer()
+metrics = Metrics()
+
+FROM_EMAIL = os.environ.get('FROM_EMAIL', 'noreply@example.com')
+STORE_NAME = os.environ.get('STORE_NAME', 'E-Commerce Store')
+TEMPLATE_PREFIX = os.environ.get('SES_TEMPLATE_PREFIX', 'ecommerce')
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+TEMPLATES = {'order_confirmation': 'order_confirmation'}
+# Defaults for every template variable; SES requires DefaultTemplateData for bulk sends
+DEFAULT_TEMPLATE_DATA = json.dumps({'storeName': STORE_NAME, 'orderId': '', 'items': [], 'total': ''})
+
+BULK_DESTINATIONS = 50
+CLAIM_WORKERS = 16
+# Matches the notification queue's visibility timeout
+CLAIM_TIMEOUT_SECONDS = 360
+# Concurrent consumers share the account send rate (matches the event source MaximumConcurrency)
+CONSUMER_CONCURRENCY = int(os.environ.get('NOTIFICATION_CONCURRENCY', '2'))
+# Margin for clock skew between our window and SES's
+RATE_HEADROOM = 0.9
+QUOTA_REFRESH_SECONDS = 300
+MARKER_TTL_DAYS = 7
+# Time kept back to write markers and report failures
+RESERVE_MS = 2000
+PERMANENT_FAILURES = {'MessageRejected', 'InvalidParameterValue', 'MailFromDomainNotVerified'}
+THROTTLING_ERRORS = {'Throttling', 'ThrottlingException', 'MaxSendingRateExceeded'}
+
+dynamodb = aws_clients.resource('dynamodb', 'batch', pool_size=CLAIM_WORKERS)
+read_models_table = dynamodb.Table(os.environ['READ_MODELS_TABLE'])
+client = dynamodb.meta.client
+ses = aws_clients.client('ses', 'batch')
+
+
+class SendRateLimiter:
+    """Sliding one-second window of sends, the way SES measures MaxSendRate."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int, deadline: float) -> bool:
+        """Wait until ``count`` (at most ``rate``) more sends fit; False if not before ``deadline``."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= 1:
+                    self.window.popleft()
+                if sum(sent for _, sent in self.window) + count <= self.rate:
+                    self.window.append((now, count))
+                    return True
+                wait = self.window[0][0] + 1 - now
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self) -> None:
+        """SES throttled us anyway: treat the next second as used up."""
+        with self.lock:
+            self.window.append((time.monotonic(), self.rate))
+
+
+_limiter: Optional[SendRateLimiter] = None
+_quota_checked = 0.0
+_daily_remaining = 0
+_registered_templates = set()
+
+
+def send_quota() -> SendRateLimiter:
+    """Refresh the send rate and daily allowance from SES every few minutes."""
+    global _limiter, _quota_checked, _daily_remaining
+    if _limiter is None or time.monotonic() - _quota_checked > QUOTA_REFRESH_SECONDS:
+        quota = ses.get_send_quota()
+        rate = max(1.0, float(quota['MaxSendRate']) * RATE_HEADROOM / CONSUMER_CONCURRENCY)
+        if _limiter is None or _limiter.rate != rate:
+            _limiter = SendRateLimiter(rate)
+        # Max24HourSend is -1 for unlimited accounts
+        max_daily = float(quota['Max24HourSend'])
+        _daily_remaining = int(max_daily - float(quota['SentLast24Hours'])) if max_daily >= 0 else 10 ** 9
+        _quota_checked = time.monotonic()
+    return _limiter
+
+
+def template_name(message_type: str) -> str:
+    return f'{TEMPLATE_PREFIX}-{TEMPLATES[message_type].replace("_", "-")}'
+
+
+def ensure_template(message_type: str) -> str:
+    """Register the SES template from templates/<name>.json once per container."""
+    name = template_name(message_type)
+    if name in _registered_templates:
+        return name
+    with open(os.path.join(TEMPLATES_DIR, f'{TEMPLATES[message_type]}.json')) as f:
+        template = {'TemplateName': name, **json.load(f)}
+    try:
+        current = ses.get_template(TemplateName=name)['Template']
+        if any(current.get(part) != template[part] for part in ('SubjectPart', 'TextPart', 'HtmlPart')):
+            ses.update_template(Template=template)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'TemplateDoesNotExist':
+            raise
+        ses.create_template(Template=template)
+    _registered_templates.add(name)
+    return name
+
+
+def marker_key(message: Dict[str, Any]) -> Dict[str, str]:
+    return {'PK': f"NOTIFY#{message['email'].lower()}", 'SK': f"{message['type']}#{message['orderId']}"}
+
+
+def claim(message: Dict[str, Any], now: datetime) -> bool:
+    """Take the recipient's marker for this message; False if it was sent or is being sent."""
+    try:
+        read_models_table.put_item(
+            Item={**marker_key(message), 'state': 'sending', 'claimedAt': now.isoformat() + 'Z',
+                  'expiresAt': int((now + timedelta(days=MARKER_TTL_DAYS)).timestamp())},
+            ConditionExpression='attribute_not_exists(PK) OR (#state = :sending AND claimedAt < :stale)',
+            ExpressionAttributeNames={'#state': 'state'},
+            ExpressionAttributeValues={
+                ':sending': 'sending',
+                # A claim older than the queue's visibility timeout belongs to a crashed invocation
+                ':stale': (now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)).isoformat() + 'Z'
+            }
+        )
+        return True
+    except client.exceptions.ConditionalCheckFailedException:
+        return False
+
+
+@tracer.capture_method
+def claim_all(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    with ThreadPoolExecutor(max_workers=CLAIM_WORKERS) as pool:
+        claimed = list(pool.map(lambda message: claim(message, now), messages))
+    return [message for message, ok in zip(messages, claimed) if ok]
+
+
+@tracer.capture_method
+def settle(done: List[Dict[str, Any]], released: List[Dict[str, Any]]) -> None:
+    """Mark delivered (or permanently rejected) messages and release claims for retries."""
+    expires_at = int((datetime.utcnow() + timedelta(days=MARKER_TTL_DAYS)).timestamp())
+    sent_at = datetime.utcnow().isoformat() + 'Z'
+    with read_models_table.batch_writer(overwrite_by_pkeys=['PK', 'SK']) as batch:
+        for message in done:
+            batch.put_item(Item={**marker_key(message), 'state': 'sent', 'sentAt': sent_at, 'expiresAt': expires_at})
+        for message in released:
+            batch.delete_item(Key=marker_key(message))
+
+
+def send_bulk(template: str, messages: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """One SendBulkTemplatedEmail call; splits the messages by per-destination outcome."""
+    outcome = {'sent': [], 'rejected': [], 'retry': []}
+    try:
+        response = ses.send_bulk_templated_email(
+            Source=FROM_EMAIL,
+            Template=template,
+            DefaultTemplateData=DEFAULT_TEMPLATE_DATA,
+            Destinations=[
+                {
+                    'Destination': {'ToAddresses': [message['email']]},
+                    'ReplacementTemplateData': json.dumps(message.get('data', {}))
+                }
+                for message in messages
+            ]
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] in THROTTLING_ERRORS:
+            outcome['throttled'] = True
+        else:
+            logger.exception("Bulk send failed", extra={'template': template, 'destinations': len(messages)})
+        outcome['retry'] = messages
+        return outcome
+
+    for message, status in zip(messages, response['Status']):
+        if status['Status'] == 'Success':
+            outcome['sent'].append(message)
+        elif status['Status'] in PERMANENT_FAILURES:
+            logger.warning("Notification rejected", extra={'orderId': message['orderId'], 'status': status['Status'],
+                                                           'error': status.get('Error')})
+            outcome['rejected'].append(message)
+        else:
+            outcome['retry'].append(message)
+    return outcome
+
+
+@metrics.log_metrics
+@aws_clients.record_metrics(metrics)
+@tracer.capture_lambda_handler
+@logger.inject_lambda_context
+@profiling.profiled
+def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
+    """Lambda handler entry point."""
+    global _daily_remaining
+
+    deadline = time.monotonic() + (context.get_remaining_time_in_millis() - RESERVE_MS) / 1000
+
+    message_ids: Dict[tuple, str] = {}
+    queued: Dict[tuple, Dict[str, Any]] = {}
+    for record in event.get('Records', []):
+        message = json.loads(record['body'])
+        if message.get('type') not in TEMPLATES or not message.get('email'):
+            logger.warning("Dropping malformed notification", extra={'messageId': record['messageId']})
+            continue
+        key = tuple(marker_key(message).values())
+        if key not in queued:
+            message_ids[key] = record['messageId']
+            queued[key] = message
+
+    pending = claim_all(list(queued.values()))
+
+    limiter = send_quota() if pending else None
+    sent, rejected, retry = [], [], []
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for message in pending:
+        by_type.setdefault(message['type'], []).append(message)
+
+    throttled = False
+    for message_type, messages in by_type.items():
+        template = ensure_template(message_type)
+        # SES counts every destination against the per-second rate, so a call never exceeds it
+        size = max(1, min(BULK_DESTINATIONS, int(limiter.rate)))
+        for start in range(0, len(messages), size):
+            chunk = messages[start:start + size]
+            if throttled or len(chunk) > _daily_remaining or not limiter.acquire(len(chunk), deadline):
+                retry.extend(chunk)
+                continue
+            outcome = send_bulk(template, chunk)
+            _daily_remaining -= len(outcome['sent'])
+            sent.extend(outcome['sent'])
+            rejected.extend(outcome['rejected'])
+            retry.extend(outcome['retry'])
+            if outcome.get('throttled'):
+                limiter.drain()
+                throttled = True
+
+    if sent or rejected or retry:
+        settle(sent + rejected, retry)
+
+    duplicates = len(queued) - len(pending) + len(event.get('Records', [])) - len(message_ids)
+    metrics.add_metric(name='NotificationsSent', unit=MetricUnit.Count, value=len(sent))
+    metrics.add_metric(name='NotificationsDuplicate', unit=MetricUnit.Count, value=duplicates)
+    metrics.add_metric(name='NotificationsRejected', unit=MetricUnit.Count, value=len(rejected))
+    metrics.add_metric(name='NotificationsDeferred', unit=MetricUnit.Count, value=len(retry))
+    logger.info("Notification batch processed", extra={
+        'messages': len(event.get('Records', [])), 'sent': len(sent), 'duplicates': duplicates,
+        'rejected': len(rejected), 'deferred': len(retry)
+    })
+
+    return {'batchItemFailures': [{'itemIdentifier': message_ids[tuple(marker_key(m).values())]} for m in retry]}
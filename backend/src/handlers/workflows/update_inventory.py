@@ -1,57 +1,70 @@
 """
 Update Inventory Lambda Handler
 Step Functions task to update product inventory after order
+
+Orders reserved at checkout commit their reservation (the stock was taken
+then); ``action: release`` returns it when payment fails. Orders without a
+reservation, or whose reservation expired, take their stock here with one
+conditional transaction (inventory_ledger.take). If any line is short the
+task fails with InsufficientInventory, and the workflow's Catch sends the
+paid order to manual review. Any other error fails the task too, so it is
+retried or caught rather than reported as a status the workflow would
+carry on past.
 """
-import os
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import inventory_ledger
+import profiling
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
-products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+
+class InsufficientInventory(Exception):
+    """A paid order's stock could not be taken; raised so the workflow catches it."""
 
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
     try:
         order_id = event.get('orderId')
         items = event.get('items', [])
-        
+        totals = inventory_ledger.quantities(items)
+
+        if event.get('action') == 'release':
+            released = inventory_ledger.release(order_id, totals)
+            logger.info(f"Reservation for order {order_id} {'released' if released else 'already closed'}")
+            return {'status': 'success', 'message': 'Reservation released' if released else 'No open reservation'}
+
         logger.info(f"Updating inventory for order: {order_id}")
-        
-        for item in items:
-            product_id = item['productId']
-            quantity = item['quantity']
-            
-            # Decrement inventory
-            products_table.update_item(
-                Key={
-                    'PK': f'PRODUCT#{product_id}',
-                    'SK': 'METADATA'
-                },
-                UpdateExpression='SET inventory = inventory - :qty',
-                ExpressionAttributeValues={
-                    ':qty': quantity
-                }
-            )
-            
-            logger.info(f"Decremented inventory for {product_id} by {quantity}")
-        
+
+        if inventory_ledger.commit(order_id, totals):
+            return {
+                'status': 'success',
+                'message': f'Reservation committed for {len(items)} items'
+            }
+
+        # No reservation (order predates the ledger, or it expired): take the stock now
+        refused = inventory_ledger.take(order_id, totals)
+        if refused:
+            raise InsufficientInventory(f'Insufficient inventory for: {", ".join(refused)}')
+
+        logger.info(f"Took inventory for order {order_id} without a reservation")
         return {
             'status': 'success',
             'message': f'Inventory updated for {len(items)} items'
         }
-        
-    except Exception as e:
+
+    except InsufficientInventory:
+        logger.warning(f"Inventory for order {event.get('orderId')} could not be taken")
+        raise
+    except Exception:
+        # Raised, not returned: the workflow's Retry and Catch only see a failed task
         logger.exception("Error updating inventory")
-        return {
-            'status': 'error',
-            'message': str(e)
-        }
+        raise
@@ -1,23 +1,28 @@
 """
 Validate Inventory Lambda Handler
 Step Functions task to validate product inventory availability
+
+Orders from checkout already hold a reservation. Any other order reserves
+its stock here through the inventory ledger, all lines in one conditional
+transaction, so the stock it was validated against is still there when
+UpdateInventory commits it. Errors fail the task rather than reporting the
+stock as unavailable, so an outage is retried or caught as a failure instead
+of cancelling the order.
 """
-import json
-import os
 from typing import Any, Dict
 from aws_lambda_powertools import Logger, Tracer
 from aws_lambda_powertools.utilities.typing import LambdaContext
-import boto3
+
+import inventory_ledger
+import profiling
 
 logger = Logger()
 tracer = Tracer()
 
-dynamodb = boto3.resource('dynamodb')
-products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
-
 
 @tracer.capture_lambda_handler
 @logger.inject_lambda_context
+@profiling.profiled
 def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
     """Lambda handler entry point."""
     
@@ -27,31 +32,14 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         
         logger.info(f"Validating inventory for order: {order_id}")
         
-        all_available = True
-        unavailable_items = []
-        
-        for item in items:
-            product_id = item['productId']
-            quantity = item['quantity']
-            
-            # Get product
-            response = products_table.get_item(
-                Key={
-                    'PK': f'PRODUCT#{product_id}',
-                    'SK': 'METADATA'
-                }
-            )
-            
-            if 'Item' not in response:
-                all_available = False
-                unavailable_items.append(product_id)
-                continue
-            
-            product = response['Item']
-            
-            if product.get('inventory', 0) < quantity:
-                all_available = False
-                unavailable_items.append(product_id)
+        # Orders from checkout hold a reservation: the stock is already set aside
+        if inventory_ledger.get_reservation(order_id):
+            logger.info(f"Inventory reserved at checkout for order: {order_id}")
+            return {'status': 'success', 'available': True, 'message': 'Inventory reserved at checkout'}
+
+        # Otherwise reserve every line now; the reservation is committed or released later
+        unavailable_items = inventory_ledger.reserve(order_id, event.get('userId', ''), inventory_ledger.quantities(items))
+        all_available = not unavailable_items
         
         result = {
             'status': 'success' if all_available else 'failed',
@@ -63,10 +51,7 @@ def handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any]:
         
         return result
         
-    except Exception as e:
+    except Exception:
+        # An outage is not a shortage: fail the task so the workflow retries or catches it
         logger.exception("Error validating inventory")
-        return {
-            'status': 'error',
-            'available': False,
-            'message': str(e)
-        }
+        raise
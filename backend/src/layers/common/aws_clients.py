@@ -0,0 +1,178 @@
+"""
+Shared boto3 client factory
+
+Handlers get their clients and resources here instead of calling
+``boto3.client``/``boto3.resource`` with botocore's defaults (10 pooled
+connections, legacy retries, 60 s read timeout, no TCP keep-alive). Each
+workload picks a profile:
+
+- ``interactive``: API handlers. Short connect/read timeouts and few
+  attempts, so a slow partition costs a retry instead of the whole
+  30 s invocation.
+- ``batch``: stream, queue, workflow and scheduled jobs. Longer read
+  timeout and more attempts; throughput matters more than tail latency.
+
+Both use adaptive retries (client-side rate limiting once throttles are
+seen) and keep-alive. ``pool_size`` should match the handler's thread
+pool so workers never queue for a connection. Clients are cached per
+(service, profile, pool size) for the life of the container.
+
+Every client counts calls, retries, throttles and timeouts per
+container (hedged_reads.py and rate_limits.py add their own counters
+through ``count``); ``record_metrics`` adds them to a handler's Powertools
+metrics after each invocation. While profiling.py profiles an invocation, every operation's
+wall time is also reported to ``call_timer``.
+"""
+import functools
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'interactive': {
+        'connect_timeout': 1,
+        'read_timeout': 3,
+        'retries': {'mode': 'adaptive', 'total_max_attempts': 4},
+        'max_pool_connections': 10,
+        'tcp_keepalive': True
+    },
+    'batch': {
+        'connect_timeout': 2,
+        'read_timeout': 10,
+        'retries': {'mode': 'adaptive', 'total_max_attempts': 10},
+        'max_pool_connections': 25,
+        'tcp_keepalive': True
+    }
+}
+
+THROTTLING_ERRORS = {
+    'ThrottlingException', 'Throttling', 'ProvisionedThroughputExceededException',
+    'RequestLimitExceeded', 'TooManyRequestsException', 'SlowDown', 'RequestThrottled'
+}
+
+# Counters from shared modules, published only by functions that use the module (keyed by its first counter)
+MODULE_METRICS = {
+    'hedged_reads': (('hedged_reads', 'HedgedReads'), ('hedge_requests', 'HedgeRequests'),
+                     ('hedge_wins', 'HedgeWins'), ('hedges_over_budget', 'HedgesOverBudget')),
+    'rate_limit_checks': (('rate_limit_checks', 'RateLimitChecks'), ('rate_limited', 'RateLimited'),
+                          ('rate_limit_leases', 'RateLimitLeases'))
+}
+
+# Shared modules (inventory_ledger, notifications) follow the function's profile
+DEFAULT_PROFILE = os.environ.get('AWS_CLIENT_PROFILE', 'interactive')
+
+_cache: Dict[tuple, Any] = {}
+_lock = threading.Lock()
+stats: Counter = Counter()
+# Set by profiling.py while it profiles an invocation: called with (service, seconds) per operation
+call_timer: Optional[Callable[[str, float], None]] = None
+
+
+def config(profile: Optional[str] = None, pool_size: Optional[int] = None) -> Config:
+    settings = dict(PROFILES[profile or DEFAULT_PROFILE])
+    if pool_size:
+        settings['max_pool_connections'] = max(pool_size, settings['max_pool_connections'])
+    return Config(**settings)
+
+
+def count(key: str, value: int = 1) -> None:
+    with _lock:
+        stats[key] += value
+
+
+def _on_call(model: Any = None, context: Dict[str, Any] = None, **kwargs) -> None:
+    """before-call: start the operation's clock while an invocation is profiled."""
+    if call_timer is not None and context is not None:
+        context['timed_call'] = (model.service_model.service_name, time.perf_counter())
+
+
+def _time_call(context: Optional[Dict[str, Any]]) -> None:
+    timer = call_timer
+    if timer is not None and context and 'timed_call' in context:
+        service, started_at = context.pop('timed_call')
+        timer(service, time.perf_counter() - started_at)
+
+
+def _on_response(parsed: Dict[str, Any] = None, context: Dict[str, Any] = None, **kwargs) -> None:
+    """after-call: once per operation, with the attempts it took."""
+    count('calls')
+    count('retries', (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts', 0))
+    _time_call(context)
+
+
+def _on_error(context: Dict[str, Any] = None, **kwargs) -> None:
+    """after-call-error: operations that raised still count towards profiled AWS time."""
+    _time_call(context)
+
+
+def _on_attempt(response=None, caught_exception=None, **kwargs) -> None:
+    """needs-retry: once per attempt, before the retry handler decides."""
+    if caught_exception is not None:
+        if 'Timeout' in type(caught_exception).__name__:
+            count('timeouts')
+    elif response is not None and response[1].get('Error', {}).get('Code') in THROTTLING_ERRORS:
+        count('throttles')
+
+
+def _instrument(client: Any) -> Any:
+    client.meta.events.register('before-call', _on_call)
+    client.meta.events.register('after-call', _on_response)
+    client.meta.events.register('after-call-error', _on_error)
+    # First, so it sees every attempt even when the retry handler answers
+    client.meta.events.register_first('needs-retry', _on_attempt)
+    return client
+
+
+def client(service: str, profile: Optional[str] = None, pool_size: Optional[int] = None,
+           endpoint_url: Optional[str] = None) -> Any:
+    """``endpoint_url`` is for per-deployment endpoints such as a WebSocket API's management API."""
+    profile = profile or DEFAULT_PROFILE
+    key = ('client', service, profile, pool_size, endpoint_url)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = _instrument(boto3.client(service, config=config(profile, pool_size),
+                                                   endpoint_url=endpoint_url))
+        return _cache[key]
+
+
+def resource(service: str, profile: Optional[str] = None, pool_size: Optional[int] = None) -> Any:
+    profile = profile or DEFAULT_PROFILE
+    key = ('resource', service, profile, pool_size)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = boto3.resource(service, config=config(profile, pool_size))
+            _instrument(_cache[key].meta.client)
+        return _cache[key]
+
+
+def emit_metrics(metrics: Any) -> None:
+    """Add the counters since the last call to a Powertools ``Metrics`` instance and reset them."""
+    from aws_lambda_powertools.metrics import MetricUnit
+
+    with _lock:
+        snapshot = dict(stats)
+        stats.clear()
+    for key, name in (('retries', 'AwsRetries'), ('throttles', 'AwsThrottles'), ('timeouts', 'AwsTimeouts')):
+        metrics.add_metric(name=name, unit=MetricUnit.Count, value=snapshot.get(key, 0))
+    for gate, counters in MODULE_METRICS.items():
+        if gate in snapshot:
+            for key, name in counters:
+                metrics.add_metric(name=name, unit=MetricUnit.Count, value=snapshot.get(key, 0))
+
+
+def record_metrics(metrics: Any) -> Callable:
+    """Handler decorator (inside ``@metrics.log_metrics``) that emits the client counters per invocation."""
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                emit_metrics(metrics)
+        return wrapper
+    return decorator
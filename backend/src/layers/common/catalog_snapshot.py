@@ -0,0 +1,387 @@
+"""
+Catalog snapshot: a memory-mapped, read-only copy of the active products
+
+products/build_catalog_snapshot.py exports the active products to one file
+and publishes it to the catalog bucket behind a version pointer. The product
+read handlers download the current snapshot to /tmp when a container starts,
+mmap it, and lay on top the changes products/catalog_deltas.py has recorded
+in ReadModelsTable since the snapshot was built (``Catalog``). Lookups are
+binary searches over fixed-width index entries in the map; nothing is
+decoded until a handler asks for a dict.
+
+File layout (little-endian), sections in this order:
+
+    header      HEADER: magic, counts and the offset of each section below
+    records     one compact JSON document per product, in productId order
+    ids         one ID_ENTRY per product, in productId order
+    id pool     the productIds, UTF-8
+    categories  one CATEGORY_ENTRY per category, in name order
+    name pool   the category names, UTF-8
+    postings    one POSTING per product, grouped by category, in (price, productId) order
+
+A record holds the product as get_product.py returns it, with
+``imageAssets`` written last; its ID_ENTRY stores where that field starts,
+so the list view get_products.py returns (no image variants) is a prefix of
+the record and both are served as bytes straight from the map. Decimals are
+written as JSON numbers.
+"""
+import heapq
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+import aws_clients
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CATSNAP1'
+# magic, products, categories, then the offsets of ids, id pool, categories, name pool, postings
+HEADER = struct.Struct('<8sII5Q')
+# record offset, record length, list view length, price, id pool offset, id length
+ID_ENTRY = struct.Struct('<QIIdIH')
+# name pool offset, name length, first posting, posting count
+CATEGORY_ENTRY = struct.Struct('<IHII')
+# price, product index
+POSTING = struct.Struct('<dI')
+
+POINTER_KEY = 'catalog/latest.json'
+SNAPSHOT_PREFIX = 'catalog/snapshots/'
+DELTAS_PK = 'CATALOG#DELTAS'
+# Idempotency set for the image pipeline; never returned by the API
+OMITTED_FIELDS = ('imageIds',)
+# Delta rows are re-read this far back, so rows written out of order by
+# concurrent stream batches are not skipped
+DELTA_OVERLAP_SECONDS = 60
+
+Entry = Tuple[bytes, int, str, float]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_json_default, separators=(',', ':')).encode()
+
+
+def encode(product: Dict[str, Any]) -> Tuple[bytes, int]:
+    """A product's record and the length of its list view (the record up to ``imageAssets``)."""
+    fields = {k: v for k, v in product.items() if k not in OMITTED_FIELDS and k != 'imageAssets'}
+    body = _dumps(fields)
+    if 'imageAssets' not in product:
+        return body, len(body) - 1
+    prefix = body[:-1]
+    separator = b',' if fields else b''
+    return prefix + separator + b'"imageAssets":' + _dumps(product['imageAssets']) + b'}', len(prefix)
+
+
+def entry(product: Dict[str, Any]) -> Entry:
+    """What the snapshot and the delta overlay keep per product."""
+    record, list_length = encode(product)
+    return record, list_length, str(product.get('category', '')), float(product.get('price', 0))
+
+
+def list_view(record: bytes, list_length: int) -> bytes:
+    return bytes(record[:list_length]) + b'}'
+
+
+def write(path: str, products: Iterable[Tuple[str, Entry]]) -> Dict[str, int]:
+    """Write a snapshot of ``(productId, entry)`` pairs to ``path``; returns its counts."""
+    products = sorted(products, key=lambda item: item[0].encode())
+    index_entries, id_pool, by_category = [], bytearray(), {}
+    with open(path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        offset = HEADER.size
+        for index, (product_id, (record, list_length, category, price)) in enumerate(products):
+            f.write(record)
+            encoded_id = product_id.encode()
+            index_entries.append(ID_ENTRY.pack(offset, len(record), list_length, price, len(id_pool), len(encoded_id)))
+            id_pool += encoded_id
+            by_category.setdefault(category, []).append((price, encoded_id, index))
+            offset += len(record)
+
+        ids_offset = offset
+        f.write(b''.join(index_entries))
+        id_pool_offset = ids_offset + len(index_entries) * ID_ENTRY.size
+        f.write(id_pool)
+
+        categories_offset = id_pool_offset + len(id_pool)
+        category_entries, names, postings = [], bytearray(), []
+        for category in sorted(by_category, key=str.encode):
+            encoded = category.encode()
+            members = sorted(by_category[category])
+            category_entries.append(CATEGORY_ENTRY.pack(len(names), len(encoded), len(postings), len(members)))
+            names += encoded
+            postings += [POSTING.pack(price, index) for price, _, index in members]
+        f.write(b''.join(category_entries))
+        names_offset = categories_offset + len(category_entries) * CATEGORY_ENTRY.size
+        f.write(names)
+        postings_offset = names_offset + len(names)
+        f.write(b''.join(postings))
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(products), len(category_entries), ids_offset, id_pool_offset,
+                            categories_offset, names_offset, postings_offset))
+    return {'products': len(products), 'categories': len(category_entries),
+            'bytes': postings_offset + len(postings) * POSTING.size}
+
+
+def _bisect(lo: int, hi: int, before) -> int:
+    """First position in [lo, hi) for which ``before(position)`` is false."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if before(mid):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class Snapshot:
+    """A snapshot file, mapped read-only."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, self.category_count, self._ids, self._id_pool,
+         self._categories, self._names, self._postings) = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a catalog snapshot')
+        self._view = memoryview(self._map)
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            # A record view is still referenced; the map is freed with it
+            pass
+
+    def _entry(self, index: int) -> Tuple[int, int, int, float, int, int]:
+        return ID_ENTRY.unpack_from(self._map, self._ids + index * ID_ENTRY.size)
+
+    def _id_bytes(self, index: int) -> bytes:
+        entry_ = self._entry(index)
+        start = self._id_pool + entry_[4]
+        return self._map[start:start + entry_[5]]
+
+    def product_id(self, index: int) -> str:
+        return self._id_bytes(index).decode()
+
+    def price(self, index: int) -> float:
+        return self._entry(index)[3]
+
+    def find(self, product_id: str) -> Optional[int]:
+        key = product_id.encode()
+        index = _bisect(0, self.count, lambda i: self._id_bytes(i) < key)
+        return index if index < self.count and self._id_bytes(index) == key else None
+
+    def record(self, index: int) -> memoryview:
+        offset, length = self._entry(index)[:2]
+        return self._view[offset:offset + length]
+
+    def list_view(self, index: int) -> bytes:
+        offset, _, list_length = self._entry(index)[:3]
+        return self._map[offset:offset + list_length] + b'}'
+
+    def ids_after(self, after: Optional[str]) -> Iterator[int]:
+        """Product indexes in productId order, starting after ``after``."""
+        start = 0
+        if after:
+            key = after.encode()
+            start = _bisect(0, self.count, lambda i: self._id_bytes(i) <= key)
+        return iter(range(start, self.count))
+
+    def postings(self, category: str, min_price: Optional[float] = None,
+                 max_price: Optional[float] = None) -> Iterator[Tuple[float, int]]:
+        """``(price, index)`` for a category's products within the price range, cheapest first."""
+        key = category.encode()
+
+        def name(i):
+            name_offset, name_length = CATEGORY_ENTRY.unpack_from(self._map, self._categories + i * CATEGORY_ENTRY.size)[:2]
+            return self._map[self._names + name_offset:self._names + name_offset + name_length]
+
+        position = _bisect(0, self.category_count, lambda i: name(i) < key)
+        if position == self.category_count or name(position) != key:
+            return iter(())
+        first, count = CATEGORY_ENTRY.unpack_from(self._map, self._categories + position * CATEGORY_ENTRY.size)[2:]
+
+        def posting(j):
+            return POSTING.unpack_from(self._map, self._postings + j * POSTING.size)
+
+        start = first if min_price is None else _bisect(first, first + count, lambda j: posting(j)[0] < min_price)
+        end = first + count if max_price is None else _bisect(start, first + count, lambda j: posting(j)[0] <= max_price)
+        return (posting(j) for j in range(start, end))
+
+
+class Catalog:
+    """The current snapshot plus the product changes recorded since it was built.
+
+    ``refresh()`` is called once per invocation: every ``check_seconds`` it
+    reads the version pointer and swaps in a new snapshot, every
+    ``refresh_seconds`` it reads new delta rows. It returns False (and the
+    handler reads DynamoDB) until a snapshot is loaded, or when the deltas
+    could not be read for ``max_stale_seconds``.
+    """
+
+    def __init__(self, s3: Any, bucket: str, deltas_table: Any, directory: Optional[str] = None,
+                 check_seconds: float = 300, refresh_seconds: float = 5, max_stale_seconds: float = 60):
+        self.s3 = s3
+        self.bucket = bucket
+        self.deltas_table = deltas_table
+        self.directory = directory or tempfile.gettempdir()
+        self.check_seconds = check_seconds
+        self.refresh_seconds = refresh_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.snapshot: Optional[Snapshot] = None
+        self.version: Optional[str] = None
+        self.overlay: Dict[str, Optional[Entry]] = {}
+        self._path: Optional[str] = None
+        self._cursor = ''
+        self._next_check = 0.0
+        self._next_refresh = 0.0
+        self._fresh_until = 0.0
+
+    def refresh(self) -> bool:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_seconds
+            try:
+                self._load_pointer()
+            except Exception:
+                logger.exception('Could not load the catalog snapshot')
+        if self.snapshot and now >= self._next_refresh:
+            self._next_refresh = now + self.refresh_seconds
+            try:
+                self._load_deltas()
+                self._fresh_until = now + self.max_stale_seconds
+            except Exception:
+                logger.exception('Could not read catalog deltas')
+        return self.snapshot is not None and now < self._fresh_until
+
+    def _load_pointer(self) -> None:
+        pointer = json.loads(self.s3.get_object(Bucket=self.bucket, Key=POINTER_KEY)['Body'].read())
+        if pointer['version'] == self.version:
+            return
+        path = os.path.join(self.directory, f"catalog-{pointer['version']}.snap")
+        if not os.path.exists(path):
+            self.s3.download_file(self.bucket, pointer['key'], path + '.part')
+            os.replace(path + '.part', path)
+        snapshot = Snapshot(path)
+
+        previous, previous_path = self.snapshot, self._path
+        self.snapshot, self.version, self._path = snapshot, pointer['version'], path
+        self.overlay = {}
+        built_at = datetime.fromisoformat(pointer['builtAt'].rstrip('Z'))
+        self._cursor = (built_at - timedelta(seconds=DELTA_OVERLAP_SECONDS)).isoformat()
+        self._fresh_until = 0.0
+        self._load_deltas()
+        self._next_refresh = time.monotonic() + self.refresh_seconds
+        self._fresh_until = time.monotonic() + self.max_stale_seconds
+        if previous:
+            previous.close()
+            os.remove(previous_path)
+
+    def _load_deltas(self) -> None:
+        query_params = {'KeyConditionExpression': Key('PK').eq(DELTAS_PK) & Key('SK').gte(self._cursor)}
+        latest = None
+        while True:
+            response = self.deltas_table.query(**query_params)
+            for item in response.get('Items', []):
+                product = item.get('product')
+                active = product is not None and product.get('status', 'active') == 'active'
+                self.overlay[item['productId']] = entry(product) if active else None
+                latest = item['SK'].split('#', 1)[0]
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        if latest:
+            cursor = datetime.fromisoformat(latest.rstrip('Z')) - timedelta(seconds=DELTA_OVERLAP_SECONDS)
+            self._cursor = max(self._cursor, cursor.isoformat())
+
+    def record(self, product_id: str) -> Optional[bytes]:
+        """The product's JSON document, or None if it is not an active product in the catalog."""
+        if product_id in self.overlay:
+            overlay_entry = self.overlay[product_id]
+            return overlay_entry[0] if overlay_entry else None
+        index = self.snapshot.find(product_id)
+        return None if index is None else self.snapshot.record(index)
+
+    def product(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """The product as a dict with Decimal numbers, as the boto3 resource client returns it."""
+        record = self.record(product_id)
+        return None if record is None else json.loads(bytes(record), parse_float=Decimal)
+
+    def listing(self, category: Optional[str] = None, min_price: Optional[float] = None,
+                max_price: Optional[float] = None, after: Optional[list] = None,
+                limit: int = 20) -> Tuple[List[bytes], Optional[list]]:
+        """One page of list views and the ``after`` key of the next page (None on the last page).
+
+        With a category, products come cheapest first and ``after`` is
+        ``[price, productId]``; without, in productId order and ``after`` is
+        ``[productId]``.
+        """
+        def in_range(price):
+            return (min_price is None or price >= min_price) and (max_price is None or price <= max_price)
+
+        snapshot = self.snapshot
+        changed = [(overlay_entry[3], product_id, overlay_entry) for product_id, overlay_entry in self.overlay.items()
+                   if overlay_entry and in_range(overlay_entry[3])
+                   and (category is None or overlay_entry[2] == category)]
+        if category is not None:
+            start = tuple(after) if after else None
+            changed = sorted((price, product_id, e) for price, product_id, e in changed
+                             if start is None or (price, product_id) > start)
+            lower = min_price
+            if start:
+                lower = start[0] if lower is None else max(lower, start[0])
+            current = ((price, snapshot.product_id(index), index)
+                       for price, index in snapshot.postings(category, lower, max_price))
+            current = (item for item in current if item[1] not in self.overlay
+                       and (start is None or item[:2] > start))
+            key = lambda item: item[:2]  # noqa: E731
+        else:
+            start_id = after[0] if after else None
+            changed = sorted((product_id, price, e) for price, product_id, e in changed
+                             if start_id is None or product_id > start_id)
+            current = ((snapshot.product_id(index), None, index) for index in snapshot.ids_after(start_id))
+            current = (item for item in current
+                       if item[0] not in self.overlay and in_range(snapshot.price(item[2])))
+            key = lambda item: item[0]  # noqa: E731
+
+        page = list(islice(heapq.merge(current, changed, key=key), limit + 1))
+        views = [list_view(item[2][0], item[2][1]) if isinstance(item[2], tuple) else snapshot.list_view(item[2])
+                 for item in page[:limit]]
+        if len(page) <= limit:
+            return views, None
+        last = page[limit - 1]
+        return views, ([last[0], last[1]] if category is not None else [last[0]])
+
+
+def from_environment(dynamodb: Any) -> Optional[Catalog]:
+    """The catalog in CATALOG_BUCKET with its snapshot already mapped, or None when it is not configured.
+
+    Handlers call this at import, so the download and mmap happen during init.
+    """
+    bucket = os.environ.get('CATALOG_BUCKET')
+    if not bucket:
+        return None
+    catalog = Catalog(aws_clients.client('s3', 'interactive'), bucket,
+                      dynamodb.Table(os.environ['READ_MODELS_TABLE']))
+    catalog.refresh()
+    return catalog
@@ -0,0 +1,124 @@
+"""
+Cognito user identity for API handlers
+
+Routes behind the CognitoAuthorizer get the verified JWT claims in the
+request context. Routes that also serve anonymous callers (the cart routes,
+GET /products) have no authorizer, so API Gateway passes the Authorization
+header through unchecked. ``claims`` verifies it here instead, with the
+authorizer's checks: an RS256 signature from the user pool's keys (fetched
+once per container, again when a token names an unknown key), the pool's
+issuer, expiry, and COGNITO_CLIENT_ID as audience (``aud`` on ID tokens,
+``client_id`` on access tokens).
+
+A request without an Authorization header is anonymous (``claims`` returns
+None). A header that does not hold a valid token raises InvalidToken, so the
+caller gets a 401 rather than quietly landing in a guest cart. So does a
+token that cannot be checked because the user pool's keys are unreachable.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+from jose import JWTError, jwt
+
+JWKS_TIMEOUT_SECONDS = 2
+# Unknown key IDs trigger at most one JWKS refetch per interval (key rotation)
+JWKS_REFRESH_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+_jwks: Optional[Dict[str, Any]] = None
+_jwks_fetched_at = 0.0
+_lock = threading.Lock()
+
+
+class InvalidToken(Exception):
+    """An Authorization header was sent but does not hold a valid user pool token."""
+
+
+def issuer() -> Optional[str]:
+    pool_id = os.environ.get('COGNITO_USER_POOL_ID')
+    if not pool_id:
+        return None
+    return f"https://cognito-idp.{pool_id.split('_')[0]}.amazonaws.com/{pool_id}"
+
+
+def _fetch_keys() -> Dict[str, Any]:
+    try:
+        with urllib.request.urlopen(f'{issuer()}/.well-known/jwks.json', timeout=JWKS_TIMEOUT_SECONDS) as response:
+            return json.load(response)
+    except (OSError, ValueError) as e:
+        # URLError and socket timeouts are OSErrors; ValueError is a malformed document
+        logger.exception('Could not fetch the user pool signing keys')
+        raise InvalidToken('Signing keys are unavailable') from e
+
+
+def _keys(kid: Optional[str]) -> Dict[str, Any]:
+    global _jwks, _jwks_fetched_at
+    with _lock:
+        known = _jwks is not None and any(key.get('kid') == kid for key in _jwks.get('keys', []))
+        if not known and (_jwks is None or time.time() - _jwks_fetched_at > JWKS_REFRESH_SECONDS):
+            _jwks = _fetch_keys()
+            _jwks_fetched_at = time.time()
+        return _jwks
+
+
+def verify(token: str) -> Dict[str, Any]:
+    """The claims of a valid user pool ID or access token; raises InvalidToken."""
+    if issuer() is None:
+        raise InvalidToken('COGNITO_USER_POOL_ID is not set')
+    try:
+        kid = jwt.get_unverified_header(token).get('kid')
+        claims = jwt.decode(token, _keys(kid), algorithms=['RS256'], issuer=issuer(),
+                            options={'verify_aud': False, 'verify_at_hash': False})
+    except JWTError as e:
+        raise InvalidToken(str(e)) from e
+    audience = claims.get('aud') if claims.get('token_use') == 'id' else claims.get('client_id')
+    if audience != os.environ.get('COGNITO_CLIENT_ID'):
+        raise InvalidToken('Token was issued to another client')
+    return claims
+
+
+def bearer_token(event: Dict[str, Any]) -> Optional[str]:
+    headers = event.get('headers') or {}
+    value = next((value for name, value in headers.items() if name.lower() == 'authorization'), None)
+    if not value:
+        return None
+    scheme, _, token = value.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else value.strip()
+
+
+def claims(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The caller's verified claims, or None for an anonymous request; raises InvalidToken."""
+    request_context = event.get('requestContext') or {}
+    authorized = ((request_context.get('authorizer') or {}).get('jwt') or {}).get('claims')
+    if authorized:
+        return authorized
+    token = bearer_token(event)
+    return verify(token) if token else None
+
+
+def groups(user_claims: Optional[Dict[str, Any]]) -> List[str]:
+    """``cognito:groups`` as a list.
+
+    Verified tokens carry a JSON list; the HTTP API authorizer flattens it to
+    a string such as ``[Admins Customers]``.
+    """
+    value = (user_claims or {}).get('cognito:groups')
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(group) for group in value]
+    return [group for group in str(value).strip('[]').replace(',', ' ').split() if group]
+
+
+def unauthorized(message: str = 'Invalid or expired token') -> Dict[str, Any]:
+    return {
+        'statusCode': 401,
+        'body': json.dumps({'error': 'UNAUTHORIZED', 'message': message}),
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+    }
@@ -0,0 +1,140 @@
+"""
+Hedged DynamoDB reads for the interactive path
+
+A GetItem that has not answered within the container's recent p95 read
+latency is sent a second time and the first answer wins, so one slow
+storage node costs a duplicate read instead of the request's p99. Hedging
+is opt-in per function (``HEDGED_READS=on``); otherwise ``get_item`` is a
+plain ``table.get_item`` call.
+
+- The threshold adapts: it is the ``percentile`` of the last ``window``
+  primary read latencies, recomputed every 16 reads once 32 are known.
+  Until then it is INITIAL_DELAY_SECONDS.
+- Hedges are budgeted: every read earns ``budget`` of a token (5%, up to
+  BURST tokens) and a hedge spends one, so duplicates stay under 5% of
+  reads even when the whole table is slow.
+- Reads run on a small thread pool so the caller can stop waiting. The
+  losing read is not cancelled (botocore cannot abandon a request); it
+  finishes in the background, and on Lambda it resumes if the container
+  is frozen first. When the pool is busy, reads run inline, unhedged.
+
+Counters go to aws_clients.stats: ``record_metrics`` publishes
+``HedgedReads``, ``HedgeRequests``, ``HedgeWins`` and ``HedgesOverBudget``.
+The hedge win rate is HedgeWins / HedgeRequests.
+
+Usage:
+    import hedged_reads
+    response = hedged_reads.get_item(table, Key={'PK': ..., 'SK': ...})
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict
+
+import aws_clients
+
+INITIAL_DELAY_SECONDS = 0.05
+# The threshold never drops below this, so a fast table is not hedged on noise
+MIN_DELAY_SECONDS = 0.002
+MIN_SAMPLES = 32
+UPDATE_EVERY = 16
+BURST = 10
+MAX_WORKERS = 8
+
+
+class HedgedReader:
+    """Issues GetItem calls, with a hedge after an adaptive delay."""
+
+    def __init__(self, percentile: float = 95, budget: float = 0.05, window: int = 512,
+                 max_workers: int = MAX_WORKERS):
+        self.percentile = percentile
+        self.budget = budget
+        self.latencies = deque(maxlen=window)
+        self.delay = INITIAL_DELAY_SECONDS
+        self.tokens = 1.0
+        self.max_workers = max_workers
+        self.in_flight = 0
+        self._since_update = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged-read')
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            self._since_update += 1
+            if len(self.latencies) >= MIN_SAMPLES and self._since_update >= UPDATE_EVERY:
+                ordered = sorted(self.latencies)
+                index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+                self.delay = max(MIN_DELAY_SECONDS, ordered[index])
+                self._since_update = 0
+
+    def _call(self, read: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any], primary: bool) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            return read(**kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            # Only primaries: hedges start late and would drag the percentile down
+            if primary:
+                self._record(time.perf_counter() - started)
+
+    def _submit(self, read: Callable[..., Dict[str, Any]], kwargs: Dict[str, Any], primary: bool) -> Future:
+        with self._lock:
+            self.in_flight += 1
+        return self._executor.submit(self._call, read, kwargs, primary)
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def get_item(self, table: Any, **kwargs) -> Dict[str, Any]:
+        """``table.get_item(**kwargs)``, hedged once if it is slower than the threshold."""
+        aws_clients.count('hedged_reads')
+        with self._lock:
+            self.tokens = min(BURST, self.tokens + self.budget)
+            # A primary and its hedge need two workers
+            busy = self.in_flight + 2 > self.max_workers
+        if busy:
+            started = time.perf_counter()
+            try:
+                return table.get_item(**kwargs)
+            finally:
+                self._record(time.perf_counter() - started)
+
+        primary = self._submit(table.get_item, kwargs, primary=True)
+        done, _ = wait([primary], timeout=self.delay)
+        if done:
+            return primary.result()
+        if not self._take_token():
+            aws_clients.count('hedges_over_budget')
+            return primary.result()
+
+        aws_clients.count('hedge_requests')
+        hedge = self._submit(table.get_item, kwargs, primary=False)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        aws_clients.count('hedge_wins')
+                    return future.result()
+        # Both failed: surface the primary's error
+        return primary.result()
+
+
+ENABLED = os.environ.get('HEDGED_READS', 'off') == 'on'
+reader = HedgedReader() if ENABLED else None
+
+
+def get_item(table: Any, **kwargs) -> Dict[str, Any]:
+    """A ``table.get_item`` call, hedged when the function has HEDGED_READS=on."""
+    if reader is None:
+        return table.get_item(**kwargs)
+    return reader.get_item(table, **kwargs)
@@ -0,0 +1,230 @@
+"""
+Inventory reservation ledger
+
+Checkout reserves stock for an order; the order workflows later commit the
+reservation (payment succeeded) or release it (payment failed). Each product
+keeps two counters:
+
+- ``inventory``: stock still available to new orders
+- ``reserved``: stock held by open reservations
+
+and each open reservation is a ledger item in OrdersTable
+(``RESERVATION#<orderId>`` / ``RESERVATION``) with the reserved quantities
+and an ``expiresAt`` TTL. Reserving is one TransactWriteItems of
+conditional counter updates (``inventory >= :qty`` on products that are not
+soft-deleted), so validation and
+decrement happen together and there is no read-then-check window.
+Reservations that are never committed or released are deleted by DynamoDB
+TTL; handlers/inventory/expire_reservations.py restores their stock from
+the stream.
+
+Commit, release and TTL expiry all delete the ledger item under
+``attribute_exists``, so exactly one of them moves the stock.
+
+Orders whose reservation is gone (it expired) take their stock with
+``take``: the same conditional decrements for all lines in one transaction,
+so either every line is taken or none is. Commit and take both put a
+``RESERVATION#<orderId>`` / ``SETTLED`` marker under ``attribute_not_exists``,
+so a retried step never takes an order's stock twice.
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import aws_clients
+
+dynamodb = aws_clients.resource('dynamodb')
+client = dynamodb.meta.client
+PRODUCTS_TABLE = os.environ.get('PRODUCTS_TABLE')
+ORDERS_TABLE = os.environ.get('ORDERS_TABLE')
+
+RESERVATION_TTL_SECONDS = int(os.environ.get('INVENTORY_RESERVATION_MINUTES', '30')) * 60
+MAX_TRANSACT_ITEMS = 100
+# Settled markers outlive any retry of the step that settled the order
+SETTLED_TTL_SECONDS = 7 * 24 * 3600
+
+
+def reservation_key(order_id: str) -> Dict[str, str]:
+    return {'PK': f'RESERVATION#{order_id}', 'SK': 'RESERVATION'}
+
+
+def settled_key(order_id: str) -> Dict[str, str]:
+    return {'PK': f'RESERVATION#{order_id}', 'SK': 'SETTLED'}
+
+
+def _settled_marker(order_id: str) -> Dict[str, Any]:
+    return {
+        'Put': {
+            'TableName': ORDERS_TABLE,
+            'Item': {**settled_key(order_id), 'orderId': order_id,
+                     'expiresAt': int(time.time()) + SETTLED_TTL_SECONDS},
+            'ConditionExpression': 'attribute_not_exists(PK)'
+        }
+    }
+
+
+def quantities(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Sum quantities per product so each product is updated once."""
+    totals: Dict[str, int] = {}
+    for item in items:
+        totals[item['productId']] = totals.get(item['productId'], 0) + int(item['quantity'])
+    return totals
+
+
+def counter_update(product_id: str, available: int = 0, reserved: int = 0) -> Dict[str, Any]:
+    """Move stock between the counters; taking available stock is conditional."""
+    names, values, clauses = {}, {}, []
+    if available:
+        clauses.append('inventory :available')
+        values[':available'] = available
+    if reserved:
+        clauses.append('#reserved :reserved')
+        names['#reserved'] = 'reserved'
+        values[':reserved'] = reserved
+    update = {
+        'TableName': PRODUCTS_TABLE,
+        'Key': {'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'},
+        'UpdateExpression': 'ADD ' + ', '.join(clauses),
+        'ExpressionAttributeValues': values
+    }
+    if available < 0:
+        # Soft-deleted products (delete_product.py) keep their stock but cannot be ordered
+        update['ConditionExpression'] = ('attribute_exists(PK) AND inventory >= :needed '
+                                         'AND (attribute_not_exists(#status) OR #status <> :deleted)')
+        names['#status'] = 'status'
+        values[':needed'] = -available
+        values[':deleted'] = 'deleted'
+    if names:
+        update['ExpressionAttributeNames'] = names
+    return {'Update': update}
+
+
+def reserve_items(order_id: str, user_id: str, totals: Dict[str, int], now: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Transaction items that take the stock and record the reservation.
+
+    Products come first in ``totals`` order, so cancellation reasons line up
+    with ``list(totals)``; the ledger put is last.
+    """
+    now = now or int(time.time())
+    transact_items = [counter_update(product_id, -qty, qty) for product_id, qty in totals.items()]
+    transact_items.append({
+        'Put': {
+            'TableName': ORDERS_TABLE,
+            'Item': {
+                **reservation_key(order_id),
+                'orderId': order_id,
+                'userId': user_id,
+                'items': totals,
+                'createdAt': now,
+                'expiresAt': now + RESERVATION_TTL_SECONDS
+            },
+            'ConditionExpression': 'attribute_not_exists(PK)'
+        }
+    })
+    return transact_items
+
+
+def unavailable_products(error: Exception, product_ids: List[str]) -> List[str]:
+    """Products whose conditional update cancelled a reserve transaction."""
+    reasons = getattr(error, 'response', {}).get('CancellationReasons', [])
+    return [
+        product_id for product_id, reason in zip(product_ids, reasons)
+        if reason.get('Code') == 'ConditionalCheckFailed'
+    ]
+
+
+def reserve(order_id: str, user_id: str, totals: Dict[str, int]) -> List[str]:
+    """Reserve an order's stock, all lines or none.
+
+    Returns the products that could not cover their quantity (nothing was
+    reserved), or an empty list once the order holds a reservation,
+    including one made earlier.
+    """
+    try:
+        client.transact_write_items(TransactItems=reserve_items(order_id, user_id, totals))
+        return []
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[-1].get('Code') == 'ConditionalCheckFailed':
+            return []
+        refused = unavailable_products(e, list(totals))
+        if refused:
+            return refused
+        raise
+
+
+def get_reservation(order_id: str) -> Optional[Dict[str, Any]]:
+    return dynamodb.Table(ORDERS_TABLE).get_item(Key=reservation_key(order_id), ConsistentRead=True).get('Item')
+
+
+def settle_items(order_id: str, totals: Dict[str, int], restore: bool) -> List[Dict[str, Any]]:
+    """Close a reservation: drop the reserved counters and, when releasing, give the stock back.
+
+    The ledger delete comes first; a commit ends with the settled marker.
+    """
+    transact_items = [{
+        'Delete': {
+            'TableName': ORDERS_TABLE,
+            'Key': reservation_key(order_id),
+            'ConditionExpression': 'attribute_exists(PK)'
+        }
+    }]
+    transact_items += [
+        counter_update(product_id, qty if restore else 0, -qty) for product_id, qty in totals.items()
+    ]
+    if not restore:
+        transact_items.append(_settled_marker(order_id))
+    return transact_items
+
+
+def take_items(order_id: str, totals: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Transaction items that take an unreserved order's stock: products in ``totals`` order, then the marker."""
+    transact_items = [counter_update(product_id, -qty) for product_id, qty in totals.items()]
+    transact_items.append(_settled_marker(order_id))
+    return transact_items
+
+
+def _settle(order_id: str, totals: Dict[str, int], restore: bool) -> bool:
+    try:
+        client.transact_write_items(TransactItems=settle_items(order_id, totals, restore))
+        return True
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+            return False
+        raise
+
+
+def commit(order_id: str, totals: Dict[str, int]) -> bool:
+    """The order is paid: the reserved stock is consumed.
+
+    False if the reservation no longer exists (it expired and its stock was
+    restored, or this order was already committed); the caller then calls
+    ``take``.
+    """
+    return _settle(order_id, totals, restore=False)
+
+
+def take(order_id: str, totals: Dict[str, int]) -> List[str]:
+    """Take a paid order's stock without a reservation, all lines or none.
+
+    Returns the products that could not cover their quantity (nothing was
+    taken), or an empty list once the order's stock is taken, including by
+    an earlier commit or take.
+    """
+    try:
+        client.transact_write_items(TransactItems=take_items(order_id, totals))
+        return []
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = e.response.get('CancellationReasons', [])
+        if reasons and reasons[-1].get('Code') == 'ConditionalCheckFailed':
+            return []
+        refused = unavailable_products(e, list(totals))
+        if refused:
+            return refused
+        raise
+
+
+def release(order_id: str, totals: Dict[str, int]) -> bool:
+    """The order failed: return the reserved stock. False if already released or expired."""
+    return _settle(order_id, totals, restore=True)
@@ -0,0 +1,74 @@
+"""
+Time-decayed product sales rankings shared by the ranking handlers and GET /products
+
+Two rankings are kept, differing only in how fast old sales stop counting:
+``popular`` (half-life 14 days) and ``trending`` (half-life 1 day).
+
+Counters use forward decay so they can be maintained with plain atomic
+``ADD`` updates: a sale at time t adds ``units * 2 ** ((t - epoch) / half_life)``
+to the product's counter for the epoch containing t, so later sales weigh
+more and every counter in an epoch decays by the same factor. Epochs last
+EPOCH_HALF_LIVES half-lives, which bounds the weights; a ranking reads the
+current and the previous epoch and scales both to the present, and
+anything older is worth less than 2 ** -EPOCH_HALF_LIVES of a new sale and
+is left to expire.
+
+Keys in ReadModelsTable:
+    PK: RANK#<kind>#<epoch>#<shard>  SK: PRODUCT#<productId>   score, productId, category, expiresAt
+    PK: RANKING                      SK: <kind>#ALL            productIds, scores, builtAt
+    PK: RANKING                      SK: <kind>#CATEGORY#<c>   productIds, scores, builtAt
+
+Counters are spread over SHARDS partitions by productId so a best-seller's
+updates do not all land on one partition.
+"""
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Tuple
+
+HALF_LIVES = {
+    'popular': 14 * 24 * 3600,
+    'trending': 24 * 3600
+}
+EPOCH_HALF_LIVES = 8
+SHARDS = 16
+TOP_K = 500
+CATEGORY_TOP_K = 200
+RANKING_PK = 'RANKING'
+
+
+def epoch_seconds(kind: str) -> int:
+    return HALF_LIVES[kind] * EPOCH_HALF_LIVES
+
+
+def epoch_of(kind: str, moment: datetime) -> int:
+    """Start (Unix seconds) of the epoch containing ``moment``."""
+    seconds = int(moment.timestamp())
+    return seconds - seconds % epoch_seconds(kind)
+
+
+def weight(kind: str, epoch: int, moment: datetime) -> float:
+    """Forward-decay weight of one unit sold at ``moment`` in ``epoch``."""
+    return 2 ** ((moment.timestamp() - epoch) / HALF_LIVES[kind])
+
+
+def decay(kind: str, epoch: int, now: datetime) -> float:
+    """Factor that turns a counter of ``epoch`` into units as they count at ``now``."""
+    return 2 ** ((epoch - now.timestamp()) / HALF_LIVES[kind])
+
+
+def shard(product_id: str) -> int:
+    return zlib.crc32(product_id.encode()) % SHARDS
+
+
+def counter_pk(kind: str, epoch: int, shard_number: int) -> str:
+    return f'RANK#{kind}#{epoch}#{shard_number}'
+
+
+def ranking_key(kind: str, category: Optional[str] = None) -> Tuple[str, str]:
+    return RANKING_PK, f'{kind}#CATEGORY#{category}' if category else f'{kind}#ALL'
+
+
+def to_decimal(value: float) -> Decimal:
+    """Scores as DynamoDB numbers (6 decimal places is well below a unit sold)."""
+    return Decimal(f'{value:.6f}')
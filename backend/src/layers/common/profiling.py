@@ -0,0 +1,242 @@
+"""
+On-demand profiling for Lambda handlers
+
+``@profiling.profiled`` wraps every Python handler's body (innermost, inside
+the Powertools decorators). An invocation is profiled when:
+
+- ``PROFILING=on`` (every invocation; for a short debugging deploy),
+- a random draw falls under ``PROFILE_SAMPLE_RATE`` (e.g. ``0.01``), or
+- the request carries an ``X-Debug-Profile`` header with a token signed
+  with PROFILING_SECRET (``issue_debug_token``; see backend/local/profiles.py).
+  Tokens expire, so a leaked one stops working on its own.
+
+Otherwise the wrapper costs a flag check and a random draw.
+
+A profiled invocation runs under cProfile (handler thread) and tracemalloc,
+and records where the wall clock went:
+
+- ``parse``: ``phase('parse')`` blocks (request_models.parse_body);
+- one entry per AWS service (``dynamodb``, ``s3``...): every operation's
+  wall time from aws_clients' call timer, summed over all threads, plus the
+  part spent on the handler thread;
+- ``serialize``: time in ``json.dumps`` on the handler thread (from cProfile);
+- ``compute``: the rest of the handler thread's wall clock.
+
+plus peak traced memory per ``phase()`` and for the whole invocation, and
+the allocation sites still holding the most memory at the end.
+
+Each profile is one gzipped JSON document (summary plus the cProfile rows)
+written to ``s3://$PROFILE_BUCKET/profiles/<function>/<date>/`` or, without
+a bucket, to PROFILE_DIR (default ``/tmp/profiles``). Profiled API
+responses carry ``X-Profile-Id``. backend/local/profiles.py merges many
+profiles into a flame graph.
+"""
+import base64
+import contextlib
+import cProfile
+import functools
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import aws_clients
+
+logger = logging.getLogger(__name__)
+
+DEBUG_HEADER = 'x-debug-profile'
+PROFILES_PREFIX = 'profiles'
+DEBUG_TOKEN_TTL_SECONDS = 3600
+TOP_ALLOCATION_SITES = 25
+
+PROFILING = os.environ.get('PROFILING', 'off') == 'on'
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+PROFILE_BUCKET = os.environ.get('PROFILE_BUCKET')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', '/tmp/profiles')
+
+# The invocation being profiled; Lambda runs one invocation per container at a time
+_active: Optional['Profile'] = None
+
+
+def _sign(secret: str, payload: str) -> str:
+    digest = hmac.new(secret.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+
+def issue_debug_token(secret: str, ttl_seconds: int = DEBUG_TOKEN_TTL_SECONDS, now: Optional[int] = None) -> str:
+    expires_at = int(now if now is not None else time.time()) + ttl_seconds
+    return f'{expires_at}.{_sign(secret, f"profile.{expires_at}")}'
+
+
+def verify_debug_token(token: Optional[str], now: Optional[int] = None) -> bool:
+    secret = os.environ.get('PROFILING_SECRET')
+    if not secret or not token or token.count('.') != 1:
+        return False
+    expires_at, signature = token.split('.')
+    if not expires_at.isdigit() or not hmac.compare_digest(signature, _sign(secret, f'profile.{expires_at}')):
+        return False
+    return int(expires_at) > int(now if now is not None else time.time())
+
+
+def trigger(event: Any) -> Optional[str]:
+    """Why this invocation should be profiled, or None."""
+    headers = event.get('headers') if isinstance(event, dict) else None
+    if headers:
+        token = next((value for name, value in headers.items() if name.lower() == DEBUG_HEADER), None)
+        if token is not None and verify_debug_token(token):
+            return 'header'
+    if PROFILING:
+        return 'always'
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+class Profile:
+    """What one profiled invocation collects."""
+
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.phases: Dict[str, Dict[str, float]] = defaultdict(lambda: {'ms': 0.0, 'calls': 0})
+        self.aws: Dict[str, Dict[str, float]] = defaultdict(lambda: {'ms': 0.0, 'handlerThreadMs': 0.0, 'calls': 0})
+        self.peak_bytes = 0
+        self.lock = threading.Lock()
+
+    def record_call(self, service: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.aws[service]
+            entry['ms'] += seconds * 1000
+            entry['calls'] += 1
+            if threading.get_ident() == self.thread_id:
+                entry['handlerThreadMs'] += seconds * 1000
+
+    def record_peak(self) -> None:
+        self.peak_bytes = max(self.peak_bytes, tracemalloc.get_traced_memory()[1])
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute a block's wall time and peak memory to ``name`` in the current profile."""
+    profile = _active
+    if profile is None or threading.get_ident() != profile.thread_id:
+        yield
+        return
+    profile.record_peak()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry = profile.phases[name]
+        entry['ms'] += (time.perf_counter() - started) * 1000
+        entry['calls'] += 1
+        peak = tracemalloc.get_traced_memory()[1]
+        entry['peakBytes'] = max(entry.get('peakBytes', 0), peak - base)
+        profile.peak_bytes = max(profile.peak_bytes, peak)
+
+
+def _stats_rows(profiler: cProfile.Profile) -> List[list]:
+    """cProfile's stats as JSON rows: [file, line, func, calls, primitive calls, tottime, cumtime, callers]."""
+    profiler.create_stats()
+    return [[*key, nc, cc, tt, ct, [[*caller, *edge] for caller, edge in callers.items()]]
+            for key, (cc, nc, tt, ct, callers) in profiler.stats.items()]
+
+
+def _serialize_ms(rows: List[list]) -> float:
+    """Time in json.dumps, except botocore's own request encoding (already counted as AWS time)."""
+    return sum(caller[6] for row in rows
+               if row[0].endswith(os.path.join('json', '__init__.py')) and row[2] == 'dumps'
+               for caller in row[7] if 'botocore' not in caller[0] and 'boto3' not in caller[0]) * 1000
+
+
+def _allocation_sites(snapshot: tracemalloc.Snapshot) -> List[Dict[str, Any]]:
+    return [{'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'bytes': stat.size,
+             'count': stat.count} for stat in snapshot.statistics('lineno')[:TOP_ALLOCATION_SITES]]
+
+
+def summarize(profile: Profile, rows: List[list], wall_ms: float) -> Dict[str, Any]:
+    phases = {name: dict(entry) for name, entry in profile.phases.items()}
+    phases['serialize'] = {'ms': _serialize_ms(rows)}
+    aws = {service: dict(entry) for service, entry in profile.aws.items()}
+    accounted = (sum(entry['ms'] for entry in phases.values())
+                 + sum(entry['handlerThreadMs'] for entry in aws.values()))
+    phases['compute'] = {'ms': max(0.0, wall_ms - accounted)}
+    return {'wallMs': wall_ms, 'phases': phases, 'aws': aws}
+
+
+def _write(document: Dict[str, Any], function_name: str, request_id: str) -> str:
+    now = datetime.now(timezone.utc)
+    name = f'{function_name}/{now:%Y-%m-%d}/{now:%H%M%S%f}-{request_id}.json.gz'
+    body = gzip.compress(json.dumps(document, separators=(',', ':')).encode('utf-8'))
+    if PROFILE_BUCKET:
+        key = f'{PROFILES_PREFIX}/{name}'
+        aws_clients.client('s3').put_object(Bucket=PROFILE_BUCKET, Key=key, Body=body,
+                                            ContentType='application/json', ContentEncoding='gzip')
+        return f's3://{PROFILE_BUCKET}/{key}'
+    path = os.path.join(PROFILE_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(body)
+    return path
+
+
+def profiled(handler: Callable) -> Callable:
+    """Handler decorator (innermost) that profiles the invocations ``trigger`` picks."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _active
+        reason = trigger(event)
+        if reason is None or _active is not None:
+            return handler(event, context)
+
+        profile = _active = Profile()
+        aws_clients.call_timer = profile.record_call
+        tracemalloc.start(1)
+        profiler = cProfile.Profile()
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            response = handler(event, context)
+        finally:
+            profiler.disable()
+            wall_ms = (time.perf_counter() - started) * 1000
+            aws_clients.call_timer = None
+            _active = None
+            profile.record_peak()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+        function_name = getattr(context, 'function_name', 'local')
+        request_id = getattr(context, 'aws_request_id', None) or f'{time.time_ns():x}'
+        rows = _stats_rows(profiler)
+        document = {
+            'function': function_name,
+            'requestId': request_id,
+            'trigger': reason,
+            'startedAt': started_at.isoformat(),
+            **summarize(profile, rows, wall_ms),
+            'memory': {'peakBytes': profile.peak_bytes, 'retainedBytes': sum(s.size for s in snapshot.traces),
+                       'top': _allocation_sites(snapshot)},
+            'stats': rows
+        }
+        try:
+            logger.warning('Profile written to %s (%s, %.1f ms)', _write(document, function_name, request_id),
+                           reason, wall_ms)
+        except Exception:
+            # Profiling must never fail the request
+            logger.exception('Could not write the profile')
+        if isinstance(response, dict) and 'statusCode' in response:
+            response['headers'] = {**(response.get('headers') or {}), 'X-Profile-Id': request_id}
+        return response
+    return wrapper
@@ -0,0 +1,203 @@
+"""
+Per-user and per-IP rate limits for the API handlers
+
+Handlers call ``limiter.check(route, event)`` before any other work and
+return its 429 response when there is one. Callers are Cognito users with a
+valid token (``user#<sub>``: group ``admin`` for members of exactly the
+Admins group, else ``customer``), or anonymous callers by source IP
+(``ip#<address>``). Each (route, group) pair has a ``Limit``:
+
+- ``rate``/``burst``: an in-memory token bucket in the container. A warm
+  container turns away a client that is hammering it without any I/O.
+- ``per_window``: a cap on requests per WINDOW_SECONDS across all
+  containers, kept in ReadModelsTable:
+
+      PK: RATELIMIT#<route>#<caller>    SK: WINDOW#<window>    used, expiresAt
+
+  Containers lease quota in chunks (up to LEASE_MAX requests, 5% of the
+  window's cap) with one conditional ``ADD``. Requests then spend the lease
+  locally, so a busy caller costs about one write per lease. A refused
+  lease marks the caller as exhausted in this container until the window
+  ends. The limit is coarse: a window can end with part of its quota
+  leased but unused. Counter errors fail open.
+
+DEFAULT_LIMITS can be overridden per route and group with the RATE_LIMITS
+environment variable, e.g.
+``{"cart:add": {"anonymous": {"rate": 1, "burst": 5, "perWindow": 60}}}``.
+The checks are off unless RATE_LIMITING=on. Turning them on costs one
+conditional ReadModelsTable write per lease (about one per LEASE_MAX
+requests of a busy caller) and a token bucket check per request; size the
+RATE_LIMITS overrides to the traffic first, since callers beyond them get 429.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+import aws_clients
+import cognito_auth
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+LEASE_MAX = 10
+# Callers remembered per container (buckets and leases), least recently seen dropped first
+MAX_TRACKED_CALLERS = 10000
+ADMIN_GROUP = 'Admins'
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: float
+    burst: int
+    per_window: int = 0
+
+
+DEFAULT_LIMITS: Dict[str, Dict[str, Limit]] = {
+    'cart:add': {
+        'admin': Limit(rate=20, burst=60, per_window=1200),
+        'customer': Limit(rate=5, burst=20, per_window=300),
+        'anonymous': Limit(rate=2, burst=10, per_window=120)
+    },
+    # Scans ProductsTable
+    'products:search': {
+        'admin': Limit(rate=5, burst=20, per_window=300),
+        'customer': Limit(rate=1, burst=5, per_window=60),
+        'anonymous': Limit(rate=0.5, burst=5, per_window=30)
+    },
+    'products:list': {
+        'admin': Limit(rate=20, burst=100, per_window=3000),
+        'customer': Limit(rate=10, burst=50, per_window=1200),
+        'anonymous': Limit(rate=5, burst=30, per_window=600)
+    }
+}
+
+
+def limits_from_environment() -> Dict[str, Dict[str, Limit]]:
+    limits = {route: dict(groups) for route, groups in DEFAULT_LIMITS.items()}
+    for route, groups in json.loads(os.environ.get('RATE_LIMITS') or '{}').items():
+        for group, limit in groups.items():
+            limits.setdefault(route, {})[group] = Limit(rate=float(limit['rate']), burst=int(limit['burst']),
+                                                        per_window=int(limit.get('perWindow', 0)))
+    return limits
+
+
+def caller(event: Dict[str, Any]) -> Tuple[str, str]:
+    """(group, caller key) for the request.
+
+    The limited routes have no authorizer, so the Authorization header is
+    verified here (cognito_auth.claims); without a valid token the caller is
+    keyed by source IP.
+    """
+    request_context = event.get('requestContext') or {}
+    try:
+        claims = cognito_auth.claims(event) or {}
+    except cognito_auth.InvalidToken:
+        claims = {}
+    if claims.get('sub'):
+        group = 'admin' if ADMIN_GROUP in cognito_auth.groups(claims) else 'customer'
+        return group, f"user#{claims['sub']}"
+    return 'anonymous', f"ip#{(request_context.get('http') or {}).get('sourceIp', 'unknown')}"
+
+
+def too_many_requests(retry_after: float) -> Dict[str, Any]:
+    seconds = max(1, math.ceil(retry_after))
+    return {
+        'statusCode': 429,
+        'body': json.dumps({'error': 'RATE_LIMITED', 'message': f'Too many requests; retry in {seconds} s'}),
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*',
+                    'Retry-After': str(seconds)}
+    }
+
+
+class RateLimiter:
+    """Token buckets for this container plus leased shares of the global window counters."""
+
+    def __init__(self, table: Any, limits: Optional[Dict[str, Dict[str, Limit]]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.table = table
+        self.limits = limits if limits is not None else limits_from_environment()
+        self.clock = clock
+        # (route, caller) -> [tokens, updated at, window, leased requests left, window exhausted]
+        self.callers: 'OrderedDict[Tuple[str, str], list]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, key: Tuple[str, str], limit: Limit, now: float) -> list:
+        state = self.callers.get(key)
+        if state is None:
+            state = self.callers[key] = [float(limit.burst), now, None, 0, False]
+            if len(self.callers) > MAX_TRACKED_CALLERS:
+                self.callers.popitem(last=False)
+        else:
+            self.callers.move_to_end(key)
+        return state
+
+    def _lease(self, route: str, caller_key: str, limit: Limit, window: int) -> int:
+        """Reserve up to a lease of the window's quota; returns the requests granted (0 if exhausted)."""
+        size = max(1, min(LEASE_MAX, limit.per_window // 20))
+        try:
+            self.table.update_item(
+                Key={'PK': f'RATELIMIT#{route}#{caller_key}', 'SK': f'WINDOW#{window}'},
+                UpdateExpression='ADD used :n SET expiresAt = :expires',
+                ConditionExpression='attribute_not_exists(used) OR used <= :room',
+                ExpressionAttributeValues={':n': size, ':room': limit.per_window - size,
+                                           ':expires': (window + 2) * WINDOW_SECONDS}
+            )
+            aws_clients.count('rate_limit_leases')
+            return size
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return 0
+            logger.exception('Rate limit counter unavailable; allowing the request')
+            return 1
+
+    def check(self, route: str, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """None if the request may proceed, else the 429 response to return."""
+        group, caller_key = caller(event)
+        limit = self.limits.get(route, {}).get(group)
+        if limit is None:
+            return None
+        aws_clients.count('rate_limit_checks')
+        now = self.clock()
+        with self._lock:
+            state = self._state((route, caller_key), limit, now)
+            state[0] = min(float(limit.burst), state[0] + (now - state[1]) * limit.rate)
+            state[1] = now
+            if state[0] < 1:
+                aws_clients.count('rate_limited')
+                return too_many_requests((1 - state[0]) / limit.rate)
+
+            window = int(now // WINDOW_SECONDS)
+            if limit.per_window and state[2] != window:
+                state[2:] = [window, 0, False]
+            if limit.per_window and state[4]:
+                aws_clients.count('rate_limited')
+                return too_many_requests((window + 1) * WINDOW_SECONDS - now)
+            state[0] -= 1
+
+        if limit.per_window and state[3] == 0:
+            granted = self._lease(route, caller_key, limit, window)
+            with self._lock:
+                if granted == 0:
+                    state[4] = True
+                    aws_clients.count('rate_limited')
+                    return too_many_requests((window + 1) * WINDOW_SECONDS - now)
+                state[3] += granted
+        if limit.per_window:
+            with self._lock:
+                state[3] -= 1
+        return None
+
+
+def from_environment(dynamodb: Any) -> Optional[RateLimiter]:
+    """The handler's limiter; None unless RATE_LIMITING is on."""
+    if os.environ.get('RATE_LIMITING', 'off') != 'on':
+        return None
+    return RateLimiter(dynamodb.Table(os.environ['READ_MODELS_TABLE']))
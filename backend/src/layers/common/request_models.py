@@ -0,0 +1,182 @@
+"""
+Request body schemas shared by the API handlers
+
+Each request body is declared as a TypedDict, and a pydantic TypeAdapter is
+compiled for every schema when this module is imported, so warm invocations
+reuse the validators. ``parse_body`` hands the raw body (str or bytes)
+straight to pydantic-core: JSON decoding, type coercion and constraint
+checks happen in one pass, and a handler gets back a plain dict holding
+only the declared fields, or a ``RequestError`` before it touches DynamoDB.
+TypedDicts rather than BaseModels keep the result in the shape the handlers
+already index into and skip building a model instance per object, which is
+what makes a 50-operation cart batch cheaper than ``json.loads`` alone.
+
+Numbers follow the handlers' previous coercions (``"3"`` is a valid
+quantity, ``3.5`` is not); prices are parsed to Decimal, which the boto3
+resource client requires. Optional fields are left out when absent, so the
+handlers keep applying defaults with ``dict.get``.
+"""
+import base64
+import json
+from decimal import Decimal
+from typing import Annotated, Any, Dict, List, Literal, Union
+
+from pydantic import Field, StringConstraints, TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict
+
+from profiling import phase
+
+MAX_IMAGE_FILE_SIZE = 10 * 1024 * 1024
+# Raster formats only: the variants are re-encoded with Pillow
+IMAGE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif'
+}
+# BatchGetItem accepts at most 100 keys; one key is reserved for the cart itself
+MAX_CART_OPERATIONS = 50
+# PUT /cart/promo-codes
+MAX_PROMO_CODES = 5
+# POST /products/availability splits the IDs into BatchGetItem chunks of 100
+MAX_AVAILABILITY_IDS = 500
+
+Text = Annotated[str, StringConstraints(min_length=1, max_length=2000)]
+Identifier = Annotated[str, StringConstraints(min_length=1, max_length=128)]
+Status = Annotated[str, StringConstraints(pattern=r'^[a-z][a-z_]{0,31}$')]
+Currency = Annotated[str, StringConstraints(pattern=r'^[A-Za-z]{3}$', to_upper=True)]
+Price = Annotated[Decimal, Field(ge=0, allow_inf_nan=False)]
+Quantity = Annotated[int, Field(ge=0, le=10000)]
+PositiveQuantity = Annotated[int, Field(ge=1, le=10000)]
+
+
+class CreateProductRequest(TypedDict):
+    name: Text
+    price: Price
+    currency: Currency
+    category: Identifier
+    inventory: Quantity
+    status: NotRequired[Status]
+    description: NotRequired[Text]
+    subCategory: NotRequired[Identifier]
+    brand: NotRequired[Identifier]
+    sku: NotRequired[Identifier]
+    images: NotRequired[List[str]]
+    attributes: NotRequired[Dict[str, Any]]
+
+
+class UpdateProductRequest(TypedDict):
+    name: NotRequired[Text]
+    description: NotRequired[Text]
+    price: NotRequired[Price]
+    inventory: NotRequired[Quantity]
+    status: NotRequired[Status]
+    brand: NotRequired[Identifier]
+    images: NotRequired[List[str]]
+    attributes: NotRequired[Dict[str, Any]]
+
+
+class AddCartItemRequest(TypedDict):
+    productId: Identifier
+    quantity: NotRequired[PositiveQuantity]
+
+
+class UpdateCartItemRequest(TypedDict):
+    # 0 removes the line
+    quantity: Quantity
+
+
+class AddOperation(TypedDict):
+    op: Literal['add']
+    productId: Identifier
+    quantity: NotRequired[PositiveQuantity]
+
+
+class SetOperation(TypedDict):
+    op: Literal['set']
+    productId: Identifier
+    quantity: NotRequired[Quantity]
+
+
+class RemoveOperation(TypedDict):
+    op: Literal['remove']
+    productId: Identifier
+
+
+class BatchCartRequest(TypedDict):
+    operations: Annotated[
+        List[Annotated[Union[AddOperation, SetOperation, RemoveOperation], Field(discriminator='op')]],
+        Field(min_length=1, max_length=MAX_CART_OPERATIONS)
+    ]
+
+
+class AvailabilityRequest(TypedDict):
+    productIds: Annotated[List[Identifier], Field(min_length=1, max_length=MAX_AVAILABILITY_IDS)]
+
+
+class MergeGuestCartRequest(TypedDict):
+    guestSession: NotRequired[str]
+    guestCart: NotRequired[str]
+
+
+class SetPromoCodesRequest(TypedDict):
+    promoCodes: Annotated[
+        List[Annotated[str, StringConstraints(pattern=r'^[A-Za-z0-9_-]{1,32}$')]],
+        Field(max_length=MAX_PROMO_CODES)
+    ]
+
+
+class CheckoutRequest(TypedDict):
+    shippingAddress: NotRequired[Dict[str, Any]]
+    paymentMethodId: NotRequired[str]
+
+
+class ImageUploadRequest(TypedDict):
+    contentType: Literal[tuple(IMAGE_EXTENSIONS)]
+    fileSize: NotRequired[Annotated[int, Field(ge=0, le=MAX_IMAGE_FILE_SIZE)]]
+
+
+_ADAPTERS = {
+    schema: TypeAdapter(schema)
+    for schema in (CreateProductRequest, UpdateProductRequest, AddCartItemRequest, UpdateCartItemRequest,
+                   BatchCartRequest, AvailabilityRequest, MergeGuestCartRequest, SetPromoCodesRequest, CheckoutRequest,
+                   ImageUploadRequest)
+}
+
+
+class RequestError(Exception):
+    """A request body that failed validation; ``response()`` is the 400 to return."""
+
+    def __init__(self, code: str, message: str, details: List[Dict[str, str]]):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+
+    def response(self) -> Dict[str, Any]:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': self.code, 'message': self.message, 'details': self.details}),
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+        }
+
+
+def _field(loc: tuple) -> str:
+    return '.'.join(str(part) for part in loc) or 'body'
+
+
+def parse_body(schema: type, event: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate the event's raw body against ``schema``; raises RequestError."""
+    body = event.get('body') or '{}'
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    try:
+        with phase('parse'):
+            return _ADAPTERS[schema].validate_json(body)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_input=False)
+        if any(error['type'] == 'json_invalid' for error in errors):
+            raise RequestError('INVALID_JSON', 'Request body is not valid JSON', [])
+        details = [{'field': _field(error['loc']), 'message': error['msg']} for error in errors]
+        first = details[0]
+        raise RequestError('INVALID_REQUEST', f"{first['field']}: {first['message']}", details)
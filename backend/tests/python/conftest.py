@@ -0,0 +1,100 @@
+"""
+Shared fixtures for the Python handler tests
+
+Handlers run in-process against moto through backend/local/stack.py, the
+same stand-in the benchmarks use. Handler modules bind their tables at
+import, so one stack serves the whole session; tests use their own IDs.
+
+Run from the repository root:
+    python -m pytest backend/tests/python
+"""
+import json
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'local'))
+
+os.environ.setdefault('GUEST_SESSION_SECRET', 'test-guest-session-secret')
+os.environ.setdefault('COGNITO_USER_POOL_ID', 'us-east-1_TestPool')
+os.environ.setdefault('COGNITO_CLIENT_ID', 'test-client')
+os.environ.setdefault('RATE_LIMITING', 'off')
+
+from asl_runner import LambdaContext  # noqa: E402
+from stack import local_stack  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def stack():
+    with local_stack() as local:
+        yield local
+
+
+@pytest.fixture
+def context():
+    return LambdaContext(function_name='test')
+
+
+@pytest.fixture
+def product(stack):
+    """Create an active product and return a factory for more."""
+    from decimal import Decimal
+
+    def create(price='19.99', inventory=100, **fields):
+        product_id = f'prod-{uuid.uuid4().hex[:10]}'
+        stack.table('PRODUCTS_TABLE').put_item(Item={
+            'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id, 'name': f'Product {product_id}',
+            'price': Decimal(price), 'inventory': inventory, 'status': 'active', 'category': 'books', **fields})
+        return product_id
+    return create
+
+
+@pytest.fixture(scope='session')
+def signing_key():
+    """An RSA key standing in for the user pool's, installed as cognito_auth's JWKS."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'layers', 'common'))
+    import cognito_auth
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()).decode()
+    public = jwk.construct(pem, 'RS256').public_key().to_dict()
+    cognito_auth._jwks = {'keys': [{**public, 'kid': 'test-key', 'use': 'sig'}]}
+    cognito_auth._jwks_fetched_at = time.time() + 10 ** 9
+    return pem
+
+
+@pytest.fixture
+def user_token(signing_key):
+    """Mint a user pool ID token for ``sub``."""
+    from jose import jwt
+
+    import cognito_auth
+
+    def mint(sub, groups=(), expires_in=3600, **claims):
+        now = int(time.time())
+        return jwt.encode({'sub': sub, 'iss': cognito_auth.issuer(), 'aud': os.environ['COGNITO_CLIENT_ID'],
+                           'token_use': 'id', 'iat': now, 'exp': now + expires_in,
+                           'cognito:groups': list(groups), **claims},
+                          signing_key, algorithm='RS256', headers={'kid': 'test-key'})
+    return mint
+
+
+def api_event(body=None, headers=None, path=None, claims=None, source_ip='198.51.100.7'):
+    """An HTTP API (payload 2.0) event."""
+    request_context = {'http': {'sourceIp': source_ip}}
+    if claims:
+        request_context['authorizer'] = {'jwt': {'claims': claims}}
+    return {
+        'headers': headers or {},
+        'body': json.dumps(body) if body is not None else None,
+        'pathParameters': path or {},
+        'requestContext': request_context
+    }
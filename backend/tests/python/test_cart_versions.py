@@ -0,0 +1,101 @@
+"""Conditional cart writes, stream re-pricing and the CARTREF backfill (cart/cart_store.py, reprice_carts.py)."""
+import json
+import sys
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from conftest import api_event
+
+serializer = TypeSerializer()
+
+
+@pytest.fixture(scope='module')
+def handlers(stack):
+    return {name: stack.handler('cart', name)
+            for name in ('add_to_cart', 'update_cart_item', 'reprice_carts', 'backfill_cart_refs')}
+
+
+@pytest.fixture(scope='module')
+def cart_store(handlers):
+    import cart_store
+    return cart_store
+
+
+def product_change(product_id, old_price, new_price):
+    def image(price):
+        return {name: serializer.serialize(value) for name, value in {
+            'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA', 'productId': product_id,
+            'price': Decimal(price), 'status': 'active', 'inventory': 100}.items()}
+    return {'Records': [{'eventName': 'MODIFY', 'dynamodb': {'OldImage': image(old_price), 'NewImage': image(new_price)}}]}
+
+
+def read_cart(stack, sub):
+    return stack.table('CARTS_TABLE').get_item(Key={'PK': f'USER#{sub}', 'SK': 'CART'})['Item']
+
+
+def test_reprice_moves_updated_at_and_stale_saves_conflict(handlers, cart_store, stack, context, product):
+    product_id = product(price='10.00')
+    handlers['add_to_cart'](api_event({'productId': product_id, 'quantity': 1}, claims={'sub': 'user-v1'}), context)
+    seen = read_cart(stack, 'user-v1')
+
+    handlers['reprice_carts'](product_change(product_id, '10.00', '12.00'), context)
+
+    repriced = read_cart(stack, 'user-v1')
+    assert repriced['items'][0]['price'] == Decimal('12.00')
+    assert repriced['totals']['subtotal'] == Decimal('12.00')
+    assert repriced['updatedAt'] != seen['updatedAt']
+    assert repriced['pricedAt'] == repriced['updatedAt']
+
+    stale = {**seen, 'updatedAt': '2099-01-01T00:00:00Z'}
+    with pytest.raises(cart_store.CartConflict):
+        cart_store.save_cart(stack.table('CARTS_TABLE'), stale, (), cart_store.version_condition(seen))
+    assert read_cart(stack, 'user-v1')['items'][0]['price'] == Decimal('12.00')
+
+
+def test_handler_answers_conflict_when_the_cart_changes_under_it(handlers, cart_store, stack, context, product,
+                                                                  monkeypatch):
+    product_id = product(price='10.00')
+    handlers['add_to_cart'](api_event({'productId': product_id, 'quantity': 1}, claims={'sub': 'user-v2'}), context)
+    update_module = sys.modules['update_cart_item']
+    save_cart = update_module.save_cart
+
+    def reprice_first(table, cart, previous_ids=(), condition=None):
+        handlers['reprice_carts'](product_change(product_id, '10.00', '8.00'), context)
+        return save_cart(table, cart, previous_ids, condition)
+
+    monkeypatch.setattr(update_module, 'save_cart', reprice_first)
+    response = handlers['update_cart_item'](
+        api_event({'quantity': 3}, path={'productId': product_id}, claims={'sub': 'user-v2'}), context)
+
+    assert response['statusCode'] == 409
+    assert json.loads(response['body'])['error'] == 'CONFLICT'
+    stored = read_cart(stack, 'user-v2')
+    assert stored['items'][0]['quantity'] == 1
+    assert stored['items'][0]['price'] == Decimal('8.00')
+
+
+def test_backfill_indexes_and_reprices_legacy_carts(handlers, cart_store, stack, context, product):
+    product_id = product(price='15.00')
+    carts = stack.table('CARTS_TABLE')
+    carts.put_item(Item={
+        'PK': 'USER#user-legacy', 'SK': 'CART', 'userId': 'user-legacy',
+        'items': [{'productId': product_id, 'quantity': 2, 'price': Decimal('11.00')}],
+        'totals': {'subtotal': Decimal('22.00')}, 'updatedAt': '2025-01-01T00:00:00Z'})
+
+    assert handlers['backfill_cart_refs']({'dryRun': True}, context)['backfilled'] >= 1
+    assert 'Item' not in carts.get_item(Key=cart_store.ref_key(product_id, 'USER#user-legacy'))
+
+    result = handlers['backfill_cart_refs']({}, context)
+
+    assert result['backfilled'] >= 1
+    cart = read_cart(stack, 'user-legacy')
+    assert cart['items'][0]['price'] == Decimal('15.00')
+    assert cart['totals']['subtotal'] == Decimal('30.00')
+    assert 'refsExpireAt' in cart
+    assert 'Item' in carts.get_item(Key=cart_store.ref_key(product_id, 'USER#user-legacy'))
+
+    handlers['reprice_carts'](product_change(product_id, '15.00', '14.00'), context)
+
+    assert read_cart(stack, 'user-legacy')['totals']['subtotal'] == Decimal('28.00')
@@ -0,0 +1,61 @@
+"""Newest-first order listing across legacy and time-sortable order IDs (orders/get_orders.py)."""
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import api_event
+
+
+@pytest.fixture(scope='module')
+def get_orders(stack):
+    return stack.handler('orders', 'get_orders')
+
+
+@pytest.fixture(scope='module')
+def history(stack, get_orders):
+    """Three legacy orders (one whose key sorts inside the sortable range) and three sortable ones."""
+    import order_ids
+
+    def put(order_id, created_at):
+        stack.table('ORDERS_TABLE').put_item(Item={
+            'PK': 'USER#user-history', 'SK': f'ORDER#{order_id}', 'orderId': order_id,
+            'userId': 'user-history', 'status': 'delivered', 'createdAt': created_at})
+
+    put('ord-f00000000001', '2025-03-01T00:00:00Z')
+    put('ord-01000000000a', '2025-06-01T00:00:00Z')
+    put('ord-7abcdef01234', '2025-01-01T00:00:00Z')
+    sortable = []
+    for month in (8, 9, 10):
+        moment = datetime(2025, month, 1, tzinfo=timezone.utc)
+        order_id = order_ids.new_order_id(int(moment.timestamp() * 1000))
+        put(order_id, moment.isoformat().replace('+00:00', 'Z'))
+        sortable.append(order_id)
+    return sortable[::-1] + ['ord-01000000000a', 'ord-f00000000001', 'ord-7abcdef01234']
+
+
+def list_orders(get_orders, context, **params):
+    event = api_event(claims={'sub': 'user-history'})
+    event['queryStringParameters'] = {name: str(value) for name, value in params.items()}
+    response = get_orders(event, context)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+
+def test_pages_run_newest_first_through_legacy_orders(get_orders, history, context):
+    seen, token = [], None
+    while True:
+        params = {'limit': 2, **({'nextToken': token} if token else {})}
+        body = list_orders(get_orders, context, **params)
+        seen += [order['orderId'] for order in body['orders']]
+        token = body.get('nextToken')
+        if not token:
+            break
+
+    assert seen == history
+
+
+def test_date_range_includes_legacy_orders(get_orders, history, context):
+    body = list_orders(get_orders, context, since='2025-02-01', until='2025-09-01')
+
+    assert [order['orderId'] for order in body['orders']] == [history[2], 'ord-01000000000a', 'ord-f00000000001']
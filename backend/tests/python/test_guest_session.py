@@ -0,0 +1,153 @@
+"""Guest session tokens, caller identity and the guest cart round trip (cart/guest_session.py)."""
+import json
+import sys
+
+import pytest
+
+from conftest import api_event
+
+
+@pytest.fixture(scope='module')
+def handlers(stack):
+    return {name: stack.handler('cart', name) for name in ('add_to_cart', 'get_cart', 'merge_guest_cart')}
+
+
+@pytest.fixture(scope='module')
+def guest_session(handlers):
+    import guest_session
+    return guest_session
+
+
+def test_issued_session_verifies(guest_session):
+    owner = guest_session.issue_session(now=1_800_000_000)
+
+    verified = guest_session.verify_session(owner.session_token, now=1_800_000_001)
+
+    assert verified.user_id == owner.user_id
+    assert verified.is_guest
+    assert verified.session_expires_at == owner.session_expires_at
+
+
+@pytest.mark.parametrize('tamper', [
+    lambda token: token[:-2] + ('AA' if not token.endswith('AA') else 'BB'),
+    lambda token: token.replace('guest-', 'guest-0', 1),
+    lambda token: token.replace('guest-', 'user-', 1),
+    lambda token: token.rsplit('.', 1)[0],
+    lambda token: '',
+])
+def test_tampered_sessions_are_rejected(guest_session, tamper):
+    token = guest_session.issue_session(now=1_800_000_000).session_token
+
+    assert guest_session.verify_session(tamper(token), now=1_800_000_001) is None
+
+
+def test_expired_session_is_rejected(guest_session):
+    owner = guest_session.issue_session(now=1_800_000_000)
+
+    assert guest_session.verify_session(owner.session_token, now=owner.session_expires_at) is None
+
+
+def test_signed_in_caller_is_read_from_the_authorization_header(guest_session, user_token):
+    event = api_event(headers={'Authorization': f'Bearer {user_token("user-123")}'})
+
+    owner = guest_session.resolve_cart_owner(event, create=True)
+
+    assert owner.user_id == 'user-123'
+    assert not owner.is_guest
+
+
+def test_anonymous_caller_gets_a_new_session_only_when_asked(guest_session):
+    assert guest_session.resolve_cart_owner(api_event()) is None
+    assert guest_session.resolve_cart_owner(api_event(), create=True).new_session
+
+
+def test_guest_adds_then_reads_cart_with_session(handlers, context, product):
+    product_id = product(price='12.50')
+
+    added = handlers['add_to_cart'](api_event({'productId': product_id, 'quantity': 2}), context)
+    session = added['headers']['X-Guest-Session']
+    cart = handlers['get_cart'](api_event(headers={'X-Guest-Session': session}), context)
+
+    assert added['statusCode'] == 200
+    assert cart['statusCode'] == 200
+    body = json.loads(cart['body'])
+    assert [(item['productId'], int(item['quantity'])) for item in body['items']] == [(product_id, 2)]
+    assert body['totals']['subtotal'] == '25.00'
+
+
+def test_stateless_guest_cart_round_trips_through_get_cart(stack, handlers, context, product, monkeypatch):
+    monkeypatch.setattr(sys.modules['signed_cart'], 'STATELESS', True)
+    product_id = product(price='4.00')
+
+    added = handlers['add_to_cart'](api_event({'productId': product_id, 'quantity': 3}), context)
+    session, token = added['headers']['X-Guest-Session'], added['headers']['X-Guest-Cart']
+    cart = handlers['get_cart'](api_event(headers={'X-Guest-Session': session, 'X-Guest-Cart': token}), context)
+
+    assert cart['statusCode'] == 200
+    body = json.loads(cart['body'])
+    assert [(item['productId'], int(item['quantity'])) for item in body['items']] == [(product_id, 3)]
+    assert body['totals']['subtotal'] == '12.00'
+    assert cart['headers']['X-Guest-Cart'] == body['guestCart']
+    guest_id = session.split('.')[0]
+    assert 'Item' not in stack.table('CARTS_TABLE').get_item(Key={'PK': f'USER#{guest_id}', 'SK': 'CART'})
+
+
+def test_anonymous_get_cart_without_session_is_empty(handlers, context):
+    response = handlers['get_cart'](api_event(), context)
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['items'] == []
+
+
+@pytest.mark.parametrize('authorization', ['Bearer not-a-jwt', 'expired'])
+def test_bad_user_token_is_unauthorized(handlers, context, user_token, authorization):
+    if authorization == 'expired':
+        authorization = f'Bearer {user_token("user-123", expires_in=-60)}'
+
+    response = handlers['get_cart'](api_event(headers={'Authorization': authorization}), context)
+
+    assert response['statusCode'] == 401
+
+
+def test_unreachable_signing_keys_are_unauthorized(handlers, context, user_token, monkeypatch):
+    import urllib.error
+    import urllib.request
+
+    import cognito_auth
+
+    def unreachable(*args, **kwargs):
+        raise urllib.error.URLError('timed out')
+
+    token = user_token('user-123')
+    monkeypatch.setattr(cognito_auth, '_jwks', None)
+    monkeypatch.setattr(urllib.request, 'urlopen', unreachable)
+
+    response = handlers['get_cart'](api_event(headers={'Authorization': f'Bearer {token}'}), context)
+
+    assert response['statusCode'] == 401
+    assert response['headers']['Access-Control-Allow-Origin'] == '*'
+
+
+def test_merge_folds_guest_cart_into_user_cart(stack, handlers, context, product, user_token):
+    shared, guest_only = product(), product()
+    token = user_token('user-merge')
+    user_headers = {'Authorization': f'Bearer {token}'}
+    handlers['add_to_cart'](api_event({'productId': shared, 'quantity': 1}, headers=user_headers), context)
+    added = handlers['add_to_cart'](api_event({'productId': shared, 'quantity': 2}), context)
+    session = added['headers']['X-Guest-Session']
+    handlers['add_to_cart'](api_event({'productId': guest_only}, headers={'X-Guest-Session': session}), context)
+
+    merged = handlers['merge_guest_cart'](api_event({'guestSession': session}, claims={'sub': 'user-merge'}), context)
+
+    assert merged['statusCode'] == 200
+    body = json.loads(merged['body'])
+    assert body['mergedItems'] == 2
+    assert {item['productId']: item['quantity'] for item in body['cart']['items']} == {shared: 3, guest_only: 1}
+    guest_id = session.split('.')[0]
+    assert 'Item' not in stack.table('CARTS_TABLE').get_item(Key={'PK': f'USER#{guest_id}', 'SK': 'CART'})
+
+
+def test_merge_requires_a_valid_guest_session(handlers, context):
+    response = handlers['merge_guest_cart'](api_event({'guestSession': 'guest-x.1.sig'}, claims={'sub': 'u'}), context)
+
+    assert response['statusCode'] == 400
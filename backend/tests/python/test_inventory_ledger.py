@@ -0,0 +1,201 @@
+"""Reservation ledger and the workflow steps that settle it (layers/common/inventory_ledger.py)."""
+import sys
+import uuid
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+serializer = TypeSerializer()
+
+
+@pytest.fixture(scope='module')
+def handlers(stack):
+    return {
+        'validate_inventory': stack.handler('workflows', 'validate_inventory'),
+        'update_inventory': stack.handler('workflows', 'update_inventory'),
+        'fulfil_order': stack.handler('workflows', 'fulfil_order'),
+        'expire_reservations': stack.handler('inventory', 'expire_reservations'),
+    }
+
+
+@pytest.fixture(scope='module')
+def ledger(handlers):
+    import inventory_ledger
+    return inventory_ledger
+
+
+def new_order_id():
+    return f'ord-{uuid.uuid4().hex[:12]}'
+
+
+def stock(stack, product_id):
+    item = stack.table('PRODUCTS_TABLE').get_item(Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'})['Item']
+    return int(item['inventory']), int(item.get('reserved', 0))
+
+
+def pending_order(stack, status='pending'):
+    order_id = new_order_id()
+    stack.table('ORDERS_TABLE').put_item(Item={'PK': 'USER#user-ledger', 'SK': f'ORDER#{order_id}',
+                                               'orderId': order_id, 'userId': 'user-ledger', 'status': status})
+    return order_id
+
+
+def order_status(stack, order_id):
+    return stack.table('ORDERS_TABLE').get_item(Key={'PK': 'USER#user-ledger', 'SK': f'ORDER#{order_id}'})['Item']['status']
+
+
+def expire(stack, ledger, order_id):
+    """Delete the reservation the way TTL does and return the stream record it produces."""
+    orders = stack.table('ORDERS_TABLE')
+    reservation = orders.get_item(Key=ledger.reservation_key(order_id))['Item']
+    orders.delete_item(Key=ledger.reservation_key(order_id))
+    return {
+        'eventID': uuid.uuid4().hex, 'eventName': 'REMOVE',
+        'userIdentity': {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'},
+        'dynamodb': {
+            'Keys': {name: serializer.serialize(value) for name, value in ledger.reservation_key(order_id).items()},
+            'OldImage': {name: serializer.serialize(value) for name, value in reservation.items()},
+            'SequenceNumber': '1'
+        }
+    }
+
+
+def test_reserve_then_commit_consumes_the_stock_once(ledger, stack, product):
+    product_id = product(inventory=10)
+    order_id = new_order_id()
+
+    assert ledger.reserve(order_id, 'user-ledger', {product_id: 3}) == []
+    assert ledger.reserve(order_id, 'user-ledger', {product_id: 3}) == []
+    assert stock(stack, product_id) == (7, 3)
+
+    assert ledger.commit(order_id, {product_id: 3})
+    assert not ledger.commit(order_id, {product_id: 3})
+    # A retried step that falls back to take finds the order already settled
+    assert ledger.take(order_id, {product_id: 3}) == []
+    assert stock(stack, product_id) == (7, 0)
+
+
+def test_release_returns_the_stock_once(ledger, stack, product):
+    product_id = product(inventory=10)
+    order_id = new_order_id()
+    ledger.reserve(order_id, 'user-ledger', {product_id: 4})
+
+    assert ledger.release(order_id, {product_id: 4})
+    assert not ledger.release(order_id, {product_id: 4})
+    assert stock(stack, product_id) == (10, 0)
+
+
+def test_reserve_takes_all_lines_or_none(ledger, stack, product):
+    plenty, short = product(inventory=10), product(inventory=1)
+
+    assert ledger.reserve(new_order_id(), 'user-ledger', {plenty: 2, short: 2}) == [short]
+    assert stock(stack, plenty) == (10, 0)
+    assert stock(stack, short) == (1, 0)
+
+
+def test_expired_reservation_is_restored_once_and_taken_again_on_payment(handlers, ledger, stack, context,
+                                                                          product):
+    product_id = product(inventory=10)
+    order_id = new_order_id()
+    ledger.reserve(order_id, 'user-ledger', {product_id: 2})
+    record = expire(stack, ledger, order_id)
+
+    handlers['expire_reservations']({'Records': [record]}, context)
+    handlers['expire_reservations']({'Records': [record]}, context)
+    assert stock(stack, product_id) == (10, 0)
+
+    items = [{'productId': product_id, 'quantity': 2}]
+    assert handlers['update_inventory']({'orderId': order_id, 'items': items}, context)['status'] == 'success'
+    assert handlers['update_inventory']({'orderId': order_id, 'items': items}, context)['status'] == 'success'
+    assert stock(stack, product_id) == (8, 0)
+
+
+def test_update_inventory_fails_the_order_when_stock_is_short(handlers, stack, context, product):
+    plenty, short = product(inventory=10), product(inventory=1)
+    update_inventory = handlers['update_inventory']
+    items = [{'productId': plenty, 'quantity': 2}, {'productId': short, 'quantity': 2}]
+
+    with pytest.raises(Exception) as raised:
+        update_inventory({'orderId': new_order_id(), 'items': items}, context)
+
+    assert type(raised.value).__name__ == 'InsufficientInventory'
+    assert short in str(raised.value)
+    assert stock(stack, plenty) == (10, 0)
+    assert stock(stack, short) == (1, 0)
+
+
+def test_validate_inventory_reserves_orders_without_a_reservation(handlers, stack, context, product):
+    product_id, short = product(inventory=5), product(inventory=1)
+    validate = handlers['validate_inventory']
+
+    result = validate({'orderId': new_order_id(), 'userId': 'user-ledger',
+                       'items': [{'productId': product_id, 'quantity': 5}]}, context)
+    assert result['available']
+    assert stock(stack, product_id) == (0, 5)
+
+    result = validate({'orderId': new_order_id(), 'userId': 'user-ledger',
+                       'items': [{'productId': short, 'quantity': 2}]}, context)
+    assert not result['available']
+    assert short in result['message']
+    assert stock(stack, short) == (1, 0)
+
+
+def test_fused_reserve_takes_unreserved_stock_through_the_ledger(handlers, ledger, stack, context, product):
+    product_id, deleted = product(inventory=10), product(inventory=10, status='deleted')
+    fulfil = handlers['fulfil_order']
+    order_id = pending_order(stack)
+    event = {'orderId': order_id, 'userId': 'user-ledger', 'items': [{'productId': product_id, 'quantity': 3}]}
+
+    assert fulfil(event, context)['reserved']
+    assert fulfil(event, context)['reserved']
+    assert stock(stack, product_id) == (7, 0)
+    assert 'Item' in stack.table('ORDERS_TABLE').get_item(Key=ledger.settled_key(order_id))
+
+    refused = pending_order(stack)
+    result = fulfil({'orderId': refused, 'userId': 'user-ledger', 'items': [{'productId': deleted, 'quantity': 1}]},
+                    context)
+    assert result['unavailable'] == [deleted]
+    assert order_status(stack, refused) == 'cancelled'
+    assert stock(stack, deleted) == (10, 0)
+
+
+def test_fused_release_retries_cancellations_it_did_not_cause(handlers, stack, context, product, monkeypatch):
+    product_id = product(inventory=10)
+    fulfil = handlers['fulfil_order']
+    order_id = pending_order(stack, status='reserved')
+    event = {'action': 'release', 'orderId': order_id, 'userId': 'user-ledger',
+             'items': [{'productId': product_id, 'quantity': 2}]}
+    client = sys.modules['fulfil_order'].client
+
+    def throttled(**kwargs):
+        raise client.exceptions.TransactionCanceledException({
+            'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+            'CancellationReasons': [{'Code': 'ThrottlingError'}, {'Code': 'None'}]}, 'TransactWriteItems')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(client, 'transact_write_items', throttled)
+        with pytest.raises(client.exceptions.TransactionCanceledException):
+            fulfil(event, context)
+
+    assert fulfil(event, context)['status'] == 'success'
+    assert fulfil(event, context)['status'] == 'success'
+    assert order_status(stack, order_id) == 'failed'
+    assert stock(stack, product_id) == (12, 0)
+
+
+@pytest.mark.parametrize('step', ['validate_inventory', 'update_inventory'])
+def test_dynamodb_errors_fail_the_task(handlers, ledger, stack, context, product, monkeypatch, step):
+    from botocore.exceptions import ClientError
+
+    product_id = product(inventory=10)
+
+    def unavailable(**kwargs):
+        raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Throttled'}},
+                          'TransactWriteItems')
+
+    monkeypatch.setattr(ledger.client, 'transact_write_items', unavailable)
+
+    with pytest.raises(ClientError):
+        handlers[step]({'orderId': new_order_id(), 'userId': 'user-ledger',
+                        'items': [{'productId': product_id, 'quantity': 2}]}, context)
+    assert stock(stack, product_id) == (10, 0)
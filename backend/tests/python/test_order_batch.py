@@ -0,0 +1,97 @@
+"""Queue-mode order processing and SQS redelivery (workflows/process_order_batch.py)."""
+import json
+import sys
+import uuid
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def process(stack):
+    return stack.handler('workflows', 'process_order_batch')
+
+
+@pytest.fixture
+def order(stack):
+    def create(product_id, quantity=2):
+        order_id = f'ord-{uuid.uuid4().hex[:12]}'
+        stack.table('ORDERS_TABLE').put_item(Item={
+            'PK': 'USER#user-batch', 'SK': f'ORDER#{order_id}', 'orderId': order_id, 'userId': 'user-batch',
+            'status': 'pending', 'GSI1PK': 'STATUS#pending', 'paymentMethodId': 'pm_test',
+            'items': [{'productId': product_id, 'quantity': quantity, 'price': Decimal('5.00')}],
+            'totals': {'total': Decimal('10.00'), 'currency': 'USD'}})
+        return order_id
+    return create
+
+
+def deliver(process, context, *order_ids):
+    records = [{'messageId': str(uuid.uuid4()), 'body': json.dumps({'orderId': order_id, 'userId': 'user-batch'})}
+               for order_id in order_ids]
+    return process({'Records': records}, context)
+
+
+def stored_order(stack, order_id):
+    return stack.table('ORDERS_TABLE').get_item(Key={'PK': 'USER#user-batch', 'SK': f'ORDER#{order_id}'})['Item']
+
+
+def stock(stack, product_id):
+    item = stack.table('PRODUCTS_TABLE').get_item(Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'})['Item']
+    return int(item['inventory']), int(item.get('reserved', 0))
+
+
+def test_order_is_paid_and_stock_taken_once(process, stack, context, product, order):
+    product_id = product(inventory=10)
+    order_id = order(product_id)
+
+    assert deliver(process, context, order_id) == {'batchItemFailures': []}
+    assert deliver(process, context, order_id) == {'batchItemFailures': []}
+
+    saved = stored_order(stack, order_id)
+    assert saved['status'] == 'processing'
+    assert saved['GSI1PK'] == 'STATUS#processing'
+    assert saved['payment']['status'] == 'completed'
+    assert saved['items'][0]['productId'] == product_id
+    assert stock(stack, product_id) == (8, 0)
+    assert 'Item' not in stack.table('ORDERS_TABLE').get_item(Key={'PK': f'RESERVATION#{order_id}', 'SK': 'RESERVATION'})
+
+
+def test_redelivery_after_a_crash_reuses_the_reservation(process, stack, context, product, order):
+    product_id = product(inventory=10)
+    order_id = order(product_id, quantity=3)
+    batch = sys.modules['process_order_batch']
+    # The first delivery reserved the stock and then died before paying
+    assert batch.reserve_order(stored_order(stack, order_id)) is None
+    assert stock(stack, product_id) == (7, 3)
+
+    deliver(process, context, order_id)
+
+    assert stored_order(stack, order_id)['status'] == 'processing'
+    assert stock(stack, product_id) == (7, 0)
+
+
+def test_insufficient_stock_cancels_without_taking_any(process, stack, context, product, order):
+    product_id = product(inventory=3)
+    first, second = order(product_id, quantity=2), order(product_id, quantity=2)
+
+    deliver(process, context, first, second)
+
+    assert stored_order(stack, first)['status'] == 'processing'
+    cancelled = stored_order(stack, second)
+    assert cancelled['status'] == 'cancelled'
+    assert product_id in cancelled['errorMessage']
+    assert stock(stack, product_id) == (1, 0)
+
+
+def test_settled_orders_are_left_alone(process, stack, context, product, order):
+    product_id = product(inventory=10)
+    order_id = order(product_id)
+    stack.table('ORDERS_TABLE').update_item(
+        Key={'PK': 'USER#user-batch', 'SK': f'ORDER#{order_id}'},
+        UpdateExpression='SET #status = :failed', ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':failed': 'failed'})
+
+    deliver(process, context, order_id)
+
+    assert stored_order(stack, order_id)['status'] == 'failed'
+    assert stock(stack, product_id) == (10, 0)
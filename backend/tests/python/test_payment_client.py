@@ -0,0 +1,98 @@
+"""Circuit breaker and bulkhead around gateway calls (workflows/payment_client.py)."""
+import sys
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def client(stack, monkeypatch):
+    stack.handler('workflows', 'process_payment')
+    payment_client = sys.modules['payment_client']
+    monkeypatch.setattr(payment_client, 'breaker', payment_client.CircuitBreaker(failure_threshold=2, reset_seconds=0))
+    monkeypatch.setattr(payment_client, '_api_key', 'sk_test')
+    return payment_client
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+
+def gateway(monkeypatch, client, *outcomes):
+    """Answer successive calls with the given responses or exceptions."""
+    calls = []
+
+    def send(*args, **kwargs):
+        calls.append(args)
+        outcome = outcomes[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(client.session, 'request', send)
+    return calls
+
+
+def open_breaker(client):
+    client.breaker.record(False)
+    client.breaker.record(False)
+    assert client.breaker.opened_at is not None
+
+
+def test_unexpected_error_in_half_open_trial_clears_the_trial(client, monkeypatch):
+    open_breaker(client)
+    gateway(monkeypatch, client, requests.exceptions.InvalidHeader('bad header'), Response(200, {'id': 'ch_1'}))
+
+    with pytest.raises(requests.exceptions.InvalidHeader):
+        client.request('GET', '/v1/charges/ch_1')
+
+    assert not client.breaker.trial_in_flight
+    assert client.breaker.opened_at is not None
+    assert client.request('GET', '/v1/charges/ch_1') == {'id': 'ch_1'}
+    assert client.breaker.state == 'closed'
+
+
+def test_any_exception_counts_as_a_failure(client, monkeypatch):
+    gateway(monkeypatch, client, ValueError('boom'), ValueError('boom'))
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            client.request('GET', '/v1/charges/ch_1')
+
+    assert client.breaker.opened_at is not None
+
+
+def test_server_errors_fail_the_trial(client, monkeypatch):
+    open_breaker(client)
+    gateway(monkeypatch, client, Response(503))
+
+    with pytest.raises(client.PaymentGatewayTimeout):
+        client.request('GET', '/v1/charges/ch_1')
+
+    assert not client.breaker.trial_in_flight
+    assert client.breaker.failures == 3
+
+
+def test_declines_do_not_trip_the_breaker(client, monkeypatch):
+    gateway(monkeypatch, client, *[Response(402, {'error': {'message': 'Card declined'}})] * 3)
+
+    for _ in range(3):
+        with pytest.raises(client.PaymentDeclined):
+            client.request('POST', '/v1/charges')
+
+    assert client.breaker.state == 'closed'
+
+
+def test_bulkhead_is_released_when_the_breaker_rejects(client, monkeypatch):
+    monkeypatch.setattr(client.breaker, 'reset_seconds', 3600)
+    open_breaker(client)
+    available = client.bulkhead._value
+
+    with pytest.raises(client.PaymentGatewayUnavailable):
+        client.request('GET', '/v1/charges/ch_1')
+
+    assert client.bulkhead._value == available
@@ -0,0 +1,117 @@
+"""Cart totals, promotions and PUT /cart/promo-codes (cart/pricing.py, cart/set_promo_codes.py)."""
+import json
+from decimal import Decimal
+
+import pytest
+
+from conftest import api_event
+
+
+@pytest.fixture(scope='module')
+def handlers(stack):
+    return {name: stack.handler('cart', name) for name in ('add_to_cart', 'set_promo_codes')}
+
+
+@pytest.fixture
+def pricing(handlers, monkeypatch):
+    import pricing
+    for code, promotion in pricing.compile_promotions({
+        'SAVE10': {'type': 'percent', 'value': 10, 'minSubtotal': 25},
+        'BOOKS5': {'type': 'amount', 'value': 5, 'category': 'books'},
+        'FREESHIP': {'type': 'free_shipping'},
+    }).items():
+        monkeypatch.setitem(pricing.PROMOTIONS, code, promotion)
+    return pricing
+
+
+def line(price, quantity, category='books'):
+    return {'productId': f'prod-{price}', 'price': price, 'quantity': quantity, 'category': category}
+
+
+def test_totals_are_exact_cents_whatever_the_price_type(pricing):
+    carts = [{'items': [line(price, 3)]} for price in (Decimal('0.10'), 0.1, '0.10')]
+
+    totals = [pricing.price_cart(cart) for cart in carts]
+
+    assert {t['subtotal'] for t in totals} == {Decimal('0.30')}
+    assert totals[0] == totals[1] == totals[2]
+    assert totals[0]['total'] == Decimal('0.30') + Decimal('0.02') + Decimal('9.99')
+    assert carts[0]['items'][0]['lineTotal'] == Decimal('0.30')
+
+
+def test_sub_cent_prices_round_half_up(pricing):
+    assert pricing.to_cents(Decimal('1.005')) == 101
+    assert pricing.to_cents(Decimal('1.004')) == 100
+    assert str(pricing.from_cents(4000)) == '40.00'
+
+
+def test_promotions_apply_in_the_same_pass(pricing):
+    cart = {'items': [line(Decimal('20.00'), 1), line(Decimal('10.00'), 1, category='audio')],
+            'promoCodes': ['save10', 'BOOKS5']}
+
+    totals = pricing.price_cart(cart)
+
+    assert totals['discount'] == Decimal('8.00')
+    assert totals['tax'] == Decimal('1.76')
+    assert totals['shipping'] == Decimal('9.99')
+    assert totals['total'] == Decimal('30.00') - Decimal('8.00') + Decimal('1.76') + Decimal('9.99')
+
+
+def test_promotion_minimum_subtotal(pricing):
+    totals = pricing.price_cart({'items': [line(Decimal('20.00'), 1)], 'promoCodes': ['SAVE10']})
+
+    assert totals['discount'] == Decimal('0.00')
+
+
+def test_price_carts_applies_new_prices(pricing):
+    carts = [{'items': [line(Decimal('5.00'), 2)]}, {'items': [line(Decimal('7.00'), 1)]}]
+
+    totals = pricing.price_carts(carts, {'prod-5.00': Decimal('4.50')})
+
+    assert [t['subtotal'] for t in totals] == [Decimal('9.00'), Decimal('7.00')]
+    assert carts[0]['items'][0]['price'] == Decimal('4.50')
+
+
+def user_cart(handlers, context, product, sub):
+    event = api_event({'productId': product(price='20.00'), 'quantity': 2}, claims={'sub': sub})
+    assert handlers['add_to_cart'](event, context)['statusCode'] == 200
+
+
+def test_promo_codes_are_stored_and_priced(handlers, pricing, stack, context, product):
+    user_cart(handlers, context, product, 'user-promo-1')
+
+    response = handlers['set_promo_codes'](
+        api_event({'promoCodes': ['save10', 'FREESHIP', 'SAVE10']}, claims={'sub': 'user-promo-1'}), context)
+
+    assert response['statusCode'] == 200
+    cart = json.loads(response['body'])
+    assert cart['promoCodes'] == ['SAVE10', 'FREESHIP']
+    assert Decimal(cart['totals']['discount']) == Decimal('4.00')
+    assert Decimal(cart['totals']['shipping']) == Decimal('0.00')
+    stored = stack.table('CARTS_TABLE').get_item(Key={'PK': 'USER#user-promo-1', 'SK': 'CART'})['Item']
+    assert stored['promoCodes'] == ['SAVE10', 'FREESHIP']
+    assert stored['totals']['discount'] == Decimal('4.00')
+
+    response = handlers['set_promo_codes'](api_event({'promoCodes': []}, claims={'sub': 'user-promo-1'}), context)
+
+    assert 'promoCodes' not in json.loads(response['body'])
+    assert json.loads(response['body'])['totals']['discount'] == '0.00'
+
+
+def test_unknown_promo_codes_are_rejected(handlers, pricing, stack, context, product):
+    user_cart(handlers, context, product, 'user-promo-2')
+
+    response = handlers['set_promo_codes'](
+        api_event({'promoCodes': ['SAVE10', 'NOPE']}, claims={'sub': 'user-promo-2'}), context)
+
+    assert response['statusCode'] == 400
+    assert json.loads(response['body'])['promoCodes'] == ['NOPE']
+    stored = stack.table('CARTS_TABLE').get_item(Key={'PK': 'USER#user-promo-2', 'SK': 'CART'})['Item']
+    assert 'promoCodes' not in stored
+
+
+def test_promo_codes_need_a_signed_in_cart(handlers, pricing, context):
+    assert handlers['set_promo_codes'](api_event({'promoCodes': ['SAVE10']}), context)['statusCode'] == 401
+    response = handlers['set_promo_codes'](api_event({'promoCodes': ['SAVE10']}, claims={'sub': 'user-no-cart'}),
+                                           context)
+    assert response['statusCode'] == 404
@@ -0,0 +1,72 @@
+"""Bulk product changes: conflicts, duplicates and soft-deleted products (products/product_changes.py)."""
+import json
+
+import pytest
+
+from conftest import api_event
+
+
+@pytest.fixture(scope='module')
+def handlers(stack):
+    return {name: stack.handler('products', name) for name in ('bulk_update_products', 'delete_product')}
+
+
+def bulk(handlers, context, changes, **fields):
+    response = handlers['bulk_update_products'](api_event({'changes': changes, **fields},
+                                                          claims={'sub': 'admin-1'}), context)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+
+def stored(stack, product_id):
+    return stack.table('PRODUCTS_TABLE').get_item(Key={'PK': f'PRODUCT#{product_id}', 'SK': 'METADATA'})['Item']
+
+
+def test_stale_rows_conflict_and_return_the_current_version(handlers, stack, context, product):
+    product_id = product(updatedAt='2026-01-02T00:00:00Z')
+
+    body = bulk(handlers, context, [{'productId': product_id, 'price': 12, 'expectedUpdatedAt': '2026-01-01T00:00:00Z'}])
+
+    assert body['results'] == [{'productId': product_id, 'status': 'conflict', 'updatedAt': '2026-01-02T00:00:00Z'}]
+    assert stored(stack, product_id)['price'] != 12
+
+    body = bulk(handlers, context, [{'productId': product_id, 'price': 12, 'expectedUpdatedAt': '2026-01-02T00:00:00Z'}])
+
+    assert body['results'][0]['status'] == 'updated'
+    assert stored(stack, product_id)['price'] == 12
+
+
+def test_if_unmodified_since_refuses_newer_products(handlers, stack, context, product):
+    older, newer = product(updatedAt='2026-01-01T00:00:00Z'), product(updatedAt='2026-03-01T00:00:00Z')
+
+    body = bulk(handlers, context, [{'productId': older, 'inventory': 5}, {'productId': newer, 'inventory': 5}],
+                ifUnmodifiedSince='2026-02-01T00:00:00Z')
+
+    assert [result['status'] for result in body['results']] == ['updated', 'conflict']
+    assert stored(stack, older)['inventory'] == 5
+    assert stored(stack, newer)['inventory'] == 100
+
+
+def test_duplicate_and_unknown_rows_are_reported(handlers, context, product):
+    product_id = product()
+
+    body = bulk(handlers, context, [{'productId': product_id, 'inventory': 1}, {'productId': product_id, 'inventory': 2},
+                                    {'productId': 'prod-missing', 'inventory': 1}])
+
+    assert [result['status'] for result in body['results']] == ['updated', 'duplicate', 'not_found']
+
+
+def test_rows_cannot_delete_or_restore_products(handlers, stack, context, product):
+    live, deleted = product(), product()
+    handlers['delete_product']({'pathParameters': {'id': deleted}}, context)
+
+    body = bulk(handlers, context, [{'productId': live, 'status': 'deleted'},
+                                    {'productId': deleted, 'status': 'active', 'price': 9}])
+
+    assert body['results'][0]['status'] == 'invalid'
+    assert body['results'][1] == {'productId': deleted, 'status': 'deleted'}
+    assert stored(stack, live)['status'] == 'active'
+    restored = stored(stack, deleted)
+    assert restored['status'] == 'deleted'
+    assert restored['GSI2PK'] == 'STATUS#deleted'
+    assert 'GSI1SK' not in restored
@@ -0,0 +1,81 @@
+"""Ranking counters and the order status feed from the OrdersTable stream (orders/project_orders.py)."""
+import sys
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from fake_connections import FakeConnections
+
+serializer = TypeSerializer()
+
+
+@pytest.fixture(scope='module')
+def project(stack):
+    return stack.handler('orders', 'project_orders')
+
+
+def paid_order(product_id, status='processing'):
+    return {'PK': 'USER#user-rank', 'SK': 'ORDER#ord-rank', 'orderId': 'ord-rank', 'userId': 'user-rank',
+            'status': status, 'createdAt': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'items': [{'productId': product_id, 'category': 'books', 'quantity': 3, 'price': Decimal('4.00')}]}
+
+
+def record(old=None, new=None):
+    images = {name: {k: serializer.serialize(v) for k, v in image.items()}
+              for name, image in (('OldImage', old), ('NewImage', new)) if image}
+    return {'eventID': uuid.uuid4().hex, 'eventName': 'MODIFY' if old else 'INSERT',
+            'dynamodb': {**images, 'SequenceNumber': '1'}}
+
+
+def scores(stack, product_id):
+    items = stack.table('READ_MODELS_TABLE').scan()['Items']
+    return {item['PK'].split('#')[1]: item['score'] for item in items
+            if item['PK'].startswith('RANK#') and item['SK'] == f'PRODUCT#{product_id}'}
+
+
+def test_paid_orders_feed_the_ranking_counters_once(project, stack, context):
+    import product_rankings
+    product_id = f'prod-{uuid.uuid4().hex[:10]}'
+    order = paid_order(product_id)
+    paid = record(new=order)
+
+    assert project({'Records': [paid]}, context) == {'batchItemFailures': []}
+    assert project({'Records': [paid]}, context) == {'batchItemFailures': []}
+
+    counted = scores(stack, product_id)
+    assert set(counted) == set(product_rankings.HALF_LIVES)
+    created_at = datetime.fromisoformat(order['createdAt'].replace('Z', '+00:00'))
+    for kind, score in counted.items():
+        epoch = product_rankings.epoch_of(kind, created_at)
+        assert score == product_rankings.to_decimal(3 * product_rankings.weight(kind, epoch, created_at))
+
+    project({'Records': [record(old=order, new={**order, 'status': 'cancelled'})]}, context)
+
+    assert all(score == 0 for score in scores(stack, product_id).values())
+
+
+def test_status_changes_feed_the_status_item_and_push_once(project, stack, context, monkeypatch):
+    projector = sys.modules['project_orders']
+    connections = FakeConnections()
+    monkeypatch.setattr(projector, 'connections_api', connections)
+    order_id = f'ord-{uuid.uuid4().hex[:12]}'
+    order = {**paid_order(f'prod-{uuid.uuid4().hex[:10]}', status='pending'),
+             'SK': f'ORDER#{order_id}', 'orderId': order_id, 'updatedAt': '2026-01-01T00:00:00Z'}
+    project({'Records': [record(new=order)]}, context)
+    connections.connect('conn-1')
+    projector.store.add(order_id, 'conn-1')
+    connections.connect('conn-gone')
+    projector.store.add(order_id, 'conn-gone')
+    connections.disconnect('conn-gone')
+
+    processing = record(old=order, new={**order, 'status': 'processing', 'updatedAt': '2026-01-01T00:00:05Z'})
+    project({'Records': [processing]}, context)
+    project({'Records': [processing]}, context)
+
+    item = stack.table('READ_MODELS_TABLE').get_item(Key={'PK': f'ORDERSTATUS#{order_id}', 'SK': 'STATUS'})['Item']
+    assert (item['status'], item['version'], item['userId']) == ('processing', '2026-01-01T00:00:05Z', 'user-rank')
+    assert connections.inbox['conn-1'] == [
+        {'type': 'orderStatus', 'orderId': order_id, 'status': 'processing', 'version': '2026-01-01T00:00:05Z'}]
+    assert projector.store.connections(order_id) == ['conn-1']
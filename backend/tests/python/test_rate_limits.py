@@ -0,0 +1,94 @@
+"""Caller groups and leased window quotas (layers/common/rate_limits.py)."""
+import sys
+import uuid
+
+import pytest
+
+from conftest import api_event
+
+
+@pytest.fixture(scope='module')
+def rate_limits(stack):
+    stack.handler('cart', 'add_to_cart')
+    import rate_limits
+    return rate_limits
+
+
+@pytest.fixture
+def clock():
+    return [1_800_000_010.0]
+
+
+def limiter(rate_limits, stack, clock, per_window):
+    limit = rate_limits.Limit(rate=1000, burst=1000, per_window=per_window)
+    return rate_limits.RateLimiter(stack.table('READ_MODELS_TABLE'), {'cart:add': {'customer': limit}},
+                                   clock=lambda: clock[0])
+
+
+@pytest.mark.parametrize('groups, group', [
+    (['Admins'], 'admin'),
+    ('[Admins Customers]', 'admin'),
+    ('[NotAdmins]', 'customer'),
+    (['SuperAdmins', 'Admins-readonly'], 'customer'),
+    ('', 'customer'),
+])
+def test_admin_group_is_an_exact_match(rate_limits, groups, group):
+    assert rate_limits.caller(api_event(claims={'sub': 'user-1', 'cognito:groups': groups})) == (group, 'user#user-1')
+
+
+@pytest.mark.parametrize('groups, group', [((), 'customer'), (('Admins',), 'admin')])
+def test_bearer_token_identifies_callers_on_routes_without_an_authorizer(rate_limits, user_token, groups, group):
+    token = user_token('user-bearer', groups=groups)
+    event = api_event(headers={'Authorization': f'Bearer {token}'}, source_ip='203.0.113.5')
+
+    assert rate_limits.caller(event) == (group, 'user#user-bearer')
+
+
+def test_invalid_bearer_token_is_keyed_by_ip(rate_limits):
+    event = api_event(headers={'Authorization': 'Bearer not-a-jwt'}, source_ip='203.0.113.5')
+
+    assert rate_limits.caller(event) == ('anonymous', 'ip#203.0.113.5')
+
+
+def test_anonymous_callers_are_keyed_by_ip(rate_limits):
+    assert rate_limits.caller(api_event(source_ip='203.0.113.5')) == ('anonymous', 'ip#203.0.113.5')
+
+
+def test_containers_share_the_window_through_leases(rate_limits, stack, clock):
+    containers = [limiter(rate_limits, stack, clock, per_window=200) for _ in range(3)]
+    event = api_event(claims={'sub': f'user-{uuid.uuid4().hex[:8]}'})
+    stack.reset_counters()
+
+    allowed = sum(containers[n % 3].check('cart:add', event) is None for n in range(230))
+
+    assert allowed == 200
+    # One write per lease of LEASE_MAX requests, plus each container's refused lease
+    assert stack.api_calls.get('UpdateItem') == 200 // rate_limits.LEASE_MAX + 3
+    refused = containers[0].check('cart:add', event)
+    assert refused['statusCode'] == 429
+    assert int(refused['headers']['Retry-After']) <= rate_limits.WINDOW_SECONDS
+
+    clock[0] += rate_limits.WINDOW_SECONDS
+    assert containers[0].check('cart:add', event) is None
+
+
+def test_rate_limiting_is_off_unless_enabled(rate_limits, monkeypatch, stack):
+    monkeypatch.delenv('RATE_LIMITING', raising=False)
+    assert rate_limits.from_environment(stack.dynamodb) is None
+    monkeypatch.setenv('RATE_LIMITING', 'on')
+    assert rate_limits.from_environment(stack.dynamodb) is not None
+
+
+def test_post_cart_limits_signed_in_callers_by_their_token(rate_limits, stack, clock, context, product, user_token,
+                                                           monkeypatch):
+    add_to_cart = stack.handler('cart', 'add_to_cart')
+    # Only customers are limited here, one request per window
+    monkeypatch.setattr(sys.modules['add_to_cart'], 'limiter', limiter(rate_limits, stack, clock, per_window=1))
+    product_id = product()
+    headers = {'Authorization': f'Bearer {user_token(f"user-{uuid.uuid4().hex[:8]}")}'}
+
+    first = add_to_cart(api_event({'productId': product_id}, headers=headers), context)
+    second = add_to_cart(api_event({'productId': product_id}, headers=headers), context)
+
+    assert first['statusCode'] == 200
+    assert second['statusCode'] == 429
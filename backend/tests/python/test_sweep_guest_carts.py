@@ -0,0 +1,62 @@
+"""Expired and pre-session guest carts swept in bounded, resumable runs (cart/sweep_guest_carts.py)."""
+import sys
+import time
+import uuid
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def sweep(stack):
+    return stack.handler('cart', 'sweep_guest_carts')
+
+
+def put_cart(stack, user_id, product_id, **fields):
+    carts = stack.table('CARTS_TABLE')
+    pk = f'USER#{user_id}'
+    carts.put_item(Item={'PK': pk, 'SK': 'CART', 'userId': user_id,
+                         'items': [{'productId': product_id, 'quantity': 1}], **fields})
+    carts.put_item(Item={'PK': f'CARTREF#{product_id}', 'SK': pk, 'expiresAt': int(time.time()) + 3600})
+    return pk
+
+
+def exists(stack, pk, sk='CART'):
+    return 'Item' in stack.table('CARTS_TABLE').get_item(Key={'PK': pk, 'SK': sk})
+
+
+def test_expired_and_orphan_guest_carts_are_deleted_with_their_refs(sweep, stack, context):
+    now = int(time.time())
+    product_id = f'prod-{uuid.uuid4().hex[:10]}'
+    expired = put_cart(stack, f'guest-{uuid.uuid4()}', product_id, isGuest=True, expiresAt=now - 60)
+    live = put_cart(stack, f'guest-{uuid.uuid4()}', product_id, isGuest=True, expiresAt=now + 3600)
+    orphan = put_cart(stack, f'guest-{uuid.uuid4()}', product_id, expiresAt=now + 3600)
+    user = put_cart(stack, f'user-{uuid.uuid4().hex[:8]}', product_id, expiresAt=now - 60)
+
+    for _ in range(100):
+        if sweep({}, context)['passComplete']:
+            break
+
+    assert not exists(stack, expired) and not exists(stack, orphan)
+    assert exists(stack, live) and exists(stack, user)
+    assert not exists(stack, f'CARTREF#{product_id}', expired)
+    assert exists(stack, f'CARTREF#{product_id}', live)
+
+
+def test_each_run_scans_a_bounded_slice_and_resumes(sweep, stack, context, monkeypatch):
+    sweeper = sys.modules['sweep_guest_carts']
+    monkeypatch.setattr(sweeper, 'PAGE_SIZE', 2)
+    monkeypatch.setattr(sweeper, 'MAX_PAGES_PER_RUN', 1)
+    product_id = f'prod-{uuid.uuid4().hex[:10]}'
+    for _ in range(3):
+        put_cart(stack, f'guest-{uuid.uuid4()}', product_id, isGuest=True, expiresAt=int(time.time()) + 3600)
+
+    first = sweep({}, context)
+
+    assert first['scanned'] <= 2
+    assert not first['passComplete']
+    assert sweeper.load_cursor() is not None
+    runs = 1
+    while not sweep({}, context)['passComplete']:
+        runs += 1
+    assert runs > 1
+    assert sweeper.load_cursor() is None
@@ -66,6 +66,7 @@ export const cartApi = {
 export const ordersApi = {
   getAll: () => api.get('/orders'),
   getById: (id) => api.get(`/orders/${id}`),
+  getStatus: (id, params) => api.get(`/orders/${id}/status`, { params }),
   create: (data) => api.post('/checkout', data),
 }
 